@@ -0,0 +1,320 @@
+"""
+Ingestion throughput benchmark: streams a synthetic species corpus through the
+IngestionPipeline into local FAISS and embedded (local) Qdrant.
+
+Usage (from backend/):
+    python -m benchmarks.ingest_benchmark --documents 500
+    python -m benchmarks.ingest_benchmark --corpus data/snakes.json --documents 2000 --backends faiss,qdrant
+    python -m benchmarks.ingest_benchmark --documents 5000 --embedder random --batch-size 128   # pipeline overhead only
+
+The synthetic corpus has the same fields as the knowledge base. Field presence and word
+counts are resampled from --corpus when given (its vocabulary is reused, so tokenization
+and chunking behave like the real text); otherwise word counts follow a gamma distribution
+around the per-field averages measured on the production corpus (see FIELD_CHUNK_CONFIG).
+--length-scale multiplies every field length, e.g. to test longer documents.
+
+--embedder model (default) uses the real e5 model; --embedder random returns random unit
+vectors so chunking / upload / checkpoint costs can be measured without the model.
+Pipeline print() output is discarded during the timed runs (--verbose keeps it).
+
+Reported per backend (median of --repeat runs):
+    throughput  chunks/s end to end and per stage (chunks / busy seconds of that stage)
+    time split  busy seconds per stage (read_chunk, embed, tokenize, upload, persist) and
+                their share; stages overlap (read / embed / upload run in parallel threads),
+                so the end-to-end time is close to the slowest stage, not their sum
+    memory      RSS before the run, peak RSS during it (sampled) and the difference
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+from config.rag_config import RagConfig
+from rag.document_processor import DocumentProcessor
+from rag.inference_runtime import PRIORITY_BULK
+from rag.ingest_manifest import IngestManifest
+from rag.ingestion_pipeline import IngestionPipeline, iter_documents
+from rag.partition_router import PartitionRouter
+from benchmarks.bench_utils import RSSSampler, peak_rss_mb, write_report
+
+# Average words per field in the production corpus (measured for FIELD_CHUNK_CONFIG)
+FIELD_AVG_WORDS = {
+    "Tên khoa học và tên phổ thông": 292,
+    "Phân loại học": 190,
+    "Đặc điểm hình thái": 426,
+    "Độc tính": 170,
+    "Tập tính săn mồi": 206,
+    "Hành vi và sinh thái": 219,
+    "Phân bố địa lý và môi trường sống": 224,
+    "Sinh sản": 162,
+    "Tình trạng bảo tồn": 119,
+    "Giá trị nghiên cứu": 109,
+    "Sự liên quan với con người": 105,
+    "Các quan sát thú vị từ các nhà nghiên cứu": 186,
+}
+FIELD_LENGTH_CV = 0.35  # Coefficient of variation of the default gamma length distribution
+
+DEFAULT_VOCABULARY = (
+    "rắn độc không loài họ chi thân dài màu đen trắng vàng nâu xanh đầu đuôi vảy lưng bụng "
+    "sống ở rừng núi đồng bằng ven suối ruộng lúa Việt Nam Đông Nam Á ăn chuột ếch nhái chim "
+    "trứng cá thằn lằn săn mồi vào ban đêm ngày nọc độc thần kinh máu gây tử vong khi bị cắn "
+    "triệu chứng sưng đau chảy máu khó thở liệt cơ cần sơ cứu garô bất động chi đưa đến bệnh viện "
+    "huyết thanh kháng nọc con người nuôi nghiên cứu bảo tồn sách đỏ nguy cấp sinh sản đẻ trứng "
+    "con non mùa mưa khô trưởng thành cá thể quan sát nhà khoa học tập tính phòng vệ bạnh cổ "
+    "phì hơi trườn leo cây bơi nước hang hốc mô đất Naja Bungarus Trimeresurus Ophiophagus"
+).split()
+
+BACKENDS = ("faiss", "qdrant")
+STAGES = ("read_chunk", "embed", "tokenize", "upload", "persist")
+
+
+class RandomEmbeddingGenerator:
+    """EmbeddingGenerator stand-in returning random unit vectors (no model, ~zero cost)"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+
+    def generate_embeddings(self, texts, batch_size: int = None, show_progress: bool = True,
+                            priority: int = PRIORITY_BULK) -> np.ndarray:
+        vectors = self.rng.standard_normal((len(texts), RagConfig.VECTOR_DIMENSION)).astype("float32")
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# ---- synthetic corpus ----
+
+def corpus_profile(path: str) -> Tuple[Dict[str, dict], List[str], List[int]]:
+    """
+    Field presence / word counts and vocabulary of a real corpus
+
+    Returns:
+        ({field: {"presence": share of documents, "lengths": [word counts]}}, vocabulary, weights)
+    """
+    documents = 0
+    lengths = {field: [] for field in DocumentProcessor.DEFAULT_METADATA_FIELDS}
+    words = Counter()
+    for doc in iter_documents(path):
+        documents += 1
+        for field in lengths:
+            text = doc.get(field)
+            if text:
+                tokens = str(text).split()
+                lengths[field].append(len(tokens))
+                words.update(tokens)
+    if not documents:
+        raise ValueError(f"corpus {path} has no documents")
+    profile = {
+        field: {"presence": len(values) / documents, "lengths": values}
+        for field, values in lengths.items() if values
+    }
+    vocabulary, weights = zip(*words.most_common(20000))
+    return profile, list(vocabulary), list(weights)
+
+
+def default_profile(samples: int = 1000, seed: int = 0) -> Tuple[Dict[str, dict], List[str], List[int]]:
+    """Gamma-distributed word counts around FIELD_AVG_WORDS, every field present"""
+    rng = np.random.default_rng(seed)
+    shape = 1 / FIELD_LENGTH_CV ** 2
+    profile = {
+        field: {"presence": 1.0,
+                "lengths": np.maximum(5, rng.gamma(shape, mean / shape, samples)).astype(int).tolist()}
+        for field, mean in FIELD_AVG_WORDS.items()
+    }
+    return profile, DEFAULT_VOCABULARY, [1] * len(DEFAULT_VOCABULARY)
+
+
+def write_corpus(path: str, documents: int, profile: Dict[str, dict], vocabulary: List[str],
+                 weights: List[int], length_scale: float, seed: int) -> dict:
+    """Write a JSONL corpus of synthetic documents; returns document / field / word counts"""
+    rng = random.Random(seed)
+    cum_weights = list(itertools.accumulate(weights))
+    fields = words = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(documents):
+            doc = {"id": f"bench-{i:06d}", "name_vn": f"Rắn thử nghiệm {i}", "name_en": f"Benchmark snake {i}"}
+            for field, stats in profile.items():
+                if rng.random() >= stats["presence"]:
+                    continue
+                count = max(1, int(rng.choice(stats["lengths"]) * length_scale))
+                doc[field] = " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+                fields += 1
+                words += count
+            f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    return {"documents": documents, "fields": fields, "words": words, "bytes": os.path.getsize(path)}
+
+
+# ---- runs ----
+
+def create_store(backend: str, workdir: str):
+    """Empty FAISS index or embedded Qdrant collection inside workdir"""
+    if backend == "faiss":
+        from rag.vector_store import FAISSVectorStore
+        RagConfig.FAISS_INDEX_PATH = os.path.join(workdir, "faiss_index")
+        store = FAISSVectorStore()
+        store.create_index()
+        return store
+
+    from rag.qdrant_vector_store import QdrantVectorStore
+    # One embedded storage per process (shared client): every run recreates the collection
+    RagConfig.QDRANT_MODE = "local"
+    RagConfig.QDRANT_LOCAL_PATH = os.path.join(os.path.dirname(workdir), "qdrant_storage")
+    RagConfig.QDRANT_COLLECTION_NAME = "ingest_benchmark"
+    store = QdrantVectorStore()
+    store.create_index()
+    return store
+
+
+def run_once(backend: str, corpus_path: str, workdir: str, embedder, reranker, args) -> dict:
+    """Full (non-resumed) ingestion of the corpus into a fresh store"""
+    os.makedirs(workdir, exist_ok=True)
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        store = create_store(backend, workdir)
+        pipeline = IngestionPipeline(
+            embedder, store, DocumentProcessor(),
+            partition_router=PartitionRouter(os.path.join(workdir, "partition_index")),
+            reranker=reranker,
+            manifest=IngestManifest(os.path.join(workdir, "ingest_manifest.json")),
+            batch_size=args.batch_size,
+            queue_size=args.queue_size,
+            checkpoint_path=os.path.join(workdir, "ingest_checkpoint.json")
+        )
+        with RSSSampler() as rss:
+            started = time.perf_counter()
+            stats = pipeline.run(corpus_path, resume=False)
+            elapsed = time.perf_counter() - started
+
+    chunks = stats["chunks_done"]
+    busy = stats["stage_seconds"]
+    total_busy = sum(busy.values()) or 1e-9
+    return {
+        "chunks": chunks,
+        "documents": stats["documents_done"],
+        "batches": stats["batches"],
+        "checkpoints": stats["checkpoints"],
+        "elapsed_seconds": round(elapsed, 3),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "stage_seconds": busy,
+        "stage_share": {stage: round(seconds / total_busy, 4) for stage, seconds in busy.items()},
+        "stage_chunks_per_second": {
+            stage: round(chunks / seconds, 1) if seconds > 0 else None for stage, seconds in busy.items()
+        },
+        "rss_start_mb": round(rss.start_mb, 1),
+        "rss_peak_mb": round(rss.peak_mb, 1),
+        "rss_growth_mb": round(rss.peak_mb - rss.start_mb, 1)
+    }
+
+
+def summarize_runs(runs: List[dict]) -> dict:
+    """Median of every numeric metric over the repeated runs (per-stage dicts too)"""
+    def median(values):
+        values = [v for v in values if v is not None]
+        return round(statistics.median(values), 3) if values else None
+
+    summary = {}
+    for key, value in runs[0].items():
+        if isinstance(value, dict):
+            summary[key] = {stage: median([run[key][stage] for run in runs]) for stage in value}
+        else:
+            summary[key] = median([run[key] for run in runs])
+    return summary
+
+
+def print_summary(backend: str, summary: dict):
+    print(f"\n{backend}: {summary['chunks']:.0f} chunks in {summary['elapsed_seconds']:.2f}s "
+          f"→ {summary['chunks_per_second']:.1f} chunks/s, peak RSS {summary['rss_peak_mb']:.0f} MB "
+          f"(+{summary['rss_growth_mb']:.0f} MB)")
+    print(f"  {'stage':<12}{'busy s':>10}{'share':>9}{'chunks/s':>12}")
+    for stage in STAGES:
+        rate = summary["stage_chunks_per_second"].get(stage)
+        print(f"  {stage:<12}{summary['stage_seconds'][stage]:>10.3f}{summary['stage_share'][stage]:>9.1%}"
+              f"{f'{rate:.1f}' if rate is not None else '-':>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming ingestion into local FAISS / Qdrant")
+    parser.add_argument("--corpus", default=None, help="Real corpus (JSON / JSONL) to take field lengths and vocabulary from")
+    parser.add_argument("--documents", type=int, default=500, help="Synthetic documents to generate")
+    parser.add_argument("--length-scale", type=float, default=1.0, help="Multiply every field's word count")
+    parser.add_argument("--backends", default="faiss,qdrant", help="Comma-separated: faiss, qdrant")
+    parser.add_argument("--embedder", choices=["model", "random"], default="model",
+                        help="model = real e5 embeddings, random = no model (measure the rest of the pipeline)")
+    parser.add_argument("--tokenize", action="store_true",
+                        help="Load the cross-encoder and pre-tokenize passages like scripts/ingest.py does")
+    parser.add_argument("--batch-size", type=int, default=RagConfig.INGEST_BATCH_SIZE, help="Chunks per batch")
+    parser.add_argument("--queue-size", type=int, default=RagConfig.INGEST_QUEUE_SIZE, help="Batches between stages")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per backend (median reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's print() output")
+    parser.add_argument("--output", default=f"benchmarks/results/ingest_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    args = parser.parse_args()
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    unknown = set(backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backends: {', '.join(sorted(unknown))}")
+
+    profile, vocabulary, weights = corpus_profile(args.corpus) if args.corpus else default_profile(seed=args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="ingest_bench_") as tmp:
+        corpus_path = os.path.join(tmp, "corpus.jsonl")
+        corpus = write_corpus(corpus_path, args.documents, profile, vocabulary, weights, args.length_scale, args.seed)
+        print(f"Synthetic corpus: {corpus['documents']} documents, {corpus['fields']} fields, "
+              f"{corpus['words']} words ({corpus['bytes'] / 1e6:.1f} MB)")
+
+        load_started = time.perf_counter()
+        if args.embedder == "model":
+            from rag.embeddings import EmbeddingGenerator
+            embedder = EmbeddingGenerator()
+        else:
+            embedder = RandomEmbeddingGenerator(args.seed)
+        reranker = None
+        if args.tokenize:
+            from rag.reranker import CrossEncoderReranker
+            reranker = CrossEncoderReranker(RagConfig.CROSS_ENCODER_MODEL)
+        model_load_seconds = time.perf_counter() - load_started
+
+        results = {}
+        for backend in backends:
+            runs = []
+            for i in range(args.repeat):
+                run = run_once(backend, corpus_path, os.path.join(tmp, f"{backend}_{i}"), embedder, reranker, args)
+                print(f"  {backend} run {i + 1}/{args.repeat}: {run['chunks_per_second']:.1f} chunks/s")
+                runs.append(run)
+            summary = summarize_runs(runs)
+            print_summary(backend, summary)
+            results[backend] = {"summary": summary, "runs": runs}
+
+        if "qdrant" in backends:
+            from rag.qdrant_client_factory import close_qdrant_client
+            close_qdrant_client()  # Release the embedded storage before its directory is removed
+
+    write_report({
+        "benchmark": "ingest",
+        "config": {
+            "documents": args.documents,
+            "corpus_profile": args.corpus or "FIELD_AVG_WORDS",
+            "length_scale": args.length_scale,
+            "embedder": RagConfig.EMBEDDING_MODEL if args.embedder == "model" else "random",
+            "tokenize": RagConfig.CROSS_ENCODER_MODEL if args.tokenize else None,
+            "batch_size": args.batch_size,
+            "queue_size": args.queue_size,
+            "repeat": args.repeat,
+            "use_field_specific_chunking": RagConfig.USE_FIELD_SPECIFIC_CHUNKING
+        },
+        "corpus": corpus,
+        "model_load_seconds": round(model_load_seconds, 3),
+        "process_peak_rss_mb": round(peak_rss_mb(), 1),
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
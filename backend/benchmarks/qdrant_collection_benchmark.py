@@ -0,0 +1,176 @@
+"""
+Latency / recall benchmark of Qdrant collection configurations against a local Qdrant.
+
+Start a local instance first:
+    docker run -p 6333:6333 qdrant/qdrant
+
+Usage (from backend/):
+    python -m benchmarks.qdrant_collection_benchmark --url http://localhost:6333 --points 20000
+
+Embedded Qdrant (QDRANT_MODE=local) always searches exactly and ignores HNSW / quantization
+settings, so the numbers are only meaningful against a Qdrant server.
+
+Each configuration gets its own temporary collection filled with the same vectors.
+Recall@k is measured against exact (brute force) cosine search computed with numpy.
+If --source-collection is given, vectors are copied from that collection instead of
+being generated randomly, which gives recall numbers closer to production.
+"""
+import argparse
+import time
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+from config.rag_config import RagConfig
+from rag.qdrant_vector_store import QdrantVectorStore
+from benchmarks.bench_utils import summarize_latencies, write_report
+
+# Candidates are spelled out (not read from RagConfig): RagConfig keeps Qdrant's defaults
+# until a run of this benchmark on the production-sized corpus justifies one of them
+TUNED_HNSW = {"hnsw_m": 16, "hnsw_ef_construct": 128}
+CONFIGURATIONS = [
+    {"name": "default", "collection": {"use_quantization": False, "on_disk": False, "hnsw_m": 16, "hnsw_ef_construct": 100},
+     "search": {"use_quantization": False, "hnsw_ef": 100}},
+    {"name": "hnsw_tuned", "collection": {"use_quantization": False, "on_disk": False, **TUNED_HNSW},
+     "search": {"use_quantization": False, "hnsw_ef": 128}},
+    {"name": "int8_rescore", "collection": {"use_quantization": True, "on_disk": False, **TUNED_HNSW},
+     "search": {"use_quantization": True, "hnsw_ef": 128, "rescore": True, "oversampling": 2.0}},
+    {"name": "int8_no_rescore", "collection": {"use_quantization": True, "on_disk": False, **TUNED_HNSW},
+     "search": {"use_quantization": True, "hnsw_ef": 128, "rescore": False}},
+    {"name": "int8_rescore_on_disk", "collection": {"use_quantization": True, "on_disk": True, **TUNED_HNSW},
+     "search": {"use_quantization": True, "hnsw_ef": 128, "rescore": True, "oversampling": 2.0}},
+]
+
+
+def load_vectors(client: QdrantClient, args) -> np.ndarray:
+    """Random unit vectors, or vectors copied from an existing collection"""
+    if args.source_collection:
+        vectors = []
+        offset = None
+        while len(vectors) < args.points:
+            points, offset = client.scroll(
+                collection_name=args.source_collection,
+                limit=min(1000, args.points - len(vectors)),
+                offset=offset,
+                with_payload=False,
+                with_vectors=True
+            )
+            vectors.extend(point.vector for point in points)
+            if offset is None:
+                break
+        data = np.asarray(vectors, dtype="float32")
+    else:
+        rng = np.random.default_rng(args.seed)
+        data = rng.standard_normal((args.points, RagConfig.VECTOR_DIMENSION)).astype("float32")
+
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+def wait_for_green(client: QdrantClient, collection_name: str, timeout: float = 600):
+    """Wait until the optimizer has finished building the index"""
+    start = time.time()
+    while time.time() - start < timeout:
+        info = client.get_collection(collection_name=collection_name)
+        if str(info.status).lower().endswith("green"):
+            return
+        time.sleep(1)
+    print(f"  ⚠️  Collection '{collection_name}' not green after {timeout}s, measuring anyway")
+
+
+def run_configuration(client: QdrantClient, config: dict, vectors: np.ndarray, queries: np.ndarray,
+                      ground_truth: np.ndarray, args) -> dict:
+    collection_name = f"bench_{config['name']}"
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+
+    client.create_collection(
+        collection_name=collection_name,
+        **QdrantVectorStore.build_collection_config(vectors.shape[1], **config["collection"])
+    )
+
+    upload_start = time.perf_counter()
+    for start in range(0, len(vectors), args.batch_size):
+        batch = vectors[start:start + args.batch_size]
+        client.upsert(
+            collection_name=collection_name,
+            points=[PointStruct(id=start + i, vector=vector.tolist()) for i, vector in enumerate(batch)]
+        )
+    upload_seconds = time.perf_counter() - upload_start
+    wait_for_green(client, collection_name)
+
+    search_params = QdrantVectorStore.build_search_params(**config["search"])
+
+    # Warm-up so the first measured query doesn't pay for cold caches
+    for query in queries[:min(10, len(queries))]:
+        client.query_points(collection_name=collection_name, query=query.tolist(), limit=args.k,
+                            search_params=search_params)
+
+    latencies = []
+    hits = 0
+    for query, truth in zip(queries, ground_truth):
+        start = time.perf_counter()
+        results = client.query_points(
+            collection_name=collection_name,
+            query=query.tolist(),
+            limit=args.k,
+            search_params=search_params
+        ).points
+        latencies.append(time.perf_counter() - start)
+        hits += len({hit.id for hit in results} & set(truth.tolist()))
+
+    if not args.keep_collections:
+        client.delete_collection(collection_name)
+
+    result = {
+        "name": config["name"],
+        "collection": config["collection"],
+        "search": config["search"],
+        "upload_seconds": round(upload_seconds, 3),
+        f"recall@{args.k}": round(hits / (len(queries) * args.k), 4),
+        "latency": summarize_latencies(latencies)
+    }
+    print(f"  {config['name']:<22} recall@{args.k}={result[f'recall@{args.k}']:.4f} "
+          f"p50={result['latency']['p50_ms']}ms p95={result['latency']['p95_ms']}ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant collection configurations")
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--grpc", action="store_true", help="Talk to Qdrant over gRPC (port 6334)")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=RagConfig.RERANK_TOP_K)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--source-collection", default=None, help="Copy vectors from this collection")
+    parser.add_argument("--keep-collections", action="store_true")
+    parser.add_argument("--output", default="benchmarks/results/qdrant_collection.json")
+    args = parser.parse_args()
+
+    client = QdrantClient(url=args.url, prefer_grpc=args.grpc, timeout=300)
+    vectors = load_vectors(client, args)
+
+    # Queries are perturbed corpus vectors so they have realistic near neighbours
+    rng = np.random.default_rng(args.seed + 1)
+    query_ids = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    queries = vectors[query_ids] + 0.05 * rng.standard_normal((len(query_ids), vectors.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    print(f"Computing exact top-{args.k} for {len(queries)} queries over {len(vectors)} vectors...")
+    ground_truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+
+    results = [run_configuration(client, config, vectors, queries, ground_truth, args) for config in CONFIGURATIONS]
+
+    write_report({
+        "benchmark": "qdrant_collection",
+        "points": len(vectors),
+        "queries": len(queries),
+        "k": args.k,
+        "source": args.source_collection or "random",
+        "results": results
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
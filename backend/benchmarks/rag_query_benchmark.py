@@ -0,0 +1,324 @@
+"""
+Offline benchmark of the RagService query path and retrieval-quality suite.
+
+Usage (from backend/):
+    python -m benchmarks.rag_query_benchmark --corpus data/snakes.json
+    python -m benchmarks.rag_query_benchmark --corpus data/snakes.json --concurrency 1,4,16 --mode sync
+    python -m benchmarks.rag_query_benchmark --corpus data/snakes.json --llm-latency-ms 0 --repeat 5
+    python -m benchmarks.rag_query_benchmark --corpus data/snakes.json --partition-routing on --concurrency 1
+
+The corpus (JSON list of species documents, the same file the index is ingested from) is
+ingested into a temporary FAISS index with the real embedding model, partition router and
+cross-encoder(s); Gemini is replaced by a mock that sleeps --llm-latency-ms and returns a
+canned answer, and the LLM admission rate limit is lifted. Nothing outside the temporary
+directory is written except the report.
+
+Reported:
+    latency   p50/p95/p99 of every deadline stage (embedding, retrieval, rerank,
+              context_assembly, llm) and end to end, per concurrency level
+    throughput  completed queries per second per concurrency level
+    quality   recall@k, hit@k and MRR of the dense search and of the final context,
+              against relevant chunks labelled in the question file
+
+Relevance labels: a question's "relevant_chunks" ([{"doc_id", "field", "chunk_index"}]) if
+given; otherwise every chunk of the labelled "field" in documents mentioning the labelled
+"species" (scientific name; any species when null).
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+from config.rag_config import RagConfig
+from benchmarks.bench_utils import summarize_latencies, write_report
+
+STAGES = ["embedding", "retrieval", "rerank", "context_assembly", "llm"]
+
+
+class MockGeminiLLM:
+    """Stand-in for GeminiLLM with a fixed latency and no network"""
+
+    ERROR_PREFIX = "Sorry, I encountered an error"
+    latency_ms = 0.0
+
+    def __init__(self):
+        self.scheduler = None
+        self.calls = 0
+
+    def build_prompt(self, query: str, context: List[str]) -> str:
+        return query + "\n\n" + "\n\n".join(context)
+
+    def _answer(self, query: str, context: List[str]) -> str:
+        self.calls += 1
+        return f"Mock answer to '{query}' from {len(context)} passages"
+
+    def generate_response(self, query, context, timeout_ms=None, info=None) -> str:
+        time.sleep(self.latency_ms / 1000)
+        return self._answer(query, context)
+
+    async def agenerate_response(self, query, context, timeout_ms=None, info=None) -> str:
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self._answer(query, context)
+
+    def generate_response_stream(self, query, context, timeout_ms=None, info=None):
+        time.sleep(self.latency_ms / 1000)
+        yield self._answer(query, context)
+
+    def generate_simple_response(self, text: str) -> str:
+        return "Mock response"
+
+    def get_stats(self) -> dict:
+        return {"mock": {"requests": self.calls, "errors": 0, "wins": self.calls, "hedged_requests": 0,
+                         "fallback_requests": 0, "cancelled": 0, "hedge_delay_ms": None}}
+
+
+def build_service(args, workdir: str):
+    """RagService over a temporary FAISS index of the corpus, with Gemini mocked"""
+    import services.RagService as rag_service_module
+    from rag.llm_scheduler import LLMAdmissionScheduler
+
+    RagConfig.USE_QDRANT = False
+    RagConfig.FAISS_INDEX_PATH = f"{workdir}/faiss_index"
+    RagConfig.PARTITION_INDEX_PATH = f"{workdir}/partition_index"
+    RagConfig.USE_ANSWER_CACHE = args.answer_cache
+    MockGeminiLLM.latency_ms = args.llm_latency_ms
+    rag_service_module.GeminiLLM = MockGeminiLLM
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        documents = json.load(f)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        service = rag_service_module.RagService()
+        # No rate limit: the benchmark measures the pipeline, not the Gemini quota
+        service.llm_scheduler = LLMAdmissionScheduler(requests_per_minute=1e9, capacity=1e9, max_queue_size=1_000_000)
+        service.llm.scheduler = service.llm_scheduler
+        service.ingest_documents_with_metadata(documents)
+    return service, documents
+
+
+# ---- relevance ----
+
+def doc_key(doc: Dict) -> str:
+    return doc.get("id") or doc.get("name_vn") or doc.get("name_en") or "Unknown"
+
+
+def chunk_ids(metadata: Dict) -> List[Tuple]:
+    """(doc, field, chunk_index) ids covered by a chunk or an assembled passage"""
+    doc = metadata.get("doc_id") or metadata.get("species")
+    indices = metadata.get("chunk_indices") or [metadata.get("chunk_index")]
+    return [(doc, metadata.get("field"), index) for index in indices]
+
+
+def relevant_chunks(item: Dict, documents: List[Dict], all_metadata: List[Dict]) -> Set[Tuple]:
+    if item.get("relevant_chunks"):
+        return {(c["doc_id"], c["field"], c["chunk_index"]) for c in item["relevant_chunks"]}
+    species = (item.get("species") or "").lower()
+    docs = {doc_key(doc) for doc in documents if species in json.dumps(doc, ensure_ascii=False).lower()}
+    return {
+        chunk_id
+        for metadata in all_metadata
+        if metadata.get("field") == item.get("field")
+        for chunk_id in chunk_ids(metadata)
+        if chunk_id[0] in docs
+    }
+
+
+def score_ranking(ranked: List[Dict], relevant: Set[Tuple], k_values: List[int]) -> Dict[str, float]:
+    """recall@k (share of relevant chunks found), hit@k and reciprocal rank of one ranking"""
+    found, first_rank = set(), None
+    scores = {}
+    for rank, metadata in enumerate(ranked, start=1):
+        hits = set(chunk_ids(metadata)) & relevant
+        if hits and first_rank is None:
+            first_rank = rank
+        found |= hits
+        if rank in k_values:
+            scores[f"recall@{rank}"] = len(found) / len(relevant)
+            scores[f"hit@{rank}"] = float(bool(found))
+    for k in k_values:
+        # Fewer results than k: the ranking's final values hold
+        scores.setdefault(f"recall@{k}", len(found) / len(relevant))
+        scores.setdefault(f"hit@{k}", float(bool(found)))
+    scores["mrr"] = 1.0 / first_rank if first_rank else 0.0
+    return scores
+
+
+def evaluate_quality(service, questions: List[Dict], documents: List[Dict], k_values: List[int]) -> dict:
+    all_metadata = service.vector_store.metadata
+    per_question, totals = [], {"dense": [], "context": []}
+    search_k = max(max(k_values), RagConfig.RERANK_TOP_K)
+
+    for item in questions:
+        relevant = relevant_chunks(item, documents, all_metadata)
+        if not relevant:
+            per_question.append({"question": item["question"], "labelled": False})
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            embedding = service.embedding_generator.generate_single_embedding(item["question"])
+            _, _, dense = service.vector_store.search_with_metadata(embedding, search_k)
+            retrieval = service.retrieve_context(item["question"], query_embedding=embedding)
+        scores = {
+            "dense": score_ranking(dense, relevant, k_values),
+            "context": score_ranking(retrieval.get("context_metadata", []), relevant, k_values)
+        }
+        totals["dense"].append(scores["dense"])
+        totals["context"].append(scores["context"])
+        per_question.append({"question": item["question"], "labelled": True, "relevant": len(relevant), **scores})
+
+    def mean(rows: List[Dict]) -> Dict[str, float]:
+        return {key: round(sum(row[key] for row in rows) / len(rows), 4) for key in rows[0]} if rows else {}
+
+    return {
+        "labelled_questions": len(totals["dense"]),
+        "k_values": k_values,
+        "dense": mean(totals["dense"]),
+        "context": mean(totals["context"]),
+        "per_question": per_question
+    }
+
+
+# ---- load ----
+
+def run_level(service, questions: List[str], concurrency: int, mode: str, deadline_ms: Optional[float],
+              loop: asyncio.AbstractEventLoop) -> dict:
+    """Run every question once at the given concurrency and collect stage latencies"""
+    results = []
+
+    async def run_async():
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one(question):
+            async with slots:
+                start = time.perf_counter()
+                result = await service.aquery(question, deadline_ms=deadline_ms)
+                results.append((time.perf_counter() - start, result))
+
+        await asyncio.gather(*(one(question) for question in questions))
+
+    def one_sync(question):
+        start = time.perf_counter()
+        result = service.query(question, deadline_ms=deadline_ms)
+        results.append((time.perf_counter() - start, result))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if mode == "async":
+            loop.run_until_complete(run_async())
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one_sync, questions))
+        wall = time.perf_counter() - start
+
+    stages = {stage: [] for stage in STAGES}
+    degradations = {}
+    for _, result in results:
+        report = result.get("deadline") or {}
+        for stage, ms in report.get("stages_ms", {}).items():
+            stages.setdefault(stage, []).append(ms / 1000)
+        for degradation in report.get("degradations", []):
+            degradations[degradation["name"]] = degradations.get(degradation["name"], 0) + 1
+
+    return {
+        "concurrency": concurrency,
+        "queries": len(results),
+        "errors": sum("error" in result for _, result in results),
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(len(results) / wall, 3) if wall else None,
+        "end_to_end": summarize_latencies([latency for latency, _ in results]),
+        "stages": {stage: summarize_latencies(values) for stage, values in stages.items() if values},
+        "degradations": degradations
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the RAG query path with a mocked LLM")
+    parser.add_argument("--corpus", required=True, help="JSON list of species documents")
+    parser.add_argument("--questions", default="benchmarks/data/questions.json")
+    parser.add_argument("--mode", choices=["async", "sync"], default="async",
+                        help="async: RagService.aquery on one event loop; sync: RagService.query in threads")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the question set per level")
+    parser.add_argument("--llm-latency-ms", type=float, default=800.0, help="Latency of the mocked Gemini call")
+    parser.add_argument("--deadline-ms", type=float, default=RagConfig.QUERY_DEADLINE_MS, help="0 = no deadline")
+    parser.add_argument("--answer-cache", action="store_true", help="Keep the semantic answer cache enabled")
+    parser.add_argument("--k", default="1,3,5,10", help="Comma-separated k values for recall@k / hit@k")
+    parser.add_argument("--partition-routing", choices=["on", "off"],
+                        help="Override USE_PARTITION_ROUTING (compare recall@k of both before enabling it)")
+    parser.add_argument("--skip-quality", action="store_true")
+    parser.add_argument("--output", default="benchmarks/results/rag_query_benchmark.json")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        question_items = json.load(f)
+    questions = [item["question"] for item in question_items]
+    levels = [int(value) for value in args.concurrency.split(",")]
+    k_values = sorted(int(value) for value in args.k.split(","))
+    deadline_ms = args.deadline_ms or None
+    if args.partition_routing is not None:
+        RagConfig.USE_PARTITION_ROUTING = args.partition_routing == "on"
+
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as workdir:
+        print(f"Ingesting {args.corpus} into a temporary FAISS index...")
+        start = time.perf_counter()
+        service, documents = build_service(args, workdir)
+        print(f"✓ {service.vector_store.index.ntotal} chunks indexed in {time.perf_counter() - start:.1f}s")
+
+        # Warm-up: first calls pay lazy model initialization
+        # One event loop for every level, as in the server (asyncio primitives bind to their loop)
+        loop = asyncio.new_event_loop()
+        run_level(service, questions[:2], 1, args.mode, deadline_ms, loop)
+
+        quality = None
+        if not args.skip_quality:
+            quality = evaluate_quality(service, question_items, documents, k_values)
+            print(f"Quality ({quality['labelled_questions']} labelled questions): "
+                  f"dense {quality['dense']}, context {quality['context']}")
+
+        load = []
+        for concurrency in levels:
+            level = run_level(service, questions * args.repeat, concurrency, args.mode, deadline_ms, loop)
+            load.append(level)
+            e2e = level["end_to_end"]
+            print(f"concurrency={concurrency:>3}: {level['throughput_qps']} q/s, p50={e2e['p50_ms']}ms "
+                  f"p95={e2e['p95_ms']}ms p99={e2e['p99_ms']}ms, errors={level['errors']}")
+            for stage, summary in level["stages"].items():
+                print(f"    {stage:<17} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms p99={summary['p99_ms']}ms")
+
+        pipeline_stats = service.get_pipeline_stats()
+        loop.close()
+
+    write_report({
+        "benchmark": "rag_query_benchmark",
+        "corpus": args.corpus,
+        "questions": len(questions),
+        "mode": args.mode,
+        "repeat": args.repeat,
+        "mock_llm_latency_ms": args.llm_latency_ms,
+        "deadline_ms": deadline_ms,
+        "answer_cache": args.answer_cache,
+        "config": {
+            "embedding_model": RagConfig.EMBEDDING_MODEL,
+            "use_reranking": RagConfig.USE_RERANKING,
+            "cross_encoder_model": RagConfig.CROSS_ENCODER_MODEL,
+            "use_rerank_cascade": RagConfig.USE_RERANK_CASCADE,
+            "rerank_top_k": RagConfig.RERANK_TOP_K,
+            "final_top_k": RagConfig.FINAL_TOP_K,
+            "use_partition_routing": RagConfig.USE_PARTITION_ROUTING,
+            "use_context_compaction": RagConfig.USE_CONTEXT_COMPACTION,
+            "context_token_budget": RagConfig.CONTEXT_TOKEN_BUDGET
+        },
+        "load": load,
+        "quality": quality,
+        "pipeline": {
+            "rerank_cascade": pipeline_stats["reranking"].get("cascade"),
+            "stage_executors": pipeline_stats["stage_executors"]
+        }
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Offline evaluation of the adaptive rerank cascade against full L-12 reranking.
+
+Usage (from backend/):
+    python -m benchmarks.rerank_cascade_eval
+    python -m benchmarks.rerank_cascade_eval --corpus data/snakes.json
+
+For every question the same RERANK_TOP_K candidates are reranked twice: with the large
+cross-encoder over all candidates (reference) and with AdaptiveRerankCascade. Reported:
+the rate at which the cascade returns exactly the reference top-FINAL_TOP_K set, the mean
+set overlap, decision counts and the measured time saved.
+
+Each question is also run through every cascade path (dense skip, L-6 only, L-12 head), so
+the preservation rate and mean cost of any (RERANK_SKIP_DENSE_MARGIN,
+RERANK_SMALL_DECISIVE_MARGIN) pair can be computed offline; the cheapest pair that keeps
+--target-rate of the sets is reported as "recommended_thresholds". Set those in RagConfig
+before enabling USE_RERANK_CASCADE.
+
+Candidates come from the existing index (FAISS or Qdrant per RagConfig) or, with --corpus,
+from an in-memory FAISS index built from a JSON list of species documents. No LLM is used.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+from config.rag_config import RagConfig
+from rag.embeddings import EmbeddingGenerator
+from rag.vector_store import FAISSVectorStore
+from rag.qdrant_vector_store import QdrantVectorStore
+from rag.document_processor import DocumentProcessor
+from rag.reranker import CrossEncoderReranker
+from rag.rerank_cascade import AdaptiveRerankCascade
+from benchmarks.bench_utils import summarize_latencies, write_report
+
+# (dense margin, small margin) thresholds that force each cascade path
+PATH_THRESHOLDS = {
+    "dense_skip": (float("-inf"), float("inf")),
+    "small_only": (float("inf"), float("-inf")),
+    "large_head": (float("inf"), float("inf"))
+}
+
+
+def build_vector_store(args, embedding_generator):
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks, metadata = DocumentProcessor().process_document_with_metadata(documents, return_metadata=True)
+            embeddings = embedding_generator.generate_embeddings(chunks, show_progress=False)
+            store = FAISSVectorStore()
+            store.add_embeddings(embeddings, chunks, metadata)
+        return store
+
+    store = QdrantVectorStore() if RagConfig.USE_QDRANT else FAISSVectorStore()
+    if not store.load_index():
+        raise SystemExit("No index found; ingest documents first or pass --corpus")
+    return store
+
+
+@contextlib.contextmanager
+def forced_thresholds(dense_margin: float, small_margin: float):
+    """Temporarily replace the cascade thresholds (read by AdaptiveRerankCascade at call time)"""
+    saved = RagConfig.RERANK_SKIP_DENSE_MARGIN, RagConfig.RERANK_SMALL_DECISIVE_MARGIN
+    RagConfig.RERANK_SKIP_DENSE_MARGIN, RagConfig.RERANK_SMALL_DECISIVE_MARGIN = dense_margin, small_margin
+    try:
+        yield
+    finally:
+        RagConfig.RERANK_SKIP_DENSE_MARGIN, RagConfig.RERANK_SMALL_DECISIVE_MARGIN = saved
+
+
+def choose_path(probe: dict, dense_threshold: float, small_threshold: float) -> str:
+    """Path the cascade takes for a probed question under the given thresholds"""
+    if probe["dense_margin"] is not None and probe["dense_margin"] >= dense_threshold:
+        return "dense_skip"
+    if probe["small_margin"] is not None and probe["small_margin"] >= small_threshold:
+        return "small_only"
+    return "large_head"
+
+
+def sweep_thresholds(probes: list, target_rate: float) -> tuple:
+    """
+    Preservation rate and mean cost of every threshold pair worth trying (the observed margins)
+
+    Args:
+        probes: Per question {"dense_margin", "small_margin", "preserved": {path: bool}, "ms": {path: float}}
+        target_rate: Minimum top-k set preservation rate
+
+    Returns:
+        tuple of (grid rows, cheapest row meeting target_rate or None)
+    """
+    infinity = float("inf")
+    dense_values = sorted({p["dense_margin"] for p in probes if p["dense_margin"] is not None}) + [infinity]
+    small_values = sorted({p["small_margin"] for p in probes if p["small_margin"] is not None}) + [infinity]
+
+    grid = []
+    for dense_threshold in dense_values:
+        for small_threshold in small_values:
+            paths = [choose_path(p, dense_threshold, small_threshold) for p in probes]
+            grid.append({
+                # None = never skip at that step
+                "skip_dense_margin": None if dense_threshold == infinity else dense_threshold,
+                "small_decisive_margin": None if small_threshold == infinity else small_threshold,
+                "preservation_rate": round(sum(p["preserved"][path] for p, path in zip(probes, paths)) / len(probes), 4),
+                "mean_ms": round(sum(p["ms"][path] for p, path in zip(probes, paths)) / len(probes), 3)
+            })
+    feasible = [row for row in grid if row["preservation_rate"] >= target_rate]
+    best = min(feasible, key=lambda row: (row["mean_ms"], -row["preservation_rate"])) if feasible else None
+    return grid, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate the adaptive rerank cascade against full L-12 reranking")
+    parser.add_argument("--questions", default="benchmarks/data/questions.json")
+    parser.add_argument("--corpus", default=None, help="JSON list of species documents (build an in-memory FAISS index)")
+    parser.add_argument("--large-model", default=RagConfig.CROSS_ENCODER_MODEL)
+    parser.add_argument("--small-model", default=RagConfig.CROSS_ENCODER_SMALL_MODEL)
+    parser.add_argument("--target-rate", type=float, default=0.95,
+                        help="Top-k set preservation rate the recommended thresholds must keep")
+    parser.add_argument("--output", default="benchmarks/results/rerank_cascade_eval.json")
+    args = parser.parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [item["question"] for item in json.load(f)]
+
+    embedding_generator = EmbeddingGenerator()
+    store = build_vector_store(args, embedding_generator)
+    large = CrossEncoderReranker(args.large_model)
+    small = CrossEncoderReranker(args.small_model)
+    cascade = AdaptiveRerankCascade(large, small)
+    probe_cascade = AdaptiveRerankCascade(large, small)  # Forced paths, kept out of cascade.stats
+    top_k = RagConfig.FINAL_TOP_K
+
+    # Warm-up so the first question does not pay model initialization
+    large.predict_scores(questions[0], ["warm-up"])
+    small.predict_scores(questions[0], ["warm-up"])
+
+    latencies = {"full_large": [], "cascade": []}
+    preserved, overlaps, per_question, probes = 0, [], [], []
+
+    for question in questions:
+        query_embedding = embedding_generator.generate_single_embedding(question)
+        texts, scores, metadata = store.search_with_metadata(query_embedding, RagConfig.RERANK_TOP_K)
+        candidates = list(zip(texts, scores))
+        token_ids = [m.get("ce_token_ids") if m.get("ce_tokenizer") == large.tokenizer_signature else None
+                     for m in metadata]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            reference = large.rerank_with_original_scores(question, candidates, alpha=RagConfig.RERANK_ALPHA,
+                                                          top_k=top_k, passage_token_ids=token_ids)
+            latencies["full_large"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results, decision = cascade.rerank(question, candidates, passage_token_ids=token_ids,
+                                               alpha=RagConfig.RERANK_ALPHA, top_k=top_k)
+            latencies["cascade"].append(time.perf_counter() - start)
+
+            path_results = {}
+            for path, thresholds in PATH_THRESHOLDS.items():
+                with forced_thresholds(*thresholds):
+                    path_results[path] = probe_cascade.rerank(question, candidates, passage_token_ids=token_ids,
+                                                              alpha=RagConfig.RERANK_ALPHA, top_k=top_k)
+
+        reference_set = {item[0] for item in reference}
+        probes.append({
+            "dense_margin": decision.get("dense_margin"),
+            "small_margin": path_results["small_only"][1].get("small_margin"),
+            "preserved": {path: {item[0] for item in items} == reference_set
+                          for path, (items, _) in path_results.items()},
+            "ms": {path: path_decision["total_ms"] for path, (_, path_decision) in path_results.items()}
+        })
+        cascade_set = {item[0] for item in results}
+        overlap = len(reference_set & cascade_set) / max(1, len(reference_set))
+        overlaps.append(overlap)
+        preserved += reference_set == cascade_set
+        per_question.append({
+            "question": question,
+            "decision": decision["decision"],
+            "dense_margin": decision.get("dense_margin"),
+            "small_margin": decision.get("small_margin"),
+            "overlap": round(overlap, 3),
+            "full_large_ms": round(latencies["full_large"][-1] * 1000, 2),
+            "cascade_ms": round(latencies["cascade"][-1] * 1000, 2)
+        })
+        print(f"[{decision['decision']:>10}] overlap={overlap:.2f} {question}")
+
+    summary = {name: summarize_latencies(values) for name, values in latencies.items()}
+    preservation_rate = preserved / len(questions)
+    mean_overlap = sum(overlaps) / len(overlaps)
+    saved_ms = summary["full_large"]["mean_ms"] - summary["cascade"]["mean_ms"]
+    decisions = {name: cascade.stats[name] for name in ("dense_skip", "small_only", "large_head", "full_large")}
+
+    print(f"\nTop-{top_k} set preserved: {preserved}/{len(questions)} ({preservation_rate:.1%}), mean overlap {mean_overlap:.3f}")
+    print(f"Decisions: {decisions}")
+    print(f"full L-12: mean={summary['full_large']['mean_ms']}ms, cascade: mean={summary['cascade']['mean_ms']}ms "
+          f"(saved {saved_ms:.1f}ms/query)")
+
+    grid, recommended = sweep_thresholds(probes, args.target_rate)
+    if recommended:
+        print(f"Recommended thresholds (>= {args.target_rate:.0%} preserved): "
+              f"RERANK_SKIP_DENSE_MARGIN={recommended['skip_dense_margin']}, "
+              f"RERANK_SMALL_DECISIVE_MARGIN={recommended['small_decisive_margin']} "
+              f"({recommended['preservation_rate']:.1%} preserved, {recommended['mean_ms']}ms/query)")
+    else:
+        print(f"No threshold pair preserves {args.target_rate:.0%} of the top-{top_k} sets; keep the cascade off")
+
+    write_report({
+        "benchmark": "rerank_cascade_eval",
+        "large_model": args.large_model,
+        "small_model": args.small_model,
+        "questions": len(questions),
+        "candidates_per_query": RagConfig.RERANK_TOP_K,
+        "final_top_k": top_k,
+        "thresholds": {
+            "skip_dense_margin": RagConfig.RERANK_SKIP_DENSE_MARGIN,
+            "small_decisive_margin": RagConfig.RERANK_SMALL_DECISIVE_MARGIN,
+            "head_extra": RagConfig.RERANK_CASCADE_HEAD_EXTRA
+        },
+        "preservation_rate": round(preservation_rate, 4),
+        "mean_overlap": round(mean_overlap, 4),
+        "decisions": decisions,
+        "latency": summary,
+        "mean_saved_ms": round(saved_ms, 3),
+        "target_rate": args.target_rate,
+        "recommended_thresholds": recommended,
+        "threshold_grid": grid,
+        "per_question": per_question
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
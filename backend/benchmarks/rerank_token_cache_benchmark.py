@@ -0,0 +1,123 @@
+"""
+Rerank latency with and without the ingest-time passage token cache.
+
+Usage (from backend/):
+    python -m benchmarks.rerank_token_cache_benchmark
+    python -m benchmarks.rerank_token_cache_benchmark --corpus data/snakes.json --iterations 50
+
+Passages come from a JSON corpus (list of species documents, chunked with the same
+DocumentProcessor as ingest) or, without --corpus, synthetic passages whose lengths
+follow the chunk sizes in RagConfig.FIELD_CHUNK_CONFIG.
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+import numpy as np
+from config.rag_config import RagConfig
+from rag.document_processor import DocumentProcessor
+from rag.reranker import CrossEncoderReranker
+from benchmarks.bench_utils import summarize_latencies, write_report
+
+QUERIES = [
+    "Rắn lục đuôi đỏ có độc không?",
+    "Cần làm gì khi bị rắn cạp nia cắn?",
+    "Rắn hổ mang chúa sống ở đâu?",
+    "Rắn ráo trâu ăn gì?",
+    "Triệu chứng khi bị rắn lục cắn là gì?",
+]
+
+VOCABULARY = (
+    "rắn độc nọc cắn vết thương sưng đau máu thần kinh hô hấp sơ cứu bệnh viện huyết thanh "
+    "rừng núi đồng ruộng ban đêm ếch chuột chim trứng con vảy đầu đuôi màu xanh đỏ nâu vàng "
+    "dài mét loài họ chi phân bố Việt Nam Đông Nam Á sinh sản tập tính săn mồi bảo tồn"
+).split()
+
+
+def load_passages(args) -> list:
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = DocumentProcessor().process_document_with_metadata(documents)
+        random.Random(args.seed).shuffle(chunks)
+        return chunks
+
+    rng = random.Random(args.seed)
+    sizes = [config["chunk_size"] for config in RagConfig.FIELD_CHUNK_CONFIG.values()]
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(rng.choice(sizes))) for _ in range(500)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cross-encoder rerank with/without passage token cache")
+    parser.add_argument("--model", default=RagConfig.CROSS_ENCODER_MODEL)
+    parser.add_argument("--corpus", default=None, help="JSON list of species documents")
+    parser.add_argument("--candidates", type=int, default=RagConfig.RERANK_TOP_K)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmarks/results/rerank_token_cache.json")
+    args = parser.parse_args()
+
+    reranker = CrossEncoderReranker(args.model)
+    passages = load_passages(args)
+
+    tokenize_start = time.perf_counter()
+    token_cache = reranker.tokenize_passages(passages)
+    tokenize_seconds = time.perf_counter() - tokenize_start
+    print(f"Pre-tokenized {len(passages)} passages in {tokenize_seconds:.3f}s (paid once at ingest)")
+
+    rng = random.Random(args.seed)
+    latencies = {"uncached": [], "cached": []}
+    max_score_diff = 0.0
+
+    # Warm-up both paths
+    sample = rng.sample(range(len(passages)), args.candidates)
+    reranker.predict_scores(QUERIES[0], [passages[i] for i in sample])
+    reranker.predict_scores(QUERIES[0], [passages[i] for i in sample], [token_cache[i] for i in sample])
+
+    for iteration in range(args.iterations):
+        query = QUERIES[iteration % len(QUERIES)]
+        sample = rng.sample(range(len(passages)), args.candidates)
+        candidates = [(passages[i], 1.0 - 0.01 * rank) for rank, i in enumerate(sample)]
+        cached_ids = [token_cache[i] for i in sample]
+
+        # Alternate order so neither path benefits systematically from warm caches
+        runs = [("uncached", None), ("cached", cached_ids)]
+        if iteration % 2:
+            runs.reverse()
+
+        for name, ids in runs:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                reranker.rerank_with_original_scores(query, candidates, alpha=RagConfig.RERANK_ALPHA,
+                                                     top_k=RagConfig.FINAL_TOP_K, passage_token_ids=ids)
+                latencies[name].append(time.perf_counter() - start)
+
+        uncached_scores = reranker.predict_scores(query, [c[0] for c in candidates])
+        cached_scores = reranker.predict_scores(query, [c[0] for c in candidates], cached_ids)
+        max_score_diff = max(max_score_diff, float(np.max(np.abs(uncached_scores - cached_scores))))
+
+    summary = {name: summarize_latencies(values) for name, values in latencies.items()}
+    speedup = summary["uncached"]["mean_ms"] / summary["cached"]["mean_ms"] if summary["cached"]["mean_ms"] else None
+
+    print(f"uncached: p50={summary['uncached']['p50_ms']}ms p95={summary['uncached']['p95_ms']}ms")
+    print(f"cached:   p50={summary['cached']['p50_ms']}ms p95={summary['cached']['p95_ms']}ms")
+    print(f"speedup (mean): {speedup:.2f}x, max score difference: {max_score_diff:.2e}")
+
+    write_report({
+        "benchmark": "rerank_token_cache",
+        "model": args.model,
+        "passages": len(passages),
+        "candidates_per_query": args.candidates,
+        "iterations": args.iterations,
+        "tokenize_all_passages_seconds": round(tokenize_seconds, 3),
+        "latency": summary,
+        "speedup_mean": round(speedup, 3) if speedup else None,
+        "max_score_difference": max_score_diff
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+Startup time and memory footprint benchmark, to size pods from measurements.
+
+Usage (from backend/):
+    python -m benchmarks.startup_benchmark                          # components + servers with 1 and 2 workers
+    python -m benchmarks.startup_benchmark --workers 1,4 --repeat 3
+    python -m benchmarks.startup_benchmark --skip-servers --components embedding,cross_encoder
+    python -m benchmarks.startup_benchmark --baseline benchmarks/results/startup_base.json --tolerance 0.2
+
+Two parts:
+
+components  Each model / index is loaded alone in a fresh interpreter: import time, load time,
+            warm-up time, and the resident (rss), unique (uss) and proportional (pss) memory
+            it adds. Components: image (ConvNeXt), embedding (e5), cross_encoder,
+            cross_encoder_small (the L-12 / L-6 rerankers), faiss_index and text_store (one
+            FAISS load, split by freeing the index afterwards; needs a saved index at
+            --index-path).
+servers     The app (ENABLE_CHAT=true) is started under gunicorn with 1..N workers
+            (gunicorn.conf.py, model preloading as configured by PRELOAD_MODELS). Reported:
+            wall time from launch until every worker answers /health/ready with 200, the
+            per-component load / warm-up times the registry reports, and per-process rss / uss /
+            pss. total_pss_mb is what the pod actually uses (shared pages split between the
+            processes); one more worker costs about its uss.
+
+The report is JSON. With --baseline, the run fails (exit 1) when a component's load time or
+uss, or a server's time to ready or total pss, is more than --tolerance above the baseline.
+
+MONGO_URI / DATABASE_NAME get placeholders when unset (nothing connects at startup).
+"""
+import argparse
+import gc
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+import psutil
+from benchmarks.bench_utils import write_report
+
+COMPONENTS = ("image", "embedding", "cross_encoder", "cross_encoder_small", "faiss_index")
+MB = 1024 * 1024
+
+
+def memory_of(process: psutil.Process) -> Dict[str, float]:
+    """rss / uss / pss (Linux) of one process in MB"""
+    info = process.memory_full_info()
+    memory = {"rss_mb": info.rss / MB, "uss_mb": info.uss / MB}
+    if hasattr(info, "pss"):
+        memory["pss_mb"] = info.pss / MB
+    return memory
+
+
+def memory_delta(before: Dict[str, float], after: Dict[str, float]) -> Dict[str, float]:
+    return {key: round(after[key] - before[key], 1) for key in after if key in before}
+
+
+# ---- components (child process) ----
+
+def _load_component(name: str, index_path: str) -> dict:
+    """Load one component in this (fresh) process and measure it; runs in the child"""
+    process = psutil.Process()
+    gc.collect()
+    baseline = memory_of(process)
+    result = {"component": name}
+
+    start = time.perf_counter()
+    from config.rag_config import RagConfig
+    if name == "image":
+        import torch  # noqa: F401
+        from services.ImageService import ImageService
+    elif name == "embedding":
+        from rag.embeddings import EmbeddingGenerator
+    elif name in ("cross_encoder", "cross_encoder_small"):
+        from rag.reranker import CrossEncoderReranker
+    else:
+        from rag.vector_store import FAISSVectorStore
+    result["import_seconds"] = round(time.perf_counter() - start, 3)
+    imported = memory_of(process)
+
+    start = time.perf_counter()
+    if name == "image":
+        component = ImageService()
+        load_seconds = time.perf_counter() - start
+        warmup_ms = component.warm_up()
+    elif name == "embedding":
+        component = EmbeddingGenerator()
+        load_seconds = time.perf_counter() - start
+        warm = time.perf_counter()
+        component.generate_single_embedding("warm up")
+        warmup_ms = (time.perf_counter() - warm) * 1000
+    elif name in ("cross_encoder", "cross_encoder_small"):
+        model = RagConfig.CROSS_ENCODER_MODEL if name == "cross_encoder" else RagConfig.CROSS_ENCODER_SMALL_MODEL
+        component = CrossEncoderReranker(model)
+        load_seconds = time.perf_counter() - start
+        warm = time.perf_counter()
+        component.predict_scores("warm up", ["warm up passage"])
+        warmup_ms = (time.perf_counter() - warm) * 1000
+        result["model"] = model
+    else:
+        component = FAISSVectorStore()
+        if not component.load_index(index_path):
+            raise RuntimeError(f"no FAISS index at {index_path}")
+        load_seconds = time.perf_counter() - start
+        warmup_ms = None
+        result["vectors"] = component.index.ntotal
+
+    gc.collect()
+    loaded = memory_of(process)
+    result.update(
+        load_seconds=round(load_seconds, 3),
+        warmup_ms=round(warmup_ms, 1) if warmup_ms is not None else None,
+        import_memory_mb=memory_delta(baseline, imported),
+        memory_mb=memory_delta(imported, loaded),
+        process_rss_mb=round(loaded["rss_mb"], 1)
+    )
+
+    if name == "faiss_index":
+        # One load reads both; free the index to split it from the texts / metadata
+        component.index = None
+        gc.collect()
+        without_index = memory_of(process)
+        text_store = memory_delta(imported, without_index)
+        result["memory_mb"] = memory_delta(without_index, loaded)
+        result["text_store"] = {"component": "text_store", "chunks": len(component.texts), "memory_mb": text_store}
+    return result
+
+
+def measure_component(name: str, index_path: str) -> dict:
+    """Run _load_component in a fresh interpreter so nothing is shared or already imported"""
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup_benchmark", "--child-component", name, "--index-path", index_path],
+        capture_output=True, text=True, env=_env(), check=False
+    )
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode != 0 or not lines:
+        tail = "\n".join((completed.stderr or completed.stdout).splitlines()[-5:])
+        return {"component": name, "error": tail}
+    return json.loads(lines[-1])
+
+
+# ---- servers ----
+
+def _env(extra: Dict[str, str] = None) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env.setdefault("DATABASE_NAME", "startup_benchmark")
+    env.update(extra or {})
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get_json(url: str, timeout: float = 2.0):
+    """(status, body) of a GET; (None, None) when the server doesn't answer"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            return e.code, json.loads(e.read())
+        except ValueError:
+            return e.code, None
+    except (OSError, ValueError):
+        return None, None
+
+
+def measure_server(workers: int, timeout: float) -> dict:
+    """Launch gunicorn with `workers` workers, wait until all are ready, measure, stop it"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = _env({"ENABLE_CHAT": "true", "WEB_CONCURRENCY": str(workers), "BIND": f"127.0.0.1:{port}"})
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env
+    )
+    result = {"workers": workers}
+    try:
+        live_seconds = None
+        ready_pids = set()
+        status_body = None
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with {server.returncode}: "
+                                   f"{server.stderr.read().decode(errors='replace')[-800:]}")
+            code, body = _get_json(f"{base}/health/ready")
+            if code is not None and live_seconds is None:
+                live_seconds = time.perf_counter() - started
+            if code == 200:
+                status_body = body
+                ready_pids.add(body.get("pid"))
+                if len(ready_pids) >= workers:
+                    break
+            elif code == 503 and body and any(c.get("state") == "failed" for c in body["components"].values()):
+                raise RuntimeError(f"component failed to load: {body['components']}")
+            time.sleep(0.1 if code is None else 0.05)
+        else:
+            raise RuntimeError(f"not ready after {timeout}s ({len(ready_pids)}/{workers} workers ready)")
+
+        result["live_seconds"] = round(live_seconds, 2)
+        result["ready_seconds"] = round(time.perf_counter() - started, 2)
+        result["preloaded"] = status_body.get("preloaded")
+        result["components"] = {
+            name: {key: status.get(key) for key in ("load_seconds", "warmup_ms")}
+            for name, status in status_body["components"].items()
+        }
+
+        master = psutil.Process(server.pid)
+        processes = {"master": memory_of(master)}
+        for i, child in enumerate(master.children(recursive=True)):
+            processes[f"worker_{i}"] = memory_of(child)
+        result["processes_mb"] = {name: {k: round(v, 1) for k, v in m.items()} for name, m in processes.items()}
+        result["total_rss_mb"] = round(sum(m["rss_mb"] for m in processes.values()), 1)
+        if all("pss_mb" in m for m in processes.values()):
+            result["total_pss_mb"] = round(sum(m["pss_mb"] for m in processes.values()), 1)
+        worker_uss = [m["uss_mb"] for name, m in processes.items() if name != "master"]
+        if worker_uss:
+            result["worker_uss_mb"] = round(sum(worker_uss) / len(worker_uss), 1)
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+# ---- report ----
+
+def median_runs(runs: List[dict], keys: List[str]) -> dict:
+    """First run's details with the median of `keys` over all runs"""
+    ok = [run for run in runs if "error" not in run]
+    if not ok:
+        return runs[0]
+    summary = dict(ok[0])
+    for key in keys:
+        values = sorted(run[key] for run in ok if run.get(key) is not None)
+        if values:
+            summary[key] = values[len(values) // 2]
+    summary["runs"] = len(ok)
+    return summary
+
+
+def check_regressions(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics more than `tolerance` above the baseline"""
+    failures = []
+
+    def compare(label: str, current: Optional[float], previous: Optional[float]):
+        if current is None or previous is None or previous <= 0:
+            return
+        if current > previous * (1 + tolerance):
+            failures.append(f"{label}: {current} vs baseline {previous} (+{current / previous - 1:.0%})")
+
+    for name, component in report["components"].items():
+        previous = baseline.get("components", {}).get(name)
+        if previous and "error" not in component and "error" not in previous:
+            compare(f"{name} load_seconds", component.get("load_seconds"), previous.get("load_seconds"))
+            compare(f"{name} uss_mb", component["memory_mb"].get("uss_mb"), previous["memory_mb"].get("uss_mb"))
+    for name, server in report["servers"].items():
+        previous = baseline.get("servers", {}).get(name)
+        if previous and "error" not in server and "error" not in previous:
+            compare(f"{name} ready_seconds", server.get("ready_seconds"), previous.get("ready_seconds"))
+            compare(f"{name} total_pss_mb", server.get("total_pss_mb"), previous.get("total_pss_mb"))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start time and memory per component and per worker count")
+    parser.add_argument("--components", default=",".join(COMPONENTS), help="Comma-separated components to measure")
+    parser.add_argument("--workers", default="1,2", help="Comma-separated gunicorn worker counts")
+    parser.add_argument("--skip-components", action="store_true")
+    parser.add_argument("--skip-servers", action="store_true")
+    parser.add_argument("--index-path", default=None, help="Saved FAISS index prefix (default RagConfig.FAISS_INDEX_PATH)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (median reported)")
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for a server to be ready")
+    parser.add_argument("--baseline", default=None, help="Previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction")
+    parser.add_argument("--output", default=f"benchmarks/results/startup_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    parser.add_argument("--child-component", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.index_path is None:
+        from config.rag_config import RagConfig
+        args.index_path = RagConfig.FAISS_INDEX_PATH
+
+    if args.child_component:
+        print(json.dumps(_load_component(args.child_component, args.index_path)))
+        return
+
+    report = {"benchmark": "startup", "components": {}, "servers": {}}
+    if not args.skip_components:
+        for name in [c.strip() for c in args.components.split(",") if c.strip()]:
+            if name not in COMPONENTS:
+                parser.error(f"unknown component {name} (expected one of {', '.join(COMPONENTS)})")
+            result = median_runs([measure_component(name, args.index_path) for _ in range(args.repeat)],
+                                 ["import_seconds", "load_seconds", "warmup_ms"])
+            if "error" in result:
+                print(f"  {name}: failed ({result['error'].splitlines()[-1] if result['error'] else 'no output'})")
+            else:
+                text_store = result.pop("text_store", None)
+                warmup = f"{result['warmup_ms']} ms" if result["warmup_ms"] is not None else "-"
+                print(f"  {name}: load {result['load_seconds']}s, warm-up {warmup}, "
+                      f"+{result['memory_mb'].get('uss_mb')} MB uss / +{result['memory_mb'].get('rss_mb')} MB rss")
+                if text_store is not None:
+                    report["components"]["text_store"] = text_store
+                    print(f"  text_store: +{text_store['memory_mb'].get('uss_mb')} MB uss ({text_store['chunks']} chunks)")
+            report["components"][name] = result
+
+    if not args.skip_servers:
+        for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+            runs = []
+            for _ in range(args.repeat):
+                try:
+                    runs.append(measure_server(workers, args.timeout))
+                except (RuntimeError, OSError) as e:
+                    runs.append({"workers": workers, "error": str(e)})
+            result = median_runs(runs, ["live_seconds", "ready_seconds", "total_rss_mb", "total_pss_mb", "worker_uss_mb"])
+            if "error" in result:
+                print(f"  {workers} worker(s): failed ({result['error'][:200]})")
+            else:
+                print(f"  {workers} worker(s): ready in {result['ready_seconds']}s, "
+                      f"total pss {result.get('total_pss_mb')} MB, worker uss {result.get('worker_uss_mb')} MB")
+            report["servers"][f"workers_{workers}"] = result
+
+    failures = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            failures = check_regressions(report, json.load(f), args.tolerance)
+        report["regressions"] = failures
+    write_report(report, args.output)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
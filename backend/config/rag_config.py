@@ -1,3 +1,4 @@
+import math
 import os
 from dotenv import load_dotenv
 
@@ -20,6 +21,25 @@ class RagConfig:
     # LLM Rate limiting (Gemini Free Tier: 10 requests/minute)
     LLM_REQUESTS_PER_MINUTE = 9  # Stay under 10 to be safe
     LLM_DELAY_BETWEEN_REQUESTS = 7  # Delay in seconds (60/9 ≈ 6.7s)
+    LLM_BUCKET_CAPACITY = 1         # Token bucket: số request được gửi dồn (burst)
+    LLM_QUEUE_MAX_SIZE = 50         # Số request chờ tối đa, vượt quá → từ chối ngay
+    LLM_QUEUE_TIMEOUT_SECONDS = 60  # Chờ lâu hơn → trả lỗi "busy"
+    LLM_DEFAULT_PRIORITY = 10       # Số nhỏ hơn = ưu tiên hơn
+    
+    # LLM provider phụ cho hedging / fallback: "" (tắt), "gemini" (model Gemini khác) hoặc
+    # "openai" (endpoint tương thích OpenAI: vLLM, Ollama, llama.cpp server...)
+    LLM_SECONDARY_PROVIDER = os.getenv("LLM_SECONDARY_PROVIDER", "")
+    LLM_SECONDARY_MODEL = os.getenv("LLM_SECONDARY_MODEL", "gemini-2.0-flash-lite")
+    LLM_SECONDARY_BASE_URL = os.getenv("LLM_SECONDARY_BASE_URL", "http://localhost:11434/v1")
+    LLM_SECONDARY_API_KEY = os.getenv("LLM_SECONDARY_API_KEY")
+    LLM_SECONDARY_TIMEOUT = 60             # Giây
+    LLM_HEDGE_DEFAULT_DELAY_MS = 8000      # Chờ provider chính trước khi hedge (khi chưa đủ số liệu p95)
+    LLM_HEDGE_MIN_DELAY_MS = 1000          # Không hedge sớm hơn mức này dù p95 thấp
+    LLM_HEDGE_MIN_SAMPLES = 20             # Số lần gọi tối thiểu trước khi dùng p95 làm delay
+    LLM_STATS_WINDOW = 200                 # Số lần gọi gần nhất dùng để tính p50/p95
+    # Số lần gọi LLM đồng thời tối đa mỗi process: burst + số request được nhận trong một
+    # LLM_SECONDARY_TIMEOUT. Thread pool của HedgedLLM có ngần ấy thread cho mỗi provider
+    LLM_MAX_CONCURRENT_REQUESTS = LLM_BUCKET_CAPACITY + math.ceil(LLM_REQUESTS_PER_MINUTE * LLM_SECONDARY_TIMEOUT / 60)
     
     # RAG configurations
     CHUNK_SIZE = 200
@@ -103,6 +123,14 @@ class RagConfig:
         }
     }
     
+    # Streaming ingestion (scripts/ingest.py): parse → chunk → embed → upload nối bằng queue có giới hạn,
+    # bộ nhớ không phụ thuộc kích thước corpus
+    INGEST_BATCH_SIZE = 64               # Số chunks mỗi batch embed / upload
+    INGEST_QUEUE_SIZE = 4                # Số batch tối đa chờ giữa 2 stage
+    INGEST_CHECKPOINT_EVERY = 10         # Ghi checkpoint sau mỗi N batch đã upload
+    INGEST_CHECKPOINT_PATH = "ingest_checkpoint.json"
+    INGEST_MANIFEST_PATH = "ingest_manifest.json"  # (document, field) → content hash + chunk ids, cho delta ingestion
+    
     # Re-ranking configurations
     USE_RERANKING = True
     CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-12-v2"
@@ -120,6 +148,87 @@ class RagConfig:
     
     RERANK_ALPHA = 0.7  # Weight for cross-encoder score (0.7) vs original score (0.3)
     
+    # Adaptive rerank cascade: dense margin → L-6 → L-12 chỉ cho phần đầu còn mơ hồ.
+    # Tắt mặc định: các ngưỡng dưới đây chưa được đo; chạy python -m benchmarks.rerank_cascade_eval
+    # trên index thật, đặt ngưỡng theo "recommended_thresholds" trong report rồi mới bật
+    USE_RERANK_CASCADE = False
+    CROSS_ENCODER_SMALL_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_SKIP_DENSE_MARGIN = 0.08      # Top-1 dense hơn top-2 bao nhiêu → bỏ qua rerank
+    RERANK_SMALL_DECISIVE_MARGIN = 0.15  # Khoảng cách (điểm L-6 đã min-max) giữa hạng FINAL_TOP_K và FINAL_TOP_K+1
+    RERANK_CASCADE_HEAD_EXTRA = 3        # L-12 chấm FINAL_TOP_K + 3 passages đầu theo L-6
+    
+    # Deadline cho mỗi request (ms): các stage kiểm tra thời gian còn lại và giảm bớt công việc
+    # (ít candidates hơn, rerank ít passages hơn / bỏ rerank, context ngắn hơn) để giữ p99 SLO
+    QUERY_DEADLINE_MS = 12000
+    DEADLINE_LLM_RESERVE_MS = 6000           # Thời gian luôn giữ lại cho Gemini
+    DEADLINE_MIN_LLM_TIMEOUT_MS = 3000       # Timeout tối thiểu cho Gemini dù đã hết budget
+    DEADLINE_RETRIEVAL_ESTIMATE_MS = 300     # Ước lượng thời gian search đầy đủ RERANK_TOP_K
+    DEADLINE_REDUCED_RETRIEVAL_K = 8         # Số candidates khi không đủ thời gian
+    RERANK_ESTIMATED_MS_PER_PASSAGE = 20     # Ước lượng chi phí L-12 / passage trước khi đo được
+    DEADLINE_REDUCED_CONTEXT_CHUNKS = 3      # Số chunks gửi Gemini khi đã trễ
+    
+    # Context assembly trước khi gọi LLM: gộp các chunks liền kề cùng loài/field (bỏ phần overlap),
+    # bỏ câu trùng lặp, và cắt theo token budget
+    USE_CONTEXT_COMPACTION = True
+    CONTEXT_TOKEN_BUDGET = 1800          # Tổng số tokens tối đa của context gửi Gemini
+    CONTEXT_TOKENIZER = "gemini"         # "gemini" (LocalTokenizer, cần sentencepiece) hoặc "embedding" (tokenizer e5)
+    CONTEXT_MIN_DEDUP_WORDS = 4          # Câu ngắn hơn không bị coi là trùng lặp
+    
+    # Semantic answer cache: dùng lại câu trả lời cho câu hỏi giống/diễn đạt lại,
+    # chỉ khi context gửi LLM giống hệt và cùng phiên bản index
+    USE_ANSWER_CACHE = True
+    ANSWER_CACHE_SIMILARITY = 0.95       # Cosine similarity tối thiểu giữa 2 query embeddings
+    ANSWER_CACHE_TTL_SECONDS = 3600
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    ANSWER_CACHE_COALESCE_TIMEOUT = 60   # Giây chờ request đang generate cùng câu hỏi
+
+    # Retrieval-only API (GET /chat/retrieve): trả về passages đã rerank kèm điểm và species/field,
+    # không gọi LLM (search box, "related facts" của app mobile)
+    RETRIEVAL_SLO_MS = 1000              # Latency SLO; rerank chỉ chấm số passages vừa đủ thời gian (None = rerank tất cả)
+    RETRIEVAL_CANDIDATES = 30            # Số candidates lấy từ vector store và rerank (= tổng kết quả qua mọi trang)
+    RETRIEVAL_PAGE_SIZE = 10             # Số kết quả mặc định mỗi trang
+    RETRIEVAL_MAX_PAGE_SIZE = 30
+    RETRIEVAL_CACHE_SIZE = 256           # Số truy vấn đã rerank giữ lại (LRU) để lấy các trang sau không phải rerank lại
+    RETRIEVAL_DEGRADED_CACHE_TTL_SECONDS = 120  # Ranking bị cắt rerank vì SLO: vẫn cache để các trang không trùng/sót, nhưng hết hạn sớm
+
+    # Async query pipeline (RagService.aquery): các stage tốn CPU (embedding, rerank + context assembly)
+    # chạy trong thread pool riêng, giới hạn số tác vụ để event loop không bị chặn
+    EMBEDDING_EXECUTOR_WORKERS = 2
+    RERANK_EXECUTOR_WORKERS = 2
+    STAGE_EXECUTOR_MAX_PENDING = 32      # Số tác vụ tối đa (đang chạy + chờ) mỗi stage, vượt quá thì await
+    LLM_ADMISSION_POLL_SECONDS = 0.05    # Chu kỳ kiểm tra hàng đợi LLM khi chờ bằng asyncio
+    LLM_CANCEL_POLL_SECONDS = 0.1        # Chu kỳ kiểm tra client đã ngắt kết nối khi chờ hàng đợi / stream LLM
+
+    # Inference runtime: ngân sách CPU chung cho các model local (ConvNeXt, e5, cross-encoder).
+    # torch.set_num_threads áp dụng cho cả process, nên số intra-op threads = budget / tổng số lanes
+    # của các model đã load: khi mọi lane cùng chạy vẫn không vượt quá budget
+    INFERENCE_CPU_BUDGET = 0             # Số core cho inference, 0 = OMP_NUM_THREADS (gunicorn) hoặc số CPU
+    INFERENCE_MODEL_LANES = {"image": 1, "embedding": 1, "rerank": 1}  # Số lời gọi chạy song song mỗi model
+    INFERENCE_BULK_MAX_WAIT = 2.0        # Giây tác vụ bulk (ingest) chờ tối đa trước khi được ưu tiên như interactive
+    INFERENCE_BULK_SLICE = 16            # Số texts mỗi lần giữ lane khi embed bulk, để query chen vào giữa các lô
+    INFERENCE_UTILIZATION_WINDOW = 60    # Cửa sổ (giây) tính utilization mỗi model
+
+    # Profiling theo request (/chat/prompt): bật bằng header X-Profile-Token = PROFILING_ADMIN_TOKEN
+    # hoặc lấy mẫu ngẫu nhiên; trả thời gian từng stage qua header Server-Timing và lưu
+    # stack mẫu dạng folded (flamegraph.pl / speedscope). Tắt cả hai thì không tốn gì thêm.
+    PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN")              # None = không bật bằng header
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # Tỷ lệ request được profile (0-1)
+    PROFILING_INTERVAL = 0.005           # Giây giữa 2 lần lấy mẫu stack
+    PROFILING_OUTPUT_DIR = "profiles"
+    PROFILING_MAX_FILES = 200            # Giữ tối đa số profile gần nhất, xóa bản cũ hơn
+
+    # Hierarchical retrieval: route query → top species → top (species, field) partitions,
+    # rồi chỉ search trong các partitions đó (centroids được tính lúc ingest).
+    # Tắt mặc định: ngưỡng dưới đây chưa được đo, ngưỡng sai làm mất recall mà không báo lỗi;
+    # chạy python -m benchmarks.rag_query_benchmark --partition-routing on / off, so sánh recall@k
+    # rồi mới bật (centroids vẫn được tính lúc ingest nên bật lại không cần ingest lại)
+    USE_PARTITION_ROUTING = False
+    PARTITION_INDEX_PATH = "partition_index"
+    PARTITION_TOP_SPECIES = 2        # Số loài được chọn ở stage 1
+    PARTITION_TOP_PARTITIONS = 6     # Số partitions (loài × field) tối thiểu cho stage 2
+    PARTITION_MIN_SIMILARITY = 0.80  # Dưới ngưỡng này → search toàn bộ (global)
+    PARTITION_MIN_MARGIN = 0.02      # Top-1 loài phải hơn loài ngoài top bao nhiêu → nếu không, global
+    
     # FAISS configurations
     VECTOR_DIMENSION = 384  # multilingual-e5-small embedding dimension
     FAISS_INDEX_PATH = "faiss_index"
@@ -127,13 +236,54 @@ class RagConfig:
     # Qdrant configurations 
     USE_QDRANT = True  # Set to True to use Qdrant instead of FAISS (tạm thời dùng FAISS vì mạng không ổn)
     QDRANT_COLLECTION_NAME = "snake_knowledge_base" # Lưu trữ trong Qdrant
-    
+    QDRANT_PARTITION_COLLECTION_SUFFIX = "_partitions"  # Collection phụ lưu centroids của PartitionRouter (mọi API host dùng chung)
+
+    # Chế độ triển khai Qdrant:
+    # - "cloud":  Qdrant Cloud (QDRANT_URL + QDRANT_API_KEY)
+    # - "server": Qdrant tự host, ưu tiên gRPC (tránh serialize JSON cho vectors 384 chiều)
+    # - "local":  Qdrant nhúng trong process, lưu trên disk tại QDRANT_LOCAL_PATH (không cần server)
+    QDRANT_MODE = os.getenv("QDRANT_MODE", "cloud")
+    QDRANT_LOCAL_PATH = os.getenv("QDRANT_LOCAL_PATH", "qdrant_storage")
+    QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() == "true"  # Chỉ dùng cho "server"
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    QDRANT_TIMEOUT = 300  # 5 minutes timeout for large uploads
+
+    # Qdrant HNSW index (áp dụng khi tạo collection hoặc chạy migration)
+    # Mặc định = giá trị mặc định của Qdrant; chỉ đổi sau khi chạy benchmarks.qdrant_collection_benchmark
+    # trên Qdrant server (Qdrant nhúng luôn search exact nên không đo được HNSW / quantization)
+    QDRANT_HNSW_M = 16                 # Số cạnh mỗi node trong đồ thị HNSW
+    QDRANT_HNSW_EF_CONSTRUCT = 100     # Độ rộng tìm kiếm khi build index
+    QDRANT_SEARCH_HNSW_EF = None       # Độ rộng tìm kiếm lúc query (None = mặc định của Qdrant; lớn hơn = recall cao hơn, chậm hơn)
+
+    # Qdrant scalar quantization (int8): giảm 4x RAM cho vectors, search nhanh hơn
+    QDRANT_USE_QUANTIZATION = False       # Bật sau khi benchmark xác nhận recall (cấu hình int8_rescore)
+    QDRANT_QUANTIZATION_QUANTILE = 0.99   # Bỏ 1% giá trị ngoại lai khi tính khoảng int8
+    QDRANT_QUANTIZATION_ALWAYS_RAM = True # Giữ vectors int8 trong RAM
+    QDRANT_SEARCH_RESCORE = True          # Tính lại điểm bằng vectors gốc cho top candidates
+    QDRANT_SEARCH_OVERSAMPLING = 2.0      # Lấy k * 2 candidates từ int8 trước khi rescore
+
+    # Lưu vectors gốc (float32) trên disk, chỉ giữ bản int8 trong RAM
+    QDRANT_ON_DISK_VECTORS = False        # Chỉ nên bật cùng quantization
+
+    # Local mirror: bản sao vectors của collection trong process (memory-mapped)
+    # → search không cần gọi mạng, và vẫn trả lời được khi Qdrant Cloud mất kết nối
+    # (tự động bỏ qua khi QDRANT_MODE = "local" vì dữ liệu đã nằm trong process)
+    USE_QDRANT_MIRROR = True
+    QDRANT_MIRROR_PATH = "qdrant_mirror/snake_knowledge_base"
+    QDRANT_MIRROR_PREFER_LOCAL = True     # False = luôn gọi Qdrant, chỉ dùng mirror khi lỗi
+    QDRANT_MIRROR_REFRESH_SECONDS = 300   # Chu kỳ đồng bộ incremental
+    QDRANT_MIRROR_PAGE_SIZE = 512         # Số points mỗi lần scroll
+
+    # Circuit breaker cho Qdrant
+    QDRANT_BREAKER_FAILURE_THRESHOLD = 3  # Số lỗi liên tiếp trước khi ngắt
+    QDRANT_BREAKER_RESET_TIMEOUT = 30     # Giây chờ trước khi thử gọi lại
+
     @classmethod
     def validate(cls):
         """Validate that all required configurations are set"""
         # Only validate Google API key for LLM (embedding now runs locally)
         if not cls.GOOGLE_API_KEY:
             raise ValueError("GOOGLE_API_KEY not found in environment variables (needed for LLM)")
-        if cls.USE_QDRANT and not cls.QDRANT_API_KEY:
+        if cls.USE_QDRANT and cls.QDRANT_MODE == "cloud" and not cls.QDRANT_API_KEY:
             raise ValueError("QDRANT_API_KEY not found in environment variables")
         return True
\ No newline at end of file
@@ -0,0 +1,68 @@
+"""
+Gunicorn config for multi-worker deployments (from backend/):
+    ENABLE_CHAT=true gunicorn main:app -c gunicorn.conf.py
+
+With PRELOAD_MODELS (default on) the app is imported once in the master, which loads
+the ConvNeXt / e5 / cross-encoder weights before forking; workers share those pages
+copy-on-write instead of each holding a copy. Per-worker memory: GET /health/memory.
+
+Environment:
+    WEB_CONCURRENCY           number of workers (default 2)
+    TORCH_THREADS_PER_WORKER  torch intra-op threads per worker (default: CPUs / workers)
+    PRELOAD_MODELS            "false" to load the models in every worker instead
+    BIND                      listen address (default 0.0.0.0:8000)
+    PROMETHEUS_MULTIPROC_DIR  where the workers' metric files are kept so /metrics sums all
+                              workers (default: <tmp>/prometheus_multiproc, emptied at startup)
+"""
+import gc
+import glob
+import os
+import sys
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 120
+graceful_timeout = 30
+
+# main.py reads PRELOAD_MODELS when the master imports the app
+preload_app = os.getenv("PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
+os.environ["PRELOAD_MODELS"] = "true" if preload_app else "false"
+
+torch_threads = int(os.getenv("TORCH_THREADS_PER_WORKER") or max(1, (os.cpu_count() or 1) // workers))
+
+# Prometheus multiprocess mode: every worker writes its counters / histograms to files in this
+# directory and /metrics sums them. It must be set before the app (and prometheus_client) is
+# imported, and files left by a previous run would be summed in, so they are removed here
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                                    os.path.join(tempfile.gettempdir(), "prometheus_multiproc"))
+os.makedirs(metrics_dir, exist_ok=True)
+for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+    os.remove(path)
+
+
+def pre_fork(server, worker):
+    # Everything allocated so far is shared with the worker: keep the cyclic GC from
+    # writing to those objects' headers (which would copy their pages in every worker)
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Workers share the CPU: cap torch intra-op threads so they don't oversubscribe it
+    # (OMP_NUM_THREADS covers workers that import torch later, i.e. without preload, and is the
+    # CPU budget the inference runtime splits over the lanes of ConvNeXt, e5 and the cross-encoders)
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    runtime = sys.modules.get("rag.inference_runtime")
+    torch = sys.modules.get("torch")
+    if runtime is not None and runtime.inference_runtime.models:
+        runtime.inference_runtime.apply_threads()
+    elif torch is not None:
+        torch.set_num_threads(torch_threads)
+    server.log.info(f"Worker {worker.pid}: {torch_threads} torch threads")
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a dead worker; its counters / histograms stay in the totals
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
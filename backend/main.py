@@ -1,15 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, EmailStr
 from config.database import client, db
 from fastapi.middleware.cors import CORSMiddleware
 from routers.auth_router import app_router as auth_router
 from routers.user_router import app_router as user_router
-# from routers.chat_router import app_router as chat_router
+from routers.metrics_router import app_router as metrics_router
+from routers.health_router import app_router as health_router
+from routers.chat_router import app_router as chat_router
+from services.ServiceRegistry import registry
 from dotenv import load_dotenv
 import os
 
-app = FastAPI()
+# Chat (ConvNeXt + RAG) loads several models; disabled unless ENABLE_CHAT=true
+ENABLE_CHAT = os.getenv("ENABLE_CHAT", "false").lower() in ("1", "true", "yes")
+# Set by gunicorn.conf.py: load the model weights here, in the master, before workers fork
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() in ("1", "true", "yes")
+
+if ENABLE_CHAT and PRELOAD_MODELS:
+    registry.preload()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load in the background: /health/live answers right away, /health/ready once warm
+    if ENABLE_CHAT:
+        registry.start()
+    yield
+    await registry.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 origins = [os.getenv("FRONTEND_URL"), "http://localhost:3000"]
 app.add_middleware(
     CORSMiddleware,
@@ -21,5 +39,8 @@ app.add_middleware(
 )
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(user_router, prefix="/user", tags=["user"])
-# app.include_router(chat_router, prefix="/chat", tags=["chat"])
+app.include_router(metrics_router, prefix="/metrics", tags=["metrics"])
+app.include_router(health_router, prefix="/health", tags=["health"])
+if ENABLE_CHAT:
+    app.include_router(chat_router, prefix="/chat", tags=["chat"])
 
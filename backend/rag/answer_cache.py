@@ -0,0 +1,268 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional, Tuple
+import numpy as np
+from config.rag_config import RagConfig
+
+
+class _InFlight:
+    """A generation currently running; identical/paraphrased requests wait on it"""
+
+    def __init__(self, embedding: np.ndarray, scope: str):
+        self.embedding = embedding
+        self.scope = scope
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+        self.cached = False
+        self.waiters = 0
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def finish(self):
+        """Wake up every waiter (threads and event loops)"""
+        with self._callbacks_lock:
+            self.done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    async def wait_async(self, timeout: float) -> bool:
+        """Await the generation without blocking the event loop; False on timeout"""
+        loop = asyncio.get_running_loop()
+        finished = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(True))
+
+        with self._callbacks_lock:
+            if self.done.is_set():
+                return True
+            self._callbacks.append(wake)
+        try:
+            return await asyncio.wait_for(finished, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers looked up by query-embedding similarity.
+
+    Entries are scoped by the fingerprint of the context sent to the LLM and the index
+    version, so a paraphrased question only reuses an answer generated from exactly the
+    same passages. Concurrent requests that would hit the same entry share one in-flight
+    generation instead of each calling the LLM.
+    """
+
+    def __init__(self, similarity_threshold: float = RagConfig.ANSWER_CACHE_SIMILARITY,
+                 ttl_seconds: float = RagConfig.ANSWER_CACHE_TTL_SECONDS,
+                 max_entries: int = RagConfig.ANSWER_CACHE_MAX_ENTRIES):
+        """
+        Initialize answer cache
+
+        Args:
+            similarity_threshold: Minimum cosine similarity between query embeddings for a hit
+            ttl_seconds: Entry lifetime
+            max_entries: Maximum number of entries (least recently used are evicted)
+        """
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # id -> (embedding, scope, response, created_at)
+        self._inflight: List[_InFlight] = []
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    @staticmethod
+    def scope(context: List[str], index_version) -> str:
+        """Fingerprint of the ordered context passages and the index version"""
+        digest = hashlib.sha1()
+        digest.update(str(index_version).encode("utf-8"))
+        for passage in context:
+            digest.update(b"\x1f")
+            digest.update(passage.encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype="float32").reshape(-1)
+        return embedding / (np.linalg.norm(embedding) or 1.0)
+
+    def _lookup_locked(self, embedding: np.ndarray, scope: str) -> Optional[Tuple[int, float]]:
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if now - entry[3] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+        self.stats["expired"] += len(expired)
+
+        candidates = [(key, entry[0]) for key, entry in self._entries.items() if entry[1] == scope]
+        if not candidates:
+            return None
+        similarities = np.stack([c[1] for c in candidates]) @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return candidates[best][0], float(similarities[best])
+
+    def _find_inflight_locked(self, embedding: np.ndarray, scope: str) -> Optional[_InFlight]:
+        for flight in self._inflight:
+            if flight.scope == scope and float(flight.embedding @ embedding) >= self.similarity_threshold:
+                return flight
+        return None
+
+    def lookup(self, query_embedding, scope: str) -> Optional[Tuple[str, float]]:
+        """
+        Look up a cached answer
+
+        Returns:
+            (response, similarity) or None
+        """
+        embedding = self._normalize(query_embedding)
+        with self._lock:
+            found = self._lookup_locked(embedding, scope)
+            if found is None:
+                return None
+            key, similarity = found
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return self._entries[key][2], similarity
+
+    def store(self, query_embedding, scope: str, response: str):
+        """Store a generated answer"""
+        embedding = self._normalize(query_embedding)
+        with self._lock:
+            self._store_locked(embedding, scope, response)
+
+    def _store_locked(self, embedding: np.ndarray, scope: str, response: str):
+        self._entries[self._next_id] = (embedding, scope, response, time.time())
+        self._next_id += 1
+        self.stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_or_generate(self, query_embedding, scope: str, generate: Callable[[], str],
+                        cacheable: Callable[[str], bool] = lambda response: True) -> Tuple[str, dict]:
+        """
+        Return a cached answer, wait for a matching in-flight generation, or generate
+
+        Args:
+            query_embedding: Embedding of the user's question
+            scope: Context/index fingerprint from scope()
+            generate: Callable producing the answer (the LLM call)
+            cacheable: Predicate deciding whether a generated answer may be stored (e.g. not an error)
+
+        Returns:
+            tuple of (response, cache_info) where cache_info["status"] is "hit", "coalesced" or "miss"
+        """
+        embedding = self._normalize(query_embedding)
+        hit, flight, leader = self._join(embedding, scope)
+        if hit is not None:
+            return hit
+
+        if not leader:
+            print(f"Answer cache: waiting for in-flight generation ({flight.waiters} waiting)")
+            if flight.done.wait(RagConfig.ANSWER_CACHE_COALESCE_TIMEOUT) and flight.cached:
+                return flight.response, {"status": "coalesced"}
+            # Leader failed, produced an uncacheable answer or is too slow: generate independently
+            return generate(), {"status": "miss", "coalesce_failed": True}
+
+        try:
+            flight.response = generate()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._complete(flight, embedding, scope, cacheable)
+
+        return flight.response, {"status": "miss"}
+
+    async def aget_or_generate(self, query_embedding, scope: str, generate: Callable[[], Awaitable[str]],
+                               cacheable: Callable[[str], bool] = lambda response: True) -> Tuple[str, dict]:
+        """
+        Async version of get_or_generate: `generate` is a coroutine function, and waiting
+        for an in-flight generation does not block the event loop
+
+        Returns:
+            tuple of (response, cache_info) where cache_info["status"] is "hit", "coalesced" or "miss"
+        """
+        embedding = self._normalize(query_embedding)
+        hit, flight, leader = self._join(embedding, scope)
+        if hit is not None:
+            return hit
+
+        if not leader:
+            print(f"Answer cache: waiting for in-flight generation ({flight.waiters} waiting)")
+            if await flight.wait_async(RagConfig.ANSWER_CACHE_COALESCE_TIMEOUT) and flight.cached:
+                return flight.response, {"status": "coalesced"}
+            return await generate(), {"status": "miss", "coalesce_failed": True}
+
+        try:
+            flight.response = await generate()
+        except BaseException as e:
+            # Includes cancellation: waiters stop waiting and generate themselves
+            flight.error = e
+            raise
+        finally:
+            self._complete(flight, embedding, scope, cacheable)
+
+        return flight.response, {"status": "miss"}
+
+    def _join(self, embedding: np.ndarray, scope: str):
+        """
+        Look up a cached answer, else join or start an in-flight generation
+
+        Returns:
+            tuple of ((response, cache_info) on a hit else None, in-flight generation, is_leader)
+        """
+        with self._lock:
+            found = self._lookup_locked(embedding, scope)
+            if found is not None:
+                key, similarity = found
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return (self._entries[key][2], {"status": "hit", "similarity": round(similarity, 4)}), None, False
+
+            flight = self._find_inflight_locked(embedding, scope)
+            leader = flight is None
+            if leader:
+                flight = _InFlight(embedding, scope)
+                self._inflight.append(flight)
+                self.stats["misses"] += 1
+            else:
+                flight.waiters += 1
+                self.stats["coalesced"] += 1
+            return None, flight, leader
+
+    def _complete(self, flight: _InFlight, embedding: np.ndarray, scope: str, cacheable: Callable[[str], bool]):
+        """Finish the leader's generation: store a cacheable answer and wake the waiters"""
+        with self._lock:
+            self._inflight.remove(flight)
+            if flight.error is None and cacheable(flight.response):
+                self._store_locked(embedding, scope, flight.response)
+                flight.cached = True
+        flight.finish()
+
+    def clear(self):
+        """Drop all entries (in-flight generations are not affected)"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> dict:
+        """Get cache counters and size"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+            return {
+                **self.stats,
+                "size": len(self._entries),
+                "in_flight": len(self._inflight),
+                "hit_rate": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 4) if lookups else 0.0,
+                "similarity_threshold": self.similarity_threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "max_entries": self.max_entries
+            }
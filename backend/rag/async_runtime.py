@@ -0,0 +1,79 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict
+from config.rag_config import RagConfig
+
+
+class StageExecutors:
+    """
+    Bounded thread pools for the CPU-bound stages of the async query pipeline.
+
+    Each stage (embedding, rerank) has its own pool so a burst of reranks cannot starve
+    query embedding, and at most STAGE_EXECUTOR_MAX_PENDING tasks per stage are submitted
+    at once; further callers await their turn instead of growing the executor queue.
+    PyTorch releases the GIL inside its kernels, so the event loop stays responsive.
+    """
+
+    def __init__(self, workers: Dict[str, int] = None, max_pending: int = RagConfig.STAGE_EXECUTOR_MAX_PENDING):
+        """
+        Initialize stage executors
+
+        Args:
+            workers: Stage name -> number of threads
+            max_pending: Maximum running + queued tasks per stage
+        """
+        workers = workers or {
+            "embedding": RagConfig.EMBEDDING_EXECUTOR_WORKERS,
+            "rerank": RagConfig.RERANK_EXECUTOR_WORKERS
+        }
+        self.max_pending = max_pending
+        self.executors = {
+            stage: ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"rag-{stage}")
+            for stage, count in workers.items()
+        }
+        self._slots = {stage: asyncio.Semaphore(max_pending) for stage in workers}
+        self._pending = {stage: 0 for stage in workers}
+        self._completed = {stage: 0 for stage in workers}
+        self._lock = threading.Lock()
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` in the stage's pool and await its result
+
+        Args:
+            stage: Stage name ("embedding" or "rerank")
+            fn: Blocking callable
+        """
+        async with self._slots[stage]:
+            with self._lock:
+                self._pending[stage] += 1
+            try:
+                loop = asyncio.get_running_loop()
+                # Like asyncio.to_thread: the caller's context (request profile) follows the task
+                context = contextvars.copy_context()
+                return await loop.run_in_executor(self.executors[stage], partial(context.run, fn, *args, **kwargs))
+            finally:
+                with self._lock:
+                    self._pending[stage] -= 1
+                    self._completed[stage] += 1
+
+    def shutdown(self):
+        """Stop the pools (running tasks finish first)"""
+        for executor in self.executors.values():
+            executor.shutdown(wait=True)
+
+    def get_stats(self) -> dict:
+        """Pending / completed tasks per stage"""
+        with self._lock:
+            return {
+                stage: {
+                    "workers": executor._max_workers,
+                    "pending": self._pending[stage],
+                    "completed": self._completed[stage],
+                    "max_pending": self.max_pending
+                }
+                for stage, executor in self.executors.items()
+            }
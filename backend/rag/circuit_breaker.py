@@ -0,0 +1,85 @@
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Simple circuit breaker for a remote dependency.
+
+    closed    -> calls go to the remote; consecutive failures are counted
+    open      -> calls are refused until reset_timeout has passed
+    half_open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Initialize circuit breaker
+
+        Args:
+            name: Name of the protected dependency (for logs/stats)
+            failure_threshold: Consecutive failures before the circuit opens
+            reset_timeout: Seconds to wait before letting a trial call through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.total_failures = 0
+        self.total_rejections = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Return True if a call to the remote should be attempted now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.total_rejections += 1
+            return False
+
+    def record_success(self):
+        """Record a successful remote call"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"✓ Circuit '{self.name}' closed (remote recovered)")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Record a failed remote call"""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self._trial_in_flight = False
+
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚠️  Circuit '{self.name}' opened after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        """Get statistics about the circuit breaker"""
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_rejections": self.total_rejections
+        }
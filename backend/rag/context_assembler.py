@@ -0,0 +1,193 @@
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from config.rag_config import RagConfig
+
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def build_token_counter(fallback_tokenizer=None) -> Tuple[Callable[[str], int], str]:
+    """
+    Token counter for the context budget
+
+    Uses Gemini's local tokenizer (google-genai LocalTokenizer, needs sentencepiece) when
+    RagConfig.CONTEXT_TOKENIZER is "gemini"; otherwise, or if it cannot be loaded, the given
+    Hugging Face tokenizer (e.g. the e5 embedding model's, also SentencePiece-based).
+
+    Returns:
+        tuple of (count_tokens(text) -> int, tokenizer name)
+    """
+    if RagConfig.CONTEXT_TOKENIZER == "gemini":
+        try:
+            from google.genai.local_tokenizer import LocalTokenizer
+            tokenizer = LocalTokenizer(model_name=RagConfig.LLM_MODEL)
+            tokenizer.count_tokens("warm-up")
+            return (lambda text: tokenizer.count_tokens(text).total_tokens), f"gemini:{RagConfig.LLM_MODEL}"
+        except Exception as e:
+            print(f"Warning: Gemini local tokenizer unavailable ({e}), using fallback tokenizer")
+
+    if fallback_tokenizer is not None:
+        return (lambda text: len(fallback_tokenizer.encode(text, add_special_tokens=False))), \
+            type(fallback_tokenizer).__name__
+
+    # Last resort: whitespace words (roughly 1.3 tokens per Vietnamese word for SentencePiece models)
+    return (lambda text: int(len(text.split()) * 1.3) + 1), "words*1.3"
+
+
+class ContextAssembler:
+    """
+    Turns the reranked chunks into the context sent to the LLM.
+
+    Chunks from the same species/field are merged in document order (the word overlap
+    between consecutive chunks and the repeated "species - field:" prefix are removed),
+    sentences already present in a higher-ranked passage are dropped, passages are ordered
+    by their best score, and the result is cut to a token budget at sentence boundaries.
+    """
+
+    def __init__(self, count_tokens: Callable[[str], int], tokenizer_name: str = "",
+                 token_budget: int = RagConfig.CONTEXT_TOKEN_BUDGET):
+        """
+        Initialize context assembler
+
+        Args:
+            count_tokens: Function returning the number of tokens of a text
+            tokenizer_name: Name reported in the assembly stats
+            token_budget: Maximum total tokens of the assembled context
+        """
+        self.count_tokens = count_tokens
+        self.tokenizer_name = tokenizer_name
+        self.token_budget = token_budget
+
+    @staticmethod
+    def _split_prefix(text: str, metadata: Dict) -> Tuple[str, str]:
+        """Split the "species - field: " prefix added by DocumentProcessor from the chunk body"""
+        prefix = f"{metadata.get('species')} - {metadata.get('field')}: "
+        if metadata.get("species") and text.startswith(prefix):
+            return prefix, text[len(prefix):]
+        return "", text
+
+    @staticmethod
+    def _merge_overlap(left: str, right: str) -> str:
+        """Append `right` to `left`, dropping the longest word overlap between left's end and right's start"""
+        left_words, right_words = left.split(), right.split()
+        for size in range(min(len(left_words), len(right_words)), 0, -1):
+            if left_words[-size:] == right_words[:size]:
+                return " ".join(left_words + right_words[size:])
+        return left + " " + right
+
+    @staticmethod
+    def _sentence_key(sentence: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", "", sentence.lower()).split())
+
+    def _group(self, texts: List[str], scores: List[float], metadata: List[Dict]) -> List[dict]:
+        """Group chunks by partition and merge consecutive chunks"""
+        groups = {}
+        for rank, (text, score, meta) in enumerate(zip(texts, scores, metadata)):
+            key = meta.get("partition") or f"__chunk_{rank}"
+            group = groups.setdefault(key, {"members": [], "score": score, "rank": rank, "metadata": meta})
+            group["members"].append((meta.get("chunk_index"), text, meta))
+            group["score"] = max(group["score"], score)
+
+        assembled = []
+        for group in groups.values():
+            members = sorted(group["members"], key=lambda m: (m[0] is None, m[0] or 0))
+            prefix, body = self._split_prefix(members[0][1], members[0][2])
+            previous_index = members[0][0]
+            merges = 0
+            for chunk_index, text, meta in members[1:]:
+                _, next_body = self._split_prefix(text, meta)
+                if previous_index is not None and chunk_index == previous_index + 1:
+                    body = self._merge_overlap(body, next_body)
+                    merges += 1
+                else:
+                    body = body + " ... " + next_body
+                previous_index = chunk_index
+
+            meta = group["metadata"]
+            assembled.append({
+                "prefix": prefix,
+                "body": body,
+                "score": group["score"],
+                "rank": group["rank"],
+                "merges": merges,
+                "metadata": {
+                    "species": meta.get("species"),
+                    "field": meta.get("field"),
+                    "partition": meta.get("partition"),
+                    "doc_id": meta.get("doc_id"),
+                    "chunk_indices": [m[0] for m in members]
+                }
+            })
+        return assembled
+
+    def assemble(self, texts: List[str], scores: List[float],
+                 metadata: Optional[List[Dict]] = None, token_budget: Optional[int] = None) -> Tuple[List[str], List[float], List[Dict], dict]:
+        """
+        Compact chunks into LLM context
+
+        Args:
+            texts: Selected chunks (best first)
+            scores: Their scores (combined rerank or similarity)
+            metadata: Per-chunk metadata (species, field, partition, chunk_index)
+            token_budget: Override of the assembler's token budget
+
+        Returns:
+            tuple of (passages, scores, metadata, stats)
+        """
+        budget = token_budget or self.token_budget
+        metadata = metadata or [{} for _ in texts]
+        tokens_before = sum(self.count_tokens(text) for text in texts)
+
+        groups = self._group(texts, scores, metadata)
+        groups.sort(key=lambda g: (-g["score"], g["rank"]))
+
+        seen_sentences = set()
+        duplicates_removed = 0
+        passages, passage_scores, passage_metadata = [], [], []
+        used_tokens = 0
+        truncated = False
+
+        for group in groups:
+            kept = []
+            for sentence in _SENTENCE_SPLIT.split(group["body"]):
+                key = self._sentence_key(sentence)
+                if len(key.split()) >= RagConfig.CONTEXT_MIN_DEDUP_WORDS and key in seen_sentences:
+                    duplicates_removed += 1
+                    continue
+                seen_sentences.add(key)
+                kept.append(sentence)
+            if not kept:
+                continue
+
+            # Fit the passage in the remaining budget, dropping trailing sentences if needed
+            passage = group["prefix"] + " ".join(kept)
+            tokens = self.count_tokens(passage)
+            while tokens > budget - used_tokens and len(kept) > 1:
+                kept.pop()
+                truncated = True
+                passage = group["prefix"] + " ".join(kept)
+                tokens = self.count_tokens(passage)
+            if tokens > budget - used_tokens:
+                truncated = True
+                if passages:
+                    break
+                # Never send an empty context: keep the best passage even if it alone exceeds the budget
+
+            passages.append(passage)
+            passage_scores.append(group["score"])
+            passage_metadata.append(group["metadata"])
+            used_tokens += tokens
+
+        stats = {
+            "input_chunks": len(texts),
+            "output_passages": len(passages),
+            "merged_chunks": sum(g["merges"] for g in groups),
+            "duplicate_sentences_removed": duplicates_removed,
+            "tokens_before": tokens_before,
+            "tokens_after": used_tokens,
+            "token_budget": budget,
+            "truncated": truncated,
+            "tokenizer": self.tokenizer_name
+        }
+        print(f"Context assembly: {len(texts)} chunks -> {len(passages)} passages, "
+              f"{tokens_before} -> {used_tokens} tokens (budget {budget})")
+        return passages, passage_scores, passage_metadata, stats
@@ -0,0 +1,65 @@
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    Latency budget for one request, carried through the RAG pipeline.
+
+    Stages check the remaining budget before doing optional work and record any
+    degradation they apply (fewer candidates, reranking skipped, smaller context...),
+    so the response can report exactly what was given up to stay within the SLO.
+    """
+
+    def __init__(self, budget_ms: Optional[float]):
+        """
+        Initialize deadline
+
+        Args:
+            budget_ms: Total time budget in milliseconds (None = no deadline)
+        """
+        self.budget_ms = budget_ms
+        self.start = time.perf_counter()
+        self.degradations = []
+        self.stages = {}
+        self._stage_start = self.start
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def remaining_ms(self) -> float:
+        """Remaining budget in milliseconds (infinite without a deadline)"""
+        if self.budget_ms is None:
+            return float("inf")
+        return self.budget_ms - self.elapsed_ms()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining_ms() <= 0
+
+    def can_afford(self, cost_ms: float, reserve_ms: float = 0.0) -> bool:
+        """True if `cost_ms` of work still fits while keeping `reserve_ms` for later stages"""
+        return self.remaining_ms() - reserve_ms >= cost_ms
+
+    def mark(self, stage: str):
+        """Record the time spent since the previous mark under `stage`"""
+        now = time.perf_counter()
+        self.stages[stage] = round((now - self._stage_start) * 1000, 2)
+        self._stage_start = now
+
+    def degrade(self, name: str, **details):
+        """Record a degradation applied because of the remaining budget"""
+        entry = {"name": name, "remaining_ms": round(self.remaining_ms(), 1), **details}
+        self.degradations.append(entry)
+        print(f"Deadline: {name} ({entry['remaining_ms']}ms left) {details if details else ''}")
+
+    def get_report(self) -> dict:
+        """Budget, elapsed time, per-stage timings and applied degradations"""
+        elapsed = self.elapsed_ms()
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": round(elapsed, 2),
+            "exceeded": self.budget_ms is not None and elapsed > self.budget_ms,
+            "stages_ms": dict(self.stages),
+            "degradations": list(self.degradations)
+        }
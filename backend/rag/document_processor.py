@@ -1,10 +1,33 @@
+import hashlib
+import json
 import re
-from typing import List, Dict, Optional
+import uuid
+from typing import List, Dict, Iterator, Optional, Tuple
 from config.rag_config import RagConfig
+from rag.partition_router import PartitionRouter
 
 class DocumentProcessor:
     """Handles document processing and text chunking with metadata context"""
     
+    # Default metadata fields of a species document, in chunking order
+    DEFAULT_METADATA_FIELDS = [
+        "Tên khoa học và tên phổ thông",
+        "Phân loại học",
+        "Đặc điểm hình thái",
+        "Độc tính",
+        "Tập tính săn mồi",
+        "Hành vi và sinh thái",
+        "Phân bố địa lý và môi trường sống",
+        "Sinh sản",
+        "Tình trạng bảo tồn",
+        "Giá trị nghiên cứu",
+        "Sự liên quan với con người",
+        "Các quan sát thú vị từ các nhà nghiên cứu"
+    ]
+    
+    # Namespace of the deterministic chunk ids (uuid5)
+    CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "ask-snake/knowledge-base/chunks")
+    
     def __init__(self, chunk_size: int = RagConfig.CHUNK_SIZE, chunk_overlap: int = RagConfig.CHUNK_OVERLAP):
         """
         Initialize document processor
@@ -118,17 +141,9 @@ class DocumentProcessor:
         text = self.clean_text(text)
         
         # Get field-specific chunk config if enabled
-        if RagConfig.USE_FIELD_SPECIFIC_CHUNKING and metadata_key and metadata_key in RagConfig.FIELD_CHUNK_CONFIG:
-            field_config = RagConfig.FIELD_CHUNK_CONFIG[metadata_key]
-            chunk_size = field_config["chunk_size"]
-            chunk_overlap = field_config["chunk_overlap"]
-            chunk_by = RagConfig.CHUNK_BY
+        chunk_size, chunk_overlap, chunk_by = self.field_chunk_config(metadata_key)
+        if RagConfig.USE_FIELD_SPECIFIC_CHUNKING and metadata_key in RagConfig.FIELD_CHUNK_CONFIG:
             print(f"  Using field-specific config for '{metadata_key}': chunk_size={chunk_size} {chunk_by}, overlap={chunk_overlap} {chunk_by}")
-        else:
-            # Use default chunk size and overlap
-            chunk_size = self.chunk_size
-            chunk_overlap = self.chunk_overlap
-            chunk_by = "chars"  # Default to chars
         
         # Create context prefix if both snake_name and metadata_key provided
         context_prefix = ""
@@ -141,6 +156,19 @@ class DocumentProcessor:
         else:
             return self._chunk_by_chars(text, context_prefix, chunk_size, chunk_overlap)
     
+    def field_chunk_config(self, metadata_key: str = None) -> Tuple[int, int, str]:
+        """
+        Chunking parameters used for a field
+        
+        Returns:
+            (chunk_size, chunk_overlap, chunk_by)
+        """
+        if RagConfig.USE_FIELD_SPECIFIC_CHUNKING and metadata_key and metadata_key in RagConfig.FIELD_CHUNK_CONFIG:
+            field_config = RagConfig.FIELD_CHUNK_CONFIG[metadata_key]
+            return field_config["chunk_size"], field_config["chunk_overlap"], RagConfig.CHUNK_BY
+        # Use default chunk size and overlap, by chars
+        return self.chunk_size, self.chunk_overlap, "chars"
+    
     def _chunk_by_words(self, text: str, context_prefix: str, chunk_size: int, chunk_overlap: int) -> List[str]:
         """Chunk text by word count"""
         words = text.split()
@@ -223,7 +251,8 @@ class DocumentProcessor:
     def process_document_with_metadata(self, 
                                       documents: List[Dict], 
                                       name_field: str = "name_vn",
-                                      metadata_fields: List[str] = None) -> List[str]:
+                                      metadata_fields: List[str] = None,
+                                      return_metadata: bool = False):
         """
         Process documents with metadata context
         
@@ -232,28 +261,14 @@ class DocumentProcessor:
             name_field: Field name for snake name (default: "name_vn")
             metadata_fields: List of metadata field names to process
                            If None, process all fields except id and name fields
+            return_metadata: Also return per-chunk metadata (species, field, partition, chunk_index)
             
         Returns:
-            List of processed text chunks with context prefix
+            List of processed text chunks with context prefix,
+            or (chunks, chunk_metadata) if return_metadata is True
         """
-        if metadata_fields is None:
-            # Default metadata fields to process
-            metadata_fields = [
-                "Tên khoa học và tên phổ thông",
-                "Phân loại học",
-                "Đặc điểm hình thái",
-                "Độc tính",
-                "Tập tính săn mồi",
-                "Hành vi và sinh thái",
-                "Phân bố địa lý và môi trường sống",
-                "Sinh sản",
-                "Tình trạng bảo tồn",
-                "Giá trị nghiên cứu",
-                "Sự liên quan với con người",
-                "Các quan sát thú vị từ các nhà nghiên cứu"
-            ]
-        
         all_chunks = []
+        all_metadata = []
         
         for doc in documents:
             # Get snake name
@@ -261,20 +276,13 @@ class DocumentProcessor:
             
             print(f"\n📄 Processing: {snake_name}")
             
-            # Process each metadata field
-            for metadata_key in metadata_fields:
-                if metadata_key in doc and doc[metadata_key]:
-                    text = doc[metadata_key]
-                    
-                    # Chunk with context prefix
-                    chunks = self.chunk_text_with_metadata_context(
-                        text=text,
-                        snake_name=snake_name,
-                        metadata_key=metadata_key
-                    )
-                    
-                    all_chunks.extend(chunks)
-                    print(f"  ✓ {metadata_key}: {len(chunks)} chunks")
+            field_counts = {}
+            for chunk, metadata in self.iter_document_chunks(doc, name_field, metadata_fields):
+                all_chunks.append(chunk)
+                all_metadata.append(metadata)
+                field_counts[metadata["field"]] = field_counts.get(metadata["field"], 0) + 1
+            for metadata_key, count in field_counts.items():
+                print(f"  ✓ {metadata_key}: {count} chunks")
         
         print(f"\n✅ Total processed: {len(all_chunks)} chunks with context")
         
@@ -289,8 +297,102 @@ class DocumentProcessor:
             print(f"  Max length: {max_length} characters")
             print(f"  Min length: {min_length} characters")
         
+        if return_metadata:
+            return all_chunks, all_metadata
         return all_chunks
     
+    def iter_document_fields(self, doc: Dict, name_field: str = "name_vn",
+                             metadata_fields: List[str] = None) -> Iterator[Tuple[str, str, str]]:
+        """
+        Non-empty metadata fields of one document
+        
+        Args:
+            doc: Document dict with metadata fields
+            name_field: Field name for snake name
+            metadata_fields: Fields to return (default DEFAULT_METADATA_FIELDS)
+            
+        Yields:
+            (snake name, metadata key, field text)
+        """
+        snake_name = doc.get(name_field) or doc.get("name_en") or "Unknown"
+        
+        for metadata_key in metadata_fields or self.DEFAULT_METADATA_FIELDS:
+            if metadata_key in doc and doc[metadata_key]:
+                yield snake_name, metadata_key, doc[metadata_key]
+    
+    def chunk_field(self, doc: Dict, snake_name: str, metadata_key: str, text: str) -> List[Tuple[str, Dict]]:
+        """
+        Chunk one field of a document
+        
+        Returns:
+            List of (chunk text with context prefix, chunk metadata)
+        """
+        chunks = self.chunk_text_with_metadata_context(text=text, snake_name=snake_name, metadata_key=metadata_key)
+        return [
+            (chunk, self.build_chunk_metadata(doc, snake_name, metadata_key, chunk_index))
+            for chunk_index, chunk in enumerate(chunks)
+        ]
+    
+    def iter_document_chunks(self, doc: Dict, name_field: str = "name_vn",
+                             metadata_fields: List[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Chunk one document field by field
+        
+        Args:
+            doc: Document dict with metadata fields
+            name_field: Field name for snake name
+            metadata_fields: Fields to chunk (default DEFAULT_METADATA_FIELDS)
+            
+        Yields:
+            (chunk text with context prefix, chunk metadata)
+        """
+        for snake_name, metadata_key, text in self.iter_document_fields(doc, name_field, metadata_fields):
+            yield from self.chunk_field(doc, snake_name, metadata_key, text)
+    
+    @staticmethod
+    def document_key(doc: Dict, snake_name: str) -> str:
+        """Stable key of a document: its id, or the species name for documents without one"""
+        return str(doc.get("id") or snake_name)
+    
+    def content_hash(self, snake_name: str, metadata_key: str, text: str) -> str:
+        """
+        Hash of everything that determines a field's chunks and embeddings
+        (text, species name in the context prefix, chunking parameters, embedding model)
+        """
+        key = json.dumps(
+            [snake_name, metadata_key, text, *self.field_chunk_config(metadata_key), RagConfig.EMBEDDING_MODEL],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    
+    @classmethod
+    def chunk_id(cls, doc_key: str, metadata_key: str, chunk_index: int) -> str:
+        """Deterministic id of a chunk, so re-ingesting the same chunk overwrites instead of duplicating"""
+        return str(uuid.uuid5(cls.CHUNK_ID_NAMESPACE, f"{doc_key}\x1f{metadata_key}\x1f{chunk_index}"))
+    
+    @staticmethod
+    def build_chunk_metadata(doc: Dict, snake_name: str, metadata_key: str, chunk_index: int) -> Dict:
+        """
+        Build the metadata stored alongside a chunk in the vector store
+        
+        Args:
+            doc: Source document dict
+            snake_name: Species name used in the context prefix
+            metadata_key: Field the chunk was cut from
+            chunk_index: Position of the chunk within the field
+            
+        Returns:
+            Metadata dict (species, field, partition, chunk_index, doc_id, chunk_id)
+        """
+        return {
+            "chunk_id": DocumentProcessor.chunk_id(DocumentProcessor.document_key(doc, snake_name), metadata_key, chunk_index),
+            "doc_id": doc.get("id"),
+            "species": snake_name,
+            "field": metadata_key,
+            "partition": PartitionRouter.partition_key(snake_name, metadata_key),
+            "chunk_index": chunk_index
+        }
+    
     def process_document(self, text: str) -> List[str]:
         """
         Process a document by cleaning and chunking (backward compatible method)
@@ -1,5 +1,6 @@
 from sentence_transformers import SentenceTransformer
 from config.rag_config import RagConfig
+from rag.inference_runtime import inference_runtime, PRIORITY_BULK, PRIORITY_INTERACTIVE
 import numpy as np
 from typing import List, Union
 import time
@@ -27,6 +28,7 @@ class EmbeddingGenerator:
                 RagConfig.EMBEDDING_MODEL, 
                 device=self.device
             )
+            inference_runtime.register("embedding")
             print(f"✓ Model loaded from cache! Embedding dimension: {self.model.get_sentence_embedding_dimension()}")
         except Exception as e:
             print(f"❌ Error loading model: {e}")
@@ -34,7 +36,8 @@ class EmbeddingGenerator:
             print(f"   python -c \"from sentence_transformers import SentenceTransformer; SentenceTransformer('{RagConfig.EMBEDDING_MODEL}')\"")
             raise
     
-    def generate_embeddings(self, texts: Union[str, List[str]], batch_size: int = None, show_progress: bool = True) -> np.ndarray:
+    def generate_embeddings(self, texts: Union[str, List[str]], batch_size: int = None, show_progress: bool = True,
+                            priority: int = PRIORITY_BULK) -> np.ndarray:
         """
         Generate embeddings for given text(s) using local model
         
@@ -42,6 +45,8 @@ class EmbeddingGenerator:
             texts: Single text string or list of text strings
             batch_size: Maximum number of texts per batch (default from Config.EMBEDDING_BATCH_SIZE)
             show_progress: Show progress bar
+            priority: Inference runtime priority; bulk work releases the model every
+                INFERENCE_BULK_SLICE texts so interactive queries are not stuck behind it
             
         Returns:
             numpy array of embeddings
@@ -59,13 +64,22 @@ class EmbeddingGenerator:
             print(f"  Generating {len(texts)} embeddings with {RagConfig.EMBEDDING_MODEL}...")
             
             # Generate embeddings in batches
-            embeddings = self.model.encode(
-                processed_texts,
-                batch_size=batch_size,
-                show_progress_bar=show_progress,
-                convert_to_numpy=True,
-                normalize_embeddings=True  # Normalize for cosine similarity
-            )
+            slice_size = RagConfig.INFERENCE_BULK_SLICE if priority == PRIORITY_BULK else len(processed_texts)
+            parts = []
+            for start in range(0, len(processed_texts), max(1, slice_size)):
+                parts.append(inference_runtime.run(
+                    "embedding", self.model.encode,
+                    processed_texts[start:start + slice_size],
+                    priority=priority,
+                    batch_size=batch_size,
+                    show_progress_bar=show_progress,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True  # Normalize for cosine similarity
+                ))
+            if not parts:
+                embeddings = np.zeros((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+            else:
+                embeddings = np.concatenate(parts) if len(parts) > 1 else parts[0]
             
             print(f"  ✓ Successfully generated {len(embeddings)} embeddings")
             return embeddings
@@ -88,8 +102,10 @@ class EmbeddingGenerator:
             # Use "query:" prefix for queries (E5 model recommendation)
             processed_text = f"query: {text}"
             
-            embedding = self.model.encode(
+            embedding = inference_runtime.run(
+                "embedding", self.model.encode,
                 processed_text,
+                priority=PRIORITY_INTERACTIVE,
                 convert_to_numpy=True,
                 normalize_embeddings=True
             )
@@ -0,0 +1,215 @@
+import asyncio
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Dict
+from config.rag_config import RagConfig
+
+PRIORITY_INTERACTIVE = 0  # User-facing requests: query embedding, rerank, chat images
+PRIORITY_BULK = 1         # Ingestion, re-indexing, batch image jobs
+
+
+class _ModelLane:
+    """Admission state of one model: concurrent calls, waiting tickets and usage counters"""
+
+    def __init__(self, name: str, lanes: int):
+        self.name = name
+        self.lanes = lanes
+        self.running = 0
+        self.waiting = []             # [(seq, priority, enqueued_at)]
+        self.busy = deque()           # (start, end) of finished calls within the utilization window
+        self.active = {}              # seq -> start of calls holding a lane
+        self.busy_seconds = 0.0
+        self.completed = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 0}
+        self.wait_seconds = {PRIORITY_INTERACTIVE: 0.0, PRIORITY_BULK: 0.0}
+        self.promoted = 0             # Bulk calls admitted ahead of interactive ones after INFERENCE_BULK_MAX_WAIT
+
+
+class InferenceRuntime:
+    """
+    Shared CPU budget for the local models (ConvNeXt, e5, cross-encoders).
+
+    Each model registered in the process gets INFERENCE_MODEL_LANES concurrent calls, and
+    torch's intra-op thread count is set to INFERENCE_CPU_BUDGET divided by the lanes of all
+    registered models, so the models together never use more threads than the budget when
+    they are all hot. Calls wait for a free lane in priority order: interactive before bulk,
+    FIFO within a priority, and a bulk call that waited INFERENCE_BULK_MAX_WAIT is served
+    like an interactive one so ingestion still makes progress under query load.
+
+    torch.set_num_threads is process-wide (one intra-op pool, whichever thread calls it), so
+    the thread count is set once when a model registers (and again by apply_threads after a
+    fork), never per call: concurrent calls of different models would overwrite each other's.
+    The call itself runs in the caller's thread (no extra hop).
+    """
+
+    def __init__(self, budget: int = RagConfig.INFERENCE_CPU_BUDGET, lanes: Dict[str, int] = None,
+                 bulk_max_wait: float = RagConfig.INFERENCE_BULK_MAX_WAIT,
+                 window: float = RagConfig.INFERENCE_UTILIZATION_WINDOW):
+        """
+        Initialize runtime
+
+        Args:
+            budget: Cores for inference (0 = OMP_NUM_THREADS, read when the threads are applied so
+                gunicorn's per-worker value applies, or the CPU count)
+            lanes: Model name -> concurrent calls
+            bulk_max_wait: Seconds after which a waiting bulk call is served like an interactive one
+            window: Seconds over which utilization is computed
+        """
+        self._budget = budget
+        self.lane_counts = lanes or RagConfig.INFERENCE_MODEL_LANES
+        self.bulk_max_wait = bulk_max_wait
+        self.window = window
+        self.models = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    @property
+    def budget(self) -> int:
+        """Cores available to inference in this process"""
+        if self._budget:
+            return self._budget
+        return int(os.getenv("OMP_NUM_THREADS") or 0) or os.cpu_count() or 1
+
+    def register(self, model: str):
+        """Give a loaded model its lanes and re-split the budget over all lanes (idempotent)"""
+        with self._cond:
+            self._lane_locked(model)
+            self._apply_threads_locked()
+
+    def _lane_locked(self, model: str) -> _ModelLane:
+        if model not in self.models:
+            self.models[model] = _ModelLane(model, max(1, self.lane_counts.get(model, 1)))
+        return self.models[model]
+
+    @property
+    def threads(self) -> int:
+        """Torch intra-op threads: the budget split over the lanes of the registered models"""
+        with self._cond:
+            return self._threads_locked()
+
+    def _threads_locked(self) -> int:
+        lanes = sum(lane.lanes for lane in self.models.values()) or 1
+        return max(1, self.budget // lanes)
+
+    def apply_threads(self):
+        """Set torch's process-wide intra-op threads (e.g. after a fork changed OMP_NUM_THREADS)"""
+        with self._cond:
+            self._apply_threads_locked()
+
+    def _apply_threads_locked(self):
+        torch = sys.modules.get("torch")
+        if torch is not None and self.models:
+            threads = self._threads_locked()
+            if torch.get_num_threads() != threads:
+                torch.set_num_threads(threads)
+
+    # ---- admission ----
+
+    def _head_locked(self, lane: _ModelLane, now: float):
+        """Next ticket to admit: interactive or aged bulk first, then bulk, FIFO within each"""
+        def rank(ticket):
+            seq, priority, enqueued_at = ticket
+            urgent = priority == PRIORITY_INTERACTIVE or now - enqueued_at >= self.bulk_max_wait
+            return (0 if urgent else 1, seq)
+        return min(lane.waiting, key=rank)
+
+    def _admit(self, model: str, priority: int) -> int:
+        """Block until the call holds one of the model's lanes; returns its sequence number"""
+        with self._cond:
+            lane = self._lane_locked(model)
+            ticket = (next(self._seq), priority, time.monotonic())
+            lane.waiting.append(ticket)
+            while True:
+                now = time.monotonic()
+                if lane.running < lane.lanes and self._head_locked(lane, now) is ticket:
+                    break
+                self._cond.wait()
+
+            lane.waiting.remove(ticket)
+            lane.running += 1
+            lane.active[ticket[0]] = now
+            lane.wait_seconds[priority] += now - ticket[2]
+            if priority == PRIORITY_BULK and any(t[1] == PRIORITY_INTERACTIVE for t in lane.waiting):
+                lane.promoted += 1
+            if lane.waiting and lane.running < lane.lanes:
+                self._cond.notify_all()  # Another lane is still free for the new head
+            return ticket[0]
+
+    def _release(self, model: str, seq: int, priority: int):
+        with self._cond:
+            lane = self.models[model]
+            start = lane.active.pop(seq)
+            end = time.monotonic()
+            lane.running -= 1
+            lane.completed[priority] += 1
+            lane.busy_seconds += end - start
+            lane.busy.append((start, end))
+            self._prune_locked(lane, end)
+            self._cond.notify_all()
+
+    def _prune_locked(self, lane: _ModelLane, now: float):
+        while lane.busy and lane.busy[0][1] < now - self.window:
+            lane.busy.popleft()
+
+    @contextmanager
+    def slot(self, model: str, priority: int = PRIORITY_INTERACTIVE):
+        """
+        Hold one of the model's lanes for the duration of the block
+
+        Args:
+            model: Model name ("image", "embedding", "rerank")
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BULK
+        """
+        seq = self._admit(model, priority)
+        try:
+            yield
+        finally:
+            self._release(model, seq, priority)
+
+    def run(self, model: str, fn: Callable, *args, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Run `fn(*args, **kwargs)` in the calling thread while holding a lane of `model`"""
+        with self.slot(model, priority):
+            return fn(*args, **kwargs)
+
+    async def arun(self, model: str, fn: Callable, *args, priority: int = PRIORITY_INTERACTIVE, **kwargs):
+        """Async version of run: waits and runs in a worker thread, not on the event loop"""
+        return await asyncio.to_thread(partial(self.run, model, fn, *args, priority=priority, **kwargs))
+
+    # ---- stats ----
+
+    def get_stats(self) -> dict:
+        """Budget, threads, queue and utilization (busy lane-seconds / window) per model"""
+        with self._cond:
+            now = time.monotonic()
+            stats = {"cpu_budget": self.budget, "intra_op_threads": self._threads_locked(), "models": {}}
+            for name, lane in self.models.items():
+                self._prune_locked(lane, now)
+                since = now - self.window
+                busy = sum(end - max(start, since) for start, end in lane.busy)
+                busy += sum(now - max(start, since) for start in lane.active.values())
+                queued = [t[1] for t in lane.waiting]
+                stats["models"][name] = {
+                    "lanes": lane.lanes,
+                    "running": lane.running,
+                    "queued_interactive": queued.count(PRIORITY_INTERACTIVE),
+                    "queued_bulk": queued.count(PRIORITY_BULK),
+                    "completed_interactive": lane.completed[PRIORITY_INTERACTIVE],
+                    "completed_bulk": lane.completed[PRIORITY_BULK],
+                    "avg_wait_ms_interactive": round(
+                        lane.wait_seconds[PRIORITY_INTERACTIVE] * 1000 / max(1, lane.completed[PRIORITY_INTERACTIVE]), 2),
+                    "avg_wait_ms_bulk": round(
+                        lane.wait_seconds[PRIORITY_BULK] * 1000 / max(1, lane.completed[PRIORITY_BULK]), 2),
+                    "bulk_promoted": lane.promoted,
+                    "busy_seconds": round(lane.busy_seconds, 3),
+                    "utilization": round(busy / (self.window * lane.lanes), 4)
+                }
+            return stats
+
+
+# One runtime per process: the image service and the RAG models share the budget
+inference_runtime = InferenceRuntime()
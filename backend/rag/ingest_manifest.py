@@ -0,0 +1,126 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+from config.rag_config import RagConfig
+
+
+class IngestManifest:
+    """
+    Record of what is in the index: (document key, field) → content hash and chunk ids.
+
+    Re-ingesting a corpus compares each field's content hash with the manifest, so only
+    new or changed fields are re-chunked, re-embedded and upserted, and the chunk ids of
+    changed, emptied or removed fields tell which points to delete.
+
+    A field whose chunks are only partly uploaded is "pending" until complete() is called
+    for it; a run that crashed in between sees it as changed and uploads it again.
+    """
+
+    SEPARATOR = "\x1f"
+
+    def __init__(self, path: str = None):
+        """
+        Initialize manifest
+
+        Args:
+            path: Manifest file (default from RagConfig.INGEST_MANIFEST_PATH)
+        """
+        self.path = path or RagConfig.INGEST_MANIFEST_PATH
+        self.entries: Dict[str, Dict] = {}
+
+    @classmethod
+    def key(cls, doc_key: str, field: str) -> str:
+        return f"{doc_key}{cls.SEPARATOR}{field}"
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Entry {"hash", "chunk_ids"} (plus "pending" while partly uploaded) of a (document, field) key, or None"""
+        return self.entries.get(key)
+
+    def is_current(self, key: str, content_hash: str) -> bool:
+        """True if the field is fully indexed with this content hash"""
+        entry = self.entries.get(key)
+        return entry is not None and entry["hash"] == content_hash and not entry.get("pending")
+
+    def add_chunk(self, key: str, content_hash: str, chunk_id: str):
+        """
+        Record an ingested chunk; a new content hash replaces the field's previous chunk ids
+        and leaves the field pending until complete() is called
+
+        Args:
+            key: IngestManifest.key(doc_key, field)
+            content_hash: DocumentProcessor.content_hash of the field
+            chunk_id: Id of the chunk point
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry["hash"] != content_hash:
+            entry = self.entries[key] = {"hash": content_hash, "chunk_ids": [], "pending": True}
+        if chunk_id not in entry["chunk_ids"]:
+            entry["chunk_ids"].append(chunk_id)
+
+    def complete(self, key: str, content_hash: str):
+        """
+        Mark a field as fully uploaded (after its last chunk)
+
+        Args:
+            key: IngestManifest.key(doc_key, field)
+            content_hash: DocumentProcessor.content_hash of the field (a field that produced
+                          no chunks is recorded with no chunk ids)
+        """
+        entry = self.entries.get(key)
+        if entry is None or entry["hash"] != content_hash:
+            entry = self.entries[key] = {"hash": content_hash, "chunk_ids": []}
+        entry.pop("pending", None)
+
+    def remove(self, keys: Iterable[str]) -> List[str]:
+        """
+        Drop entries
+
+        Returns:
+            Chunk ids of the dropped entries
+        """
+        chunk_ids = []
+        for key in keys:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                chunk_ids.extend(entry["chunk_ids"])
+        return chunk_ids
+
+    def clear(self):
+        self.entries = {}
+
+    def load(self) -> bool:
+        """
+        Load the manifest from disk
+
+        Returns:
+            True if a manifest was found
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)["entries"]
+        except FileNotFoundError:
+            return False
+        print(f"Ingest manifest loaded: {len(self.entries)} fields")
+        return True
+
+    def save(self):
+        """Atomically replace the manifest file"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries}, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def get_stats(self) -> dict:
+        return {
+            "fields": len(self.entries),
+            "chunks": sum(len(entry["chunk_ids"]) for entry in self.entries.values()),
+            "pending": sum(1 for entry in self.entries.values() if entry.get("pending"))
+        }
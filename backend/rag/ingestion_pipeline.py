@@ -0,0 +1,547 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Set
+from config.rag_config import RagConfig
+from rag.ingest_manifest import IngestManifest
+from rag.inference_runtime import PRIORITY_BULK
+
+_READ_SIZE = 1 << 16
+_DONE = object()  # End-of-stream sentinel passed between stages
+
+
+def _is_qdrant(vector_store) -> bool:
+    """isinstance check that doesn't import qdrant_client for FAISS runs"""
+    module = sys.modules.get("rag.qdrant_vector_store")
+    return module is not None and isinstance(vector_store, module.QdrantVectorStore)
+
+
+def iter_documents(path: str) -> Iterator[Dict]:
+    """
+    Stream documents from a JSON / JSONL corpus without loading the whole file
+
+    Args:
+        path: .jsonl / .ndjson file (one document per line) or .json file
+              holding an array of documents (or a single document)
+
+    Yields:
+        Document dicts, in file order
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from e
+        return
+
+    # JSON array: decode one element at a time from a sliding buffer
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        eof = False
+
+        def fill() -> bool:
+            nonlocal buffer, eof
+            data = f.read(_READ_SIZE)
+            if not data:
+                eof = True
+            buffer += data
+            return bool(data)
+
+        def skip_whitespace():
+            nonlocal buffer
+            while True:
+                buffer = buffer.lstrip()
+                if buffer or eof or not fill():
+                    return
+
+        skip_whitespace()
+        if not buffer.startswith("["):
+            # Single document (or anything else json understands): fall back to a full parse
+            buffer += f.read()
+            yield json.loads(buffer)
+            return
+        buffer = buffer[1:]
+
+        while True:
+            skip_whitespace()
+            if buffer.startswith("]"):
+                return
+            if not buffer:
+                raise ValueError(f"{path}: unexpected end of file inside the document array")
+            while True:
+                try:
+                    doc, end = decoder.raw_decode(buffer)
+                    # A number or literal could continue past the buffer end; objects cannot
+                    if end < len(buffer) or eof:
+                        break
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                fill()
+            buffer = buffer[end:]
+            yield doc
+
+            skip_whitespace()
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+            elif not buffer.startswith("]"):
+                raise ValueError(f"{path}: expected ',' or ']' after a document")
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion: parse → chunk → embed → upload, one thread per stage.
+
+    Stages are connected by bounded queues of chunk batches, so embedding the next batch
+    overlaps with uploading the previous one and at most ~2 * queue_size batches are held
+    in memory whatever the corpus size. A checkpoint (position of the next chunk to upload)
+    is written every few batches, after the vector store, partition router and manifest are
+    saved, so a crashed run resumes exactly where the last checkpoint stopped.
+
+    run_delta re-ingests a corpus against the manifest: only new or changed fields are
+    chunked, embedded and upserted, and points of changed / removed fields are deleted;
+    the partition centroids are then recounted from the stored vectors.
+    """
+
+    def __init__(
+        self,
+        embedding_generator,
+        vector_store,
+        document_processor,
+        partition_router=None,
+        reranker=None,
+        manifest: IngestManifest = None,
+        batch_size: int = RagConfig.INGEST_BATCH_SIZE,
+        queue_size: int = RagConfig.INGEST_QUEUE_SIZE,
+        checkpoint_every: int = RagConfig.INGEST_CHECKPOINT_EVERY,
+        checkpoint_path: str = RagConfig.INGEST_CHECKPOINT_PATH
+    ):
+        """
+        Initialize ingestion pipeline
+
+        Args:
+            embedding_generator: EmbeddingGenerator
+            vector_store: FAISSVectorStore or QdrantVectorStore
+            document_processor: DocumentProcessor (chunking + chunk metadata)
+            partition_router: PartitionRouter to update with the new chunks (optional)
+            reranker: CrossEncoderReranker, to pre-tokenize passages (optional)
+            manifest: IngestManifest recording what is indexed (default: RagConfig.INGEST_MANIFEST_PATH)
+            batch_size: Chunks per embed / upload batch
+            queue_size: Batches buffered between two stages
+            checkpoint_every: Write a checkpoint every N uploaded batches
+            checkpoint_path: Checkpoint file
+        """
+        self.embedding_generator = embedding_generator
+        self.vector_store = vector_store
+        self.document_processor = document_processor
+        self.partition_router = partition_router
+        self.reranker = reranker
+        self.manifest = manifest if manifest is not None else IngestManifest()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_path = checkpoint_path
+
+    # ---- checkpoint ----
+
+    @staticmethod
+    def _source_signature(path: str) -> Dict:
+        stat = os.stat(path)
+        return {"source": os.path.abspath(path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+    def load_checkpoint(self, path: str) -> Optional[Dict]:
+        """
+        Read the checkpoint of a previous run over the same corpus file
+
+        Returns:
+            Checkpoint dict, or None if missing or written for another / modified file
+        """
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: ignoring unreadable checkpoint {self.checkpoint_path}: {e}")
+            return None
+
+        signature = self._source_signature(path)
+        if any(checkpoint.get(key) != value for key, value in signature.items()):
+            print(f"Checkpoint {self.checkpoint_path} belongs to another corpus or the file changed, starting over")
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, signature: Dict, cursor: tuple, stats: Dict, completed: bool):
+        """Atomically replace the checkpoint (write a temp file, then rename)"""
+        checkpoint = {
+            **signature,
+            "next_document": cursor[0],
+            "next_chunk": cursor[1],
+            "documents_done": stats["documents_done"],
+            "chunks_done": stats["chunks_done"],
+            "completed": completed,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _persist(self, stats: Dict, signature: Optional[Dict] = None, cursor: tuple = None, completed: bool = False):
+        """Save index state first, then the checkpoint that points past it (full runs only)"""
+        persist_started = time.perf_counter()
+        self.vector_store.save_index()
+        if self.partition_router is not None:
+            self.partition_router.save()
+        self.manifest.save()
+        if signature is not None:
+            self._save_checkpoint(signature, cursor, stats, completed)
+        stats["checkpoints"] += 1
+        stats["stage_seconds"]["persist"] += time.perf_counter() - persist_started
+
+    # ---- stages ----
+
+    @staticmethod
+    def _new_stage_seconds() -> Dict[str, float]:
+        """Busy time per stage; waiting on a full / empty queue is excluded"""
+        return {"read_chunk": 0.0, "embed": 0.0, "tokenize": 0.0, "upload": 0.0, "persist": 0.0}
+
+    def _new_batch(self) -> Dict:
+        return {"texts": [], "metadata": [], "fields": [], "replaces": [], "completes": []}
+
+    def _read(self, path: str, start: tuple, out: queue.Queue, stop: threading.Event, delta: Optional[Dict] = None):
+        """
+        Parse + chunk stage: emits batches of chunks tagged with the cursor after their last chunk.
+        In delta mode fields whose content hash matches the manifest are skipped, and a changed
+        field's previous chunk ids go into the "replaces" list of the batch holding its first chunk.
+        A field goes into the "completes" list of the batch holding (or following) its last chunk.
+        """
+        processor = self.document_processor
+        start_document, start_chunk = start
+        batch = self._new_batch()
+        document_count = 0
+        busy = self._stage_seconds
+        mark = time.perf_counter()  # Time blocked on a full queue is not counted as stage work
+
+        for document_index, doc in enumerate(iter_documents(path)):
+            document_count = document_index + 1
+            if document_index < start_document:
+                continue
+            skip = start_chunk if document_index == start_document else 0
+            chunk_position = 0  # Chunks of this document so far (resume cursor)
+
+            for snake_name, field, text in processor.iter_document_fields(doc):
+                key = IngestManifest.key(processor.document_key(doc, snake_name), field)
+                content_hash = processor.content_hash(snake_name, field, text)
+                if delta is not None:
+                    delta["seen"].add(key)
+                    entry = self.manifest.get(key)
+                    if self.manifest.is_current(key, content_hash):
+                        delta["fields_unchanged"] += 1
+                        continue
+                    delta["fields_changed"] += 1
+                    if entry is not None:
+                        batch["replaces"].extend(entry["chunk_ids"])
+
+                for chunk, chunk_metadata in processor.chunk_field(doc, snake_name, field, text):
+                    chunk_position += 1
+                    if chunk_position <= skip:
+                        continue
+                    batch["texts"].append(chunk)
+                    batch["metadata"].append(chunk_metadata)
+                    batch["fields"].append((key, content_hash))
+                    if len(batch["texts"]) >= self.batch_size:
+                        batch["cursor"] = (document_index, chunk_position)
+                        batch["documents_done"] = document_index
+                        busy["read_chunk"] += time.perf_counter() - mark
+                        if not self._put(out, batch, stop):
+                            return
+                        mark = time.perf_counter()
+                        batch = self._new_batch()
+                # Uploaded after the field's last chunk (batches are uploaded in order)
+                batch["completes"].append((key, content_hash))
+
+        # Last (partial) batch; an empty one still carries the final cursor
+        batch["cursor"] = (max(document_count, start_document), 0)
+        batch["documents_done"] = batch["cursor"][0]
+        busy["read_chunk"] += time.perf_counter() - mark
+        self._put(out, batch, stop)
+
+    def _embed(self, inp: queue.Queue, out: queue.Queue, stop: threading.Event):
+        """Embed stage: adds embeddings (and cross-encoder token ids) to each batch"""
+        while True:
+            batch = self._get(inp, stop)
+            if batch is _DONE:
+                return
+            if batch["texts"]:
+                started = time.perf_counter()
+                batch["embeddings"] = self.embedding_generator.generate_embeddings(
+                    batch["texts"], show_progress=False, priority=PRIORITY_BULK)
+                self._stage_seconds["embed"] += time.perf_counter() - started
+                if self.reranker is not None:
+                    started = time.perf_counter()
+                    signature = self.reranker.tokenizer_signature
+                    for chunk_metadata, ids in zip(batch["metadata"], self.reranker.tokenize_passages(batch["texts"])):
+                        chunk_metadata["ce_token_ids"] = ids
+                        chunk_metadata["ce_tokenizer"] = signature
+                    self._stage_seconds["tokenize"] += time.perf_counter() - started
+            if not self._put(out, batch, stop):
+                return
+
+    def _remove_from_router(self, chunk_ids: List[str]):
+        """Take chunks out of the partition centroids (before they are deleted or overwritten)"""
+        if self.partition_router is not None and chunk_ids:
+            embeddings, metadata = self.vector_store.fetch_embeddings(chunk_ids)
+            self.partition_router.remove(embeddings, metadata)
+
+    def _delete(self, chunk_ids: List[str]) -> int:
+        """Delete chunks from the vector store and the partition centroids"""
+        if not chunk_ids:
+            return 0
+        self._remove_from_router(chunk_ids)
+        if _is_qdrant(self.vector_store):
+            return self.vector_store.delete_embeddings(chunk_ids, refresh_mirror=False)
+        return self.vector_store.delete_embeddings(chunk_ids)
+
+    def _upload(self, batch: Dict) -> int:
+        """
+        Upsert a batch (deterministic chunk ids: re-uploading after a crash or an edit overwrites
+        instead of duplicating) after removing the chunks it replaces, then mark the fields whose
+        last chunk is now uploaded as complete in the manifest
+
+        Returns:
+            Number of deleted chunks
+        """
+        texts, metadata = batch["texts"], batch["metadata"]
+        ids = [m["chunk_id"] for m in metadata]
+
+        deleted = 0
+        if batch["replaces"]:
+            new_ids = set(ids)
+            # Re-used ids are overwritten by the upsert below, the others are deleted
+            self._remove_from_router([chunk_id for chunk_id in batch["replaces"] if chunk_id in new_ids])
+            deleted = self._delete([chunk_id for chunk_id in batch["replaces"] if chunk_id not in new_ids])
+
+        if texts:
+            embeddings = batch["embeddings"]
+            if _is_qdrant(self.vector_store):
+                self.vector_store.add_embeddings(
+                    embeddings, texts, metadata, batch_size=len(texts), ids=ids, refresh_mirror=False
+                )
+            else:
+                self.vector_store.add_embeddings(embeddings, texts, metadata, ids=ids)
+            if self.partition_router is not None:
+                self.partition_router.add(embeddings, metadata)
+            for (key, content_hash), chunk_id in zip(batch["fields"], ids):
+                self.manifest.add_chunk(key, content_hash, chunk_id)
+        for key, content_hash in batch["completes"]:
+            self.manifest.complete(key, content_hash)
+        return deleted
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        """Blocking put that gives up when the pipeline is stopping"""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _get(q: queue.Queue, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _stage(self, target, errors: List, stop: threading.Event, out: Optional[queue.Queue], *args):
+        """Run a stage; on exit (normal or error) pass the end-of-stream sentinel downstream"""
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if out is not None:
+                self._put(out, _DONE, stop)
+
+    # ---- run ----
+
+    def _run_stages(self, path: str, start: tuple, stats: Dict, signature: Optional[Dict] = None,
+                    delta: Optional[Dict] = None) -> tuple:
+        """
+        Run read → embed threads and upload on this thread, persisting every checkpoint_every batches
+
+        Returns:
+            Cursor after the last uploaded batch
+        """
+        self._stage_seconds = stats["stage_seconds"]
+        chunks_queue = queue.Queue(maxsize=self.queue_size)
+        embedded_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors = []
+        threads = [
+            threading.Thread(target=self._stage, name="ingest-read", daemon=True,
+                             args=(self._read, errors, stop, chunks_queue, path, start, chunks_queue, stop, delta)),
+            threading.Thread(target=self._stage, name="ingest-embed", daemon=True,
+                             args=(self._embed, errors, stop, embedded_queue, chunks_queue, embedded_queue, stop))
+        ]
+        for thread in threads:
+            thread.start()
+
+        started = time.perf_counter()
+        cursor = start
+        try:
+            while True:
+                batch = self._get(embedded_queue, stop)
+                if batch is _DONE:
+                    break
+                if batch["texts"] or batch["replaces"] or batch["completes"]:
+                    upload_started = time.perf_counter()
+                    stats["chunks_deleted"] += self._upload(batch)
+                    stats["stage_seconds"]["upload"] += time.perf_counter() - upload_started
+                if batch["texts"]:
+                    stats["batches"] += 1
+                    stats["chunks_done"] += len(batch["texts"])
+                cursor = batch["cursor"]
+                stats["documents_done"] = batch["documents_done"]
+                if batch["texts"] and stats["batches"] % self.checkpoint_every == 0:
+                    self._persist(stats, signature, cursor)
+                if batch["texts"]:
+                    elapsed = time.perf_counter() - started
+                    print(f"  ✓ {stats['chunks_done']} chunks / {stats['documents_done']} documents "
+                          f"({stats['chunks_done'] / max(elapsed, 1e-9):.1f} chunks/s this run)")
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            # Keep the last checkpoint: the next run resumes from it
+            raise errors[0]
+        return cursor
+
+    def _finish(self, stats: Dict, started: float) -> Dict:
+        if _is_qdrant(self.vector_store) and self.vector_store.mirror is not None:
+            try:
+                self.vector_store.mirror.refresh()
+            except Exception as e:
+                print(f"Warning: mirror refresh after ingestion failed: {e}")
+
+        stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+        stats["vector_store_stats"] = self.vector_store.get_stats()
+        stats["manifest_stats"] = self.manifest.get_stats()
+        if self.partition_router is not None:
+            stats["partition_stats"] = self.partition_router.get_stats()
+        return stats
+
+    def run(self, path: str, resume: bool = True) -> Dict:
+        """
+        Ingest a whole corpus file (first build / rebuild)
+
+        Args:
+            path: JSON / JSONL corpus (see iter_documents)
+            resume: Continue from the checkpoint of a previous run over the same file;
+                    otherwise the manifest starts empty
+
+        Returns:
+            Ingestion statistics
+        """
+        started = time.perf_counter()
+        signature = self._source_signature(path)
+        checkpoint = self.load_checkpoint(path) if resume else None
+        if checkpoint and checkpoint.get("completed"):
+            print(f"Corpus {path} already fully ingested (checkpoint {self.checkpoint_path}); use --restart to ingest again")
+            return {"documents_done": checkpoint["documents_done"], "chunks_done": checkpoint["chunks_done"],
+                    "batches": 0, "checkpoints": 0, "resumed": True, "already_completed": True}
+        if checkpoint is None:
+            self.manifest.clear()
+        else:
+            self.manifest.load()  # Saved together with the checkpoint
+
+        start = (checkpoint["next_document"], checkpoint["next_chunk"]) if checkpoint else (0, 0)
+        stats = {
+            "documents_done": checkpoint["documents_done"] if checkpoint else 0,
+            "chunks_done": checkpoint["chunks_done"] if checkpoint else 0,
+            "chunks_deleted": 0,
+            "batches": 0,
+            "checkpoints": 0,
+            "resumed": checkpoint is not None,
+            "stage_seconds": self._new_stage_seconds()
+        }
+        if checkpoint:
+            print(f"Resuming {path} at document {start[0]}, chunk {start[1]} "
+                  f"({stats['chunks_done']} chunks already ingested)")
+
+        cursor = self._run_stages(path, start, stats, signature=signature)
+        self._finish(stats, started)
+        self._persist(stats, signature, cursor, completed=True)
+        stats["stage_seconds"] = {stage: round(seconds, 3) for stage, seconds in stats["stage_seconds"].items()}
+        return stats
+
+    def run_delta(self, path: str, prune: bool = True) -> Dict:
+        """
+        Re-ingest a corpus against the manifest: only new or changed fields are chunked,
+        embedded and upserted, chunks of changed fields that no longer exist are deleted
+
+        Args:
+            path: JSON / JSONL corpus (see iter_documents)
+            prune: The corpus is the whole knowledge base: delete chunks of documents / fields
+                   that are in the manifest but not in the corpus. Disable for partial update files
+
+        Returns:
+            Ingestion statistics
+        """
+        started = time.perf_counter()
+        delta = {"seen": set(), "fields_changed": 0, "fields_unchanged": 0}
+        stats = {"documents_done": 0, "chunks_done": 0, "chunks_deleted": 0, "batches": 0, "checkpoints": 0,
+                 "stage_seconds": self._new_stage_seconds()}
+
+        self._run_stages(path, (0, 0), stats, delta=delta)
+
+        removed_fields = 0
+        if prune:
+            missing: Set[str] = set(self.manifest.entries) - delta["seen"]
+            removed_fields = len(missing)
+            stats["chunks_deleted"] += self._delete(self.manifest.remove(missing))
+
+        stats.update(
+            fields_changed=delta["fields_changed"],
+            fields_unchanged=delta["fields_unchanged"],
+            fields_removed=removed_fields
+        )
+        print(f"Delta ingestion: {delta['fields_changed']} changed, {delta['fields_unchanged']} unchanged, "
+              f"{removed_fields} removed fields; {stats['chunks_done']} chunks upserted, {stats['chunks_deleted']} deleted")
+
+        # The incremental centroid updates subtract what the store holds under a replaced id; after
+        # a run that crashed between an upsert and the next persist that is already the new vector,
+        # so the centroids are recounted from the stored vectors before they are published
+        if self.partition_router is not None:
+            rebuild_started = time.perf_counter()
+            self.partition_router.rebuild(self.vector_store.iter_embeddings())
+            stats["stage_seconds"]["router_rebuild"] = time.perf_counter() - rebuild_started
+
+        self._finish(stats, started)
+        self._persist(stats)
+        stats["stage_seconds"] = {stage: round(seconds, 3) for stage, seconds in stats["stage_seconds"].items()}
+        return stats
@@ -1,33 +1,177 @@
+import threading
 from google import genai
 from google.genai import types
 from config.rag_config import RagConfig
-from typing import List
+from rag.llm_scheduler import LLMAdmissionScheduler
+from rag.llm_providers import LLMProvider, OpenAICompatibleProvider, HedgedLLM
+from typing import List, Optional, Iterator
+
+
+class GeminiProvider(LLMProvider):
+    """Gemini backend (google-genai), reporting rate-limit feedback to the admission scheduler"""
+    
+    def __init__(self, client, model: str):
+        """
+        Initialize Gemini provider
+        
+        Args:
+            client: genai.Client
+            model: Gemini model name
+        """
+        super().__init__()
+        self.name = f"gemini:{model}"
+        self.client = client
+        self.model = model
+        self.scheduler = None  # LLMAdmissionScheduler receiving success / rate-limit feedback
+    
+    def _report(self, error: Exception = None):
+        """Feed the outcome of an API call back to the admission scheduler"""
+        if self.scheduler is None:
+            return
+        if error is None:
+            self.scheduler.record_success()
+            return
+        retry_after = LLMAdmissionScheduler.rate_limit_delay(error)
+        if retry_after is not None:
+            self.scheduler.record_rate_limited(retry_after or None)
+    
+    @staticmethod
+    def build_request(prompt: str, timeout_ms: Optional[int] = None):
+        """Contents and generation config (thinking disabled) for a single-turn prompt"""
+        contents = [
+            types.Content(
+                role="user",
+                parts=[
+                    types.Part.from_text(text=prompt),
+                ],
+            ),
+        ]
+        
+        # Configure generation with thinking disabled
+        generate_content_config = types.GenerateContentConfig(
+            thinking_config=types.ThinkingConfig(
+                thinking_budget=0,
+            ),
+            http_options=types.HttpOptions(timeout=int(timeout_ms)) if timeout_ms else None,
+        )
+        return contents, generate_content_config
+    
+    def generate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        contents, generate_content_config = self.build_request(prompt, timeout_ms)
+        try:
+            response = self.client.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=generate_content_config
+            )
+        except Exception as e:
+            self._report(e)
+            raise
+        self._report()
+        return response.candidates[0].content.parts[0].text
+    
+    async def agenerate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        """Generate through the google-genai asyncio client (client.aio)"""
+        contents, generate_content_config = self.build_request(prompt, timeout_ms)
+        try:
+            response = await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=generate_content_config
+            )
+        except Exception as e:
+            self._report(e)
+            raise
+        self._report()
+        return response.candidates[0].content.parts[0].text
+    
+    def stream(self, prompt: str, timeout_ms: Optional[int] = None) -> Iterator[str]:
+        contents, generate_content_config = self.build_request(prompt, timeout_ms)
+        
+        stream = self.client.models.generate_content_stream(
+            model=self.model,
+            contents=contents,
+            config=generate_content_config
+        )
+        try:
+            for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+            self._report()
+        except Exception as e:
+            self._report(e)
+            raise
+        finally:
+            # Stop the underlying HTTP stream when the consumer goes away early
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+
 
 class GeminiLLM:
-    """Gemini 2.5 Flash LLM for generating responses"""
+    """
+    Gemini 2.5 Flash LLM for generating responses.
+    
+    Gemini is the primary provider; an optional secondary provider (RagConfig.LLM_SECONDARY_PROVIDER)
+    receives a hedged request when Gemini is slower than its p95, and takes over when Gemini fails.
+    """
+    
+    # Prefix of the apology returned instead of raising (such answers are never cached)
+    ERROR_PREFIX = "Sorry, I encountered an error"
     
     def __init__(self):
-        """Initialize Gemini LLM client"""
+        """Initialize Gemini LLM client and the secondary provider, if configured"""
         RagConfig.validate()
         self.client = genai.Client(api_key=RagConfig.GOOGLE_API_KEY)
         self.model = RagConfig.LLM_MODEL
+        self.primary = GeminiProvider(self.client, self.model)
+        
+        providers = [self.primary]
+        secondary = self._create_secondary_provider()
+        if secondary is not None:
+            print(f"LLM hedging enabled: {self.primary.name} -> {secondary.name}")
+            providers.append(secondary)
+        self.hedged = HedgedLLM(providers)
+    
+    def _create_secondary_provider(self) -> Optional[LLMProvider]:
+        kind = RagConfig.LLM_SECONDARY_PROVIDER
+        if not kind:
+            return None
+        if kind == "gemini":
+            return GeminiProvider(self.client, RagConfig.LLM_SECONDARY_MODEL)
+        if kind == "openai":
+            return OpenAICompatibleProvider(
+                RagConfig.LLM_SECONDARY_BASE_URL,
+                RagConfig.LLM_SECONDARY_MODEL,
+                RagConfig.LLM_SECONDARY_API_KEY
+            )
+        raise ValueError(f"Unknown LLM_SECONDARY_PROVIDER '{kind}' (expected 'gemini', 'openai' or empty)")
+    
+    @property
+    def scheduler(self):
+        return self.primary.scheduler
+    
+    @scheduler.setter
+    def scheduler(self, scheduler: LLMAdmissionScheduler):
+        # Admission control only covers the rate-limited primary; hedges to the secondary bypass it
+        self.primary.scheduler = scheduler
     
-    def generate_response(self, query: str, context: List[str]) -> str:
+    def build_prompt(self, query: str, context: List[str]) -> str:
         """
-        Generate response using query and retrieved context
+        Build the expert-answer prompt from the query and retrieved context
         
         Args:
             query: User's question
             context: List of relevant text chunks from vector search
             
         Returns:
-            Generated response string
+            Prompt string
         """
         # Prepare context
         context_text = "\n\n".join([f"Context {i+1}: {text}" for i, text in enumerate(context)])
         
         # Create prompt
-        prompt = f"""Consider yourself a snake expert to give professional answers, answer users like an expert and not answer like you rely on this or that information to give results even though you have to get results from context to answer
+        return f"""Consider yourself a snake expert to give professional answers, answer users like an expert and not answer like you rely on this or that information to give results even though you have to get results from context to answer
 
 Based on the following context information, please answer the question accurately and comprehensively.
 
@@ -39,36 +183,75 @@ Question: {query}
 Please provide a detailed answer based on the context provided. If the context doesn't contain enough information to answer the question, please mention that.
 
 Position yourself as a snake expert, give the user some more questions related to the current question so the user can build on that and then continue saying what question you want me to help you answer"""
-
-        try:
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=prompt),
-                    ],
-                ),
-            ]
+    
+    def generate_response(self, query: str, context: List[str], timeout_ms: Optional[int] = None,
+                          info: Optional[dict] = None) -> str:
+        """
+        Generate response using query and retrieved context
+        
+        Args:
+            query: User's question
+            context: List of relevant text chunks from vector search
+            timeout_ms: Optional HTTP timeout for each provider call (from the request deadline)
+            info: Optional dict filled with the answering provider and whether a hedge was sent
             
-            # Configure generation with thinking disabled
-            generate_content_config = types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(
-                    thinking_budget=0,
-                ),
-            )
+        Returns:
+            Generated response string
+        """
+        try:
+            response, provider_info = self.hedged.generate(self.build_prompt(query, context), timeout_ms)
+            if info is not None:
+                info.update(provider_info)
+            return response
             
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=contents,
-                config=generate_content_config
-            )
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return f"{self.ERROR_PREFIX} while generating the response: {str(e)}"
+    
+    async def agenerate_response(self, query: str, context: List[str], timeout_ms: Optional[int] = None,
+                                 info: Optional[dict] = None) -> str:
+        """
+        Async version of generate_response (hedged, the losing request is cancelled)
+        
+        Args:
+            query: User's question
+            context: List of relevant text chunks from vector search
+            timeout_ms: Optional HTTP timeout for each provider call (from the request deadline)
+            info: Optional dict filled with the answering provider and whether a hedge was sent
             
-            final_response = response.candidates[0].content.parts[0].text
-            return final_response
+        Returns:
+            Generated response string
+        """
+        try:
+            response, provider_info = await self.hedged.agenerate(self.build_prompt(query, context), timeout_ms)
+            if info is not None:
+                info.update(provider_info)
+            return response
             
         except Exception as e:
             print(f"Error generating response: {e}")
-            return f"Sorry, I encountered an error while generating the response: {str(e)}"
+            return f"{self.ERROR_PREFIX} while generating the response: {str(e)}"
+    
+    def generate_response_stream(self, query: str, context: List[str],
+                                 timeout_ms: Optional[int] = None, info: Optional[dict] = None,
+                                 cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Stream the response as text deltas (hedged on time to first chunk)
+        
+        Args:
+            query: User's question
+            context: List of relevant text chunks from vector search
+            timeout_ms: Optional HTTP timeout for each provider call
+            info: Optional dict filled with the answering provider once its first chunk arrives
+            cancel: Optional event that stops the stream when set from another thread
+            
+        Yields:
+            Text deltas as they are generated
+            
+        Errors are raised to the caller (the stream may already be partially sent).
+        Closing the generator or setting `cancel` stops reading from the providers.
+        """
+        yield from self.hedged.stream(self.build_prompt(query, context), timeout_ms, info, cancel)
     
     def generate_simple_response(self, text: str) -> str:
         """
@@ -81,30 +264,12 @@ Position yourself as a snake expert, give the user some more questions related t
             Generated response string
         """
         try:
-            contents = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=text),
-                    ],
-                ),
-            ]
-            
-            generate_content_config = types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(
-                    thinking_budget=0,
-                ),
-            )
-            
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=contents,
-                config=generate_content_config
-            )
-            
-            final_response = response.candidates[0].content.parts[0].text
-            return final_response
+            return self.primary.generate(text)
             
         except Exception as e:
             print(f"Error generating simple response: {e}")
-            return f"Sorry, I encountered an error: {str(e)}"
\ No newline at end of file
+            return f"{self.ERROR_PREFIX}: {str(e)}"
+    
+    def get_stats(self) -> dict:
+        """Per-provider latency / error statistics"""
+        return self.hedged.get_stats()
@@ -0,0 +1,456 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterator, List, Optional, Tuple
+import httpx
+from config.rag_config import RagConfig
+
+
+class ProviderStats:
+    """Rolling latency / error statistics of one LLM provider"""
+
+    def __init__(self, window: int = RagConfig.LLM_STATS_WINDOW):
+        self.latencies = deque(maxlen=window)        # Full-response latency (seconds)
+        self.first_token = deque(maxlen=window)      # Streaming time to first chunk (seconds)
+        self.counters = {"requests": 0, "errors": 0, "wins": 0, "hedged_requests": 0, "fallback_requests": 0, "cancelled": 0}
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def record(self, counter: str):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def record_latency(self, latency: Optional[float] = None, first_token: Optional[float] = None):
+        with self._lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            if first_token is not None:
+                self.first_token.append(first_token)
+
+    def record_error(self, error: Exception):
+        with self._lock:
+            self.counters["errors"] += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    @staticmethod
+    def _percentile(values, pct: float) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+    def p95(self, streaming: bool = False) -> Optional[float]:
+        """95th percentile latency in seconds (None until LLM_HEDGE_MIN_SAMPLES were recorded)"""
+        with self._lock:
+            values = list(self.first_token if streaming else self.latencies)
+        if len(values) < RagConfig.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self._percentile(values, 95)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            latencies, first_token = list(self.latencies), list(self.first_token)
+            counters, last_error = dict(self.counters), self.last_error
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None
+        return {
+            **counters,
+            "error_rate": round(counters["errors"] / counters["requests"], 4) if counters["requests"] else 0.0,
+            "p50_ms": to_ms(self._percentile(latencies, 50)),
+            "p95_ms": to_ms(self._percentile(latencies, 95)),
+            "first_token_p50_ms": to_ms(self._percentile(first_token, 50)),
+            "first_token_p95_ms": to_ms(self._percentile(first_token, 95)),
+            "last_error": last_error
+        }
+
+
+class LLMProvider:
+    """
+    Interface of an LLM backend.
+
+    Providers raise on failure (no apology strings) so the caller can hedge or fall back.
+    """
+
+    name = "provider"
+
+    def __init__(self):
+        self.stats = ProviderStats()
+
+    def generate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        """Generate the full response for a prompt"""
+        raise NotImplementedError
+
+    def stream(self, prompt: str, timeout_ms: Optional[int] = None) -> Iterator[str]:
+        """Stream the response as text deltas (default: one chunk with the full response)"""
+        yield self.generate(prompt, timeout_ms)
+
+    async def agenerate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        """Async generate (default: the blocking call in a worker thread)"""
+        return await asyncio.to_thread(self.generate, prompt, timeout_ms)
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Any OpenAI-compatible /chat/completions endpoint (vLLM, Ollama, llama.cpp server,
+    OpenRouter...). Used as the secondary provider for hedging and fallback.
+    """
+
+    def __init__(self, base_url: str, model: str, api_key: Optional[str] = None):
+        """
+        Initialize provider
+
+        Args:
+            base_url: API base URL, e.g. http://localhost:11434/v1
+            model: Model name on that endpoint
+            api_key: Optional bearer token
+        """
+        super().__init__()
+        self.name = f"openai:{model}"
+        self.model = model
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.client = httpx.Client(headers=headers, timeout=RagConfig.LLM_SECONDARY_TIMEOUT)
+        self.async_client = httpx.AsyncClient(headers=headers, timeout=RagConfig.LLM_SECONDARY_TIMEOUT)
+
+    def _payload(self, prompt: str, stream: bool) -> dict:
+        return {"model": self.model, "messages": [{"role": "user", "content": prompt}], "stream": stream}
+
+    def generate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        timeout = timeout_ms / 1000 if timeout_ms else RagConfig.LLM_SECONDARY_TIMEOUT
+        response = self.client.post(self.url, json=self._payload(prompt, False), timeout=timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def agenerate(self, prompt: str, timeout_ms: Optional[int] = None) -> str:
+        timeout = timeout_ms / 1000 if timeout_ms else RagConfig.LLM_SECONDARY_TIMEOUT
+        response = await self.async_client.post(self.url, json=self._payload(prompt, False), timeout=timeout)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stream(self, prompt: str, timeout_ms: Optional[int] = None) -> Iterator[str]:
+        timeout = timeout_ms / 1000 if timeout_ms else RagConfig.LLM_SECONDARY_TIMEOUT
+        with self.client.stream("POST", self.url, json=self._payload(prompt, True), timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+
+class HedgedLLM:
+    """
+    Hedged generation over an ordered list of providers.
+
+    The primary provider is called first. If it has not answered (or, when streaming, has
+    not produced its first chunk) after its own p95 latency, the next provider is started
+    as a hedge and whichever answers first wins; the loser is cancelled. A provider that
+    fails starts the next one immediately, so hedging also acts as fallback.
+    """
+
+    def __init__(self, providers: List[LLMProvider],
+                 max_concurrent_requests: int = RagConfig.LLM_MAX_CONCURRENT_REQUESTS):
+        """
+        Initialize hedged LLM
+
+        Args:
+            providers: Providers in preference order (primary first)
+            max_concurrent_requests: Generations that may run at once (what the admission
+                scheduler lets through); each may occupy one thread per provider, so an
+                admitted request never waits for a free thread
+        """
+        self.providers = providers
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent_requests) * len(providers),
+                                           thread_name_prefix="llm-hedge")
+
+    def hedge_delay(self, provider: LLMProvider, streaming: bool = False) -> float:
+        """Seconds to wait for `provider` before starting the next one"""
+        p95 = provider.stats.p95(streaming)
+        if p95 is None:
+            return RagConfig.LLM_HEDGE_DEFAULT_DELAY_MS / 1000
+        return max(RagConfig.LLM_HEDGE_MIN_DELAY_MS / 1000, p95)
+
+    def _call(self, provider: LLMProvider, prompt: str, timeout_ms: Optional[int]) -> str:
+        provider.stats.record("requests")
+        start = time.perf_counter()
+        try:
+            text = provider.generate(prompt, timeout_ms)
+        except Exception as e:
+            provider.stats.record_error(e)
+            raise
+        provider.stats.record_latency(latency=time.perf_counter() - start)
+        return text
+
+    def generate(self, prompt: str, timeout_ms: Optional[int] = None) -> Tuple[str, dict]:
+        """
+        Generate with hedging
+
+        Returns:
+            tuple of (response, info) with the winning provider and whether a hedge was sent
+
+        Raises:
+            the last provider error if every provider failed
+        """
+        start = time.perf_counter()
+        pending = {}
+        started = []
+        reasons = set()
+        last_error = None
+
+        def launch(index: int, reason: str = None):
+            provider = self.providers[index]
+            if reason:
+                provider.stats.record(f"{reason}_requests")
+                reasons.add(reason)
+            started.append(provider.name)
+            pending[self.executor.submit(self._call, provider, prompt, timeout_ms)] = index
+
+        launch(0)
+        next_index = 1
+        while pending:
+            delay = self.hedge_delay(self.providers[next_index - 1]) if next_index < len(self.providers) else None
+            done, _ = wait(list(pending), timeout=delay, return_when=FIRST_COMPLETED)
+
+            if not done:
+                print(f"LLM hedge: {self.providers[next_index - 1].name} slower than {delay:.1f}s, "
+                      f"starting {self.providers[next_index].name}")
+                launch(next_index, "hedged")
+                next_index += 1
+                continue
+
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if error is None:
+                    winner = self.providers[index]
+                    winner.stats.record("wins")
+                    for loser in pending:
+                        # Running calls cannot be interrupted; their results are discarded
+                        loser.cancel()
+                        self.providers[pending[loser]].stats.record("cancelled")
+                    return future.result(), {
+                        "provider": winner.name,
+                        "hedged": "hedged" in reasons,
+                        "fallback": "fallback" in reasons,
+                        "started": started,
+                        "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                    }
+                last_error = error
+                print(f"LLM provider {self.providers[index].name} failed: {error}")
+
+            if not pending and next_index < len(self.providers):
+                launch(next_index, "fallback")
+                next_index += 1
+
+        raise last_error
+
+    async def _acall(self, provider: LLMProvider, prompt: str, timeout_ms: Optional[int]) -> str:
+        provider.stats.record("requests")
+        start = time.perf_counter()
+        try:
+            text = await provider.agenerate(prompt, timeout_ms)
+        except Exception as e:
+            provider.stats.record_error(e)
+            raise
+        provider.stats.record_latency(latency=time.perf_counter() - start)
+        return text
+
+    async def agenerate(self, prompt: str, timeout_ms: Optional[int] = None) -> Tuple[str, dict]:
+        """
+        Async generate with hedging (same policy as generate).
+
+        Unlike the threaded version, the losing request is really cancelled, and so are
+        all provider calls when the caller itself is cancelled (e.g. client disconnected).
+
+        Returns:
+            tuple of (response, info) with the winning provider and whether a hedge was sent
+
+        Raises:
+            the last provider error if every provider failed
+        """
+        start = time.perf_counter()
+        pending = {}
+        started = []
+        reasons = set()
+        last_error = None
+
+        def launch(index: int, reason: str = None):
+            provider = self.providers[index]
+            if reason:
+                provider.stats.record(f"{reason}_requests")
+                reasons.add(reason)
+            started.append(provider.name)
+            pending[asyncio.create_task(self._acall(provider, prompt, timeout_ms))] = index
+
+        launch(0)
+        next_index = 1
+        try:
+            while pending:
+                delay = self.hedge_delay(self.providers[next_index - 1]) if next_index < len(self.providers) else None
+                done, _ = await asyncio.wait(list(pending), timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    print(f"LLM hedge: {self.providers[next_index - 1].name} slower than {delay:.1f}s, "
+                          f"starting {self.providers[next_index].name}")
+                    launch(next_index, "hedged")
+                    next_index += 1
+                    continue
+
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        winner = self.providers[index]
+                        winner.stats.record("wins")
+                        return task.result(), {
+                            "provider": winner.name,
+                            "hedged": "hedged" in reasons,
+                            "fallback": "fallback" in reasons,
+                            "started": started,
+                            "latency_ms": round((time.perf_counter() - start) * 1000, 1)
+                        }
+                    last_error = error
+                    print(f"LLM provider {self.providers[index].name} failed: {error}")
+
+                if not pending and next_index < len(self.providers):
+                    launch(next_index, "fallback")
+                    next_index += 1
+        finally:
+            for task, index in pending.items():
+                task.cancel()
+                self.providers[index].stats.record("cancelled")
+
+        raise last_error
+
+    def stream(self, prompt: str, timeout_ms: Optional[int] = None, info: Optional[dict] = None,
+               cancel: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Stream with hedging on time-to-first-chunk
+
+        Args:
+            prompt: Prompt text
+            timeout_ms: Per-provider timeout
+            info: Optional dict filled with the winning provider once known
+            cancel: Event set by another thread (client disconnected): the stream ends without
+                an error right away; the providers stop at their next chunk (or timeout) on their
+                own threads, so an abandoned stream never delays other requests
+
+        Yields:
+            Text deltas from the winning provider
+        """
+        events = queue.Queue()
+        cancelled = [threading.Event() for _ in self.providers]
+        started = []
+        reasons = set()
+        start = time.perf_counter()
+        hedge = {}  # "at" / "delay" of the next hedge, set when a provider is launched
+
+        def worker(index: int):
+            provider = self.providers[index]
+            provider.stats.record("requests")
+            provider_start = time.perf_counter()
+            first = True
+            try:
+                for chunk in provider.stream(prompt, timeout_ms):
+                    if cancelled[index].is_set() or (cancel is not None and cancel.is_set()):
+                        provider.stats.record("cancelled")
+                        return
+                    if first:
+                        provider.stats.record_latency(first_token=time.perf_counter() - provider_start)
+                        first = False
+                    events.put((index, "chunk", chunk))
+                provider.stats.record_latency(latency=time.perf_counter() - provider_start)
+                events.put((index, "end", None))
+            except Exception as e:
+                provider.stats.record_error(e)
+                events.put((index, "error", e))
+
+        def launch(index: int, reason: str = None):
+            if reason:
+                self.providers[index].stats.record(f"{reason}_requests")
+                reasons.add(reason)
+            started.append(index)
+            # Own thread, not the hedge pool: a provider stream can't be interrupted while it
+            # waits for its next chunk, so an abandoned one must not hold a shared thread
+            threading.Thread(target=worker, args=(index,), daemon=True,
+                             name=f"llm-stream-{self.providers[index].name}").start()
+            hedge["delay"] = self.hedge_delay(self.providers[index], streaming=True)
+            hedge["at"] = time.perf_counter() + hedge["delay"]
+
+        launch(0)
+        winner = None
+        running = 1
+        last_error = None
+        try:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    print("LLM stream cancelled (client disconnected)")
+                    return
+                can_hedge = winner is None and len(started) < len(self.providers)
+                timeout = max(0.0, hedge["at"] - time.perf_counter()) if can_hedge else None
+                if cancel is not None:
+                    timeout = RagConfig.LLM_CANCEL_POLL_SECONDS if timeout is None else min(timeout, RagConfig.LLM_CANCEL_POLL_SECONDS)
+                try:
+                    index, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    if can_hedge and time.perf_counter() >= hedge["at"]:
+                        print(f"LLM hedge: no first chunk from {self.providers[started[-1]].name} "
+                              f"after {hedge['delay']:.1f}s, starting {self.providers[len(started)].name}")
+                        launch(len(started), "hedged")
+                        running += 1
+                    continue
+
+                if winner is not None and index != winner:
+                    continue
+                if kind == "chunk":
+                    if winner is None:
+                        winner = index
+                        self.providers[index].stats.record("wins")
+                        for other in started:
+                            if other != index:
+                                cancelled[other].set()
+                        if info is not None:
+                            info.update({
+                                "provider": self.providers[index].name,
+                                "hedged": "hedged" in reasons,
+                                "fallback": "fallback" in reasons,
+                                "started": [self.providers[i].name for i in started],
+                                "first_chunk_ms": round((time.perf_counter() - start) * 1000, 1)
+                            })
+                    yield payload
+                elif kind == "end":
+                    if winner is None:
+                        winner = index  # empty response
+                    return
+                else:
+                    running -= 1
+                    last_error = payload
+                    print(f"LLM provider {self.providers[index].name} failed: {payload}")
+                    if winner is not None:
+                        raise payload
+                    if running == 0:
+                        if len(started) < len(self.providers):
+                            launch(len(started), "fallback")
+                            running += 1
+                        else:
+                            raise last_error
+        finally:
+            for event in cancelled:
+                event.set()
+
+    def get_stats(self) -> dict:
+        """Per-provider latency / error statistics and current hedge delays"""
+        return {
+            provider.name: {
+                **provider.stats.get_stats(),
+                "hedge_delay_ms": round(self.hedge_delay(provider) * 1000, 1)
+            }
+            for provider in self.providers
+        }
@@ -0,0 +1,295 @@
+import asyncio
+import itertools
+import re
+import threading
+import time
+from typing import Optional, Tuple
+from config.rag_config import RagConfig
+
+
+class LLMQueueFullError(Exception):
+    """Raised when the admission queue is at LLM_QUEUE_MAX_SIZE"""
+
+
+class LLMQueueTimeoutError(Exception):
+    """Raised when a request was not admitted before its timeout"""
+
+
+class LLMQueueCancelledError(Exception):
+    """Raised when a waiting request was cancelled (client disconnected)"""
+
+
+class LLMTicket:
+    """A request waiting for (or holding) an LLM admission slot"""
+
+    def __init__(self, seq: int, user_id: str, priority: int, tag: int):
+        self.seq = seq
+        self.user_id = user_id
+        self.priority = priority
+        self.tag = tag                # Fair-queuing start tag within the priority level
+        self.enqueued_at = time.monotonic()
+        self.admitted_at = None
+        self.position = None          # Position when enqueued (0 = next)
+        self.estimated_wait = None    # Seconds, estimated when enqueued
+
+    def get_info(self) -> dict:
+        """Queue position / estimated wait at enqueue time and the actual wait"""
+        waited = (self.admitted_at or time.monotonic()) - self.enqueued_at
+        return {
+            "queue_position": self.position,
+            "estimated_wait_seconds": round(self.estimated_wait, 2) if self.estimated_wait is not None else None,
+            "waited_seconds": round(waited, 2),
+            "priority": self.priority
+        }
+
+
+class LLMAdmissionScheduler:
+    """
+    Token-bucket admission control in front of the rate-limited LLM.
+
+    Requests wait in a bounded queue ordered by priority (lower = sooner) and, within a
+    priority, by start-time fair queuing across users: each user's n-th waiting request
+    is served in the n-th round, so one user's burst cannot starve the others.
+    The bucket refills at LLM_REQUESTS_PER_MINUTE and adapts to rate-limit feedback:
+    on a 429 it pauses for Retry-After (or LLM_DELAY_BETWEEN_REQUESTS) and halves the
+    refill rate, then recovers gradually on successes.
+    """
+
+    def __init__(self, requests_per_minute: float = RagConfig.LLM_REQUESTS_PER_MINUTE,
+                 capacity: float = RagConfig.LLM_BUCKET_CAPACITY,
+                 max_queue_size: int = RagConfig.LLM_QUEUE_MAX_SIZE):
+        """
+        Initialize scheduler
+
+        Args:
+            requests_per_minute: Configured refill rate (upper bound for the adaptive rate)
+            capacity: Bucket size (maximum burst)
+            max_queue_size: Maximum number of waiting requests
+        """
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = self.max_rate / 8
+        self.rate = self.max_rate
+        self.capacity = capacity
+        self.max_queue_size = max_queue_size
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._last_refill = time.monotonic()
+        self._waiting = []
+        self._virtual_time = {}  # priority -> start tag of the last admitted request
+        self._last_tag = {}      # (priority, user_id) -> start tag of the user's newest request
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.stats = {"admitted": 0, "rejected_full": 0, "timeouts": 0, "rate_limited": 0, "successes": 0}
+
+    # ---- bucket ----
+
+    def _refill_locked(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _seconds_until_token_locked(self, now: float) -> float:
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    # ---- queue ----
+
+    def _ordered_locked(self):
+        """Service order: priority, then fair-queuing round, then arrival"""
+        return sorted(self._waiting, key=lambda t: (t.priority, t.tag, t.seq))
+
+    def enqueue(self, user_id: Optional[str] = None, priority: int = RagConfig.LLM_DEFAULT_PRIORITY) -> LLMTicket:
+        """
+        Add a request to the admission queue
+
+        Args:
+            user_id: Fairness key (user id, session or client address)
+            priority: Lower value is served first
+
+        Returns:
+            LLMTicket with queue position and estimated wait
+
+        Raises:
+            LLMQueueFullError: queue is full
+        """
+        with self._cond:
+            if len(self._waiting) >= self.max_queue_size:
+                self.stats["rejected_full"] += 1
+                raise LLMQueueFullError(f"LLM queue is full ({self.max_queue_size} waiting)")
+
+            user_id = user_id or "anonymous"
+            previous = self._last_tag.get((priority, user_id))
+            tag = self._virtual_time.get(priority, 0) if previous is None else \
+                max(self._virtual_time.get(priority, 0), previous + 1)
+            ticket = LLMTicket(next(self._seq), user_id, priority, tag)
+            self._last_tag[(priority, user_id)] = tag
+            self._waiting.append(ticket)
+
+            now = time.monotonic()
+            self._refill_locked(now)
+            ticket.position = self._ordered_locked().index(ticket)
+            ticket.estimated_wait = self._seconds_until_token_locked(now) + ticket.position / self.rate
+            return ticket
+
+    def _remove_locked(self, ticket: LLMTicket):
+        self._waiting.remove(ticket)
+        if not any(t.user_id == ticket.user_id and t.priority == ticket.priority for t in self._waiting):
+            self._last_tag.pop((ticket.priority, ticket.user_id), None)
+        self._cond.notify_all()
+
+    def _try_admit_locked(self, ticket: LLMTicket, now: float) -> Tuple[bool, Optional[float]]:
+        """
+        Admit the ticket if it is at the head of the queue and a token is available
+
+        Returns:
+            (admitted, seconds until a token is available; None when the ticket is not at the head)
+        """
+        self._refill_locked(now)
+        order = self._ordered_locked()
+        if not order or order[0] is not ticket:
+            return False, None
+        wait = self._seconds_until_token_locked(now)
+        if wait > 0:
+            return False, wait
+        self.tokens -= 1
+        self._virtual_time[ticket.priority] = ticket.tag
+        ticket.admitted_at = now
+        self.stats["admitted"] += 1
+        self._remove_locked(ticket)
+        return True, 0.0
+
+    def _timeout_locked(self, ticket: LLMTicket, timeout: float):
+        self.stats["timeouts"] += 1
+        self._remove_locked(ticket)
+        raise LLMQueueTimeoutError(f"Not admitted to the LLM within {timeout}s")
+
+    def wait(self, ticket: LLMTicket, timeout: Optional[float] = RagConfig.LLM_QUEUE_TIMEOUT_SECONDS,
+             cancel: Optional[threading.Event] = None) -> LLMTicket:
+        """
+        Block until the ticket is at the head of the queue and a token is available
+
+        Args:
+            ticket: Ticket from enqueue()
+            timeout: Seconds to wait at most (None = no limit)
+            cancel: Event set by another thread when the request is abandoned (checked every
+                LLM_CANCEL_POLL_SECONDS), so a disconnected client doesn't use up a token
+
+        Raises:
+            LLMQueueTimeoutError: not admitted within timeout (the ticket is removed)
+            LLMQueueCancelledError: cancel was set before admission (the ticket is removed)
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if cancel is not None and cancel.is_set():
+                    self._remove_locked(ticket)
+                    raise LLMQueueCancelledError("Request cancelled while waiting for the LLM")
+                now = time.monotonic()
+                admitted, wait = self._try_admit_locked(ticket, now)
+                if admitted:
+                    return ticket
+                # wait is None: woken up when the queue changes
+
+                if give_up_at is not None:
+                    remaining = give_up_at - now
+                    if remaining <= 0:
+                        self._timeout_locked(ticket, timeout)
+                    wait = remaining if wait is None else min(wait, remaining)
+                if cancel is not None:
+                    wait = RagConfig.LLM_CANCEL_POLL_SECONDS if wait is None else min(wait, RagConfig.LLM_CANCEL_POLL_SECONDS)
+                self._cond.wait(wait)
+
+    async def await_admission(self, ticket: LLMTicket,
+                              timeout: Optional[float] = RagConfig.LLM_QUEUE_TIMEOUT_SECONDS) -> LLMTicket:
+        """
+        Async version of wait: sleeps on the event loop instead of blocking a thread.
+        The queue is re-checked every LLM_ADMISSION_POLL_SECONDS, or when the head's token is due.
+        A cancelled caller (client disconnected) leaves the queue.
+
+        Raises:
+            LLMQueueTimeoutError: not admitted within timeout (the ticket is removed)
+        """
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    admitted, wait = self._try_admit_locked(ticket, now)
+                    if admitted:
+                        return ticket
+                    wait = RagConfig.LLM_ADMISSION_POLL_SECONDS if wait is None else wait
+                    if give_up_at is not None:
+                        remaining = give_up_at - now
+                        if remaining <= 0:
+                            self._timeout_locked(ticket, timeout)
+                        wait = min(wait, remaining)
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.cancel(ticket)
+            raise
+
+    def cancel(self, ticket: LLMTicket):
+        """Remove a ticket that is no longer needed (e.g. client disconnected)"""
+        with self._cond:
+            if ticket in self._waiting:
+                self._remove_locked(ticket)
+
+    # ---- feedback from the LLM client ----
+
+    def record_success(self):
+        """Additive recovery of the refill rate after a successful call"""
+        with self._cond:
+            self.stats["successes"] += 1
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.1)
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """Pause admissions and halve the refill rate after a 429"""
+        with self._cond:
+            now = time.monotonic()
+            self.stats["rate_limited"] += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.paused_until = max(self.paused_until, now + (retry_after or RagConfig.LLM_DELAY_BETWEEN_REQUESTS))
+            self.tokens = 0
+            self._last_refill = now
+            print(f"LLM rate limited: pausing {self.paused_until - now:.1f}s, rate now {self.rate * 60:.1f}/min")
+            self._cond.notify_all()
+
+    @staticmethod
+    def rate_limit_delay(error: Exception) -> Optional[float]:
+        """
+        If `error` is a rate-limit (429 / RESOURCE_EXHAUSTED) error, return its retry delay
+        in seconds (0.0 when the API gave none); otherwise None
+        """
+        code = getattr(error, "code", None) or getattr(error, "status_code", None)
+        message = str(error)
+        if code != 429 and "RESOURCE_EXHAUSTED" not in message:
+            return None
+
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after = headers.get("retry-after") if hasattr(headers, "get") else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
+        # google.rpc.RetryInfo in the error details, e.g. 'retryDelay': '7s'
+        match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", message)
+        return float(match.group(1)) if match else 0.0
+
+    def get_stats(self) -> dict:
+        """Get queue length, current rate and counters"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill_locked(now)
+            return {
+                **self.stats,
+                "queued": len(self._waiting),
+                "max_queue_size": self.max_queue_size,
+                "rate_per_minute": round(self.rate * 60, 2),
+                "configured_rate_per_minute": round(self.max_rate * 60, 2),
+                "tokens": round(self.tokens, 2),
+                "paused_seconds": round(max(0.0, self.paused_until - now), 2)
+            }
@@ -0,0 +1,273 @@
+import json
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.rag_config import RagConfig
+
+
+class PartitionRouter:
+    """
+    Two-level router over the species x field structure of the knowledge base.
+
+    At ingest, per-species and per-(species, field) centroid embeddings are accumulated
+    (as running sums so they can be updated incrementally). At query time the query is
+    routed to its closest species, then to the closest (species, field) partitions of
+    those species; the vector store then only searches inside those partitions.
+    When species routing is not confident the router returns None (global search).
+
+    The centroids are saved to a local file, and also next to the collection when the vector
+    store can hold them (Qdrant sidecar collection): the collection is shared by every API host,
+    a file written by the ingest host is not.
+    """
+
+    SEPARATOR = "::"
+
+    def __init__(self, index_path: str = None, store=None):
+        """
+        Initialize partition router
+
+        Args:
+            index_path: File prefix for the centroid index (default from RagConfig.PARTITION_INDEX_PATH)
+            store: Vector store with save_partition_index / load_partition_index (None = file only)
+        """
+        self.index_path = index_path or RagConfig.PARTITION_INDEX_PATH
+        self.store = store if hasattr(store, "save_partition_index") else None
+        self.dimension = RagConfig.VECTOR_DIMENSION
+        self.species_sums: Dict[str, np.ndarray] = {}
+        self.species_counts: Dict[str, int] = {}
+        self.partition_sums: Dict[str, np.ndarray] = {}
+        self.partition_counts: Dict[str, int] = {}
+        self._species_names: List[str] = []
+        self._species_centroids = None
+        self._partition_names: List[str] = []
+        self._partition_centroids = None
+
+    @classmethod
+    def partition_key(cls, species: str, field: str) -> str:
+        """Partition id stored in each chunk's metadata"""
+        return f"{species}{cls.SEPARATOR}{field}"
+
+    @classmethod
+    def species_of(cls, partition: str) -> str:
+        return partition.split(cls.SEPARATOR, 1)[0]
+
+    @classmethod
+    def field_of(cls, partition: str) -> str:
+        return partition.split(cls.SEPARATOR, 1)[-1]
+
+    def matching_partitions(self, species: List[str] = None, fields: List[str] = None) -> Optional[List[str]]:
+        """
+        Known partitions of the given species and fields (case-insensitive)
+
+        Args:
+            species: Species names to keep (None/empty = any species)
+            fields: Field names to keep (None/empty = any field)
+
+        Returns:
+            Sorted partition ids, or None when no partition index is loaded
+        """
+        if not self.partition_counts:
+            return None
+        species = {name.lower() for name in species or []}
+        fields = {name.lower() for name in fields or []}
+        return sorted(
+            partition for partition in self.partition_counts
+            if (not species or self.species_of(partition).lower() in species)
+            and (not fields or self.field_of(partition).lower() in fields)
+        )
+
+    @property
+    def is_ready(self) -> bool:
+        """True if centroids are available for routing"""
+        return self._species_centroids is not None and len(self._species_names) > 0
+
+    def _update(self, embeddings: np.ndarray, metadata: List[dict], sign: float):
+        embeddings = np.asarray(embeddings, dtype="float32")
+        for embedding, meta in zip(embeddings, metadata):
+            species, partition = meta.get("species"), meta.get("partition")
+            if not species or not partition:
+                continue
+            for sums, counts, key in ((self.species_sums, self.species_counts, species),
+                                      (self.partition_sums, self.partition_counts, partition)):
+                if key not in sums:
+                    sums[key] = np.zeros(self.dimension, dtype="float64")
+                    counts[key] = 0
+                sums[key] += sign * embedding
+                counts[key] += int(sign)
+                if counts[key] <= 0:
+                    del sums[key]
+                    del counts[key]
+        self._compute_centroids()
+
+    def add(self, embeddings: np.ndarray, metadata: List[dict]):
+        """
+        Add chunk embeddings to the species/partition centroids
+
+        Args:
+            embeddings: chunk embeddings (normalized)
+            metadata: per-chunk metadata with "species" and "partition" keys
+        """
+        self._update(embeddings, metadata, 1.0)
+
+    def remove(self, embeddings: np.ndarray, metadata: List[dict]):
+        """Remove chunk embeddings previously added (used by delta re-ingestion)"""
+        self._update(embeddings, metadata, -1.0)
+
+    def rebuild(self, batches: Iterable[Tuple[np.ndarray, List[dict]]]):
+        """
+        Recompute every centroid from scratch
+
+        Args:
+            batches: (embeddings, metadata) batches covering all indexed chunks, e.g. the
+                vector store's iter_embeddings()
+        """
+        self.species_sums, self.species_counts, self.partition_sums, self.partition_counts = {}, {}, {}, {}
+        for embeddings, metadata in batches:
+            self._update(embeddings, metadata, 1.0)
+        self._compute_centroids()
+
+    @staticmethod
+    def _normalized_centroids(sums: Dict[str, np.ndarray]):
+        names = sorted(sums)
+        if not names:
+            return names, None
+        matrix = np.stack([sums[name] for name in names]).astype("float32")
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return names, matrix / norms
+
+    def _compute_centroids(self):
+        self._species_names, self._species_centroids = self._normalized_centroids(self.species_sums)
+        self._partition_names, self._partition_centroids = self._normalized_centroids(self.partition_sums)
+
+    def route(self, query_embedding: np.ndarray, k: int) -> dict:
+        """
+        Route a query to its top partitions
+
+        Args:
+            query_embedding: query embedding vector
+            k: number of results the second stage needs (partitions are added until they hold >= k chunks)
+
+        Returns:
+            dict with "partitions" (None = global search), "species", "confidence" and "reason"
+        """
+        if not self.is_ready:
+            return {"partitions": None, "species": [], "confidence": 0.0, "reason": "no_centroids"}
+
+        query = np.asarray(query_embedding, dtype="float32").reshape(-1)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        # Stage 1a: species
+        species_scores = self._species_centroids @ query
+        order = np.argsort(-species_scores)
+        top_n = min(RagConfig.PARTITION_TOP_SPECIES, len(order))
+        selected = order[:top_n]
+        top_score = float(species_scores[order[0]])
+        margin = float(top_score - species_scores[order[top_n]]) if top_n < len(order) else 1.0
+        species = [self._species_names[i] for i in selected]
+
+        if top_score < RagConfig.PARTITION_MIN_SIMILARITY or margin < RagConfig.PARTITION_MIN_MARGIN:
+            return {"partitions": None, "species": species, "confidence": round(margin, 4), "reason": "low_confidence"}
+
+        # Stage 1b: fields of the selected species
+        species_set = set(species)
+        candidates = [i for i, name in enumerate(self._partition_names) if self.species_of(name) in species_set]
+        partition_scores = self._partition_centroids[candidates] @ query
+        ranked = [candidates[i] for i in np.argsort(-partition_scores)]
+
+        partitions, covered = [], 0
+        for i in ranked:
+            name = self._partition_names[i]
+            partitions.append(name)
+            covered += self.partition_counts.get(name, 0)
+            if len(partitions) >= RagConfig.PARTITION_TOP_PARTITIONS and covered >= k:
+                break
+
+        if covered < k:
+            return {"partitions": None, "species": species, "confidence": round(margin, 4), "reason": "too_few_chunks"}
+
+        return {"partitions": partitions, "species": species, "confidence": round(margin, 4), "reason": "routed"}
+
+    def _entries(self) -> List[tuple]:
+        """(kind, name, embedding sum, chunk count) for every species and partition"""
+        entries = [("species", name, self.species_sums[name], self.species_counts[name]) for name in sorted(self.species_sums)]
+        entries += [("partition", name, self.partition_sums[name], self.partition_counts[name]) for name in sorted(self.partition_sums)]
+        return entries
+
+    def _set_entries(self, entries: List[tuple]):
+        self.species_sums, self.species_counts, self.partition_sums, self.partition_counts = {}, {}, {}, {}
+        for kind, name, total, count in entries:
+            sums, counts = (self.species_sums, self.species_counts) if kind == "species" else (self.partition_sums, self.partition_counts)
+            sums[name] = np.asarray(total, dtype="float64")
+            counts[name] = int(count)
+        self._compute_centroids()
+
+    def save(self, index_path: str = None):
+        """Save centroid sums and counts to disk, and next to the collection if the store supports it"""
+        index_path = index_path or self.index_path
+        species = sorted(self.species_sums)
+        partitions = sorted(self.partition_sums)
+
+        np.savez(
+            f"{index_path}.npz",
+            species_sums=np.stack([self.species_sums[s] for s in species]) if species else np.zeros((0, self.dimension)),
+            partition_sums=np.stack([self.partition_sums[p] for p in partitions]) if partitions else np.zeros((0, self.dimension))
+        )
+        with open(f"{index_path}.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "species": species,
+                "species_counts": [self.species_counts[s] for s in species],
+                "partitions": partitions,
+                "partition_counts": [self.partition_counts[p] for p in partitions]
+            }, f, ensure_ascii=False)
+
+        # Not caught: API hosts would keep routing with the previous centroids
+        if self.store is not None:
+            self.store.save_partition_index(self._entries())
+
+        print(f"Partition index saved to {index_path} ({len(species)} species, {len(partitions)} partitions)")
+
+    def load(self, index_path: str = None) -> bool:
+        """
+        Load centroid sums and counts, from the store when it holds them, else from disk
+
+        Returns:
+            True if the partition index was found
+        """
+        if self.store is not None:
+            try:
+                entries = self.store.load_partition_index()
+            except Exception as e:
+                print(f"Warning: Could not load the partition index from the vector store ({e}), trying {index_path or self.index_path}")
+                entries = None
+            if entries:
+                self._set_entries(entries)
+                print(f"Partition index loaded from the vector store: {len(self.species_sums)} species, {len(self.partition_sums)} partitions")
+                return True
+
+        index_path = index_path or self.index_path
+        try:
+            arrays = np.load(f"{index_path}.npz")
+            with open(f"{index_path}.json", "r", encoding="utf-8") as f:
+                names = json.load(f)
+        except FileNotFoundError:
+            print(f"Partition index not found at {index_path}, using global search")
+            return False
+
+        self._set_entries(
+            [("species", name, total, count) for name, total, count in
+             zip(names["species"], arrays["species_sums"], names["species_counts"])] +
+            [("partition", name, total, count) for name, total, count in
+             zip(names["partitions"], arrays["partition_sums"], names["partition_counts"])]
+        )
+
+        print(f"Partition index loaded: {len(self.species_sums)} species, {len(self.partition_sums)} partitions")
+        return True
+
+    def get_stats(self) -> dict:
+        """Get statistics about the partition index"""
+        return {
+            "ready": self.is_ready,
+            "species": len(self.species_sums),
+            "partitions": len(self.partition_sums),
+            "chunks": sum(self.partition_counts.values())
+        }
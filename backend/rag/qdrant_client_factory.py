@@ -0,0 +1,129 @@
+import threading
+from typing import Optional
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from config.rag_config import RagConfig
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+
+def create_qdrant_client() -> QdrantClient:
+    """
+    Create a Qdrant client for the configured deployment mode
+
+    Modes (RagConfig.QDRANT_MODE):
+        cloud  -> Qdrant Cloud over HTTPS (url + api_key)
+        server -> self-hosted Qdrant, gRPC preferred (QDRANT_PREFER_GRPC)
+        local  -> embedded on-disk storage in this process (QDRANT_LOCAL_PATH), no server needed
+
+    Returns:
+        QdrantClient instance
+    """
+    mode = RagConfig.QDRANT_MODE
+
+    if mode == "local":
+        print(f"Opening embedded Qdrant storage at {RagConfig.QDRANT_LOCAL_PATH}...")
+        return QdrantClient(path=RagConfig.QDRANT_LOCAL_PATH)
+
+    if mode == "server":
+        print(f"Connecting to self-hosted Qdrant at {RagConfig.QDRANT_URL} (gRPC: {RagConfig.QDRANT_PREFER_GRPC})...")
+        return QdrantClient(
+            url=RagConfig.QDRANT_URL,
+            api_key=RagConfig.QDRANT_API_KEY,
+            prefer_grpc=RagConfig.QDRANT_PREFER_GRPC,
+            grpc_port=RagConfig.QDRANT_GRPC_PORT,
+            timeout=RagConfig.QDRANT_TIMEOUT
+        )
+
+    if mode == "cloud":
+        print(f"Connecting to Qdrant at {RagConfig.QDRANT_URL}...")
+        return QdrantClient(
+            url=RagConfig.QDRANT_URL,
+            api_key=RagConfig.QDRANT_API_KEY,
+            timeout=RagConfig.QDRANT_TIMEOUT
+        )
+
+    raise ValueError(f"Unknown QDRANT_MODE '{mode}' (expected 'cloud', 'server' or 'local')")
+
+
+def get_qdrant_client() -> QdrantClient:
+    """
+    Get the process-wide Qdrant client, creating it on first use.
+    Embedded storage can only be opened by one client per path, and a shared
+    client also shares its connection pool, so every component should use this.
+
+    Returns:
+        Shared QdrantClient instance
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_qdrant_client()
+    return _client
+
+
+def create_async_qdrant_client() -> Optional[AsyncQdrantClient]:
+    """
+    Create an asyncio Qdrant client for the configured deployment mode
+
+    Returns:
+        AsyncQdrantClient instance, or None in "local" mode (the embedded storage is
+        already opened by the sync client and cannot be opened twice)
+    """
+    mode = RagConfig.QDRANT_MODE
+
+    if mode == "local":
+        return None
+
+    if mode == "server":
+        return AsyncQdrantClient(
+            url=RagConfig.QDRANT_URL,
+            api_key=RagConfig.QDRANT_API_KEY,
+            prefer_grpc=RagConfig.QDRANT_PREFER_GRPC,
+            grpc_port=RagConfig.QDRANT_GRPC_PORT,
+            timeout=RagConfig.QDRANT_TIMEOUT
+        )
+
+    if mode == "cloud":
+        return AsyncQdrantClient(
+            url=RagConfig.QDRANT_URL,
+            api_key=RagConfig.QDRANT_API_KEY,
+            timeout=RagConfig.QDRANT_TIMEOUT
+        )
+
+    raise ValueError(f"Unknown QDRANT_MODE '{mode}' (expected 'cloud', 'server' or 'local')")
+
+
+def get_async_qdrant_client() -> Optional[AsyncQdrantClient]:
+    """
+    Get the process-wide asyncio Qdrant client, creating it on first use.
+    Must first be called from inside the serving event loop (gRPC channels bind to it).
+
+    Returns:
+        Shared AsyncQdrantClient instance, or None in "local" mode
+    """
+    global _async_client
+    if _async_client is None and RagConfig.QDRANT_MODE != "local":
+        with _client_lock:
+            if _async_client is None:
+                _async_client = create_async_qdrant_client()
+    return _async_client
+
+
+async def close_async_qdrant_client():
+    """Close the shared asyncio client"""
+    global _async_client
+    client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
+
+
+def close_qdrant_client():
+    """Close the shared client (releases the embedded storage lock in local mode)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
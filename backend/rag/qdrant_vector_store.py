@@ -1,8 +1,16 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.models import (
+    Distance, VectorParams, VectorParamsDiff, PointStruct, PointIdsList, Filter, FieldCondition, MatchValue, MatchAny,
+    PayloadSchemaType,
+    HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    QuantizationSearchParams, SearchParams, Disabled
+)
 import numpy as np
-from typing import List, Tuple, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 from config.rag_config import RagConfig
+from rag.qdrant_client_factory import get_qdrant_client, get_async_qdrant_client
+from rag.vector_mirror import LocalVectorMirror
+from rag.circuit_breaker import CircuitBreaker
+import asyncio
 import uuid
 import time
 
@@ -15,6 +23,14 @@ class QdrantVectorStore:
         self.collection_name = RagConfig.QDRANT_COLLECTION_NAME
         self.client = None
         self.texts = []  # Local cache for texts (optional, for compatibility)
+        self.mirror = None
+        # Embedded mode always does exact search, HNSW/quantization params don't apply
+        self.search_params = self.build_search_params() if RagConfig.QDRANT_MODE != "local" else None
+        self.breaker = CircuitBreaker(
+            "qdrant",
+            failure_threshold=RagConfig.QDRANT_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=RagConfig.QDRANT_BREAKER_RESET_TIMEOUT
+        )
         
         # Initialize Qdrant client
         self._initialize_client()
@@ -22,26 +38,33 @@ class QdrantVectorStore:
     def _initialize_client(self):
         """Initialize Qdrant client and create collection if needed"""
         try:
-            print(f"Connecting to Qdrant at {RagConfig.QDRANT_URL}...")
-            self.client = QdrantClient(
-                url=RagConfig.QDRANT_URL,
-                api_key=RagConfig.QDRANT_API_KEY,
-                timeout=300  # 5 minutes timeout for large uploads
-            )
+            # Shared client: one connection pool (or embedded storage) per process
+            self.client = get_qdrant_client()
+            
+            # Embedded mode already searches in-process, a mirror would only duplicate it
+            if RagConfig.USE_QDRANT_MIRROR and RagConfig.QDRANT_MODE != "local":
+                self.mirror = LocalVectorMirror(self.client, self.collection_name, self.dimension)
             
             # Check if collection exists, create if not
-            collections = self.client.get_collections().collections
+            try:
+                collections = self.client.get_collections().collections
+            except Exception as e:
+                # Remote unreachable: keep serving from the local mirror if we have one
+                if self.mirror is not None and self.mirror.load():
+                    self.breaker.record_failure()
+                    print(f"⚠️  Qdrant unreachable ({e}), serving from local mirror")
+                    return
+                raise
+            
             collection_names = [c.name for c in collections]
             
             if self.collection_name not in collection_names:
                 print(f"Creating collection '{self.collection_name}'...")
                 self.client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.dimension,
-                        distance=Distance.COSINE
-                    )
+                    **self.build_collection_config(self.dimension)
                 )
+                self._create_payload_indexes()
                 print(f"✓ Collection '{self.collection_name}' created successfully!")
             else:
                 print(f"✓ Using existing collection '{self.collection_name}'")
@@ -50,6 +73,153 @@ class QdrantVectorStore:
             print(f"Error initializing Qdrant client: {e}")
             raise
     
+    @staticmethod
+    def build_collection_config(
+        dimension: int,
+        hnsw_m: int = None,
+        hnsw_ef_construct: int = None,
+        use_quantization: bool = None,
+        on_disk: bool = None
+    ) -> dict:
+        """
+        Build create_collection kwargs (vectors, HNSW, quantization) from RagConfig
+        
+        Args:
+            dimension: vector dimension
+            hnsw_m: override for RagConfig.QDRANT_HNSW_M
+            hnsw_ef_construct: override for RagConfig.QDRANT_HNSW_EF_CONSTRUCT
+            use_quantization: override for RagConfig.QDRANT_USE_QUANTIZATION
+            on_disk: override for RagConfig.QDRANT_ON_DISK_VECTORS
+            
+        Returns:
+            dict of keyword arguments for QdrantClient.create_collection
+        """
+        hnsw_m = RagConfig.QDRANT_HNSW_M if hnsw_m is None else hnsw_m
+        hnsw_ef_construct = RagConfig.QDRANT_HNSW_EF_CONSTRUCT if hnsw_ef_construct is None else hnsw_ef_construct
+        use_quantization = RagConfig.QDRANT_USE_QUANTIZATION if use_quantization is None else use_quantization
+        on_disk = RagConfig.QDRANT_ON_DISK_VECTORS if on_disk is None else on_disk
+        
+        config = {
+            "vectors_config": VectorParams(
+                size=dimension,
+                distance=Distance.COSINE,
+                on_disk=on_disk
+            ),
+            "hnsw_config": HnswConfigDiff(
+                m=hnsw_m,
+                ef_construct=hnsw_ef_construct
+            )
+        }
+        
+        if use_quantization:
+            config["quantization_config"] = ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=RagConfig.QDRANT_QUANTIZATION_QUANTILE,
+                    always_ram=RagConfig.QDRANT_QUANTIZATION_ALWAYS_RAM
+                )
+            )
+        
+        return config
+    
+    @staticmethod
+    def build_search_params(
+        hnsw_ef: int = None,
+        use_quantization: bool = None,
+        rescore: bool = None,
+        oversampling: float = None
+    ) -> SearchParams:
+        """
+        Build query-time search params (hnsw_ef, quantization rescoring) from RagConfig
+        
+        Args:
+            hnsw_ef: override for RagConfig.QDRANT_SEARCH_HNSW_EF
+            use_quantization: override for RagConfig.QDRANT_USE_QUANTIZATION
+            rescore: override for RagConfig.QDRANT_SEARCH_RESCORE
+            oversampling: override for RagConfig.QDRANT_SEARCH_OVERSAMPLING
+            
+        Returns:
+            SearchParams for QdrantClient.query_points
+        """
+        hnsw_ef = RagConfig.QDRANT_SEARCH_HNSW_EF if hnsw_ef is None else hnsw_ef
+        use_quantization = RagConfig.QDRANT_USE_QUANTIZATION if use_quantization is None else use_quantization
+        rescore = RagConfig.QDRANT_SEARCH_RESCORE if rescore is None else rescore
+        oversampling = RagConfig.QDRANT_SEARCH_OVERSAMPLING if oversampling is None else oversampling
+        
+        quantization = None
+        if use_quantization:
+            quantization = QuantizationSearchParams(
+                ignore=False,
+                rescore=rescore,
+                oversampling=oversampling
+            )
+        
+        return SearchParams(hnsw_ef=hnsw_ef, exact=False, quantization=quantization)
+    
+    def _create_payload_indexes(self):
+        """Index the payload keys used to filter partitioned searches"""
+        if RagConfig.QDRANT_MODE == "local":
+            return
+        for field_name in ("partition", "species", "field"):
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD
+            )
+    
+    def apply_collection_config(self) -> dict:
+        """
+        Migrate an existing collection to the HNSW/quantization/on-disk settings in RagConfig.
+        Qdrant rebuilds the index in the background; points are kept.
+        
+        Returns:
+            dict with the collection config before and after the update
+        """
+        try:
+            before = self._describe_collection_config()
+            
+            quantization_config = Disabled.DISABLED
+            if RagConfig.QDRANT_USE_QUANTIZATION:
+                quantization_config = self.build_collection_config(self.dimension)["quantization_config"]
+            
+            print(f"Updating collection '{self.collection_name}' configuration...")
+            self.client.update_collection(
+                collection_name=self.collection_name,
+                vectors_config={"": VectorParamsDiff(on_disk=RagConfig.QDRANT_ON_DISK_VECTORS)},
+                hnsw_config=HnswConfigDiff(
+                    m=RagConfig.QDRANT_HNSW_M,
+                    ef_construct=RagConfig.QDRANT_HNSW_EF_CONSTRUCT
+                ),
+                quantization_config=quantization_config
+            )
+            
+            self._create_payload_indexes()
+            
+            after = self._describe_collection_config()
+            print(f"✓ Collection '{self.collection_name}' updated (optimizer will rebuild segments in background)")
+            
+            return {"before": before, "after": after}
+            
+        except Exception as e:
+            print(f"Error updating collection config: {e}")
+            raise
+    
+    def _describe_collection_config(self) -> dict:
+        """Summarize the current vectors/HNSW/quantization config of the collection"""
+        info = self.client.get_collection(collection_name=self.collection_name)
+        params = info.config.params
+        vectors = params.vectors
+        quantization = info.config.quantization_config
+        
+        return {
+            "status": str(info.status),
+            "points_count": info.points_count,
+            "on_disk": getattr(vectors, "on_disk", None),
+            "hnsw_m": info.config.hnsw_config.m,
+            "hnsw_ef_construct": info.config.hnsw_config.ef_construct,
+            "quantization": type(quantization).__name__ if quantization else None
+        }
+    
     def create_index(self):
         """Create/recreate collection (for compatibility with FAISS interface)"""
         try:
@@ -60,22 +230,23 @@ class QdrantVectorStore:
             if self.collection_name in collection_names:
                 self.client.delete_collection(collection_name=self.collection_name)
                 print(f"Deleted existing collection '{self.collection_name}'")
+            if self.partition_collection_name in collection_names:
+                self.client.delete_collection(collection_name=self.partition_collection_name)
             
             # Create new collection
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.dimension,
-                    distance=Distance.COSINE
-                )
+                **self.build_collection_config(self.dimension)
             )
+            self._create_payload_indexes()
             print(f"Created new Qdrant collection '{self.collection_name}' with dimension {self.dimension}")
             
         except Exception as e:
             print(f"Error creating collection: {e}")
             raise
     
-    def add_embeddings(self, embeddings: np.ndarray, texts: List[str], metadata: Optional[List[dict]] = None, batch_size: int = 50):
+    def add_embeddings(self, embeddings: np.ndarray, texts: List[str], metadata: Optional[List[dict]] = None, batch_size: int = 50,
+                       ids: Optional[List[str]] = None, refresh_mirror: bool = True):
         """
         Add embeddings and corresponding texts to Qdrant in batches
         
@@ -84,6 +255,9 @@ class QdrantVectorStore:
             texts: list of corresponding text chunks
             metadata: optional list of metadata dicts for each text
             batch_size: number of points to upload per batch (default 50 for stability with large uploads)
+            ids: optional point ids (deterministic chunk ids make re-uploads overwrite instead of duplicate).
+                 With ids the texts are not kept in the local cache (streaming ingestion)
+            refresh_mirror: pull the new points into the local mirror after the upload
         """
         try:
             embeddings = embeddings.astype('float32')
@@ -101,11 +275,12 @@ class QdrantVectorStore:
                 # Prepare points for this batch
                 points = []
                 for i, (embedding, text) in enumerate(zip(batch_embeddings, batch_texts)):
-                    point_id = str(uuid.uuid4())
+                    point_id = ids[batch_start + i] if ids else str(uuid.uuid4())
                     
                     payload = {
                         "text": text,
-                        "index": len(self.texts) + batch_start + i
+                        "index": len(self.texts) + batch_start + i,
+                        "ingested_at": time.time()  # Used by the local mirror for incremental refresh
                     }
                     
                     # Add metadata if provided
@@ -140,7 +315,8 @@ class QdrantVectorStore:
                             raise  # Final attempt failed, raise error
                 
                 # Update local text cache
-                self.texts.extend(batch_texts)
+                if ids is None:
+                    self.texts.extend(batch_texts)
                 
                 batch_num = (batch_start // batch_size) + 1
                 total_batches = (total_embeddings + batch_size - 1) // batch_size
@@ -150,55 +326,304 @@ class QdrantVectorStore:
                 if batch_end < total_embeddings:
                     time.sleep(0.5)
             
-            print(f"✓ Successfully added {total_embeddings} embeddings to Qdrant. Total: {len(self.texts)}")
+            print(f"✓ Successfully added {total_embeddings} embeddings to Qdrant")
+            
+            # Pull the new points into the local mirror right away
+            if self.mirror is not None and refresh_mirror:
+                try:
+                    self.mirror.refresh()
+                except Exception as e:
+                    print(f"Warning: Could not refresh local mirror: {e}")
             
         except Exception as e:
             print(f"Error adding embeddings to Qdrant: {e}")
             raise
     
-    def search(self, query_embedding: np.ndarray, k: int = RagConfig.TOP_K_RESULTS) -> Tuple[List[str], List[float]]:
+    def fetch_embeddings(self, ids: List[str], batch_size: int = 256) -> Tuple[np.ndarray, List[dict]]:
         """
-        Search for similar embeddings in Qdrant
+        Stored embeddings and payloads of points, e.g. to update partition centroids
+        before deleting them. Unknown ids are skipped.
         
         Args:
-            query_embedding: query embedding vector
-            k: number of top results to return
+            ids: point (chunk) ids
+            batch_size: ids per retrieve call
             
         Returns:
-            tuple of (similar_texts, similarity_scores)
+            tuple of (embeddings, payloads)
         """
-        try:
-            # Get collection info to check if it has data
-            collection_info = self.client.get_collection(collection_name=self.collection_name)
-            if collection_info.points_count == 0:
-                return [], []
+        vectors, payloads = [], []
+        for batch_start in range(0, len(ids), batch_size):
+            points = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=ids[batch_start:batch_start + batch_size],
+                with_payload=True,
+                with_vectors=True
+            )
+            for point in points:
+                vectors.append(point.vector)
+                payloads.append(point.payload)
+        return np.asarray(vectors, dtype='float32').reshape(-1, self.dimension), payloads
+    
+    def iter_embeddings(self, batch_size: int = 256) -> Iterator[Tuple[np.ndarray, List[dict]]]:
+        """
+        Stored embeddings and payloads of every point, one scroll page at a time, e.g. to
+        rebuild partition centroids
+        
+        Args:
+            batch_size: points per scroll call
             
-            # Convert to list for Qdrant
-            query_vector = query_embedding.astype('float32').tolist()
+        Yields:
+            tuple of (embeddings, payloads)
+        """
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=True
+            )
+            if points:
+                yield (np.asarray([point.vector for point in points], dtype='float32').reshape(-1, self.dimension),
+                       [point.payload for point in points])
+            if offset is None:
+                break
+    
+    def delete_embeddings(self, ids: List[str], batch_size: int = 256, refresh_mirror: bool = True) -> int:
+        """
+        Delete points from the collection
+        
+        Args:
+            ids: point (chunk) ids
+            batch_size: ids per delete call
+            refresh_mirror: resync the local mirror afterwards (the deleted points are dropped
+                            from it either way)
             
-            # Search in Qdrant
-            search_results = self.client.search(
+        Returns:
+            Number of ids sent for deletion
+        """
+        for batch_start in range(0, len(ids), batch_size):
+            self.client.delete(
                 collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=k
+                points_selector=PointIdsList(points=ids[batch_start:batch_start + batch_size]),
+                wait=True
             )
+        
+        # Searches served from the mirror must not return deleted points until the next refresh
+        if ids and self.mirror is not None:
+            try:
+                self.mirror.remove(ids)
+                if refresh_mirror:
+                    self.mirror.refresh()
+            except Exception as e:
+                print(f"Warning: Could not update local mirror: {e}")
+        return len(ids)
+    
+    @property
+    def partition_collection_name(self) -> str:
+        """Sidecar collection holding the partition router centroids of this collection"""
+        return f"{self.collection_name}{RagConfig.QDRANT_PARTITION_COLLECTION_SUFFIX}"
+    
+    @staticmethod
+    def _partition_point_id(kind: str, name: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{kind}:{name}"))
+    
+    def save_partition_index(self, entries: List[Tuple[str, str, np.ndarray, int]], batch_size: int = 256):
+        """
+        Store the partition router centroid sums in the sidecar collection, so every host serving
+        this collection routes with the centroids of the ingestion that built it
+        
+        Args:
+            entries: (kind, name, embedding sum, chunk count) with kind "species" or "partition"
+        """
+        name = self.partition_collection_name
+        if not self.client.collection_exists(name):
+            # Dot: sums are stored as-is (Cosine would normalize them and lose the weights)
+            self.client.create_collection(
+                collection_name=name,
+                vectors_config=VectorParams(size=self.dimension, distance=Distance.DOT)
+            )
+        
+        points = [
+            PointStruct(
+                id=self._partition_point_id(kind, key),
+                vector=np.asarray(total, dtype='float32').tolist(),
+                payload={"kind": kind, "name": key, "count": int(count)}
+            )
+            for kind, key, total, count in entries
+        ]
+        for start in range(0, len(points), batch_size):
+            self.client.upsert(collection_name=name, points=points[start:start + batch_size], wait=True)
+        
+        # Species / partitions that no longer have chunks
+        kept = {point.id for point in points}
+        stale = [point.id for point in self._scroll_all(name, with_vectors=False) if point.id not in kept]
+        if stale:
+            self.client.delete(collection_name=name, points_selector=PointIdsList(points=stale), wait=True)
+    
+    def load_partition_index(self) -> Optional[List[Tuple[str, str, np.ndarray, int]]]:
+        """
+        Partition router centroid sums stored with this collection
+        
+        Returns:
+            (kind, name, embedding sum, chunk count) entries, or None if none were saved
+        """
+        name = self.partition_collection_name
+        if not self.client.collection_exists(name):
+            return None
+        entries = [
+            (point.payload["kind"], point.payload["name"], np.asarray(point.vector, dtype='float64'), point.payload["count"])
+            for point in self._scroll_all(name, with_vectors=True)
+        ]
+        return entries or None
+    
+    def _scroll_all(self, collection_name: str, with_vectors: bool, batch_size: int = 256):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=with_vectors
+            )
+            yield from points
+            if offset is None:
+                break
+    
+    def search(self, query_embedding: np.ndarray, k: int = RagConfig.TOP_K_RESULTS) -> Tuple[List[str], List[float]]:
+        """
+        Search for similar embeddings in Qdrant, or in the local mirror
+        
+        Args:
+            query_embedding: query embedding vector
+            k: number of top results to return
             
-            # Extract texts and scores
-            similar_texts = [hit.payload["text"] for hit in search_results]
-            similarity_scores = [hit.score for hit in search_results]
-            
-            return similar_texts, similarity_scores
+        Returns:
+            tuple of (similar_texts, similarity_scores)
+        """
+        similar_texts, similarity_scores, _ = self.search_with_metadata(query_embedding, k)
+        return similar_texts, similarity_scores
+    
+    def search_with_metadata(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = RagConfig.TOP_K_RESULTS,
+        partitions: Optional[List[str]] = None,
+        filters: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[List[str], List[float], List[dict]]:
+        """
+        Search for similar embeddings, optionally only inside the given partitions.
+        
+        Routing:
+            1. Mirror synced and QDRANT_MIRROR_PREFER_LOCAL -> serve from the mirror (no network)
+            2. Circuit closed -> query Qdrant; failures are recorded on the breaker
+            3. Qdrant failed or circuit open -> serve (possibly stale) results from the mirror
+        
+        Args:
+            query_embedding: query embedding vector
+            k: number of top results to return
+            partitions: restrict search to these species/field partitions (None = whole collection)
+            filters: payload key -> accepted values (e.g. {"species": [...]}), applied in the query
             
-        except Exception as e:
-            print(f"Error searching in Qdrant: {e}")
-            return [], []
+        Returns:
+            tuple of (similar_texts, similarity_scores, metadata)
+        """
+        mirror_ready = self.mirror is not None and self.mirror.is_ready
+        
+        if mirror_ready and RagConfig.QDRANT_MIRROR_PREFER_LOCAL:
+            return self._strip_payloads(self.mirror.search(query_embedding, k, partitions, filters))
+        
+        if self.breaker.allow_request():
+            try:
+                # Search in Qdrant (hnsw_ef + int8 rescoring from RagConfig)
+                search_results = self.client.query_points(**self._query_request(query_embedding, k, partitions, filters)).points
+                self.breaker.record_success()
+                return self._parse_points(search_results)
+                
+            except Exception as e:
+                self.breaker.record_failure()
+                print(f"Error searching in Qdrant: {e}")
+        
+        if mirror_ready:
+            print("Serving search from local mirror (Qdrant unavailable)")
+            return self._strip_payloads(self.mirror.search(query_embedding, k, partitions, filters))
+        
+        return [], [], []
+    
+    async def asearch_with_metadata(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = RagConfig.TOP_K_RESULTS,
+        partitions: Optional[List[str]] = None,
+        filters: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[List[str], List[float], List[dict]]:
+        """
+        Async version of search_with_metadata (same routing and circuit breaker).
+        
+        The remote query goes through the shared AsyncQdrantClient; embedded mode has
+        no async client, so its in-process search runs in a worker thread.
+        
+        Returns:
+            tuple of (similar_texts, similarity_scores, metadata)
+        """
+        mirror_ready = self.mirror is not None and self.mirror.is_ready
+        
+        if mirror_ready and RagConfig.QDRANT_MIRROR_PREFER_LOCAL:
+            return self._strip_payloads(self.mirror.search(query_embedding, k, partitions, filters))
+        
+        async_client = get_async_qdrant_client()
+        if async_client is None:
+            return await asyncio.to_thread(self.search_with_metadata, query_embedding, k, partitions, filters)
+        
+        if self.breaker.allow_request():
+            try:
+                response = await async_client.query_points(**self._query_request(query_embedding, k, partitions, filters))
+                self.breaker.record_success()
+                return self._parse_points(response.points)
+                
+            except Exception as e:
+                self.breaker.record_failure()
+                print(f"Error searching in Qdrant: {e}")
+        
+        if mirror_ready:
+            print("Serving search from local mirror (Qdrant unavailable)")
+            return self._strip_payloads(self.mirror.search(query_embedding, k, partitions, filters))
+        
+        return [], [], []
+    
+    def _query_request(self, query_embedding: np.ndarray, k: int, partitions: Optional[List[str]],
+                       filters: Optional[Dict[str, List[str]]] = None) -> dict:
+        """query_points arguments shared by the sync and async clients"""
+        conditions = [FieldCondition(key=key, match=MatchAny(any=list(values)))
+                      for key, values in (filters or {}).items() if values]
+        if partitions:
+            conditions.append(FieldCondition(key="partition", match=MatchAny(any=partitions)))
+        query_filter = Filter(must=conditions) if conditions else None
+        
+        return {
+            "collection_name": self.collection_name,
+            "query": query_embedding.astype('float32').tolist(),
+            "query_filter": query_filter,
+            "limit": k,
+            "search_params": self.search_params
+        }
+    
+    @staticmethod
+    def _parse_points(points) -> Tuple[List[str], List[float], List[dict]]:
+        """Extract texts, scores and metadata from scored points"""
+        similar_texts = [hit.payload["text"] for hit in points]
+        similarity_scores = [hit.score for hit in points]
+        metadata = [{key: value for key, value in hit.payload.items() if key != "text"} for hit in points]
+        return similar_texts, similarity_scores, metadata
+    
+    @staticmethod
+    def _strip_payloads(results: Tuple[List[str], List[float], List[dict]]) -> Tuple[List[str], List[float], List[dict]]:
+        """Drop the text from mirror payloads so metadata matches the remote path"""
+        texts, scores, payloads = results
+        return texts, scores, [{key: value for key, value in payload.items() if key != "text"} for payload in payloads]
     
     def save_index(self, filepath: str = None):
         """
-        Save index (for Qdrant, data is already persisted in cloud)
+        Save index (for Qdrant, data is already persisted by the server / embedded storage)
         This method is kept for compatibility with FAISS interface
         """
-        print(f"✓ Data already persisted in Qdrant cloud (collection: {self.collection_name})")
+        print(f"✓ Data already persisted in Qdrant {RagConfig.QDRANT_MODE} (collection: {self.collection_name})")
         return True
     
     def load_index(self, filepath: str = None):
@@ -228,31 +653,29 @@ class QdrantVectorStore:
             
             print(f"Connected to Qdrant collection '{self.collection_name}' with {points_count} vectors")
             
-            # Skip rebuilding text cache for faster startup
-            # Text will be fetched on-demand during search
-            print("✓ Index loaded (text cache will be built on-demand for faster startup)")
+            if self.mirror is not None:
+                self._start_mirror()
             
             return True
             
         except Exception as e:
             print(f"Error loading from Qdrant: {e}")
+            if self.mirror is not None and (self.mirror.is_ready or self.mirror.load()):
+                print("✓ Index loaded from local mirror (Qdrant unavailable)")
+                self.mirror.start_background_refresh()
+                return True
             return False
     
-    def _rebuild_text_cache(self):
-        """Rebuild local text cache from Qdrant (optional)"""
+    def _start_mirror(self):
+        """Load (or build) the local mirror and keep it fresh in the background"""
         try:
-            # Scroll through all points to rebuild text cache
-            points, _ = self.client.scroll(
-                collection_name=self.collection_name,
-                limit=10000  # Adjust based on your collection size
-            )
-            
-            self.texts = [point.payload["text"] for point in points]
-            print(f"Rebuilt text cache with {len(self.texts)} texts")
-            
+            if self.mirror.load():
+                self.mirror.refresh()
+            else:
+                self.mirror.full_sync()
         except Exception as e:
-            print(f"Warning: Could not rebuild text cache: {e}")
-            self.texts = []
+            print(f"Warning: Could not sync local mirror: {e}")
+        self.mirror.start_background_refresh()
     
     def get_stats(self):
         """Get statistics about the vector store"""
@@ -264,16 +687,20 @@ class QdrantVectorStore:
                 "dimension": self.dimension,
                 "total_texts": len(self.texts),
                 "collection_name": self.collection_name,
-                "backend": "Qdrant Cloud"
+                "backend": f"Qdrant ({RagConfig.QDRANT_MODE})",
+                "circuit_breaker": self.breaker.get_stats(),
+                "mirror": self.mirror.get_stats() if self.mirror else None
             }
             
         except Exception as e:
             return {
-                "total_embeddings": 0,
+                "total_embeddings": len(self.mirror.ids) if self.mirror else 0,
                 "dimension": self.dimension,
                 "total_texts": 0,
                 "collection_name": self.collection_name,
-                "backend": "Qdrant Cloud",
+                "backend": f"Qdrant ({RagConfig.QDRANT_MODE})",
+                "circuit_breaker": self.breaker.get_stats(),
+                "mirror": self.mirror.get_stats() if self.mirror else None,
                 "error": str(e)
             }
     
@@ -281,8 +708,12 @@ class QdrantVectorStore:
         """Delete the collection from Qdrant"""
         try:
             self.client.delete_collection(collection_name=self.collection_name)
+            if self.client.collection_exists(self.partition_collection_name):
+                self.client.delete_collection(collection_name=self.partition_collection_name)
             print(f"✓ Deleted collection '{self.collection_name}' from Qdrant")
             self.texts = []
+            if self.mirror is not None:
+                self.mirror.clear()
             
         except Exception as e:
             print(f"Error deleting collection: {e}")
@@ -0,0 +1,187 @@
+import threading
+import time
+import numpy as np
+from typing import List, Tuple, Optional
+from config.rag_config import RagConfig
+from rag.reranker import CrossEncoderReranker
+
+
+class AdaptiveRerankCascade:
+    """
+    Adaptive reranking policy in front of the large cross-encoder.
+
+    For each query, in order:
+        1. dense_skip  -> the dense top-1 margin is decisive, keep the retrieval order
+        2. small_only  -> the small cross-encoder separates the top-k from the rest clearly
+        3. large_head  -> only the ambiguous head of the small model's ranking goes to the large model
+        4. full_large  -> no small model loaded, or no more candidates than top_k: score everything
+                          with the large model (previous behavior)
+
+    Every decision is returned with its timings and the estimated time saved against
+    scoring all candidates with the large model.
+    """
+
+    def __init__(self, large_reranker: CrossEncoderReranker, small_reranker: Optional[CrossEncoderReranker] = None):
+        """
+        Initialize rerank cascade
+
+        Args:
+            large_reranker: Accurate cross-encoder (e.g. MiniLM L-12)
+            small_reranker: Fast cross-encoder (e.g. MiniLM L-6), optional
+        """
+        self.large = large_reranker
+        self.small = small_reranker
+        self.stats = {
+            "queries": 0,
+            "dense_skip": 0,
+            "small_only": 0,
+            "large_head": 0,
+            "full_large": 0,
+            "time_saved_ms": 0.0
+        }
+        # Moving average of large-model cost per passage, used to estimate time saved
+        self._large_ms_per_passage = None
+        self._lock = threading.Lock()
+
+    def _record_large_cost(self, elapsed_ms: float, passages: int):
+        if passages == 0:
+            return
+        per_passage = elapsed_ms / passages
+        with self._lock:
+            if self._large_ms_per_passage is None:
+                self._large_ms_per_passage = per_passage
+            else:
+                self._large_ms_per_passage = 0.8 * self._large_ms_per_passage + 0.2 * per_passage
+
+    def estimate_large_ms(self, passages: int) -> Optional[float]:
+        """Estimated time to score `passages` candidates with the large model (None until measured)"""
+        if self._large_ms_per_passage is None:
+            return None
+        return self._large_ms_per_passage * passages
+
+    @staticmethod
+    def _normalized(scores) -> np.ndarray:
+        scores = np.asarray(scores, dtype="float64")
+        spread = scores.max() - scores.min()
+        return (scores - scores.min()) / spread if spread > 0 else np.zeros_like(scores)
+
+    def rerank(
+        self,
+        query: str,
+        passages_with_scores: List[Tuple[str, float]],
+        passage_token_ids: Optional[List[Optional[List[int]]]] = None,
+        alpha: float = RagConfig.RERANK_ALPHA,
+        top_k: int = RagConfig.FINAL_TOP_K,
+        max_large_passages: Optional[int] = None
+    ) -> Tuple[List[Tuple[str, float, Optional[float], float]], dict]:
+        """
+        Re-rank passages with the adaptive cascade
+
+        Args:
+            query: Search query
+            passages_with_scores: List of tuples (passage, original_score), in retrieval order
+            passage_token_ids: Optional pre-tokenized passages aligned with passages_with_scores
+            alpha: Weight for cross-encoder score (1-alpha for original score)
+            top_k: Number of passages to return
+            max_large_passages: Optional cap on passages sent to the large model
+
+        Returns:
+            tuple of (results, decision) where results are
+            (passage, combined_score, cross_encoder_score or None, original_score)
+        """
+        start = time.perf_counter()
+        n = len(passages_with_scores)
+        passages = [item[0] for item in passages_with_scores]
+        original_scores = [item[1] for item in passages_with_scores]
+        token_ids = passage_token_ids or [None] * n
+        decision = {"candidates": n, "timings_ms": {}}
+
+        if n == 0:
+            decision["decision"] = "empty"
+            return [], decision
+
+        # 1. Dense margin
+        ordered = sorted(original_scores, reverse=True)
+        dense_margin = ordered[0] - ordered[1] if n > 1 else float("inf")
+        decision["dense_margin"] = round(float(dense_margin), 4) if n > 1 else None
+
+        if n > top_k and dense_margin >= RagConfig.RERANK_SKIP_DENSE_MARGIN:
+            order = np.argsort(-np.asarray(original_scores))[:top_k]
+            results = [(passages[i], original_scores[i], None, original_scores[i]) for i in order]
+            return results, self._finish("dense_skip", decision, start, large_scored=0)
+
+        # 4. No small model, or no more candidates than results (nothing to cut, but the order
+        #    still matters): score everything with the large model, as without the cascade
+        if self.small is None or n <= top_k:
+            large_start = time.perf_counter()
+            large_scores = self.large.predict_scores(query, passages, token_ids)
+            large_ms = (time.perf_counter() - large_start) * 1000
+            self._record_large_cost(large_ms, n)
+            decision["timings_ms"]["large"] = round(large_ms, 2)
+            results = CrossEncoderReranker.combine_scores(passages, large_scores, original_scores, alpha, top_k)
+            return results, self._finish("full_large", decision, start, large_scored=n)
+
+        # 2. Small model over all candidates
+        # The L-6/L-12 MiniLM pair shares a tokenizer, so the ingest-time token cache is reused
+        small_token_ids = token_ids if self.small.tokenizer_signature == self.large.tokenizer_signature else None
+        small_start = time.perf_counter()
+        small_scores = self.small.predict_scores(query, passages, small_token_ids)
+        decision["timings_ms"]["small"] = round((time.perf_counter() - small_start) * 1000, 2)
+
+        small_order = np.argsort(-np.asarray(small_scores))
+        normalized = self._normalized(small_scores)
+        small_margin = normalized[small_order[top_k - 1]] - normalized[small_order[top_k]]
+        decision["small_margin"] = round(float(small_margin), 4)
+
+        if small_margin >= RagConfig.RERANK_SMALL_DECISIVE_MARGIN or max_large_passages == 0:
+            results = CrossEncoderReranker.combine_scores(passages, small_scores, original_scores, alpha, top_k)
+            return results, self._finish("small_only", decision, start, large_scored=0)
+
+        # 3. Large model over the ambiguous head only
+        head_size = min(n, top_k + RagConfig.RERANK_CASCADE_HEAD_EXTRA)
+        if max_large_passages is not None:
+            head_size = max(top_k, min(head_size, max_large_passages))
+        head = small_order[:head_size]
+
+        large_start = time.perf_counter()
+        large_scores = self.large.predict_scores(query, [passages[i] for i in head], [token_ids[i] for i in head])
+        large_ms = (time.perf_counter() - large_start) * 1000
+        self._record_large_cost(large_ms, head_size)
+        decision["timings_ms"]["large"] = round(large_ms, 2)
+
+        results = CrossEncoderReranker.combine_scores(
+            [passages[i] for i in head], large_scores, [original_scores[i] for i in head], alpha, top_k
+        )
+        return results, self._finish("large_head", decision, start, large_scored=head_size)
+
+    def _finish(self, name: str, decision: dict, start: float, large_scored: int) -> dict:
+        """Record the decision, its total time and the estimated time saved"""
+        total_ms = (time.perf_counter() - start) * 1000
+        estimated_full_ms = self.estimate_large_ms(decision["candidates"])
+        saved_ms = estimated_full_ms - total_ms if estimated_full_ms is not None and name != "full_large" else 0.0
+
+        decision.update({
+            "decision": name,
+            "large_scored": large_scored,
+            "total_ms": round(total_ms, 2),
+            "estimated_full_large_ms": round(estimated_full_ms, 2) if estimated_full_ms is not None else None,
+            "saved_ms": round(saved_ms, 2)
+        })
+
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats[name] += 1
+            self.stats["time_saved_ms"] += saved_ms
+
+        print(f"Rerank cascade: {name} ({total_ms:.1f}ms, large model scored {large_scored}/{decision['candidates']})")
+        return decision
+
+    def get_stats(self) -> dict:
+        """Get decision counts and cumulative estimated time saved"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["time_saved_ms"] = round(stats["time_saved_ms"], 2)
+        stats["large_ms_per_passage"] = round(self._large_ms_per_passage, 3) if self._large_ms_per_passage else None
+        stats["small_model"] = self.small.model_name if self.small else None
+        stats["large_model"] = self.large.model_name
+        return stats
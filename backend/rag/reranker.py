@@ -1,7 +1,9 @@
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 import numpy as np
+import torch
 from sentence_transformers import CrossEncoder
 import logging
+from rag.inference_runtime import inference_runtime
 
 class CrossEncoderReranker:
     """Cross-encoder based re-ranking for RAG pipeline"""
@@ -15,6 +17,8 @@ class CrossEncoderReranker:
         """
         self.model_name = model_name
         self.model = None
+        self.tokenizer = None
+        self.max_length = None
         self._load_model()
         
     def _load_model(self):
@@ -22,11 +26,112 @@ class CrossEncoderReranker:
         try:
             print(f"Loading cross-encoder model: {self.model_name}")
             self.model = CrossEncoder(self.model_name)
+            self.tokenizer = self.model.tokenizer
+            self.max_length = self.model.max_length or self.tokenizer.model_max_length
+            inference_runtime.register("rerank")  # All cross-encoders (cascade small / large) share one budget
             print("Cross-encoder model loaded successfully!")
         except Exception as e:
             logging.error(f"Failed to load cross-encoder model: {e}")
             raise e
     
+    @property
+    def tokenizer_signature(self) -> str:
+        """
+        Identifies the vocabulary the cached token ids belong to.
+        Cross-encoders sharing a tokenizer (e.g. MiniLM L-6 / L-12) share the cache.
+        """
+        return f"{type(self.tokenizer).__name__}:{self.tokenizer.vocab_size}:{self.max_length}"
+    
+    def tokenize_passages(self, passages: List[str]) -> List[List[int]]:
+        """
+        Tokenize passages once (no special tokens, truncated to the model's max length)
+        so they can be stored with each chunk at ingest
+        
+        Args:
+            passages: List of passage texts
+            
+        Returns:
+            List of token id lists
+        """
+        return self.tokenizer(
+            passages,
+            add_special_tokens=False,
+            truncation=True,
+            max_length=self.max_length
+        )["input_ids"]
+    
+    def _build_pair(self, query_ids: List[int], passage_ids: List[int]) -> Tuple[List[int], List[int]]:
+        """Join query and passage ids with the model's special tokens"""
+        if hasattr(self.tokenizer, "build_inputs_with_special_tokens"):
+            return (
+                self.tokenizer.build_inputs_with_special_tokens(query_ids, passage_ids),
+                self.tokenizer.create_token_type_ids_from_sequences(query_ids, passage_ids)
+            )
+        
+        # Newer transformers dropped the helpers above; MiniLM cross-encoders use the BERT layout
+        cls_id, sep_id = self.tokenizer.cls_token_id, self.tokenizer.sep_token_id
+        input_ids = [cls_id] + query_ids + [sep_id] + passage_ids + [sep_id]
+        token_type_ids = [0] * (len(query_ids) + 2) + [1] * (len(passage_ids) + 1)
+        return input_ids, token_type_ids
+    
+    def _predict_from_token_ids(self, query: str, passage_token_ids: List[List[int]]) -> np.ndarray:
+        """Score query/passage pairs from pre-tokenized passages, skipping passage tokenization"""
+        query_ids = self.tokenizer(query, add_special_tokens=False, truncation=True, max_length=self.max_length // 2)["input_ids"]
+        passage_budget = self.max_length - len(query_ids) - self.tokenizer.num_special_tokens_to_add(pair=True)
+        
+        features = {"input_ids": [], "token_type_ids": []}
+        for passage_ids in passage_token_ids:
+            input_ids, token_type_ids = self._build_pair(query_ids, passage_ids[:passage_budget])
+            features["input_ids"].append(input_ids)
+            features["token_type_ids"].append(token_type_ids)
+        
+        batch = self.tokenizer.pad(features, padding=True, return_tensors="pt")
+        hf_model = self.model.model
+        device = next(hf_model.parameters()).device
+        batch = {key: value.to(device) for key, value in batch.items()}
+        
+        with inference_runtime.slot("rerank"), torch.inference_mode():
+            logits = hf_model(**batch).logits
+            # Same activation CrossEncoder.predict applies (attribute name differs across versions)
+            activation = getattr(self.model, "activation_fn", None) or getattr(self.model, "default_activation_function", None)
+            if activation is not None:
+                logits = activation(logits)
+        
+        scores = logits.float().cpu().numpy()
+        return scores[:, 0] if scores.shape[1] == 1 else scores
+    
+    def predict_scores(
+        self, 
+        query: str, 
+        passages: List[str], 
+        passage_token_ids: Optional[List[Optional[List[int]]]] = None
+    ) -> np.ndarray:
+        """
+        Cross-encoder relevance scores for passages, using cached passage token ids when available
+        
+        Args:
+            query: Search query
+            passages: List of passage texts
+            passage_token_ids: Optional cached token ids per passage (None entries are tokenized on the fly)
+            
+        Returns:
+            numpy array of scores aligned with passages
+        """
+        if self.model is None:
+            raise RuntimeError("Cross-encoder model not loaded")
+        
+        if not passage_token_ids or all(ids is None for ids in passage_token_ids):
+            pairs = [[query, passage] for passage in passages]
+            return np.asarray(inference_runtime.run("rerank", self.model.predict, pairs))
+        
+        missing = [i for i, ids in enumerate(passage_token_ids) if ids is None]
+        if missing:
+            passage_token_ids = list(passage_token_ids)
+            for i, ids in zip(missing, self.tokenize_passages([passages[i] for i in missing])):
+                passage_token_ids[i] = ids
+        
+        return self._predict_from_token_ids(query, passage_token_ids)
+    
     def rerank(self, query: str, passages: List[str], top_k: int = None) -> List[Tuple[str, float]]:
         """
         Re-rank passages using cross-encoder
@@ -51,7 +156,7 @@ class CrossEncoderReranker:
         pairs = [[query, passage] for passage in passages]
         
         # Get relevance scores
-        scores = self.model.predict(pairs)
+        scores = inference_runtime.run("rerank", self.model.predict, pairs)
         
         # Combine passages with scores
         passage_scores = list(zip(passages, scores))
@@ -72,7 +177,8 @@ class CrossEncoderReranker:
         query: str, 
         passages_with_scores: List[Tuple[str, float]], 
         alpha: float = 0.7,
-        top_k: int = None
+        top_k: int = None,
+        passage_token_ids: Optional[List[Optional[List[int]]]] = None
     ) -> List[Tuple[str, float, float, float]]:
         """
         Re-rank passages combining original retrieval scores with cross-encoder scores
@@ -82,6 +188,7 @@ class CrossEncoderReranker:
             passages_with_scores: List of tuples (passage, original_score)
             alpha: Weight for cross-encoder score (1-alpha for original score)
             top_k: Number of top passages to return
+            passage_token_ids: Optional pre-tokenized passages (from ingest) aligned with passages_with_scores
             
         Returns:
             List of tuples (passage, combined_score, cross_encoder_score, original_score)
@@ -93,8 +200,35 @@ class CrossEncoderReranker:
         original_scores = [item[1] for item in passages_with_scores]
         
         # Get cross-encoder scores
-        cross_encoder_scores = self.model.predict([[query, passage] for passage in passages])
+        cross_encoder_scores = self.predict_scores(query, passages, passage_token_ids)
+        
+        combined_results = self.combine_scores(passages, cross_encoder_scores, original_scores, alpha, top_k)
+        
+        print(f"Combined re-ranking completed. Top combined score: {combined_results[0][1]:.4f}")
+        
+        return combined_results
+    
+    @staticmethod
+    def combine_scores(
+        passages: List[str],
+        cross_encoder_scores,
+        original_scores: List[float],
+        alpha: float = 0.7,
+        top_k: int = None
+    ) -> List[Tuple[str, float, float, float]]:
+        """
+        Min-max normalize cross-encoder and retrieval scores and combine them
         
+        Args:
+            passages: List of passage texts
+            cross_encoder_scores: Cross-encoder scores aligned with passages
+            original_scores: Retrieval scores aligned with passages
+            alpha: Weight for cross-encoder score (1-alpha for original score)
+            top_k: Number of top passages to return
+            
+        Returns:
+            List of tuples (passage, combined_score, cross_encoder_score, original_score)
+        """
         # Normalize scores to [0, 1] range
         if len(cross_encoder_scores) > 1:
             ce_min, ce_max = min(cross_encoder_scores), max(cross_encoder_scores)
@@ -125,8 +259,6 @@ class CrossEncoderReranker:
         if top_k is not None:
             combined_results = combined_results[:top_k]
         
-        print(f"Combined re-ranking completed. Top combined score: {combined_results[0][1]:.4f}")
-        
         return combined_results
     
     def get_model_info(self) -> dict:
@@ -134,5 +266,6 @@ class CrossEncoderReranker:
         return {
             "model_name": self.model_name,
             "model_loaded": self.model is not None,
-            "model_type": "cross-encoder"
+            "model_type": "cross-encoder",
+            "max_length": self.max_length
         }
\ No newline at end of file
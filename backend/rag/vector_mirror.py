@@ -0,0 +1,352 @@
+import os
+import pickle
+import threading
+import time
+import numpy as np
+from typing import List, Tuple, Optional, Dict
+from qdrant_client.models import Filter, FieldCondition, Range
+from config.rag_config import RagConfig
+
+
+class LocalVectorMirror:
+    """
+    In-process, memory-mapped copy of a Qdrant collection.
+
+    Vectors live in a .npy file opened with mmap (shared page cache, no load cost),
+    texts/payloads/ids in a pickle next to it. The mirror is filled by paging through
+    the collection with scroll and refreshed incrementally using the `ingested_at`
+    payload timestamp written by QdrantVectorStore.add_embeddings; deleted points are
+    found by comparing the collection's point ids with the mirrored ones.
+    """
+
+    def __init__(self, client, collection_name: str, dimension: int, path: str = None):
+        """
+        Initialize local mirror
+
+        Args:
+            client: QdrantClient used for syncing
+            collection_name: Collection to mirror
+            dimension: Vector dimension
+            path: File prefix for the mirror files (default from RagConfig.QDRANT_MIRROR_PATH)
+        """
+        self.client = client
+        self.collection_name = collection_name
+        self.dimension = dimension
+        self.path = path or RagConfig.QDRANT_MIRROR_PATH
+        self.vectors = np.zeros((0, dimension), dtype="float32")
+        self.ids = []
+        self.texts = []
+        self.payloads = []
+        self.partition_rows = {}  # partition -> row indices, for routed searches
+        self.last_sync = 0.0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def is_ready(self) -> bool:
+        """True if the mirror holds at least one point"""
+        return len(self.ids) > 0
+
+    def _vectors_file(self) -> str:
+        return f"{self.path}_vectors.npy"
+
+    def _meta_file(self) -> str:
+        return f"{self.path}_meta.pkl"
+
+    def load(self) -> bool:
+        """
+        Load mirror files from disk (vectors are memory-mapped, not read)
+
+        Returns:
+            True if a mirror snapshot for this collection was found
+        """
+        try:
+            with open(self._meta_file(), "rb") as f:
+                meta = pickle.load(f)
+
+            if meta.get("collection") != self.collection_name:
+                print(f"Mirror at {self.path} belongs to '{meta.get('collection')}', ignoring")
+                return False
+
+            vectors = np.load(self._vectors_file(), mmap_mode="r")
+
+            with self._lock:
+                self.vectors = vectors
+                self.ids = meta["ids"]
+                self.texts = meta["texts"]
+                self.payloads = meta["payloads"]
+                self.partition_rows = self._build_partition_rows(meta["payloads"])
+                self.last_sync = meta["last_sync"]
+
+            print(f"✓ Loaded local mirror of '{self.collection_name}' with {len(self.ids)} vectors")
+            return True
+
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Warning: Could not load local mirror: {e}")
+            return False
+
+    def _scroll(self, scroll_filter: Optional[Filter] = None, with_data: bool = True):
+        """Page through the collection, yielding points (with vectors and payloads unless with_data=False)"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=RagConfig.QDRANT_MIRROR_PAGE_SIZE,
+                offset=offset,
+                with_payload=with_data,
+                with_vectors=with_data
+            )
+            yield from points
+            if offset is None:
+                break
+
+    def _write(self, vectors: np.ndarray, ids: List, texts: List[str], payloads: List[dict], last_sync: float):
+        """Persist a snapshot atomically and swap it in"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        tmp_vectors = f"{self._vectors_file()}.tmp"
+        mmap = np.lib.format.open_memmap(tmp_vectors, mode="w+", dtype="float32", shape=vectors.shape)
+        mmap[:] = vectors
+        mmap.flush()
+        del mmap
+        os.replace(tmp_vectors, self._vectors_file())
+
+        tmp_meta = f"{self._meta_file()}.tmp"
+        with open(tmp_meta, "wb") as f:
+            pickle.dump({
+                "collection": self.collection_name,
+                "ids": ids,
+                "texts": texts,
+                "payloads": payloads,
+                "last_sync": last_sync
+            }, f)
+        os.replace(tmp_meta, self._meta_file())
+
+        mapped = np.load(self._vectors_file(), mmap_mode="r")
+        partition_rows = self._build_partition_rows(payloads)
+        with self._lock:
+            self.vectors = mapped
+            self.ids = ids
+            self.texts = texts
+            self.payloads = payloads
+            self.partition_rows = partition_rows
+            self.last_sync = last_sync
+
+    @staticmethod
+    def _build_partition_rows(payloads: List[dict]) -> dict:
+        rows = {}
+        for row, payload in enumerate(payloads):
+            partition = payload.get("partition")
+            if partition:
+                rows.setdefault(partition, []).append(row)
+        return {partition: np.asarray(indices, dtype="int64") for partition, indices in rows.items()}
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def full_sync(self) -> int:
+        """
+        Rebuild the mirror from the whole collection
+
+        Returns:
+            Number of mirrored points
+        """
+        sync_started = time.time()
+        ids, texts, payloads, vectors = [], [], [], []
+
+        for point in self._scroll():
+            ids.append(point.id)
+            texts.append(point.payload.get("text", ""))
+            payloads.append(point.payload)
+            vectors.append(point.vector)
+
+        matrix = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        self._write(self._normalize(matrix), ids, texts, payloads, sync_started)
+        self.last_error = None
+
+        print(f"✓ Local mirror synced: {len(ids)} vectors from '{self.collection_name}'")
+        return len(ids)
+
+    def refresh(self) -> int:
+        """
+        Incrementally pull points ingested since the last sync; re-ingested points
+        (same id, newer `ingested_at`) replace their stale copy, and points no longer in
+        the collection are dropped (ids are compared, so a delta that deletes as many
+        points as it adds is caught too). Falls back to a full sync when the collection
+        holds points the scroll did not return (written without `ingested_at`).
+
+        Returns:
+            Number of new, updated or removed points
+        """
+        if not self.is_ready:
+            return self.full_sync()
+
+        sync_started = time.time()
+        # Small overlap protects against clock skew between ingest hosts
+        since = self.last_sync - 60
+        known = {point_id: row for row, point_id in enumerate(self.ids)}
+
+        new_ids, new_texts, new_payloads, new_vectors = [], [], [], []
+        updated = {}  # row -> re-ingested point
+        scroll_filter = Filter(must=[FieldCondition(key="ingested_at", range=Range(gt=since))])
+        for point in self._scroll(scroll_filter):
+            if point.id in known:
+                row = known[point.id]
+                if point.payload.get("ingested_at") != self.payloads[row].get("ingested_at"):
+                    updated[row] = point
+                continue
+            new_ids.append(point.id)
+            new_texts.append(point.payload.get("text", ""))
+            new_payloads.append(point.payload)
+            new_vectors.append(point.vector)
+
+        remote_ids = {point.id for point in self._scroll(with_data=False)}
+        unknown = len(remote_ids) - len(remote_ids & known.keys()) - len(new_ids)
+        if unknown > 0:
+            print(f"Mirror is missing {unknown} points written without ingested_at, running full sync...")
+            return self.full_sync()
+        kept = [row for row, point_id in enumerate(self.ids) if point_id in remote_ids]
+
+        if new_ids or updated or len(kept) < len(self.ids):
+            vectors, texts, payloads = np.array(self.vectors), list(self.texts), list(self.payloads)
+            for row, point in updated.items():
+                vectors[row] = self._normalize(np.asarray([point.vector], dtype="float32"))[0]
+                texts[row] = point.payload.get("text", "")
+                payloads[row] = point.payload
+            matrix = np.asarray(new_vectors, dtype="float32").reshape(-1, self.dimension)
+            vectors = np.vstack([vectors[kept], self._normalize(matrix)])
+            self._write(vectors, [self.ids[row] for row in kept] + new_ids,
+                        [texts[row] for row in kept] + new_texts,
+                        [payloads[row] for row in kept] + new_payloads, sync_started)
+            removed = len(known) - len(kept)
+            print(f"✓ Local mirror refreshed: +{len(new_ids)} new, {len(updated)} updated, "
+                  f"-{removed} removed vectors (total {len(self.ids)})")
+        else:
+            removed = 0
+            with self._lock:
+                self.last_sync = sync_started
+
+        self.last_error = None
+        return len(new_ids) + len(updated) + removed
+
+    def remove(self, ids: List) -> int:
+        """
+        Drop points from the mirror right away (after deleting them from the collection),
+        so searches served locally stop returning them before the next refresh
+
+        Args:
+            ids: Point ids
+
+        Returns:
+            Number of mirrored points removed
+        """
+        deleted = {str(point_id) for point_id in ids}
+        with self._lock:
+            kept = [row for row, point_id in enumerate(self.ids) if str(point_id) not in deleted]
+            if len(kept) == len(self.ids):
+                return 0
+            removed = len(self.ids) - len(kept)
+            vectors = np.asarray(self.vectors)[kept]
+            snapshot = ([self.ids[row] for row in kept], [self.texts[row] for row in kept],
+                        [self.payloads[row] for row in kept], self.last_sync)
+        self._write(vectors, *snapshot)
+        return removed
+
+    def start_background_refresh(self, interval: float = None):
+        """Refresh the mirror periodically in a daemon thread"""
+        if self._refresh_thread is not None:
+            return
+
+        interval = interval or RagConfig.QDRANT_MIRROR_REFRESH_SECONDS
+
+        def _loop():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"Warning: Local mirror refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=_loop, name="qdrant-mirror-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop(self):
+        """Stop the background refresh thread"""
+        self._stop_event.set()
+
+    def search(self, query_embedding: np.ndarray, k: int, partitions: Optional[List[str]] = None,
+               filters: Optional[Dict[str, List[str]]] = None) -> Tuple[List[str], List[float], List[dict]]:
+        """
+        Exact cosine search over the mirrored vectors
+
+        Args:
+            query_embedding: query embedding vector
+            k: number of top results to return
+            partitions: restrict search to these species/field partitions (None = all vectors)
+            filters: payload key -> accepted values, matched like the Qdrant keyword filter
+
+        Returns:
+            tuple of (similar_texts, similarity_scores, payloads)
+        """
+        with self._lock:
+            vectors, texts, payloads, partition_rows = self.vectors, self.texts, self.payloads, self.partition_rows
+
+        if len(texts) == 0:
+            return [], [], []
+
+        query = query_embedding.astype("float32").reshape(-1)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        rows = None
+        if partitions:
+            selected = [partition_rows[p] for p in partitions if p in partition_rows]
+            if not selected:
+                return [], [], []
+            rows = np.concatenate(selected)
+        filters = {key: set(values) for key, values in (filters or {}).items() if values}
+        if filters:
+            candidates = rows if rows is not None else range(len(texts))
+            rows = np.asarray([i for i in candidates
+                               if all(payloads[i].get(key) in values for key, values in filters.items())], dtype="int64")
+            if len(rows) == 0:
+                return [], [], []
+        scores = vectors[rows] @ query if rows is not None else vectors @ query
+
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        result_rows = rows[top] if rows is not None else top
+
+        return [texts[i] for i in result_rows], scores[top].tolist(), [payloads[i] for i in result_rows]
+
+    def clear(self):
+        """Drop the mirror (in memory and on disk)"""
+        with self._lock:
+            self.vectors = np.zeros((0, self.dimension), dtype="float32")
+            self.ids, self.texts, self.payloads = [], [], []
+            self.partition_rows = {}
+            self.last_sync = 0.0
+        for filepath in (self._vectors_file(), self._meta_file()):
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    def get_stats(self) -> dict:
+        """Get statistics about the mirror"""
+        return {
+            "mirrored_points": len(self.ids),
+            "last_sync": self.last_sync,
+            "seconds_since_sync": round(time.time() - self.last_sync, 1) if self.last_sync else None,
+            "last_error": self.last_error,
+            "path": self.path
+        }
@@ -1,8 +1,9 @@
+import asyncio
 import faiss
 import numpy as np
 import pickle
 import os
-from typing import List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 from config.rag_config import RagConfig
 
 class FAISSVectorStore:
@@ -13,21 +14,30 @@ class FAISSVectorStore:
         self.dimension = RagConfig.VECTOR_DIMENSION
         self.index = None
         self.texts = []  # Store original texts
+        self.metadata = []  # Per-text metadata (species, field, partition, ...)
+        self.partition_ids: Dict[str, List[int]] = {}  # partition -> index ids
+        self.chunk_rows: Dict[str, int] = {}  # chunk id -> index id (row in texts / metadata)
         self.index_path = RagConfig.FAISS_INDEX_PATH
         
     def create_index(self):
         """Create a new FAISS index"""
-        # Using IndexFlatIP for cosine similarity (Inner Product)
-        self.index = faiss.IndexFlatIP(self.dimension)
+        # Using IndexFlatIP for cosine similarity (Inner Product); the IDMap keeps ids stable
+        # (= row in texts / metadata) when vectors are removed
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        self.texts, self.metadata = [], []
+        self.partition_ids, self.chunk_rows = {}, {}
         print(f"Created new FAISS index with dimension {self.dimension}")
     
-    def add_embeddings(self, embeddings: np.ndarray, texts: List[str]):
+    def add_embeddings(self, embeddings: np.ndarray, texts: List[str], metadata: Optional[List[dict]] = None,
+                       ids: Optional[List[str]] = None):
         """
         Add embeddings and corresponding texts to the index
         
         Args:
             embeddings: numpy array of embeddings
             texts: list of corresponding text chunks
+            metadata: optional list of metadata dicts for each text
+            ids: optional chunk ids; chunks already in the index are replaced (upsert)
         """
         if self.index is None:
             self.create_index()
@@ -35,13 +45,132 @@ class FAISSVectorStore:
         # Convert to float32 first, then normalize
         embeddings = embeddings.astype('float32')
         faiss.normalize_L2(embeddings)
+        metadata = metadata if metadata else [{} for _ in texts]
+        
+        if ids:
+            existing = [chunk_id for chunk_id in ids if chunk_id in self.chunk_rows]
+            if existing:
+                self.delete_embeddings(existing)
+            for chunk_metadata, chunk_id in zip(metadata, ids):
+                chunk_metadata["chunk_id"] = chunk_id
         
         # Add to index
-        self.index.add(embeddings)
+        start_id = len(self.texts)
+        self.index.add_with_ids(embeddings, np.arange(start_id, start_id + len(embeddings), dtype='int64'))
         self.texts.extend(texts)
+        self.metadata.extend(metadata)
+        self._index_partitions(start_id)
         
         print(f"Added {len(embeddings)} embeddings to index. Total: {self.index.ntotal}")
     
+    def _index_partitions(self, start_id: int = 0):
+        """Update the partition -> ids and chunk id -> id maps for metadata from start_id on"""
+        if start_id == 0:
+            self.partition_ids, self.chunk_rows = {}, {}
+        for idx in range(start_id, len(self.metadata)):
+            chunk_metadata = self.metadata[idx]
+            if chunk_metadata is None:  # Deleted
+                continue
+            partition = chunk_metadata.get("partition")
+            if partition:
+                self.partition_ids.setdefault(partition, []).append(idx)
+            chunk_id = chunk_metadata.get("chunk_id")
+            if chunk_id:
+                self.chunk_rows[chunk_id] = idx
+    
+    def fetch_embeddings(self, ids: List[str]) -> Tuple[np.ndarray, List[dict]]:
+        """
+        Stored (normalized) embeddings and metadata of chunks, e.g. to update partition centroids
+        before deleting them. Unknown ids are skipped.
+        
+        Args:
+            ids: chunk ids
+            
+        Returns:
+            tuple of (embeddings, metadata)
+        """
+        rows = [self.chunk_rows[chunk_id] for chunk_id in ids if chunk_id in self.chunk_rows]
+        if not rows:
+            return np.zeros((0, self.dimension), dtype='float32'), []
+        embeddings = np.stack([self.index.reconstruct(row) for row in rows])
+        return embeddings, [self.metadata[row] for row in rows]
+    
+    def iter_embeddings(self, batch_size: int = 1024) -> Iterator[Tuple[np.ndarray, List[dict]]]:
+        """
+        Stored (normalized) embeddings and metadata of every chunk, in batches, e.g. to
+        rebuild partition centroids
+        
+        Args:
+            batch_size: vectors per batch
+            
+        Yields:
+            tuple of (embeddings, metadata)
+        """
+        if self.index is None or self.index.ntotal == 0:
+            return
+        rows = faiss.vector_to_array(self.index.id_map)
+        for start in range(0, len(rows), batch_size):
+            batch_rows = rows[start:start + batch_size]
+            yield (self.index.index.reconstruct_n(start, len(batch_rows)),
+                   [self.metadata[row] for row in batch_rows])
+    
+    def delete_embeddings(self, ids: List[str]) -> int:
+        """
+        Remove chunks from the index. Their rows in texts / metadata become None
+        (ids of the remaining vectors don't move) until save_index compacts them away.
+        
+        Args:
+            ids: chunk ids
+            
+        Returns:
+            Number of removed chunks
+        """
+        rows = [self.chunk_rows.pop(chunk_id) for chunk_id in set(ids) if chunk_id in self.chunk_rows]
+        if not rows:
+            return 0
+        self.index.remove_ids(np.asarray(rows, dtype='int64'))
+        removed_by_partition: Dict[str, set] = {}
+        for row in rows:
+            partition = (self.metadata[row] or {}).get("partition")
+            if partition:
+                removed_by_partition.setdefault(partition, set()).add(row)
+            self.texts[row] = None
+            self.metadata[row] = None
+        # Only the partitions that lost rows are rewritten, not the maps of the whole index
+        for partition, removed in removed_by_partition.items():
+            remaining = [row for row in self.partition_ids.get(partition, []) if row not in removed]
+            if remaining:
+                self.partition_ids[partition] = remaining
+            else:
+                self.partition_ids.pop(partition, None)
+        return len(rows)
+    
+    def compact(self) -> int:
+        """
+        Drop the rows of deleted chunks: the remaining vectors get consecutive ids again, so
+        texts / metadata (and the pickles) don't grow with every upsert of a delta run.
+        
+        Returns:
+            Number of dropped rows
+        """
+        removed = self.texts.count(None)
+        if self.index is None or removed == 0:
+            return 0
+        # IndexIDMap2 keeps the flat storage dense; id_map holds the id (old row) of each vector
+        old_rows = faiss.vector_to_array(self.index.id_map)
+        order = np.argsort(old_rows)
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)[order]
+        old_rows = old_rows[order]
+        
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        index.add_with_ids(vectors, np.arange(len(old_rows), dtype='int64'))
+        self.index = index
+        self.texts = [self.texts[row] for row in old_rows]
+        self.metadata = [self.metadata[row] for row in old_rows]
+        self._index_partitions()
+        print(f"Compacted FAISS index: dropped {removed} deleted rows")
+        return removed
+    
     def search(self, query_embedding: np.ndarray, k: int = RagConfig.TOP_K_RESULTS) -> Tuple[List[str], List[float]]:
         """
         Search for similar embeddings
@@ -53,21 +182,70 @@ class FAISSVectorStore:
         Returns:
             tuple of (similar_texts, similarity_scores)
         """
+        similar_texts, similarity_scores, _ = self.search_with_metadata(query_embedding, k)
+        return similar_texts, similarity_scores
+    
+    def search_with_metadata(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = RagConfig.TOP_K_RESULTS,
+        partitions: Optional[List[str]] = None,
+        filters: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[List[str], List[float], List[dict]]:
+        """
+        Search for similar embeddings, optionally only inside the given partitions
+        
+        Args:
+            query_embedding: query embedding vector
+            k: number of top results to return
+            partitions: restrict search to these species/field partitions (None = whole index)
+            filters: metadata key -> accepted values (e.g. {"species": [...]}), applied in the search
+            
+        Returns:
+            tuple of (similar_texts, similarity_scores, metadata)
+        """
         if self.index is None or self.index.ntotal == 0:
-            return [], []
+            return [], [], []
         
         # Normalize query embedding
         query_embedding = query_embedding.reshape(1, -1).astype('float32')
         faiss.normalize_L2(query_embedding)
         
-        # Search
-        scores, indices = self.index.search(query_embedding, k)
+        # Search (IDSelector restricts the scan to the routed partitions / matching metadata)
+        ids = None
+        if partitions:
+            ids = [idx for partition in partitions for idx in self.partition_ids.get(partition, [])]
+        filters = {key: set(values) for key, values in (filters or {}).items() if values}
+        if filters:
+            candidates = ids if ids is not None else range(len(self.metadata))
+            ids = [idx for idx in candidates if self.metadata[idx] is not None
+                   and all(self.metadata[idx].get(key) in values for key, values in filters.items())]
+        params = None
+        if ids is not None:
+            if not ids:
+                return [], [], []
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(np.asarray(ids, dtype='int64')))
+        scores, indices = self.index.search(query_embedding, k, params=params)
         
-        # Get corresponding texts
-        similar_texts = [self.texts[idx] for idx in indices[0] if idx < len(self.texts)]
-        similarity_scores = scores[0].tolist()
+        # Get corresponding texts (FAISS pads missing results with -1)
+        similar_texts, similarity_scores, metadata = [], [], []
+        for score, idx in zip(scores[0], indices[0]):
+            if 0 <= idx < len(self.texts) and self.texts[idx] is not None:
+                similar_texts.append(self.texts[idx])
+                similarity_scores.append(float(score))
+                metadata.append(self.metadata[idx] if idx < len(self.metadata) else {})
         
-        return similar_texts, similarity_scores
+        return similar_texts, similarity_scores, metadata
+    
+    async def asearch_with_metadata(
+        self, 
+        query_embedding: np.ndarray, 
+        k: int = RagConfig.TOP_K_RESULTS,
+        partitions: Optional[List[str]] = None,
+        filters: Optional[Dict[str, List[str]]] = None
+    ) -> Tuple[List[str], List[float], List[dict]]:
+        """Async version of search_with_metadata (the in-memory FAISS search runs in a worker thread)"""
+        return await asyncio.to_thread(self.search_with_metadata, query_embedding, k, partitions, filters)
     
     def save_index(self, filepath: str = None):
         """Save the FAISS index and texts to disk"""
@@ -75,6 +253,7 @@ class FAISSVectorStore:
             filepath = self.index_path
         
         os.makedirs(os.path.dirname(filepath) if os.path.dirname(filepath) else '.', exist_ok=True)
+        self.compact()
         
         # Save FAISS index
         faiss.write_index(self.index, f"{filepath}.index")
@@ -83,6 +262,10 @@ class FAISSVectorStore:
         with open(f"{filepath}_texts.pkl", 'wb') as f:
             pickle.dump(self.texts, f)
         
+        # Save metadata
+        with open(f"{filepath}_metadata.pkl", 'wb') as f:
+            pickle.dump(self.metadata, f)
+        
         print(f"Index saved to {filepath}")
     
     def load_index(self, filepath: str = None):
@@ -98,6 +281,20 @@ class FAISSVectorStore:
             with open(f"{filepath}_texts.pkl", 'rb') as f:
                 self.texts = pickle.load(f)
             
+            # Load metadata (indexes saved before metadata support have none)
+            try:
+                with open(f"{filepath}_metadata.pkl", 'rb') as f:
+                    self.metadata = pickle.load(f)
+            except FileNotFoundError:
+                self.metadata = [{} for _ in self.texts]
+            if not isinstance(self.index, faiss.IndexIDMap2):
+                # Indexes saved before delta ingestion: plain IndexFlatIP, ids are positions
+                flat_index = self.index
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+                self.index.add_with_ids(flat_index.reconstruct_n(0, flat_index.ntotal),
+                                        np.arange(flat_index.ntotal, dtype='int64'))
+            self._index_partitions()
+            
             print(f"Index loaded from {filepath}. Total embeddings: {self.index.ntotal}")
             return True
             
@@ -113,5 +310,5 @@ class FAISSVectorStore:
         return {
             "total_embeddings": self.index.ntotal,
             "dimension": self.dimension,
-            "total_texts": len(self.texts)
+            "total_texts": len(self.texts) - self.texts.count(None)
         }
\ No newline at end of file
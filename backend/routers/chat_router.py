@@ -1,25 +1,55 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status
-from services.ImageService import ImageService
-from services.RagService import RagService
+import json
+import threading
+from typing import List
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from config.rag_config import RagConfig
+from services.ServiceRegistry import registry
+from utils.ProfilingUtils import ProfilingUtils
 
 app_router = APIRouter()
-image_service = ImageService()
-rag_service = RagService()
 
-# Kiểm tra xem có index sẵn chưa
-if not rag_service.load_existing_index():
-    print("No existing index found. Please run with --ingest first.")
+
+def _service(name: str):
+    """Loaded service from the registry; 503 while it is still loading / warming up"""
+    service = registry.get(name)
+    if service is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"The {name} service is not ready yet, please retry shortly."
+        )
+    return service
 
 @app_router.post("/prompt", status_code=status.HTTP_200_OK)
 async def get_answer(
+    request: Request,
+    response: Response,
     message: str = Form(None),
     file: UploadFile = File(None)
 ):
+    # Opt-in profiling (X-Profile-Token header or PROFILING_SAMPLE_RATE): per-stage
+    # timings come back in Server-Timing, stack samples are stored under PROFILING_OUTPUT_DIR
+    profile = ProfilingUtils.start("POST /chat/prompt", request.headers)
+    if profile is None:
+        return await _answer(request, message, file)
+    try:
+        return await _answer(request, message, file)
+    except HTTPException as e:
+        e.headers = {**(e.headers or {}), "Server-Timing": ProfilingUtils.finish(profile)}
+        profile = None
+        raise
+    finally:
+        if profile is not None:
+            response.headers["Server-Timing"] = ProfilingUtils.finish(profile)
+
+
+async def _answer(request: Request, message: str, file: UploadFile):
     try:
         # Trường hợp: chỉ có file
         if file and not message:
             file_bytes = await file.read()
-            result = await image_service.detect_image(file_bytes)
+            result = await _service("image").detect_image(file_bytes)
             return {
                 "message": "Image processed successfully",
                 "prediction": result["predicted_class"],
@@ -28,7 +58,9 @@ async def get_answer(
 
         # Trường hợp: chỉ có message
         elif message and not file:
-            result_rag = rag_service.query(message)
+            result_rag = await _service("rag").aquery(
+                message, user_id=request.client.host if request.client else None
+            )
             if "error" in result_rag:
                 return {
                     "message": "RAG query failed",
@@ -44,8 +76,10 @@ async def get_answer(
         # Trường hợp: có cả file và message
         elif file and message:
             file_bytes = await file.read()
-            result = await image_service.detect_image(file_bytes)
-            result_rag = rag_service.query(message)
+            result = await _service("image").detect_image(file_bytes)
+            result_rag = await _service("rag").aquery(
+                message, user_id=request.client.host if request.client else None
+            )
 
             if "error" in result_rag:
                 return {
@@ -71,6 +105,8 @@ async def get_answer(
                 detail="You must provide either a file or a message."
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error:", e)
         raise HTTPException(
@@ -79,6 +115,66 @@ async def get_answer(
         )
 
 
+@app_router.get("/retrieve", status_code=status.HTTP_200_OK)
+async def retrieve_passages(
+    q: str = Query(..., min_length=1),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(RagConfig.RETRIEVAL_PAGE_SIZE, ge=1, le=RagConfig.RETRIEVAL_MAX_PAGE_SIZE),
+    species: List[str] = Query(None),
+    field: List[str] = Query(None)
+):
+    """
+    Ranked passages for a query without generating an answer (search boxes, related facts).
+    Repeat species / field to filter on several values, e.g. ?q=...&field=Cách xử lý&field=Triệu chứng khi bị cắn
+    """
+    if not q.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The query must not be empty.")
+    result = await _service("rag").aretrieve_passages(q, page=page, page_size=page_size,
+                                                      species=species, fields=field)
+    if "error" in result:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=result["error"])
+    return result
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app_router.post("/prompt/stream")
+async def stream_answer(request: Request, message: str = Form(...)):
+    """
+    Stream the RAG answer as server-sent events:
+    "metadata" (retrieval info, sent before the LLM starts), "queued" (LLM queue position
+    and estimated wait), then "token" events,
+    then "done" or "error". Generation stops when the client disconnects.
+    """
+    cancel = threading.Event()
+    events = _service("rag").stream_query(message, user_id=request.client.host if request.client else None,
+                                          cancel=cancel)
+
+    async def event_stream():
+        try:
+            async for event, data in iterate_in_threadpool(events):
+                if await request.is_disconnected():
+                    print("Client disconnected, stopping generation")
+                    break
+                yield _sse(event, {"text": data} if event == "token" else data)
+        finally:
+            # Disconnected (or the response task was cancelled): the generator may be blocked in a
+            # worker thread, where close() raises; the event stops the LLM queue wait / Gemini stream
+            cancel.set()
+            try:
+                await run_in_threadpool(events.close)
+            except ValueError:
+                pass  # still running in the threadpool; it returns once it sees the event
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
 
 
@@ -93,7 +189,7 @@ async def get_answer(
 
 # # Kiểm tra xem có index sẵn chưa
 # if not rag_service.load_existing_index():
-#     print("No existing index found. Please run with --ingest first.")
+#     print("No existing index found. Please run `python -m scripts.ingest <corpus.json>` first.")
 
 
 # @app_router.post("/prompt", status_code=status.HTTP_200_OK)
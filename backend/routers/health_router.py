@@ -0,0 +1,32 @@
+import os
+import sys
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from services.ServiceRegistry import registry
+from utils.MemoryUtils import MemoryUtils
+
+app_router = APIRouter()
+
+@app_router.get("/live")
+async def live():
+    """Process is up and the event loop responds (models may still be loading)"""
+    return {"status": "alive"}
+
+@app_router.get("/ready")
+async def ready():
+    """200 once every model-backed component is loaded and warmed up, 503 before (or if one failed)"""
+    body = registry.get_status()
+    body["pid"] = os.getpid()  # Which worker answered (multi-worker readiness checks)
+    if not body["ready"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
+
+@app_router.get("/memory")
+async def memory():
+    """Unique / proportional / resident memory of the worker answering, to size workers per node"""
+    body = MemoryUtils.process_memory()
+    body["preloaded"] = bool(registry.preloaded)
+    torch = sys.modules.get("torch")  # Don't import torch just to report on it
+    if torch is not None:
+        body["torch_threads"] = torch.get_num_threads()
+    return body
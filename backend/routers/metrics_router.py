@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Response
+from utils.MetricsUtils import MetricsUtils
+
+app_router = APIRouter()
+
+@app_router.get("", include_in_schema=False)
+async def metrics():
+    body, content_type = MetricsUtils.render()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,103 @@
+"""
+Build (or extend) the RAG index from a JSON / JSONL corpus of species documents.
+
+The corpus is streamed through parse → chunk → embed → upload stages, so memory stays
+bounded for any corpus size, and a checkpoint is written every few batches: re-running
+the same command after a crash resumes where the last checkpoint stopped.
+
+Once a corpus has been ingested, running the command again is a delta ingestion: fields
+are compared with the ingest manifest by content hash, only new or changed fields are
+re-embedded and upserted, and chunks of changed or removed fields are deleted.
+
+Usage (from backend/):
+    python -m scripts.ingest data/snakes.json                 # ingest / resume / delta update
+    python -m scripts.ingest data/updates.jsonl --keep-missing  # partial update file: don't delete other documents
+    python -m scripts.ingest data/snakes.jsonl --restart      # full rebuild (ignore checkpoint and manifest)
+    python -m scripts.ingest data/snakes.json --recreate      # Qdrant: drop and recreate the collection first
+
+A Qdrant full build (no manifest, or --restart) refuses to run into a non-empty collection
+without --recreate: points the new build doesn't overwrite would be returned next to it.
+"""
+import argparse
+import json
+import os
+from config.rag_config import RagConfig
+from rag.document_processor import DocumentProcessor
+from rag.embeddings import EmbeddingGenerator
+from rag.ingest_manifest import IngestManifest
+from rag.ingestion_pipeline import IngestionPipeline
+from rag.partition_router import PartitionRouter
+from rag.reranker import CrossEncoderReranker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a JSON / JSONL corpus into the RAG index")
+    parser.add_argument("corpus", help="Corpus file: .json (array of documents) or .jsonl (one document per line)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Ignore the checkpoint and the manifest, ingest the whole corpus from the beginning")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="Delta ingestion: keep documents / fields that are not in this corpus file")
+    parser.add_argument("--recreate", action="store_true",
+                        help="Qdrant only: delete and recreate the collection before ingesting (implies --restart)")
+    parser.add_argument("--batch-size", type=int, default=RagConfig.INGEST_BATCH_SIZE, help="Chunks per embed / upload batch")
+    parser.add_argument("--checkpoint", default=RagConfig.INGEST_CHECKPOINT_PATH, help="Checkpoint file")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.corpus):
+        parser.error(f"corpus file not found: {args.corpus}")
+    if args.recreate and not RagConfig.USE_QDRANT:
+        parser.error("--recreate only applies to Qdrant (RagConfig.USE_QDRANT)")
+    restart = args.restart or args.recreate
+
+    embedding_generator = EmbeddingGenerator()
+    reranker = None
+    if RagConfig.USE_RERANKING:
+        try:
+            reranker = CrossEncoderReranker(RagConfig.CROSS_ENCODER_MODEL)
+        except Exception as e:
+            print(f"Warning: Failed to initialize re-ranker ({e}), passages will not be pre-tokenized")
+
+    if RagConfig.USE_QDRANT:
+        from rag.qdrant_vector_store import QdrantVectorStore
+        vector_store = QdrantVectorStore()
+    else:
+        from rag.vector_store import FAISSVectorStore
+        vector_store = FAISSVectorStore()
+    partition_router = PartitionRouter(store=vector_store)
+    manifest = IngestManifest()
+    pipeline = IngestionPipeline(
+        embedding_generator, vector_store, DocumentProcessor(),
+        partition_router=partition_router, reranker=reranker, manifest=manifest,
+        batch_size=args.batch_size, checkpoint_path=args.checkpoint
+    )
+
+    checkpoint = None if restart else pipeline.load_checkpoint(args.corpus)
+    if checkpoint is not None and not checkpoint.get("completed"):
+        # Continue from the state saved together with the checkpoint
+        if not RagConfig.USE_QDRANT and not vector_store.load_index():
+            parser.error(f"checkpoint {args.checkpoint} found but no saved FAISS index; use --restart")
+        partition_router.load()
+        stats = pipeline.run(args.corpus, resume=True)
+    elif not restart and manifest.load() and len(manifest):
+        # Index already built: only re-embed what changed
+        if not RagConfig.USE_QDRANT and not vector_store.load_index():
+            parser.error("ingest manifest found but no saved FAISS index; use --restart")
+        partition_router.load()
+        stats = pipeline.run_delta(args.corpus, prune=not args.keep_missing)
+    else:
+        # Full build: the FAISS index, partition centroids and manifest are rebuilt from the corpus.
+        # Qdrant points are only overwritten when their chunk id is produced again, so points of an
+        # older build (random ids, or fields no longer in the corpus) would stay searchable
+        if args.recreate:
+            vector_store.create_index()
+        elif RagConfig.USE_QDRANT:
+            existing = vector_store.get_stats()["total_embeddings"]
+            if existing:
+                parser.error(f"Qdrant collection '{vector_store.collection_name}' already holds {existing} points; "
+                             "a full build would leave the ones it doesn't overwrite searchable, use --recreate")
+        stats = pipeline.run(args.corpus, resume=False)
+    print(json.dumps(stats, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Apply the HNSW / scalar quantization / on-disk settings from RagConfig to an existing
+Qdrant collection without re-ingesting.
+
+Usage (from backend/):
+    python -m scripts.migrate_qdrant_collection            # apply
+    python -m scripts.migrate_qdrant_collection --dry-run  # show current vs target config
+"""
+import argparse
+import json
+from config.rag_config import RagConfig
+from rag.qdrant_vector_store import QdrantVectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate Qdrant collection config to RagConfig settings")
+    parser.add_argument("--dry-run", action="store_true", help="Only print current and target config")
+    args = parser.parse_args()
+
+    store = QdrantVectorStore()
+
+    target = {
+        "on_disk": RagConfig.QDRANT_ON_DISK_VECTORS,
+        "hnsw_m": RagConfig.QDRANT_HNSW_M,
+        "hnsw_ef_construct": RagConfig.QDRANT_HNSW_EF_CONSTRUCT,
+        "quantization": "ScalarQuantization" if RagConfig.QDRANT_USE_QUANTIZATION else None
+    }
+
+    if args.dry_run:
+        print("Current config:")
+        print(json.dumps(store._describe_collection_config(), indent=2, ensure_ascii=False))
+        print("Target config:")
+        print(json.dumps(target, indent=2, ensure_ascii=False))
+        return
+
+    result = store.apply_collection_config()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
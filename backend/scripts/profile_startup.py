@@ -0,0 +1,147 @@
+"""
+Profile cold-start import time with `python -X importtime` and fail when it regresses.
+
+Each run imports the target module in a fresh interpreter, so nothing is cached in
+sys.modules; the fastest of --repeat runs is kept to smooth out disk / CPU noise.
+Heavy backends (torch, sentence_transformers, faiss, qdrant_client, google.genai) must
+only load on first use of the component that needs them: importing one of the
+--forbid modules at startup is reported as a failure as well.
+
+Usage (from backend/):
+    python -m scripts.profile_startup                                   # profile main, print top imports
+    python -m scripts.profile_startup --max-ms 1500                     # fail above an absolute budget
+    python -m scripts.profile_startup --write-baseline startup.json     # record the current numbers
+    python -m scripts.profile_startup --baseline startup.json --tolerance 0.2   # fail on >20% regression
+    python -m scripts.profile_startup --module routers.auth_router --forbid torch motor
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+DEFAULT_FORBIDDEN = ["torch", "torchvision", "sentence_transformers", "faiss", "qdrant_client", "google.genai"]
+
+
+def parse_importtime(stderr: str) -> Dict[str, dict]:
+    """
+    Parse `-X importtime` output.
+
+    Args:
+        stderr: Stderr of the profiled interpreter
+
+    Returns:
+        Dict module name -> {"self_us", "cumulative_us", "depth"} (first import of each module)
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        modules.setdefault(stripped, {
+            "self_us": int(fields[0]),
+            "cumulative_us": int(fields[1]),
+            "depth": (len(name) - len(stripped)) // 2
+        })
+    return modules
+
+
+def profile_once(module: str) -> dict:
+    """Import `module` in a fresh interpreter and return its import profile"""
+    env = dict(os.environ)
+    # config.database refuses to import without these; no connection is made at import time
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    env.setdefault("DATABASE_NAME", "profile_startup")
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=False
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.splitlines()[-15:])
+        raise RuntimeError(f"import {module} failed (exit {result.returncode}):\n{tail}")
+
+    modules = parse_importtime(result.stderr)
+    # Top-level entries (depth 0) partition the whole import graph
+    total_us = sum(m["cumulative_us"] for m in modules.values() if m["depth"] == 0)
+    return {"wall_ms": wall_ms, "import_ms": total_us / 1000, "modules": modules}
+
+
+def forbidden_imports(modules: Dict[str, dict], forbidden: List[str]) -> List[str]:
+    """Forbidden packages (or any of their submodules) that were imported"""
+    return [name for name in forbidden
+            if any(m == name or m.startswith(name + ".") for m in modules)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile startup import time and check it against a budget")
+    parser.add_argument("--module", default="main", help="Module whose import is profiled")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh-interpreter runs; the fastest is kept")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports to print")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail when import time exceeds this budget")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON written by --write-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed regression over the baseline as a fraction (0.25 = +25%%)")
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN,
+                        help="Packages that must not be imported at startup (pass no value to disable)")
+    parser.add_argument("--write-baseline", default=None, help="Write the measured numbers to this JSON file")
+    args = parser.parse_args()
+
+    try:
+        runs = [profile_once(args.module) for _ in range(max(1, args.repeat))]
+    except RuntimeError as e:
+        print(e)
+        sys.exit(2)
+    best = min(runs, key=lambda run: run["import_ms"])
+    modules = best["modules"]
+
+    print(f"import {args.module}: {best['import_ms']:.1f} ms imports, {best['wall_ms']:.1f} ms wall "
+          f"(best of {len(runs)}), {len(modules)} modules")
+    slowest = sorted(modules.items(), key=lambda item: item[1]["cumulative_us"], reverse=True)
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, m in slowest[:args.top]:
+        print(f"{m['cumulative_us'] / 1000:>14.1f} {m['self_us'] / 1000:>9.1f}  {'  ' * m['depth']}{name}")
+
+    failures = []
+    loaded = forbidden_imports(modules, args.forbid or [])
+    if loaded:
+        failures.append(f"heavy backends imported at startup: {', '.join(loaded)}")
+    if args.max_ms is not None and best["import_ms"] > args.max_ms:
+        failures.append(f"import time {best['import_ms']:.1f} ms exceeds budget {args.max_ms:.1f} ms")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("module") != args.module:
+            print(f"Warning: baseline was recorded for {baseline.get('module')}, not {args.module}")
+        limit = baseline["import_ms"] * (1 + args.tolerance)
+        print(f"baseline {baseline['import_ms']:.1f} ms, limit {limit:.1f} ms (+{args.tolerance:.0%})")
+        if best["import_ms"] > limit:
+            failures.append(f"import time {best['import_ms']:.1f} ms regressed beyond {limit:.1f} ms")
+
+    if args.write_baseline:
+        with open(args.write_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "module": args.module,
+                "import_ms": round(best["import_ms"], 1),
+                "wall_ms": round(best["wall_ms"], 1),
+                "modules": len(modules),
+                "python": sys.version.split()[0]
+            }, f, indent=2)
+        print(f"Baseline written to {args.write_baseline}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
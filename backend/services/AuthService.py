@@ -2,6 +2,7 @@ from fastapi.security import OAuth2PasswordBearer, APIKeyCookie
 from fastapi import HTTPException, status, Depends
 from datetime import timedelta,datetime
 from utils.AuthUtlis import AuthUtils
+from utils.MetricsUtils import MetricsUtils
 from pydantics.token import Token, AccessToken
 from config.database import db
 from dotenv import load_dotenv
@@ -14,7 +15,8 @@ api_key_cookie = APIKeyCookie(name="refresh_token", auto_error=False)
 
 class AuthService:
     async def get_token(email: str, password: str) -> Token:
-        user = await db["users"].find_one({"email": email})
+        with MetricsUtils.time_mongo("users", "find_one"):
+            user = await db["users"].find_one({"email": email})
 
         if user is None or not AuthUtils.verify_password(password, user['password']):
             raise HTTPException(
@@ -27,7 +29,8 @@ class AuthService:
         access_token = AuthUtils.create_token(data={"email": user['email']}, expires_delta=access_token_expires)
         refresh_token_expires = int(os.getenv("REFRESH_TOKEN_EXPIRE_SECOND"))  
         refresh_token = AuthUtils.create_token(data={"email": user['email']}, expires_delta=refresh_token_expires)
-        result = await db["refresh_token"].insert_one({"user_id": user["_id"], "token": refresh_token, "create_at": datetime.utcnow(), "expires_at": datetime.utcnow() + timedelta(days=7)})
+        with MetricsUtils.time_mongo("refresh_token", "insert_one"):
+            result = await db["refresh_token"].insert_one({"user_id": user["_id"], "token": refresh_token, "create_at": datetime.utcnow(), "expires_at": datetime.utcnow() + timedelta(days=7)})
 
         if not result.inserted_id:
             raise HTTPException(
@@ -66,7 +69,8 @@ class AuthService:
         if email is None:
             raise credentials_exception
         
-        user = await db["users"].find_one({"email": email})
+        with MetricsUtils.time_mongo("users", "find_one"):
+            user = await db["users"].find_one({"email": email})
 
         if user is None:
             raise credentials_exception
@@ -75,7 +79,8 @@ class AuthService:
         access_token = AuthUtils.create_token(data={"email": user['email']}, expires_delta=access_token_expires)
         return AccessToken(access_token=access_token)
     async def register_user(email: str, password: str):
-        existing_user = await db["users"].find_one({"email": email})
+        with MetricsUtils.time_mongo("users", "find_one"):
+            existing_user = await db["users"].find_one({"email": email})
 
         if existing_user:
             raise HTTPException(
@@ -84,7 +89,8 @@ class AuthService:
             )
             
         hashed_password = AuthUtils.hash_password(password)
-        result = await db["users"].insert_one({"email": email, "password": hashed_password, "role": "user", "create_at": datetime.utcnow(), "update_at": datetime.utcnow()})
+        with MetricsUtils.time_mongo("users", "insert_one"):
+            result = await db["users"].insert_one({"email": email, "password": hashed_password, "role": "user", "create_at": datetime.utcnow(), "update_at": datetime.utcnow()})
         return result.inserted_id
     async def verify_refresh_token(refresh_token: Annotated[str, Depends(api_key_cookie)]) -> str:
         credentials_exception = HTTPException(
@@ -116,7 +122,8 @@ class AuthService:
         if email is None:
             raise credentials_exception
 
-        result = await db["refresh_token"].delete_many({"token": refresh_token})
+        with MetricsUtils.time_mongo("refresh_token", "delete_many"):
+            result = await db["refresh_token"].delete_many({"token": refresh_token})
 
         if result.deleted_count == 0:
             raise credentials_exception
@@ -131,9 +138,10 @@ class AuthService:
             )
         
         hashed_new_password = AuthUtils.hash_password(new_password)
-        result = await db["users"].update_one(
-            {"email": current_user['email']},
-            {"$set": {"password": hashed_new_password}}
-        )
+        with MetricsUtils.time_mongo("users", "update_one"):
+            result = await db["users"].update_one(
+                {"email": current_user['email']},
+                {"$set": {"password": hashed_new_password}}
+            )
         return result.modified_count
     
\ No newline at end of file
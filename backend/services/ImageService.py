@@ -1,4 +1,6 @@
+import asyncio
 import os
+import time
 import torch
 import torch.nn as nn
 from torchvision import transforms
@@ -6,6 +8,8 @@ from torchvision.models import convnext_tiny
 from PIL import Image
 from io import BytesIO
 import gdown  
+from rag.inference_runtime import inference_runtime, PRIORITY_INTERACTIVE
+from utils.MetricsUtils import MetricsUtils, IMAGE_PREDICTIONS
 
 class ImageService:
     def __init__(self):
@@ -14,6 +18,7 @@ class ImageService:
 
         self.model_dir = os.path.join(os.getcwd(), "weights")
         self.model_path = os.path.join(self.model_dir, "convnext_tiny_best.pth")
+        self.model_version = os.path.splitext(os.path.basename(self.model_path))[0]  # Label của metrics
         self.class_names_path = os.path.join(os.getcwd(), "classes.txt")
         self.model_url = os.getenv("MODEL_URL")
         # ====== Create storge save model ======
@@ -44,6 +49,7 @@ class ImageService:
 
         self.model = self.model.to(self.device)
         self.model.eval()
+        inference_runtime.register("image")
         print("Model đã sẵn sàng để sử dụng!")
 
         # ======Transform======
@@ -56,19 +62,36 @@ class ImageService:
             )
         ])
 
-    async def detect_image(self, file_bytes: bytes):
-        """Nhận bytes ảnh, dự đoán class, trả về kết quả"""
-        try:
+    def warm_up(self) -> float:
+        """Chạy một lần suy luận với ảnh rỗng để khởi tạo kernel trước request đầu tiên, trả về thời gian (ms)"""
+        start = time.perf_counter()
+        with inference_runtime.slot("image"), torch.no_grad():
+            self.model(torch.zeros(1, 3, 224, 224, device=self.device))
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    def _predict(self, file_bytes: bytes, priority: int):
+        """Decode + suy luận (chạy trong worker thread), trả về (chỉ số class, xác suất các class)"""
+        with MetricsUtils.time_image_stage("decode", self.model_version):
             img = Image.open(BytesIO(file_bytes)).convert("RGB")
             img_tensor = self.transform(img).unsqueeze(0).to(self.device)
 
-            with torch.no_grad():
-                outputs = self.model(img_tensor)
-                probs = torch.softmax(outputs, dim=1)
-                pred_idx = torch.argmax(probs, dim=1).item()
+        # Chờ lane của ConvNeXt trong ngân sách CPU chung (request chat ưu tiên hơn ảnh chạy hàng loạt)
+        with inference_runtime.slot("image", priority), \
+                MetricsUtils.time_image_stage("infer", self.model_version), torch.no_grad():
+            outputs = self.model(img_tensor)
+            probs = torch.softmax(outputs, dim=1)
+            pred_idx = torch.argmax(probs, dim=1).item()
+        return pred_idx, probs
+
+    async def detect_image(self, file_bytes: bytes, priority: int = PRIORITY_INTERACTIVE):
+        """Nhận bytes ảnh, dự đoán class, trả về kết quả (priority: PRIORITY_BULK cho xử lý ảnh hàng loạt)"""
+        try:
+            # Decode và suy luận không chạy trên event loop
+            pred_idx, probs = await asyncio.to_thread(self._predict, file_bytes, priority)
 
             pred_class = self.class_names[pred_idx]
             pred_prob = round(probs[0][pred_idx].item(), 4)
+            IMAGE_PREDICTIONS.labels(model=self.model_version, outcome="ok").inc()
 
             return {
                 "predicted_class": pred_class,
@@ -76,4 +99,5 @@ class ImageService:
             }
 
         except Exception as e:
+            IMAGE_PREDICTIONS.labels(model=self.model_version, outcome="error").inc()
             raise RuntimeError(f"Lỗi khi dự đoán ảnh: {str(e)}")
@@ -1,50 +1,154 @@
-from typing import List, Dict, Any
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterator, Tuple
 from rag.embeddings import EmbeddingGenerator
-from rag.vector_store import FAISSVectorStore
-from rag.qdrant_vector_store import QdrantVectorStore
 from rag.llm import GeminiLLM
 from rag.document_processor import DocumentProcessor
 from rag.reranker import CrossEncoderReranker
+from rag.rerank_cascade import AdaptiveRerankCascade
+from rag.deadline import Deadline
+from rag.context_assembler import ContextAssembler, build_token_counter
+from rag.answer_cache import SemanticAnswerCache
+from rag.async_runtime import StageExecutors
+from rag.inference_runtime import inference_runtime
+from rag.llm_scheduler import LLMAdmissionScheduler, LLMQueueCancelledError, LLMQueueFullError, LLMQueueTimeoutError
+from rag.partition_router import PartitionRouter
 from config.rag_config import RagConfig
+from utils.MetricsUtils import MetricsUtils
 
 class RagService:
     """Main RAG Pipeline orchestrator"""
     
-    def __init__(self):
-        """Initialize all components of the RAG pipeline"""
+    def __init__(self, models: Dict[str, Any] = None):
+        """
+        Initialize all components of the RAG pipeline
+        
+        Args:
+            models: Already loaded models to reuse instead of loading them (pre-fork sharing, see
+                    ServiceRegistry.preload): "embedding" -> EmbeddingGenerator,
+                    cross-encoder model name -> CrossEncoderReranker
+        """
         print("Initializing RAG Pipeline...")
+        models = models or {}
         
-        # Initialize components
-        self.embedding_generator = EmbeddingGenerator()
+        def load(key, factory, *args):
+            return models[key] if key in models else factory(*args)
         
-        # Choose vector store based on RagConfig
-        if RagConfig.USE_QDRANT:
-            print("Using Qdrant Cloud as vector store...")
-            self.vector_store = QdrantVectorStore()
-        else:
-            print("Using FAISS as vector store...")
-            self.vector_store = FAISSVectorStore()
+        # Load the independent components concurrently: model weights, Qdrant handshake and the
+        # Gemini client don't depend on each other, and torch / network I/O release the GIL
+        rerank_models = self.rerank_model_names()
+        with ThreadPoolExecutor(max_workers=3 + len(rerank_models), thread_name_prefix="rag-init") as pool:
+            embedding_future = pool.submit(load, "embedding", EmbeddingGenerator)
+            vector_store_future = pool.submit(self._create_vector_store)
+            llm_future = pool.submit(GeminiLLM)
+            reranker_futures = [pool.submit(load, model, self._create_reranker, model) for model in rerank_models]
         
-        self.llm = GeminiLLM()
+        self.embedding_generator = embedding_future.result()
+        self.vector_store = vector_store_future.result()
+        self.llm = llm_future.result()
+        self.llm_scheduler = LLMAdmissionScheduler()
+        self.llm.scheduler = self.llm_scheduler
         self.document_processor = DocumentProcessor()
+        self.partition_router = PartitionRouter(store=self.vector_store)
         
-        # Initialize re-ranker if enabled
-        self.reranker = None
-        if RagConfig.USE_RERANKING:
-            try:
-                print("Initializing cross-encoder re-ranker...")
-                self.reranker = CrossEncoderReranker(RagConfig.CROSS_ENCODER_MODEL)
-                print("Re-ranker initialized successfully!")
-            except Exception as e:
-                print(f"Warning: Failed to initialize re-ranker: {e}")
-                print("Continuing without re-ranking...")
-                RagConfig.USE_RERANKING = False
+        # Re-ranker (and the small cross-encoder of the cascade) if enabled
+        self.reranker = reranker_futures[0].result() if reranker_futures else None
+        self.rerank_cascade = None
+        if RagConfig.USE_RERANKING and self.reranker is None:
+            print("Continuing without re-ranking...")
+            RagConfig.USE_RERANKING = False
+        
+        if RagConfig.USE_RERANKING and RagConfig.USE_RERANK_CASCADE:
+            small_reranker = reranker_futures[1].result()
+            if small_reranker is None:
+                print("Cascade will only skip reranking on decisive dense margins...")
+            self.rerank_cascade = AdaptiveRerankCascade(self.reranker, small_reranker)
+        
+        self.answer_cache = SemanticAnswerCache() if RagConfig.USE_ANSWER_CACHE else None
+        self.stage_executors = StageExecutors()  # Bounded pools for the CPU stages of aquery
+        
+        self.context_assembler = None
+        if RagConfig.USE_CONTEXT_COMPACTION:
+            count_tokens, tokenizer_name = build_token_counter(self.embedding_generator.model.tokenizer)
+            self.context_assembler = ContextAssembler(count_tokens, tokenizer_name)
+            print(f"Context compaction enabled (budget {RagConfig.CONTEXT_TOKEN_BUDGET} tokens, tokenizer: {tokenizer_name})")
         
         # Pipeline state
         self.is_indexed = False
+        self.index_version = 0  # Bumped whenever the index changes; scopes cached answers
+        self._retrieval_cache = OrderedDict()  # (query, filters, index_version) -> (ranking, expiry); event loop only
         
         print("RAG Pipeline initialized successfully!")
     
+    @staticmethod
+    def _create_vector_store():
+        """Vector store chosen by RagConfig"""
+        # Only the configured backend (qdrant_client or faiss) is imported
+        if RagConfig.USE_QDRANT:
+            from rag.qdrant_vector_store import QdrantVectorStore
+            print(f"Using Qdrant ({RagConfig.QDRANT_MODE}) as vector store...")
+            return QdrantVectorStore()
+        from rag.vector_store import FAISSVectorStore
+        print("Using FAISS as vector store...")
+        return FAISSVectorStore()
+    
+    @staticmethod
+    def rerank_model_names() -> List[str]:
+        """Cross-encoders the pipeline loads with the current RagConfig"""
+        if not RagConfig.USE_RERANKING:
+            return []
+        if RagConfig.USE_RERANK_CASCADE:
+            return [RagConfig.CROSS_ENCODER_MODEL, RagConfig.CROSS_ENCODER_SMALL_MODEL]
+        return [RagConfig.CROSS_ENCODER_MODEL]
+    
+    @staticmethod
+    def _create_reranker(model_name: str):
+        """Load a cross-encoder; None (with a warning) if it can't be loaded"""
+        try:
+            print(f"Initializing cross-encoder re-ranker {model_name}...")
+            reranker = CrossEncoderReranker(model_name)
+            print(f"Re-ranker {model_name} initialized successfully!")
+            return reranker
+        except Exception as e:
+            print(f"Warning: Failed to initialize re-ranker {model_name}: {e}")
+            return None
+    
+    def warm_up(self) -> Dict[str, float]:
+        """
+        Run one inference per model (and one search) so lazy kernel / allocator initialization
+        and first-connection costs are paid before the first real request
+        
+        Returns:
+            Warm-up time per component in ms
+        """
+        timings = {}
+        
+        start = time.perf_counter()
+        embedding = self.embedding_generator.generate_single_embedding("warm up")
+        timings["embedding"] = (time.perf_counter() - start) * 1000
+        
+        rerankers = {"cross_encoder": self.reranker}
+        if self.rerank_cascade is not None:
+            rerankers["cross_encoder_small"] = self.rerank_cascade.small
+        for name, reranker in rerankers.items():
+            if reranker is not None:
+                start = time.perf_counter()
+                reranker.predict_scores("warm up", ["warm up passage"])
+                timings[name] = (time.perf_counter() - start) * 1000
+        
+        if self.is_indexed:
+            start = time.perf_counter()
+            self.vector_store.search_with_metadata(embedding, 1)
+            timings["vector_store"] = (time.perf_counter() - start) * 1000
+        
+        return {name: round(ms, 1) for name, ms in timings.items()}
+    
+    def close(self):
+        """Stop the stage executor pools"""
+        self.stage_executors.shutdown()
+    
     def ingest_documents(self, documents: List[str]) -> Dict[str, Any]:
         """
         Ingest documents into the RAG pipeline
@@ -71,7 +175,9 @@ class RagService:
         
         # Generate embeddings for all chunks
         print("Generating embeddings...")
-        embeddings = self.embedding_generator.generate_embeddings(all_chunks)
+        MetricsUtils.observe_batch("embed_ingest", len(all_chunks))
+        with MetricsUtils.time_stage("embed_ingest"):
+            embeddings = self.embedding_generator.generate_embeddings(all_chunks)
         
         # Add to vector store
         print("Adding embeddings to vector store...")
@@ -81,6 +187,7 @@ class RagService:
         self.vector_store.save_index()
         
         self.is_indexed = True
+        self._bump_index_version()
         
         stats = {
             "total_documents": len(documents),
@@ -107,10 +214,11 @@ class RagService:
         print(f"Starting metadata-level document ingestion for {len(documents)} entities...")
         
         # Process all documents with metadata context
-        all_chunks = self.document_processor.process_document_with_metadata(
+        all_chunks, chunk_metadata = self.document_processor.process_document_with_metadata(
             documents=documents,
             name_field=name_field,
-            metadata_fields=metadata_fields
+            metadata_fields=metadata_fields,
+            return_metadata=True
         )
         
         total_chunks = len(all_chunks)
@@ -118,28 +226,60 @@ class RagService:
         
         # Generate embeddings for all chunks
         print("Generating embeddings...")
-        embeddings = self.embedding_generator.generate_embeddings(all_chunks)
+        MetricsUtils.observe_batch("embed_ingest", len(all_chunks))
+        with MetricsUtils.time_stage("embed_ingest"):
+            embeddings = self.embedding_generator.generate_embeddings(all_chunks)
         
-        # Add to vector store
+        # Pre-tokenize passages for the cross-encoder so queries don't re-tokenize them
+        if self.reranker is not None:
+            print("Pre-tokenizing passages for the cross-encoder...")
+            self._attach_passage_tokens(all_chunks, chunk_metadata)
+        
+        # Add to vector store (species/field metadata is stored with each chunk)
         print("Adding embeddings to vector store...")
-        self.vector_store.add_embeddings(embeddings, all_chunks)
+        self.vector_store.add_embeddings(embeddings, all_chunks, chunk_metadata)
         
         # Save the index
         self.vector_store.save_index()
         
+        # Species / partition centroids for hierarchical routing
+        self.partition_router.add(embeddings, chunk_metadata)
+        self.partition_router.save()
+        
         self.is_indexed = True
+        self._bump_index_version()
         
         stats = {
             "total_documents": len(documents),
             "total_chunks": total_chunks,
             "total_embeddings": len(embeddings),
             "vector_store_stats": self.vector_store.get_stats(),
+            "partition_stats": self.partition_router.get_stats(),
             "metadata_fields": metadata_fields
         }
         
         print("Metadata-level document ingestion completed!")
         return stats
     
+    def _attach_passage_tokens(self, chunks: List[str], chunk_metadata: List[Dict]):
+        """Store cross-encoder token ids (and the tokenizer they belong to) in each chunk's metadata"""
+        signature = self.reranker.tokenizer_signature
+        token_ids = self.reranker.tokenize_passages(chunks)
+        for metadata, ids in zip(chunk_metadata, token_ids):
+            metadata["ce_token_ids"] = ids
+            metadata["ce_tokenizer"] = signature
+    
+    def _cached_passage_tokens(self, metadata: List[Dict]) -> List:
+        """Cached cross-encoder token ids per retrieved chunk (None if missing or from another tokenizer)"""
+        signature = self.reranker.tokenizer_signature
+        return [m.get("ce_token_ids") if m.get("ce_tokenizer") == signature else None for m in metadata]
+    
+    def _bump_index_version(self):
+        """Invalidate cached answers after the index changed"""
+        self.index_version += 1
+        if self.answer_cache is not None:
+            self.answer_cache.clear()
+    
     def load_existing_index(self) -> bool:
         """
         Load existing vector index from disk
@@ -151,43 +291,146 @@ class RagService:
         success = self.vector_store.load_index()
         if success:
             self.is_indexed = True
+            self._bump_index_version()
+            if RagConfig.USE_PARTITION_ROUTING and not self.partition_router.load():
+                print("⚠️  WARNING: the index has vectors but no partition centroids; every query will use "
+                      "global search until scripts.ingest is re-run on the corpus (a delta run publishes them)")
             print("Existing index loaded successfully!")
         else:
             print("No existing index found.")
         return success
     
-    def query(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS) -> Dict[str, Any]:
+    def retrieve_context(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS,
+                         deadline: Deadline = None, query_embedding=None) -> Dict[str, Any]:
         """
-        Query the RAG pipeline with optional re-ranking
+        Run the retrieval half of the pipeline (embedding, routing, search, re-ranking) without the LLM
         
         Args:
             question: User's question
             top_k: Number of top similar chunks to retrieve (overridden if re-ranking is enabled)
+            deadline: Request deadline shared with the LLM stage (None = no deadline)
+            query_embedding: Precomputed query embedding (generated here if None)
             
         Returns:
-            Dictionary containing the response and metadata
+            Dictionary with the selected context and its metadata, or an "error" key
         """
+        deadline = deadline or Deadline(None)
+        
         if not self.is_indexed:
-            return {
-                "response": "Error: No documents have been indexed yet. Please ingest documents first.",
-                "context": [],
-                "similarity_scores": [],
-                "error": "No index available"
-            }
+            return self._not_indexed_result()
         
         print(f"Processing query: {question}")
         
         # Generate embedding for the query
-        print("Generating query embedding...")
-        query_embedding = self.embedding_generator.generate_single_embedding(question)
+        if query_embedding is None:
+            query_embedding = self._embed_query(question, deadline)
+        
+        retrieval_k, routing = self._plan_retrieval(query_embedding, top_k, deadline)
         
+        # Stage 2: search for similar chunks (inside the routed partitions if any)
+        print(f"Searching for relevant context (retrieving top {retrieval_k}, routing: {routing['reason']})...")
+        with MetricsUtils.time_stage("search"):
+            similar_texts, similarity_scores, similar_metadata = self.vector_store.search_with_metadata(
+                query_embedding, retrieval_k, partitions=routing["partitions"]
+            )
+        
+        if self._needs_global_fallback(routing, similar_texts, retrieval_k, deadline):
+            with MetricsUtils.time_stage("search"):
+                similar_texts, similarity_scores, similar_metadata = self.vector_store.search_with_metadata(
+                    query_embedding, retrieval_k
+                )
+        
+        deadline.mark("retrieval")
+        return self._finish_retrieval(question, top_k, deadline, routing,
+                                      similar_texts, similarity_scores, similar_metadata)
+    
+    async def aretrieve_context(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS,
+                                deadline: Deadline = None, query_embedding=None) -> Dict[str, Any]:
+        """
+        Async version of retrieve_context: the vector search uses the store's async client,
+        embedding and re-ranking run in the bounded stage executors
+        
+        Returns:
+            Dictionary with the selected context and its metadata, or an "error" key
+        """
+        deadline = deadline or Deadline(None)
+        
+        if not self.is_indexed:
+            return self._not_indexed_result()
+        
+        print(f"Processing query: {question}")
+        
+        if query_embedding is None:
+            query_embedding = await self.stage_executors.run("embedding", self._embed_query, question, deadline)
+        
+        retrieval_k, routing = self._plan_retrieval(query_embedding, top_k, deadline)
+        
+        print(f"Searching for relevant context (retrieving top {retrieval_k}, routing: {routing['reason']})...")
+        with MetricsUtils.time_stage("search"):
+            similar_texts, similarity_scores, similar_metadata = await self.vector_store.asearch_with_metadata(
+                query_embedding, retrieval_k, partitions=routing["partitions"]
+            )
+        
+        if self._needs_global_fallback(routing, similar_texts, retrieval_k, deadline):
+            with MetricsUtils.time_stage("search"):
+                similar_texts, similarity_scores, similar_metadata = await self.vector_store.asearch_with_metadata(
+                    query_embedding, retrieval_k
+                )
+        
+        deadline.mark("retrieval")
+        return await self.stage_executors.run(
+            "rerank", self._finish_retrieval, question, top_k, deadline, routing,
+            similar_texts, similarity_scores, similar_metadata
+        )
+    
+    @staticmethod
+    def _not_indexed_result() -> Dict[str, Any]:
+        return {
+            "response": "Error: No documents have been indexed yet. Please ingest documents first.",
+            "context": [],
+            "similarity_scores": [],
+            "error": "No index available"
+        }
+    
+    def _plan_retrieval(self, query_embedding, top_k: int, deadline: Deadline) -> Tuple[int, Dict[str, Any]]:
+        """
+        Number of candidates to retrieve and the partitions to search
+        
+        Returns:
+            tuple of (retrieval_k, routing)
+        """
         # Determine how many candidates to retrieve
         retrieval_k = RagConfig.RERANK_TOP_K if RagConfig.USE_RERANKING else top_k
+        if retrieval_k > RagConfig.DEADLINE_REDUCED_RETRIEVAL_K and not deadline.can_afford(
+                RagConfig.DEADLINE_RETRIEVAL_ESTIMATE_MS, reserve_ms=RagConfig.DEADLINE_LLM_RESERVE_MS):
+            deadline.degrade("reduced_candidates", retrieval_k=RagConfig.DEADLINE_REDUCED_RETRIEVAL_K,
+                             requested_k=retrieval_k)
+            retrieval_k = RagConfig.DEADLINE_REDUCED_RETRIEVAL_K
         
-        # Search for similar chunks
-        print(f"Searching for relevant context (retrieving top {retrieval_k})...")
-        similar_texts, similarity_scores = self.vector_store.search(query_embedding, retrieval_k)
-        
+        # Stage 1: route to the closest species/field partitions (None = global search)
+        routing = {"partitions": None, "reason": "disabled"}
+        if RagConfig.USE_PARTITION_ROUTING:
+            routing = self.partition_router.route(query_embedding, retrieval_k)
+        return retrieval_k, routing
+    
+    @staticmethod
+    def _needs_global_fallback(routing: Dict[str, Any], similar_texts: List[str], retrieval_k: int,
+                               deadline: Deadline, reserve_ms: float = RagConfig.DEADLINE_LLM_RESERVE_MS) -> bool:
+        """Whether a routed search that returned too few chunks should be repeated globally"""
+        if not routing["partitions"] or len(similar_texts) >= retrieval_k:
+            return False
+        if similar_texts and not deadline.can_afford(RagConfig.DEADLINE_RETRIEVAL_ESTIMATE_MS, reserve_ms=reserve_ms):
+            deadline.degrade("global_fallback_skipped", routed_results=len(similar_texts))
+            return False
+        # Partitions unknown to the store (e.g. index built before partition metadata)
+        print("Routed search returned too few chunks, falling back to global search...")
+        routing["reason"] = "fallback_global"
+        return True
+    
+    def _finish_retrieval(self, question: str, top_k: int, deadline: Deadline, routing: Dict[str, Any],
+                          similar_texts: List[str], similarity_scores: List[float],
+                          similar_metadata: List[dict]) -> Dict[str, Any]:
+        """Re-rank the search results and assemble the LLM context (CPU-bound part of retrieval)"""
         if not similar_texts:
             return {
                 "response": "I couldn't find any relevant information to answer your question.",
@@ -203,19 +446,52 @@ class RagService:
         final_scores = similarity_scores
         rerank_info = {}
         
-        if RagConfig.USE_RERANKING and self.reranker is not None:
+        # How many passages the large cross-encoder can score before the LLM reserve is reached
+        max_large_passages = None
+        if RagConfig.USE_RERANKING and self.reranker is not None and deadline.budget_ms is not None:
+            per_passage_ms = RagConfig.RERANK_ESTIMATED_MS_PER_PASSAGE
+            if self.rerank_cascade is not None and self.rerank_cascade.estimate_large_ms(1):
+                per_passage_ms = self.rerank_cascade.estimate_large_ms(1)
+            affordable = int((deadline.remaining_ms() - RagConfig.DEADLINE_LLM_RESERVE_MS) / per_passage_ms)
+            if affordable < min(RagConfig.FINAL_TOP_K, len(similar_texts)):
+                deadline.degrade("rerank_skipped", affordable_passages=max(0, affordable))
+                rerank_info = {"reranking_used": False, "skipped_reason": "deadline"}
+            elif affordable < len(similar_texts):
+                deadline.degrade("reduced_rerank", affordable_passages=affordable, candidates=len(similar_texts))
+                max_large_passages = affordable
+        
+        if RagConfig.USE_RERANKING and self.reranker is not None and not rerank_info:
             print("Applying cross-encoder re-ranking...")
             
             # Combine original results
             passages_with_scores = list(zip(similar_texts, similarity_scores))
             
-            # Re-rank with combined scoring
-            reranked_results = self.reranker.rerank_with_original_scores(
-                question, 
-                passages_with_scores, 
-                alpha=RagConfig.RERANK_ALPHA,
-                top_k=RagConfig.FINAL_TOP_K
-            )
+            # Re-rank with combined scoring (passage token ids come from the ingest-time cache)
+            MetricsUtils.observe_batch("rerank", len(passages_with_scores))
+            with MetricsUtils.time_stage("rerank"):
+                cascade_decision = None
+                if self.rerank_cascade is not None:
+                    reranked_results, cascade_decision = self.rerank_cascade.rerank(
+                        question,
+                        passages_with_scores,
+                        passage_token_ids=self._cached_passage_tokens(similar_metadata),
+                        alpha=RagConfig.RERANK_ALPHA,
+                        top_k=RagConfig.FINAL_TOP_K,
+                        max_large_passages=max_large_passages
+                    )
+                else:
+                    passage_token_ids = self._cached_passage_tokens(similar_metadata)
+                    if max_large_passages is not None:
+                        # Candidates are in retrieval order: rerank only the head that fits the budget
+                        passages_with_scores = passages_with_scores[:max_large_passages]
+                        passage_token_ids = passage_token_ids[:max_large_passages]
+                    reranked_results = self.reranker.rerank_with_original_scores(
+                        question, 
+                        passages_with_scores, 
+                        alpha=RagConfig.RERANK_ALPHA,
+                        top_k=RagConfig.FINAL_TOP_K,
+                        passage_token_ids=passage_token_ids
+                    )
             
             # Extract re-ranked results
             final_texts = [item[0] for item in reranked_results]
@@ -227,7 +503,8 @@ class RagService:
                 "final_count_after_rerank": len(final_texts),
                 "cross_encoder_scores": [item[2] for item in reranked_results],
                 "original_scores": [item[3] for item in reranked_results],
-                "combined_scores": final_scores
+                "combined_scores": final_scores,
+                "cascade": cascade_decision
             }
             
             print(f"Re-ranking completed. Final {len(final_texts)} passages selected.")
@@ -236,23 +513,459 @@ class RagService:
             final_k = RagConfig.FINAL_TOP_K if RagConfig.USE_RERANKING else top_k
             final_texts = final_texts[:final_k]
             final_scores = final_scores[:final_k]
-            rerank_info = {"reranking_used": False}
+            rerank_info = rerank_info or {"reranking_used": False}
+        deadline.mark("rerank")
         
-        # Generate response using LLM
-        print("Generating response...")
-        response = self.llm.generate_response(question, final_texts)
+        # Smaller context when the LLM reserve is already eaten into
+        if len(final_texts) > RagConfig.DEADLINE_REDUCED_CONTEXT_CHUNKS and \
+                not deadline.can_afford(RagConfig.DEADLINE_LLM_RESERVE_MS):
+            deadline.degrade("reduced_context", context_chunks=RagConfig.DEADLINE_REDUCED_CONTEXT_CHUNKS,
+                             original_chunks=len(final_texts))
+            final_texts = final_texts[:RagConfig.DEADLINE_REDUCED_CONTEXT_CHUNKS]
+            final_scores = final_scores[:RagConfig.DEADLINE_REDUCED_CONTEXT_CHUNKS]
         
-        result = {
-            "response": response,
+        # Species/field metadata of the selected chunks
+        metadata_by_text = dict(zip(similar_texts, similar_metadata))
+        final_metadata = [
+            {key: value for key, value in metadata_by_text.get(text, {}).items() if not key.startswith("ce_")}
+            for text in final_texts
+        ]
+        
+        # Merge overlapping chunks, drop duplicated sentences and enforce the token budget
+        context_assembly = None
+        if self.context_assembler is not None:
+            with MetricsUtils.time_stage("context_assembly"):
+                final_texts, final_scores, final_metadata, context_assembly = self.context_assembler.assemble(
+                    final_texts, final_scores, final_metadata
+                )
+            deadline.mark("context_assembly")
+        
+        return {
             "context": final_texts,
+            "context_metadata": final_metadata,
             "similarity_scores": final_scores,
             "num_context_chunks": len(final_texts),
-            "rerank_info": rerank_info
+            "rerank_info": rerank_info,
+            "routing_info": routing,
+            "context_assembly": context_assembly
+        }
+    
+    def query(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS,
+              deadline_ms: float = RagConfig.QUERY_DEADLINE_MS,
+              user_id: str = None, priority: int = RagConfig.LLM_DEFAULT_PRIORITY) -> Dict[str, Any]:
+        """
+        Query the RAG pipeline with optional re-ranking
+        
+        Args:
+            question: User's question
+            top_k: Number of top similar chunks to retrieve (overridden if re-ranking is enabled)
+            deadline_ms: Latency budget for the whole request (None = no deadline).
+                         Stages degrade (fewer candidates, less reranking, smaller context) to fit it
+            user_id: Fairness key for the LLM admission queue (user, session or client address)
+            priority: LLM admission priority (lower is served first)
+            
+        Returns:
+            Dictionary containing the response and metadata
+        """
+        deadline = Deadline(deadline_ms)
+        query_embedding = self._embed_query(question, deadline)
+        retrieval = self.retrieve_context(question, top_k, deadline, query_embedding)
+        if "error" in retrieval:
+            return self._observed("sync", deadline, retrieval)
+        
+        # Generate response using LLM (or reuse an answer generated from the same context)
+        llm_queue = {}
+        llm_info = {}
+        
+        def generate():
+            ticket = self._admit_llm(user_id, priority, deadline)
+            llm_queue.update(ticket.get_info())
+            MetricsUtils.observe_stage("llm_queue_wait", ticket.admitted_at - ticket.enqueued_at)
+            print("Generating response...")
+            with MetricsUtils.time_stage("llm"):
+                return self.llm.generate_response(question, retrieval["context"],
+                                                  timeout_ms=self._llm_timeout_ms(deadline), info=llm_info)
+        
+        cache_info = {"status": "disabled"}
+        try:
+            if self.answer_cache is not None:
+                response, cache_info = self.answer_cache.get_or_generate(
+                    query_embedding,
+                    SemanticAnswerCache.scope(retrieval["context"], self.index_version),
+                    generate,
+                    cacheable=lambda answer: not answer.startswith(GeminiLLM.ERROR_PREFIX)
+                )
+                print(f"Answer cache: {cache_info['status']}")
+            else:
+                response = generate()
+        except (LLMQueueFullError, LLMQueueTimeoutError) as e:
+            return self._observed("sync", deadline, self._admission_failed_result(e, retrieval, llm_queue))
+        deadline.mark("llm")
+        
+        result = {
+            "response": response,
+            **retrieval,
+            "answer_cache": cache_info,
+            "llm_queue": llm_queue or None,
+            "llm_info": llm_info or None,
+            "deadline": deadline.get_report()
         }
         
         print("Query processed successfully!")
+        return self._observed("sync", deadline, result)
+    
+    async def aquery(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS,
+                     deadline_ms: float = RagConfig.QUERY_DEADLINE_MS,
+                     user_id: str = None, priority: int = RagConfig.LLM_DEFAULT_PRIORITY) -> Dict[str, Any]:
+        """
+        Async version of query for the event loop.
+        
+        Embedding and re-ranking run in bounded stage executors, Qdrant is queried through
+        its async client and Gemini through client.aio, so one worker serves many chats
+        concurrently. Waiting in the LLM queue or on a coalesced answer does not hold a thread.
+        
+        Args:
+            question: User's question
+            top_k: Number of top similar chunks to retrieve (overridden if re-ranking is enabled)
+            deadline_ms: Latency budget for the whole request (None = no deadline)
+            user_id: Fairness key for the LLM admission queue
+            priority: LLM admission priority (lower is served first)
+            
+        Returns:
+            Dictionary containing the response and metadata (same shape as query)
+        """
+        deadline = Deadline(deadline_ms)
+        query_embedding = await self.stage_executors.run("embedding", self._embed_query, question, deadline)
+        retrieval = await self.aretrieve_context(question, top_k, deadline, query_embedding)
+        if "error" in retrieval:
+            return self._observed("async", deadline, retrieval)
+        
+        llm_queue = {}
+        llm_info = {}
+        
+        async def generate():
+            ticket = self.llm_scheduler.enqueue(user_id, priority)
+            self._note_queue_wait(ticket, deadline)
+            await self.llm_scheduler.await_admission(ticket, timeout=RagConfig.LLM_QUEUE_TIMEOUT_SECONDS)
+            llm_queue.update(ticket.get_info())
+            MetricsUtils.observe_stage("llm_queue_wait", ticket.admitted_at - ticket.enqueued_at)
+            print("Generating response...")
+            with MetricsUtils.time_stage("llm"):
+                return await self.llm.agenerate_response(question, retrieval["context"],
+                                                         timeout_ms=self._llm_timeout_ms(deadline), info=llm_info)
+        
+        cache_info = {"status": "disabled"}
+        try:
+            if self.answer_cache is not None:
+                response, cache_info = await self.answer_cache.aget_or_generate(
+                    query_embedding,
+                    SemanticAnswerCache.scope(retrieval["context"], self.index_version),
+                    generate,
+                    cacheable=lambda answer: not answer.startswith(GeminiLLM.ERROR_PREFIX)
+                )
+                print(f"Answer cache: {cache_info['status']}")
+            else:
+                response = await generate()
+        except (LLMQueueFullError, LLMQueueTimeoutError) as e:
+            return self._observed("async", deadline, self._admission_failed_result(e, retrieval, llm_queue))
+        deadline.mark("llm")
+        
+        print("Query processed successfully!")
+        return self._observed("async", deadline, {
+            "response": response,
+            **retrieval,
+            "answer_cache": cache_info,
+            "llm_queue": llm_queue or None,
+            "llm_info": llm_info or None,
+            "deadline": deadline.get_report()
+        })
+    
+    def stream_query(self, question: str, top_k: int = RagConfig.TOP_K_RESULTS,
+                     deadline_ms: float = RagConfig.QUERY_DEADLINE_MS,
+                     user_id: str = None, priority: int = RagConfig.LLM_DEFAULT_PRIORITY,
+                     cancel: threading.Event = None) -> Iterator[Tuple[str, Any]]:
+        """
+        Query the RAG pipeline and stream the answer
+        
+        Yields (event, data) tuples in order:
+            ("metadata", retrieval result without the passages' text) -> sent before the LLM starts
+            ("queued", queue position / estimated wait)              -> while waiting for LLM admission
+            ("token", text delta)                                    -> one per streamed Gemini chunk
+            ("done", {"deadline": ...}) or ("error", {"error": ...})
+        
+        The consumer runs the generator in a worker thread, where close() fails while it is
+        blocked; setting `cancel` (client disconnected) instead leaves the LLM queue or stops
+        the Gemini stream at its next chunk, and the generator ends without caching the answer.
+        """
+        deadline = Deadline(deadline_ms)
+        query_embedding = self._embed_query(question, deadline)
+        retrieval = self.retrieve_context(question, top_k, deadline, query_embedding)
+        if "error" in retrieval:
+            yield "error", self._observed("stream", deadline, {"error": retrieval["error"], "response": retrieval["response"]})
+            return
+        
+        scope = SemanticAnswerCache.scope(retrieval["context"], self.index_version)
+        cached = self.answer_cache.lookup(query_embedding, scope) if self.answer_cache is not None else None
+        
+        metadata = {key: value for key, value in retrieval.items() if key != "context"}
+        metadata["answer_cache"] = {"status": "hit", "similarity": round(cached[1], 4)} if cached else {"status": "miss"}
+        yield "metadata", metadata
+        
+        if cached:
+            yield "token", cached[0]
+            deadline.mark("llm")
+            yield "done", self._observed("stream", deadline, {"deadline": deadline.get_report()})
+            return
+        
+        try:
+            ticket = self.llm_scheduler.enqueue(user_id, priority)
+        except LLMQueueFullError as e:
+            yield "error", self._observed("stream", deadline, {"error": str(e)})
+            return
+        try:
+            yield "queued", ticket.get_info()
+            self.llm_scheduler.wait(ticket, timeout=RagConfig.LLM_QUEUE_TIMEOUT_SECONDS, cancel=cancel)
+            MetricsUtils.observe_stage("llm_queue_wait", ticket.admitted_at - ticket.enqueued_at)
+        except LLMQueueCancelledError:
+            print("Stream cancelled while waiting for the LLM")
+            return
+        except LLMQueueTimeoutError as e:
+            yield "error", self._observed("stream", deadline, {"error": str(e)})
+            return
+        finally:
+            # Client went away while queued: give the slot to the next request
+            self.llm_scheduler.cancel(ticket)
+        
+        print("Streaming response...")
+        parts = []
+        llm_info = {}
+        try:
+            with MetricsUtils.time_stage("llm"):
+                for text in self.llm.generate_response_stream(question, retrieval["context"],
+                                                              timeout_ms=self._llm_timeout_ms(deadline), info=llm_info,
+                                                              cancel=cancel):
+                    parts.append(text)
+                    yield "token", text
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            yield "error", self._observed("stream", deadline, {"error": str(e)})
+            return
+        finally:
+            deadline.mark("llm")
+        if cancel is not None and cancel.is_set():
+            return
+        
+        # Only complete answers are cached (a disconnect closes or cancels the generator before this point)
+        if self.answer_cache is not None:
+            self.answer_cache.store(query_embedding, scope, "".join(parts))
+        yield "done", self._observed("stream", deadline, {"deadline": deadline.get_report(), "llm_info": llm_info or None})
+    
+    async def aretrieve_passages(self, question: str, page: int = 1, page_size: int = RagConfig.RETRIEVAL_PAGE_SIZE,
+                                 species: List[str] = None, fields: List[str] = None) -> Dict[str, Any]:
+        """
+        Retrieval-only query: ranked passages with their scores and species/field metadata, without
+        calling the LLM (search boxes, related facts).
+        
+        Up to RETRIEVAL_CANDIDATES passages are searched and re-ranked once per question and filters;
+        the ranking is kept in an LRU cache scoped to the index version, so later pages are sliced
+        from it. Re-ranking is cut to what fits in RETRIEVAL_SLO_MS: passages past the re-ranked
+        head keep their vector order and score ("reranked": False), and such a partial ranking
+        is only cached for RETRIEVAL_DEGRADED_CACHE_TTL_SECONDS.
+        
+        Args:
+            question: Search query
+            page: 1-based page number
+            page_size: Results per page
+            species: Only return chunks of these species (None = any; matched exactly when no
+                partition index is loaded)
+            fields: Only return chunks of these fields (None = any)
+            
+        Returns:
+            Dictionary with one page of "results", "total", "has_more", the routing / re-ranking info
+            and the deadline report, or an "error" key
+        """
+        deadline = Deadline(RagConfig.RETRIEVAL_SLO_MS)
+        if not self.is_indexed:
+            return self._observed_retrieval(deadline, {"results": [], "total": 0, "error": "No index available"}, False)
+        
+        species = sorted(set(species or []))
+        fields = sorted(set(fields or []))
+        key = (" ".join(question.lower().split()), tuple(species), tuple(fields), self.index_version)
+        ranking, expires_at = self._retrieval_cache.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._retrieval_cache[key]
+            ranking = None
+        cached = ranking is not None
+        if cached:
+            self._retrieval_cache.move_to_end(key)
+        else:
+            ranking = await self._arank_passages(question, species, fields, deadline)
+            # Rankings cut short by the SLO are cached too, so the pages of one ranking never overlap;
+            # they only expire sooner, to give the next question a chance at a full re-rank
+            expires_at = None
+            if deadline.degradations:
+                expires_at = time.monotonic() + RagConfig.RETRIEVAL_DEGRADED_CACHE_TTL_SECONDS
+            self._retrieval_cache[key] = (ranking, expires_at)
+            while len(self._retrieval_cache) > RagConfig.RETRIEVAL_CACHE_SIZE:
+                self._retrieval_cache.popitem(last=False)
+        
+        start = (page - 1) * page_size
+        items = ranking["items"]
+        return self._observed_retrieval(deadline, {
+            "results": items[start:start + page_size],
+            "total": len(items),
+            "page": page,
+            "page_size": page_size,
+            "has_more": start + page_size < len(items),
+            "filters": {"species": species, "fields": fields},
+            "routing_info": ranking["routing"],
+            "rerank_info": ranking["rerank_info"],
+            "cached": cached,
+            "deadline": deadline.get_report()
+        }, cached)
+    
+    async def _arank_passages(self, question: str, species: List[str], fields: List[str],
+                              deadline: Deadline) -> Dict[str, Any]:
+        """Embed, search (inside the filtered or routed partitions) and re-rank RETRIEVAL_CANDIDATES passages"""
+        query_embedding = await self.stage_executors.run("embedding", self._embed_query, question, deadline)
+        retrieval_k = RagConfig.RETRIEVAL_CANDIDATES
+        
+        filters = None
+        if species or fields:
+            # None = no partition index: the store filters on the species / field payload instead
+            partitions = self.partition_router.matching_partitions(species, fields)
+            routing = {"partitions": partitions, "reason": "filtered" if partitions is not None else "filtered_global"}
+            if partitions is None:
+                filters = {"species": species, "field": fields}
+            if partitions == []:
+                return {"items": [], "routing": routing, "rerank_info": {"reranking_used": False}}
+        elif RagConfig.USE_PARTITION_ROUTING:
+            routing = self.partition_router.route(query_embedding, retrieval_k)
+        else:
+            routing = {"partitions": None, "reason": "disabled"}
+        
+        with MetricsUtils.time_stage("search"):
+            similar_texts, similarity_scores, similar_metadata = await self.vector_store.asearch_with_metadata(
+                query_embedding, retrieval_k, partitions=routing["partitions"], filters=filters
+            )
+        if routing["reason"] == "routed" and self._needs_global_fallback(routing, similar_texts, retrieval_k,
+                                                                         deadline, reserve_ms=0):
+            with MetricsUtils.time_stage("search"):
+                similar_texts, similarity_scores, similar_metadata = await self.vector_store.asearch_with_metadata(
+                    query_embedding, retrieval_k
+                )
+        deadline.mark("retrieval")
+        
+        items, rerank_info = await self.stage_executors.run(
+            "rerank", self._rank_passages, question, similar_texts, similarity_scores, similar_metadata, deadline
+        )
+        return {"items": items, "routing": routing, "rerank_info": rerank_info}
+    
+    def _rank_passages(self, question: str, texts: List[str], scores: List[float], metadata: List[dict],
+                       deadline: Deadline) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Re-rank the head of the candidates that fits in the deadline with the cross-encoder
+        (all of them when RETRIEVAL_SLO_MS is None)
+        
+        Returns:
+            tuple of (result items in rank order, rerank_info)
+        """
+        # (passage, score, cross_encoder_score, vector_score), in vector order until re-ranked
+        ranked = [(text, score, None, score) for text, score in zip(texts, scores)]
+        head_size = 0
+        rerank_info = {"reranking_used": False}
+        
+        if RagConfig.USE_RERANKING and self.reranker is not None and len(texts) > 1:
+            head_size = len(texts)
+        if head_size and deadline.budget_ms is not None:
+            per_passage_ms = RagConfig.RERANK_ESTIMATED_MS_PER_PASSAGE
+            if self.rerank_cascade is not None and self.rerank_cascade.estimate_large_ms(1):
+                per_passage_ms = self.rerank_cascade.estimate_large_ms(1)
+            head_size = min(head_size, max(0, int(deadline.remaining_ms() / per_passage_ms)))
+            if head_size < 2:
+                deadline.degrade("rerank_skipped", affordable_passages=head_size)
+                head_size = 0
+                rerank_info["skipped_reason"] = "deadline"
+            elif head_size < len(texts):
+                deadline.degrade("reduced_rerank", affordable_passages=head_size, candidates=len(texts))
+        
+        if head_size:
+            MetricsUtils.observe_batch("retrieval_rerank", head_size)
+            with MetricsUtils.time_stage("retrieval_rerank"):
+                reranked = self.reranker.rerank_with_original_scores(
+                    question,
+                    list(zip(texts[:head_size], scores[:head_size])),
+                    alpha=RagConfig.RERANK_ALPHA,
+                    passage_token_ids=self._cached_passage_tokens(metadata[:head_size])
+                )
+            ranked = reranked + ranked[head_size:]
+            rerank_info = {"reranking_used": True, "candidates": len(texts), "reranked": head_size}
+        deadline.mark("rerank")
+        
+        metadata_by_text = dict(zip(texts, metadata))
+        items = []
+        for rank, (text, score, cross_encoder_score, vector_score) in enumerate(ranked, start=1):
+            meta = {key: value for key, value in metadata_by_text.get(text, {}).items() if not key.startswith("ce_")}
+            items.append({
+                "rank": rank,
+                "text": text,
+                "score": round(float(score), 4),
+                "cross_encoder_score": round(float(cross_encoder_score), 4) if cross_encoder_score is not None else None,
+                "vector_score": round(float(vector_score), 4),
+                "reranked": rank <= head_size,
+                **meta
+            })
+        return items, rerank_info
+    
+    @staticmethod
+    def _observed_retrieval(deadline: Deadline, result: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        """Record the retrieval-only latency against its SLO, then return the result"""
+        MetricsUtils.observe_retrieval(deadline.elapsed_ms() / 1000, result, cached)
+        return result
+    
+    @staticmethod
+    def _observed(mode: str, deadline: Deadline, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the end-to-end query latency and outcome, then return the result"""
+        MetricsUtils.observe_query(mode, deadline.elapsed_ms() / 1000, result)
         return result
     
+    def _admit_llm(self, user_id: str, priority: int, deadline: Deadline):
+        """Wait in the LLM admission queue; records a degradation if the wait eats the budget"""
+        ticket = self.llm_scheduler.enqueue(user_id, priority)
+        self._note_queue_wait(ticket, deadline)
+        return self.llm_scheduler.wait(ticket, timeout=RagConfig.LLM_QUEUE_TIMEOUT_SECONDS)
+    
+    @staticmethod
+    def _note_queue_wait(ticket, deadline: Deadline):
+        if ticket.position or ticket.estimated_wait:
+            print(f"LLM queue: position {ticket.position}, estimated wait {ticket.estimated_wait:.1f}s")
+            if not deadline.can_afford(ticket.estimated_wait * 1000):
+                deadline.degrade("llm_queue_wait", estimated_wait_seconds=round(ticket.estimated_wait, 2))
+    
+    @staticmethod
+    def _admission_failed_result(error: Exception, retrieval: Dict[str, Any], llm_queue: Dict[str, Any]) -> Dict[str, Any]:
+        print(f"LLM admission failed: {error}")
+        return {
+            "response": "The assistant is handling too many questions right now. Please try again in a minute.",
+            **retrieval,
+            "llm_queue": llm_queue or None,
+            "error": str(error)
+        }
+    
+    def _embed_query(self, question: str, deadline: Deadline):
+        print("Generating query embedding...")
+        with MetricsUtils.time_stage("embed"):
+            query_embedding = self.embedding_generator.generate_single_embedding(question)
+        deadline.mark("embedding")
+        return query_embedding
+    
+    @staticmethod
+    def _llm_timeout_ms(deadline: Deadline):
+        """HTTP timeout for the LLM call: what is left of the budget, but never below the minimum"""
+        if deadline.budget_ms is None:
+            return None
+        return max(deadline.remaining_ms(), RagConfig.DEADLINE_MIN_LLM_TIMEOUT_MS)
+    
     def get_pipeline_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the current pipeline state
@@ -268,7 +981,8 @@ class RagService:
                 "rerank_top_k": RagConfig.RERANK_TOP_K,
                 "final_top_k": RagConfig.FINAL_TOP_K,
                 "rerank_alpha": RagConfig.RERANK_ALPHA,
-                "reranker_loaded": self.reranker is not None
+                "reranker_loaded": self.reranker is not None,
+                "cascade": self.rerank_cascade.get_stats() if self.rerank_cascade else None
             }
         else:
             rerank_info = {"reranking_enabled": False}
@@ -277,6 +991,13 @@ class RagService:
             "is_indexed": self.is_indexed,
             "vector_store_stats": self.vector_store.get_stats(),
             "reranking": rerank_info,
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
+            "retrieval_cache": {"entries": len(self._retrieval_cache), "max_entries": RagConfig.RETRIEVAL_CACHE_SIZE},
+            "llm_queue": self.llm_scheduler.get_stats(),
+            "llm_providers": self.llm.get_stats(),
+            "stage_executors": self.stage_executors.get_stats(),
+            "inference_runtime": inference_runtime.get_stats(),
+            "index_version": self.index_version,
             "RagConfig": {
                 "chunk_size": RagConfig.CHUNK_SIZE,
                 "chunk_overlap": RagConfig.CHUNK_OVERLAP,
@@ -290,8 +1011,10 @@ class RagService:
     def reset_pipeline(self):
         """Reset the pipeline by clearing the vector store"""
         print("Resetting pipeline...")
+        from rag.vector_store import FAISSVectorStore
         self.vector_store = FAISSVectorStore()
         self.is_indexed = False
+        self._bump_index_version()
         print("Pipeline reset completed!")
     
     def test_components(self) -> Dict[str, bool]:
@@ -0,0 +1,157 @@
+import asyncio
+import gc
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from rag.inference_runtime import inference_runtime
+from utils.MetricsUtils import MetricsUtils
+
+
+class ServiceRegistry:
+    """
+    Owns the model-backed services and loads them in the background at startup.
+
+    Each component is constructed and warmed up (one inference per model) in its own
+    worker thread, so components load in parallel and the event loop keeps answering
+    /health/live meanwhile. /health/ready reports ready once every started component is.
+
+    Multi-worker deployments (gunicorn.conf.py) call preload() in the master first: the
+    model weights are loaded once and shared copy-on-write by the forked workers, which
+    only build the fork-unsafe parts (Qdrant / Gemini clients, pools) and warm up.
+    """
+
+    COMPONENTS = ("image", "rag")
+
+    def __init__(self):
+        self.services: Dict[str, object] = {}
+        self.status: Dict[str, dict] = {}
+        self.preloaded: Dict[str, object] = {}  # Loaded before fork: "image" service, "rag_models"
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, components: List[str] = COMPONENTS):
+        """
+        Start loading components in the background (call from the app lifespan)
+
+        Args:
+            components: Names of the components to load ("image", "rag")
+        """
+        for name in components:
+            self.status[name] = {"state": "loading"}
+        MetricsUtils.register_inference_runtime(inference_runtime)
+        self._task = asyncio.create_task(self._load_all(list(components)))
+
+    async def _load_all(self, components: List[str]):
+        started = time.perf_counter()
+        await asyncio.gather(*(asyncio.to_thread(self._load, name) for name in components))
+        states = {name: status["state"] for name, status in self.status.items()}
+        print(f"Service startup finished in {time.perf_counter() - started:.1f}s: {states}")
+
+    def _load(self, name: str):
+        status = self.status[name]
+        try:
+            start = time.perf_counter()
+            service = getattr(self, f"_create_{name}")()
+            status["load_seconds"] = round(time.perf_counter() - start, 2)
+
+            status["state"] = "warming"
+            status["warmup_ms"] = service.warm_up()
+            self.services[name] = service
+            status["state"] = "ready"
+            print(f"✓ {name} service ready (load {status['load_seconds']}s)")
+        except Exception as e:
+            status["state"] = "failed"
+            status["error"] = str(e)
+            print(f"❌ Failed to start {name} service: {e}")
+
+    def _create_image(self):
+        if "image" in self.preloaded:
+            return self.preloaded["image"]
+        from services.ImageService import ImageService
+        return ImageService()
+
+    def _create_rag(self):
+        from services.RagService import RagService
+        rag_service = RagService(models=self.preloaded.get("rag_models"))
+        # Kiểm tra xem có index sẵn chưa
+        if not rag_service.load_existing_index():
+            print("No existing index found. Please run `python -m scripts.ingest <corpus.json>` first.")
+        MetricsUtils.register_rag_service(rag_service)
+        return rag_service
+
+    def preload(self, components: List[str] = COMPONENTS):
+        """
+        Load model weights in the current (master) process before workers are forked.
+        Only fork-safe objects are loaded: no sockets, no threads left running, no inference
+        (an initialized OpenMP pool does not survive fork). The models are put in eval mode
+        without gradients and the garbage collector is frozen, so workers don't write to the
+        shared pages (refcounts of the few module objects aside).
+
+        Args:
+            components: Names of the components whose models to preload ("image", "rag")
+        """
+        started = time.perf_counter()
+        tasks = {}
+        if "image" in components:
+            tasks["image"] = self._create_image
+        if "rag" in components:
+            from rag.embeddings import EmbeddingGenerator
+            from services.RagService import RagService
+            tasks["embedding"] = EmbeddingGenerator
+            for model_name in RagService.rerank_model_names():
+                tasks[model_name] = lambda model_name=model_name: RagService._create_reranker(model_name)
+
+        with ThreadPoolExecutor(max_workers=len(tasks) or 1, thread_name_prefix="preload") as pool:
+            futures = {name: pool.submit(factory) for name, factory in tasks.items()}
+        loaded = {name: future.result() for name, future in futures.items()}
+
+        if "image" in loaded:
+            self.preloaded["image"] = loaded.pop("image")
+        if "rag" in components:
+            self.preloaded["rag_models"] = loaded
+
+        for model in self._torch_modules():
+            model.eval()
+            model.requires_grad_(False)
+        gc.collect()
+        gc.freeze()
+        print(f"Preloaded {sorted(tasks)} in {time.perf_counter() - started:.1f}s "
+              f"({gc.get_freeze_count()} objects frozen)")
+
+    def _torch_modules(self) -> list:
+        import torch
+        wrappers = [self.preloaded.get("image")] + list(self.preloaded.get("rag_models", {}).values())
+        modules = []
+        for wrapper in wrappers:
+            if wrapper is None:
+                continue
+            # ImageService / EmbeddingGenerator / CrossEncoderReranker keep their model in .model;
+            # older sentence-transformers CrossEncoders are not modules themselves but wrap one
+            model = wrapper.model
+            if not isinstance(model, torch.nn.Module):
+                model = model.model
+            modules.append(model)
+        return modules
+
+    def get(self, name: str):
+        """The component if it is ready, else None"""
+        return self.services.get(name)
+
+    @property
+    def is_ready(self) -> bool:
+        return all(status["state"] == "ready" for status in self.status.values())
+
+    def get_status(self) -> dict:
+        return {"ready": self.is_ready, "preloaded": bool(self.preloaded), "components": self.status}
+
+    async def shutdown(self):
+        """Release pools and clients (models still loading are left to finish in their thread)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        rag_service = self.services.get("rag")
+        if rag_service is not None:
+            from rag.qdrant_client_factory import close_async_qdrant_client
+            await asyncio.to_thread(rag_service.close)
+            await close_async_qdrant_client()
+
+
+registry = ServiceRegistry()
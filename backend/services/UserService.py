@@ -1,6 +1,7 @@
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer, APIKeyCookie
 from utils.AuthUtlis import AuthUtils
+from utils.MetricsUtils import MetricsUtils
 from pydantics.user import UserBase
 from config.database import db
 from dotenv import load_dotenv
@@ -37,7 +38,8 @@ class UserService:
         if email is None:
             raise credentials_exception
 
-        user = await db["users"].find_one({"email": email})
+        with MetricsUtils.time_mongo("users", "find_one"):
+            user = await db["users"].find_one({"email": email})
 
         if user is None:
             raise credentials_exception
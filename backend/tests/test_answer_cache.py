@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from rag.answer_cache import SemanticAnswerCache
+
+QUESTION = np.array([1.0, 0.0, 0.0], dtype="float32")
+PARAPHRASE = np.array([0.99, 0.05, 0.0], dtype="float32")
+OTHER = np.array([0.0, 1.0, 0.0], dtype="float32")
+
+
+def test_paraphrase_hits_only_inside_the_same_scope():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.store(QUESTION, "scope-a", "answer")
+
+    assert cache.lookup(PARAPHRASE, "scope-a")[0] == "answer"
+    assert cache.lookup(PARAPHRASE, "scope-b") is None
+    assert cache.lookup(OTHER, "scope-a") is None
+    assert SemanticAnswerCache.scope(["p1", "p2"], 1) != SemanticAnswerCache.scope(["p2", "p1"], 1)
+    assert SemanticAnswerCache.scope(["p1"], 1) != SemanticAnswerCache.scope(["p1"], 2)
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("rag.answer_cache.time.time", lambda: now[0])
+    cache = SemanticAnswerCache(ttl_seconds=60)
+    cache.store(QUESTION, "scope", "answer")
+
+    now[0] += 59
+    assert cache.lookup(QUESTION, "scope") is not None
+    now[0] += 2
+    assert cache.lookup(QUESTION, "scope") is None
+    assert cache.get_stats()["expired"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    vectors = np.eye(3, dtype="float32")
+    cache.store(vectors[0], "scope", "first")
+    cache.store(vectors[1], "scope", "second")
+    cache.lookup(vectors[0], "scope")        # first is now the most recently used
+    cache.store(vectors[2], "scope", "third")
+
+    assert cache.lookup(vectors[1], "scope") is None
+    assert cache.lookup(vectors[0], "scope")[0] == "first"
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_concurrent_paraphrases_share_one_generation():
+    cache = SemanticAnswerCache()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "answer"
+
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(leader=cache.get_or_generate(QUESTION, "scope", generate)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.update(follower=cache.get_or_generate(PARAPHRASE, "scope", generate)))
+    follower.start()
+    while cache.get_stats()["coalesced"] == 0:
+        time.sleep(0.001)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert len(calls) == 1
+    assert results["leader"] == ("answer", {"status": "miss"})
+    assert results["follower"] == ("answer", {"status": "coalesced"})
+    assert cache.get_or_generate(QUESTION, "scope", generate)[1]["status"] == "hit"
+
+
+def test_async_waiters_generate_themselves_when_the_leader_fails():
+    cache = SemanticAnswerCache()
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("LLM down")
+
+    async def succeeding():
+        return "answer"
+
+    async def run():
+        leader = asyncio.create_task(cache.aget_or_generate(QUESTION, "scope", failing))
+        await asyncio.sleep(0.01)
+        follower = await cache.aget_or_generate(PARAPHRASE, "scope", succeeding)
+        with pytest.raises(RuntimeError):
+            await leader
+        return follower
+
+    assert asyncio.run(run()) == ("answer", {"status": "miss", "coalesce_failed": True})
+    assert cache.get_stats()["in_flight"] == 0
+
+
+def test_uncacheable_answers_are_not_stored():
+    cache = SemanticAnswerCache()
+
+    cache.get_or_generate(QUESTION, "scope", lambda: "error", cacheable=lambda response: response != "error")
+
+    assert cache.lookup(QUESTION, "scope") is None
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import pytest
+from rag.llm_providers import HedgedLLM
+from routers import chat_router
+from services.ServiceRegistry import registry
+from test_llm_providers import SlowStreamProvider, wait_until_stopped
+
+
+class StreamingRagService:
+    """Streams a metadata event, then tokens from a slow fake LLM behind HedgedLLM"""
+
+    def __init__(self, provider):
+        self.llm = HedgedLLM([provider])
+        self.cancel = None
+
+    def stream_query(self, message, user_id=None, cancel=None):
+        self.cancel = cancel
+        yield "metadata", {"partitions": []}
+        for token in self.llm.stream(message, cancel=cancel):
+            yield "token", token
+        yield "done", {}
+
+
+class FakeRequest:
+    client = None
+
+    def __init__(self, connected_for):
+        self.checks = 0
+        self.connected_for = connected_for
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.connected_for
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    provider = SlowStreamProvider(interval=0.02)
+    monkeypatch.setitem(registry.services, "rag", StreamingRagService(provider))
+    return provider
+
+
+def test_client_disconnect_stops_the_llm_stream(provider):
+    async def consume():
+        response = await chat_router.stream_answer(FakeRequest(connected_for=3), "cobra")
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(consume())
+
+    assert len(chunks) == 3
+    assert chunks[0].startswith("event: metadata")
+    assert registry.services["rag"].cancel.is_set()
+    assert wait_until_stopped(provider)
+    assert provider.produced < provider.chunks
+    assert provider.stats.counters["cancelled"] == 1
+
+
+def test_cancelled_response_task_stops_the_llm_stream(provider):
+    # Starlette cancels the response task on disconnect, possibly while the generator is
+    # blocked in a worker thread (where close() can't stop it)
+    async def consume_then_cancel():
+        response = await chat_router.stream_answer(FakeRequest(connected_for=10 ** 6), "cobra")
+
+        async def consume():
+            async for _ in response.body_iterator:
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(consume_then_cancel())
+
+    assert registry.services["rag"].cancel.is_set()
+    assert wait_until_stopped(provider)
+    assert provider.produced < provider.chunks
@@ -0,0 +1,88 @@
+import pytest
+from config.rag_config import RagConfig
+from rag.context_assembler import ContextAssembler, build_token_counter
+
+PREFIX = "Cobra - Độc tính: "
+
+
+def words(text):
+    return len(text.split())
+
+
+def chunk(species, field, index):
+    return {"species": species, "field": field, "partition": f"{species}::{field}", "chunk_index": index}
+
+
+@pytest.fixture(autouse=True)
+def dedup_words(monkeypatch):
+    monkeypatch.setattr(RagConfig, "CONTEXT_MIN_DEDUP_WORDS", 4)
+
+
+def test_consecutive_chunks_are_merged_without_their_overlap_or_repeated_prefix():
+    assembler = ContextAssembler(words, token_budget=1000)
+    texts = [PREFIX + "gamma delta epsilon zeta.", PREFIX + "alpha beta gamma delta"]
+    metadata = [chunk("Cobra", "Độc tính", 1), chunk("Cobra", "Độc tính", 0)]
+
+    passages, scores, passage_metadata, stats = assembler.assemble(texts, [0.9, 0.5], metadata)
+
+    assert passages == [PREFIX + "alpha beta gamma delta epsilon zeta."]
+    assert scores == [0.9]
+    assert passage_metadata[0]["chunk_indices"] == [0, 1]
+    assert stats["merged_chunks"] == 1
+
+
+def test_non_consecutive_chunks_are_joined_with_an_ellipsis():
+    assembler = ContextAssembler(words, token_budget=1000)
+    metadata = [chunk("Cobra", "Độc tính", 0), chunk("Cobra", "Độc tính", 3)]
+
+    passages, _, _, stats = assembler.assemble([PREFIX + "first part.", PREFIX + "later part."], [0.9, 0.8], metadata)
+
+    assert passages == [PREFIX + "first part. ... later part."]
+    assert stats["merged_chunks"] == 0
+
+
+def test_passages_are_ordered_by_best_score_and_repeated_sentences_dropped():
+    assembler = ContextAssembler(words, token_budget=1000)
+    shared = "Nọc độc gây liệt thần kinh."
+    texts = ["Krait - Độc tính: " + shared + " Rất nguy hiểm ban đêm.", PREFIX + shared + " Có thể phun nọc."]
+    metadata = [chunk("Krait", "Độc tính", 0), chunk("Cobra", "Độc tính", 0)]
+
+    passages, scores, _, stats = assembler.assemble(texts, [0.4, 0.8], metadata)
+
+    assert scores == [0.8, 0.4]
+    assert passages == [PREFIX + shared + " Có thể phun nọc.", "Krait - Độc tính: Rất nguy hiểm ban đêm."]
+    assert stats["duplicate_sentences_removed"] == 1
+
+
+def test_context_is_cut_to_the_token_budget_at_sentence_boundaries():
+    assembler = ContextAssembler(words, token_budget=10)
+    texts = ["One two three four. Five six seven eight.", "Nine ten eleven twelve."]
+    metadata = [chunk("A", "x", 0), chunk("B", "y", 0)]
+
+    passages, _, _, stats = assembler.assemble(texts, [0.9, 0.8], metadata)
+
+    assert passages == ["One two three four. Five six seven eight."]
+    assert stats["tokens_after"] == 8 <= stats["token_budget"]
+    assert stats["truncated"]
+
+    passages, _, _, stats = assembler.assemble(texts, [0.9, 0.8], metadata, token_budget=6)
+    assert passages == ["One two three four."]
+    assert stats["tokens_after"] == 4
+
+
+def test_best_passage_is_kept_even_if_it_alone_exceeds_the_budget():
+    assembler = ContextAssembler(words, token_budget=2)
+
+    passages, _, _, stats = assembler.assemble(["A single long sentence without a break"], [0.9], [chunk("A", "x", 0)])
+
+    assert passages == ["A single long sentence without a break"]
+    assert stats["truncated"]
+
+
+def test_token_counter_falls_back_to_word_estimate(monkeypatch):
+    monkeypatch.setattr(RagConfig, "CONTEXT_TOKENIZER", "embedding")
+
+    count_tokens, name = build_token_counter()
+
+    assert name == "words*1.3"
+    assert count_tokens("một hai ba bốn") == 6
@@ -0,0 +1,79 @@
+import threading
+import time
+import torch
+from rag.inference_runtime import InferenceRuntime, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_threads_are_the_budget_split_over_all_lanes_and_set_process_wide():
+    previous = torch.get_num_threads()
+    try:
+        runtime = InferenceRuntime(budget=8, lanes={"image": 1, "embedding": 1, "rerank": 2})
+        runtime.register("image")
+        assert runtime.threads == 8
+        runtime.register("embedding")
+        runtime.register("rerank")
+        assert runtime.threads == 2
+        assert torch.get_num_threads() == 2
+
+        # Calls don't touch the thread count, whatever thread they run in
+        torch.set_num_threads(3)
+        worker = threading.Thread(target=runtime.run, args=("rerank", lambda: None))
+        worker.start()
+        worker.join()
+        assert torch.get_num_threads() == 3
+        assert runtime.get_stats()["intra_op_threads"] == 2
+    finally:
+        torch.set_num_threads(previous)
+
+
+def test_interactive_calls_are_admitted_before_waiting_bulk_calls():
+    runtime = InferenceRuntime(budget=1, lanes={"embedding": 1}, bulk_max_wait=60)
+    order = []
+    release = threading.Event()
+    holder = threading.Thread(target=runtime.run, args=("embedding", release.wait))
+    holder.start()
+    wait_until(lambda: runtime.get_stats()["models"]["embedding"]["running"] == 1)
+
+    waiters = []
+    for name, priority in (("bulk", PRIORITY_BULK), ("interactive", PRIORITY_INTERACTIVE)):
+        waiter = threading.Thread(target=runtime.run, args=("embedding", order.append, name),
+                                  kwargs={"priority": priority})
+        waiter.start()
+        waiters.append(waiter)
+        wait_until(lambda n=len(waiters): sum(
+            runtime.get_stats()["models"]["embedding"][f"queued_{p}"] for p in ("interactive", "bulk")) == n)
+
+    release.set()
+    for thread in [holder, *waiters]:
+        thread.join()
+    assert order == ["interactive", "bulk"]
+
+
+def test_bulk_call_is_promoted_after_max_wait():
+    runtime = InferenceRuntime(budget=1, lanes={"embedding": 1}, bulk_max_wait=0.05)
+    order = []
+    release = threading.Event()
+    holder = threading.Thread(target=runtime.run, args=("embedding", release.wait))
+    holder.start()
+    wait_until(lambda: runtime.get_stats()["models"]["embedding"]["running"] == 1)
+
+    bulk = threading.Thread(target=runtime.run, args=("embedding", order.append, "bulk"),
+                            kwargs={"priority": PRIORITY_BULK})
+    bulk.start()
+    time.sleep(0.1)
+    interactive = threading.Thread(target=runtime.run, args=("embedding", order.append, "interactive"))
+    interactive.start()
+    wait_until(lambda: runtime.get_stats()["models"]["embedding"]["queued_interactive"] == 1)
+
+    release.set()
+    for thread in (holder, bulk, interactive):
+        thread.join()
+    assert order == ["bulk", "interactive"]
+    assert runtime.get_stats()["models"]["embedding"]["bulk_promoted"] == 1
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import numpy as np
+import pytest
+from config.rag_config import RagConfig
+from rag.document_processor import DocumentProcessor
+from rag.ingest_manifest import IngestManifest
+from rag.ingestion_pipeline import IngestionPipeline
+from rag.partition_router import PartitionRouter
+from rag.vector_store import FAISSVectorStore
+
+TOXICITY = "Độc tính"
+HABITAT = "Phân bố địa lý và môi trường sống"
+
+
+class StubEmbedder:
+    """Deterministic embeddings (hash of the text), no model download"""
+
+    def generate_embeddings(self, texts, show_progress=False, priority=None):
+        vectors = []
+        for text in texts:
+            seed = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16)
+            vector = np.random.default_rng(seed).random(RagConfig.VECTOR_DIMENSION)
+            vectors.append(vector / np.linalg.norm(vector))
+        return np.asarray(vectors, dtype="float32")
+
+
+class CrashingStore(FAISSVectorStore):
+    """FAISS store whose n-th add_embeddings call fails, like a lost connection mid-run"""
+
+    def __init__(self, fail_on_call=None):
+        super().__init__()
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+
+    def add_embeddings(self, *args, **kwargs):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ConnectionError("upload failed")
+        return super().add_embeddings(*args, **kwargs)
+
+
+def words(prefix, count):
+    return " ".join(f"{prefix}{i}." if i % 12 == 11 else f"{prefix}{i}" for i in range(count))
+
+
+def write_corpus(path, toxicity_text):
+    docs = [
+        {"id": "naja", "name_vn": "Rắn hổ mang", TOXICITY: toxicity_text, HABITAT: words("rung", 80)},
+        {"id": "bungarus", "name_vn": "Rắn cạp nia", TOXICITY: words("doc", 90)}
+    ]
+    path.write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+
+
+class CrashingRouter(PartitionRouter):
+    """Router whose n-th add fails: the process dies after an upsert, before the next persist"""
+
+    def __init__(self, index_path, fail_on_call=None):
+        super().__init__(index_path)
+        self.fail_on_call = fail_on_call
+        self.calls = 0
+
+    def add(self, embeddings, metadata):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ConnectionError("killed")
+        super().add(embeddings, metadata)
+
+
+def make_pipeline(workdir, store, manifest=None, batch_size=2, partition_router=None):
+    store.index_path = str(workdir / "faiss")
+    return IngestionPipeline(
+        StubEmbedder(), store, DocumentProcessor(), partition_router=partition_router,
+        manifest=manifest or IngestManifest(str(workdir / "manifest.json")),
+        batch_size=batch_size, queue_size=2, checkpoint_every=1,
+        checkpoint_path=str(workdir / "checkpoint.json")
+    )
+
+
+def expected_chunk_ids(corpus_path):
+    processor = DocumentProcessor()
+    ids = set()
+    for doc in json.loads(corpus_path.read_text(encoding="utf-8")):
+        for chunk, metadata in processor.iter_document_chunks(doc):
+            ids.add(metadata["chunk_id"])
+    return ids
+
+
+def test_delta_after_crash_mid_field_reuploads_the_field(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus, words("noc", 120))
+    store = CrashingStore()
+    make_pipeline(tmp_path, store).run(str(corpus), resume=False)
+    assert set(store.chunk_rows) == expected_chunk_ids(corpus)
+
+    # A long edit: the field now spans several batches; the second upload fails
+    write_corpus(corpus, words("noclai", 1500))
+    store.fail_on_call, store.calls = 2, 0
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.load()
+    with pytest.raises(ConnectionError):
+        make_pipeline(tmp_path, store, manifest).run_delta(str(corpus))
+
+    # The periodic persist saved the manifest with the field only partly uploaded
+    persisted = IngestManifest(str(tmp_path / "manifest.json"))
+    persisted.load()
+    changed_key = IngestManifest.key("naja", TOXICITY)
+    assert persisted.get(changed_key)["pending"]
+
+    store.fail_on_call = None
+    stats = make_pipeline(tmp_path, store, persisted).run_delta(str(corpus))
+
+    assert stats["fields_changed"] == 1
+    assert set(store.chunk_rows) == expected_chunk_ids(corpus)
+    assert not persisted.get(changed_key).get("pending")
+    assert sorted(persisted.get(changed_key)["chunk_ids"]) == sorted(
+        chunk_id for chunk_id, row in store.chunk_rows.items() if store.metadata[row]["field"] == TOXICITY
+        and store.metadata[row]["doc_id"] == "naja"
+    )
+
+
+def test_delta_skips_unchanged_fields_and_prunes_removed_ones(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus, words("noc", 120))
+    store = CrashingStore()
+    make_pipeline(tmp_path, store).run(str(corpus), resume=False)
+
+    docs = json.loads(corpus.read_text(encoding="utf-8"))
+    del docs[0][HABITAT]
+    corpus.write_text(json.dumps(docs, ensure_ascii=False), encoding="utf-8")
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.load()
+    stats = make_pipeline(tmp_path, store, manifest).run_delta(str(corpus))
+
+    assert (stats["fields_changed"], stats["fields_unchanged"], stats["fields_removed"]) == (0, 2, 1)
+    assert stats["chunks_done"] == 0
+    assert set(store.chunk_rows) == expected_chunk_ids(corpus)
+
+
+def test_delta_rerun_after_crash_between_upsert_and_persist_keeps_centroids_exact(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    router_path = str(tmp_path / "partitions")
+    write_corpus(corpus, words("noc", 120))
+    store = CrashingStore()
+    make_pipeline(tmp_path, store, partition_router=CrashingRouter(router_path)).run(str(corpus), resume=False)
+
+    # The edited field's first batch is upserted, then the process dies before persisting
+    write_corpus(corpus, words("noclai", 120))
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.load()
+    router = CrashingRouter(router_path, fail_on_call=1)
+    router.load()
+    with pytest.raises(ConnectionError):
+        make_pipeline(tmp_path, store, manifest, partition_router=router).run_delta(str(corpus))
+
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.load()
+    router = PartitionRouter(router_path)
+    router.load()
+    make_pipeline(tmp_path, store, manifest, partition_router=router).run_delta(str(corpus))
+
+    expected = PartitionRouter(str(tmp_path / "unused"))
+    expected.add(*zip(*[(store.index.reconstruct(row), store.metadata[row]) for row in store.chunk_rows.values()]))
+    assert router.partition_counts == expected.partition_counts
+    for partition, total in expected.partition_sums.items():
+        np.testing.assert_allclose(router.partition_sums[partition], total, atol=1e-4)
+    for species, total in expected.species_sums.items():
+        np.testing.assert_allclose(router.species_sums[species], total, atol=1e-4)
+
+
+def test_full_run_resumes_from_checkpoint_after_crash(tmp_path):
+    corpus = tmp_path / "corpus.json"
+    write_corpus(corpus, words("noc", 400))
+    store = CrashingStore(fail_on_call=3)
+    with pytest.raises(ConnectionError):
+        make_pipeline(tmp_path, store).run(str(corpus))
+
+    store.fail_on_call = None
+    stats = make_pipeline(tmp_path, store).run(str(corpus))
+
+    assert stats["resumed"]
+    assert set(store.chunk_rows) == expected_chunk_ids(corpus)
+    manifest = IngestManifest(str(tmp_path / "manifest.json"))
+    manifest.load()
+    assert manifest.get_stats()["pending"] == 0
+    assert manifest.get_stats()["chunks"] == len(store.chunk_rows)
+
+
+def test_manifest_pending_until_complete():
+    manifest = IngestManifest("unused.json")
+    manifest.add_chunk("doc\x1ffield", "h1", "a")
+    assert not manifest.is_current("doc\x1ffield", "h1")
+    manifest.complete("doc\x1ffield", "h1")
+    assert manifest.is_current("doc\x1ffield", "h1")
+
+    # New content: previous chunk ids are replaced and the field is pending again
+    manifest.add_chunk("doc\x1ffield", "h2", "b")
+    assert manifest.get("doc\x1ffield") == {"hash": "h2", "chunk_ids": ["b"], "pending": True}
+
+    # A field that produces no chunks is recorded as complete with no chunk ids
+    manifest.complete("doc\x1fempty", "h3")
+    assert manifest.get("doc\x1fempty") == {"hash": "h3", "chunk_ids": []}
@@ -0,0 +1,124 @@
+import threading
+import time
+from rag.llm_providers import HedgedLLM, LLMProvider
+
+
+class SlowStreamProvider(LLMProvider):
+    """Streams numbered chunks every `interval` seconds and counts what it produced"""
+
+    def __init__(self, name="fake", chunks=200, interval=0.01):
+        super().__init__()
+        self.name = name
+        self.chunks = chunks
+        self.interval = interval
+        self.produced = 0
+
+    def stream(self, prompt, timeout_ms=None):
+        for i in range(self.chunks):
+            time.sleep(self.interval)
+            self.produced += 1
+            yield f"{i} "
+
+
+def wait_until_stopped(provider, timeout=2.0):
+    """Wait until the provider has stopped producing; True if it did before `timeout`"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        produced = provider.produced
+        time.sleep(provider.interval * 5)
+        if provider.produced == produced:
+            return True
+    return False
+
+
+def test_cancel_ends_the_stream_and_stops_the_provider():
+    provider = SlowStreamProvider()
+    cancel = threading.Event()
+    stream = HedgedLLM([provider]).stream("prompt", cancel=cancel)
+
+    assert [next(stream), next(stream)] == ["0 ", "1 "]
+    cancel.set()
+
+    assert list(stream) == []
+    assert wait_until_stopped(provider)
+    assert provider.produced < provider.chunks
+    assert provider.stats.counters["cancelled"] == 1
+
+
+def test_cancel_reaches_a_stream_blocked_in_another_thread():
+    # close() can't stop a generator that is running in a worker thread; the event can
+    provider = SlowStreamProvider(interval=0.05)
+    cancel = threading.Event()
+    stream = HedgedLLM([provider]).stream("prompt", cancel=cancel)
+    received = []
+    consumer = threading.Thread(target=lambda: received.extend(stream))
+    consumer.start()
+    time.sleep(0.2)
+
+    cancel.set()
+    consumer.join(2)
+
+    assert not consumer.is_alive()
+    assert wait_until_stopped(provider)
+    assert len(received) < provider.chunks
+
+
+def test_stream_without_cancel_yields_every_chunk():
+    provider = SlowStreamProvider(chunks=5, interval=0)
+    info = {}
+
+    assert "".join(HedgedLLM([provider]).stream("prompt", info=info)) == "0 1 2 3 4 "
+    assert info["provider"] == "fake"
+
+
+def test_concurrent_generations_and_streams_do_not_wait_for_a_thread():
+    provider = SlowStreamProvider(chunks=4, interval=0.1)
+    provider.generate = lambda prompt, timeout_ms=None: "".join(provider.stream(prompt, timeout_ms))
+    hedged = HedgedLLM([provider], max_concurrent_requests=4)
+    results = []
+    calls = [lambda: results.append(hedged.generate("prompt")[0]) for _ in range(2)]
+    calls += [lambda: results.append("".join(hedged.stream("prompt"))) for _ in range(2)]
+    threads = [threading.Thread(target=call) for call in calls]
+
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["0 1 2 3 "] * 4
+    assert time.monotonic() - started < 0.8  # one provider call's time, not several in a row
+
+
+class StalledStreamProvider(LLMProvider):
+    """Sends one chunk, then hangs until released (a provider that stopped responding)"""
+
+    name = "stalled"
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def generate(self, prompt, timeout_ms=None):
+        return "answer"
+
+    def stream(self, prompt, timeout_ms=None):
+        yield "first "
+        self.release.wait(5)
+        yield "late"
+
+
+def test_abandoned_stalled_stream_does_not_block_other_requests():
+    provider = StalledStreamProvider()
+    hedged = HedgedLLM([provider], max_concurrent_requests=1)
+    cancel = threading.Event()
+    stream = hedged.stream("prompt", cancel=cancel)
+    assert next(stream) == "first "
+
+    cancel.set()
+    assert list(stream) == []
+    started = time.monotonic()
+    assert hedged.generate("prompt")[0] == "answer"
+    assert time.monotonic() - started < 1
+    provider.release.set()
+    assert "".join(hedged.stream("prompt")) == "first late"
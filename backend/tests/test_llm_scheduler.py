@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+import pytest
+from rag.llm_scheduler import (LLMAdmissionScheduler, LLMQueueCancelledError, LLMQueueFullError,
+                               LLMQueueTimeoutError)
+
+
+def scheduler(**kwargs):
+    # Plenty of tokens: only the queue order decides who is admitted
+    options = {"requests_per_minute": 6000, "capacity": 100, "max_queue_size": 10}
+    options.update(kwargs)
+    return LLMAdmissionScheduler(**options)
+
+
+def admission_order(s, tickets):
+    """Admit the head repeatedly; a ticket that is not at the head can't be admitted"""
+    order = []
+    waiting = list(tickets)
+    while waiting:
+        with s._cond:
+            head = next(t for t in waiting if s._try_admit_locked(t, time.monotonic())[0])
+        waiting.remove(head)
+        order.append(head)
+    return order
+
+
+def test_one_users_burst_does_not_starve_the_others():
+    s = scheduler()
+    burst = [s.enqueue("alice") for _ in range(3)]
+    bob = s.enqueue("bob")
+    carol = s.enqueue("carol")
+
+    order = admission_order(s, burst + [bob, carol])
+
+    assert order == [burst[0], bob, carol, burst[1], burst[2]]
+    assert bob.position == 1
+
+
+def test_lower_priority_value_is_served_first():
+    s = scheduler()
+    batch = s.enqueue("alice", priority=20)
+    interactive = s.enqueue("bob", priority=1)
+
+    assert admission_order(s, [batch, interactive]) == [interactive, batch]
+
+
+def test_full_queue_rejects_and_timeout_leaves_the_queue():
+    s = scheduler(max_queue_size=1, capacity=1, requests_per_minute=1)
+    s.tokens = 0
+    ticket = s.enqueue("alice")
+    with pytest.raises(LLMQueueFullError):
+        s.enqueue("bob")
+
+    with pytest.raises(LLMQueueTimeoutError):
+        s.wait(ticket, timeout=0.05)
+
+    assert s.get_stats()["queued"] == 0
+    assert s.get_stats()["timeouts"] == 1
+
+
+def test_rate_limit_pauses_admission_and_halves_the_rate():
+    s = scheduler(capacity=1)
+    s.record_rate_limited(retry_after=0.3)
+
+    assert s.rate == pytest.approx(s.max_rate / 2)
+    ticket = s.enqueue("alice")
+    assert ticket.estimated_wait >= 0.25
+    with pytest.raises(LLMQueueTimeoutError):
+        s.wait(ticket, timeout=0.1)
+
+    ticket = s.enqueue("alice")
+    started = time.monotonic()
+    s.wait(ticket, timeout=2)
+    assert time.monotonic() - started >= 0.15
+
+    for _ in range(10):
+        s.record_success()
+    assert s.rate == pytest.approx(s.max_rate)
+
+
+def test_repeated_rate_limits_do_not_go_below_the_minimum_rate():
+    s = scheduler()
+    for _ in range(10):
+        s.record_rate_limited(retry_after=0.01)
+    assert s.rate == pytest.approx(s.min_rate)
+
+
+class RateLimitError(Exception):
+    def __init__(self, message, code=None, headers=None):
+        super().__init__(message)
+        self.code = code
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+def test_rate_limit_delay_reads_retry_after_and_retry_info():
+    assert LLMAdmissionScheduler.rate_limit_delay(RateLimitError("busy", 429, {"retry-after": "12"})) == 12.0
+    assert LLMAdmissionScheduler.rate_limit_delay(
+        RateLimitError("429 RESOURCE_EXHAUSTED {'retryDelay': '7s'}")) == 7.0
+    assert LLMAdmissionScheduler.rate_limit_delay(RateLimitError("quota", 429)) == 0.0
+    assert LLMAdmissionScheduler.rate_limit_delay(RateLimitError("server error", 500)) is None
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    s = scheduler(capacity=1)
+    s.tokens = 0
+    s.rate = s.min_rate = 1 / 3600
+
+    async def wait_then_cancel():
+        ticket = s.enqueue("alice")
+        task = asyncio.create_task(s.await_admission(ticket, timeout=None))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(wait_then_cancel())
+    assert s.get_stats()["queued"] == 0
+
+
+def test_cancel_event_releases_a_blocked_waiter():
+    s = scheduler(capacity=1)
+    s.tokens = 0
+    s.rate = s.min_rate = 1 / 3600
+    cancel = threading.Event()
+    ticket = s.enqueue("alice")
+    threading.Timer(0.05, cancel.set).start()
+
+    started = time.monotonic()
+    with pytest.raises(LLMQueueCancelledError):
+        s.wait(ticket, timeout=5, cancel=cancel)
+
+    assert time.monotonic() - started < 1
+    assert s.get_stats()["queued"] == 0
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_worker(code, metrics_dir):
+    """Run `code` in a fresh process (a gunicorn worker) sharing `metrics_dir`"""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir)}
+    result = subprocess.run([sys.executable, "-c", "from utils.MetricsUtils import MetricsUtils\n" + code],
+                            cwd=BACKEND, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_metrics_are_summed_over_worker_processes(tmp_path):
+    for _ in range(2):
+        run_worker("MetricsUtils.observe_stage('embed', 0.01)", tmp_path)
+
+    body = run_worker("print(MetricsUtils.render()[0].decode())", tmp_path)
+
+    assert 'rag_stage_duration_seconds_count{stage="embed"} 2.0' in body
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from config.rag_config import RagConfig
+from rag.partition_router import PartitionRouter
+from rag.qdrant_vector_store import QdrantVectorStore
+
+DIMENSION = 4
+
+
+@pytest.fixture(autouse=True)
+def small_index(monkeypatch):
+    monkeypatch.setattr(RagConfig, "VECTOR_DIMENSION", DIMENSION)
+    monkeypatch.setattr(RagConfig, "PARTITION_TOP_SPECIES", 1)
+    monkeypatch.setattr(RagConfig, "PARTITION_TOP_PARTITIONS", 1)
+    monkeypatch.setattr(RagConfig, "PARTITION_MIN_SIMILARITY", 0.8)
+    monkeypatch.setattr(RagConfig, "PARTITION_MIN_MARGIN", 0.02)
+
+
+def axis(i, noise=0.0):
+    vector = np.zeros(DIMENSION, dtype="float32")
+    vector[i] = 1.0
+    vector[(i + 1) % DIMENSION] = noise
+    return vector / np.linalg.norm(vector)
+
+
+def chunk(species, field):
+    return {"species": species, "partition": PartitionRouter.partition_key(species, field)}
+
+
+def build(router):
+    embeddings = np.stack([axis(0), axis(0, 0.1), axis(0, 0.2), axis(1), axis(2)])
+    metadata = [chunk("cobra", "venom"), chunk("cobra", "venom"), chunk("cobra", "habitat"),
+                chunk("python", "habitat"), chunk("krait", "venom")]
+    router.add(embeddings, metadata)
+    return embeddings, metadata
+
+
+def test_add_and_remove_keep_counts_and_centroids(tmp_path):
+    router = PartitionRouter(str(tmp_path / "partitions"))
+    embeddings, metadata = build(router)
+
+    assert router.species_counts == {"cobra": 3, "python": 1, "krait": 1}
+    assert router.partition_counts["cobra::venom"] == 2
+
+    router.remove(embeddings[3:4], metadata[3:4])
+
+    assert "python" not in router.species_counts
+    assert "python::habitat" not in router.partition_counts
+    assert router.get_stats() == {"ready": True, "species": 2, "partitions": 3, "chunks": 4}
+    np.testing.assert_allclose(router.species_sums["cobra"], embeddings[:3].sum(axis=0), rtol=1e-6)
+
+
+def test_route_picks_the_closest_species_partitions(tmp_path):
+    router = PartitionRouter(str(tmp_path / "partitions"))
+    build(router)
+
+    routing = router.route(axis(0), k=2)
+
+    assert routing["reason"] == "routed"
+    assert routing["species"] == ["cobra"]
+    assert routing["partitions"][0] == "cobra::venom"
+    # More chunks needed than the species holds -> global search
+    assert router.route(axis(0), k=10)["reason"] == "too_few_chunks"
+    assert PartitionRouter(str(tmp_path / "empty")).route(axis(0), k=2)["reason"] == "no_centroids"
+
+
+def test_matching_partitions_is_case_insensitive(tmp_path):
+    router = PartitionRouter(str(tmp_path / "partitions"))
+    assert router.matching_partitions(["cobra"]) is None
+    build(router)
+
+    assert router.matching_partitions(["Cobra"]) == ["cobra::habitat", "cobra::venom"]
+    assert router.matching_partitions(fields=["VENOM"]) == ["cobra::venom", "krait::venom"]
+    assert router.matching_partitions(["unknown"]) == []
+
+
+def test_save_and_load_round_trip_through_the_file(tmp_path):
+    router = PartitionRouter(str(tmp_path / "partitions"))
+    build(router)
+    router.save()
+
+    loaded = PartitionRouter(str(tmp_path / "partitions"))
+    assert loaded.load()
+    assert loaded.partition_counts == router.partition_counts
+    assert loaded.route(axis(0), k=2) == router.route(axis(0), k=2)
+
+
+@pytest.fixture
+def qdrant_store():
+    client = QdrantClient(":memory:")
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.client, store.collection_name, store.dimension = client, "router_test", DIMENSION
+    yield store
+    client.close()
+
+
+def test_hosts_without_the_file_load_the_centroids_from_the_collection(tmp_path, qdrant_store):
+    ingest_router = PartitionRouter(str(tmp_path / "ingest_host"), store=qdrant_store)
+    embeddings, metadata = build(ingest_router)
+    ingest_router.save()
+
+    api_router = PartitionRouter(str(tmp_path / "api_host"), store=qdrant_store)
+    assert api_router.load()
+    assert api_router.partition_counts == ingest_router.partition_counts
+    np.testing.assert_allclose(api_router.species_sums["cobra"], ingest_router.species_sums["cobra"], rtol=1e-6)
+    assert api_router.route(axis(0), k=2) == ingest_router.route(axis(0), k=2)
+
+    # Partitions emptied by a delta ingestion disappear from the collection too
+    ingest_router.remove(embeddings[3:4], metadata[3:4])
+    ingest_router.save()
+    assert api_router.load()
+    assert "python" not in api_router.species_counts
+
+
+def test_load_without_any_saved_centroids_reports_it(tmp_path, qdrant_store):
+    assert not PartitionRouter(str(tmp_path / "partitions"), store=qdrant_store).load()
@@ -0,0 +1,45 @@
+import json
+import os
+import threading
+import pytest
+from config.rag_config import RagConfig
+from utils.ProfilingUtils import PROFILE_HEADER, ProfilingUtils
+
+
+@pytest.fixture(autouse=True)
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(RagConfig, "PROFILING_ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(RagConfig, "PROFILING_OUTPUT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def profiled_request():
+    profile = ProfilingUtils.start("POST /chat/prompt", {PROFILE_HEADER: "secret"})
+    ProfilingUtils.record_stage("embed", 0.012)
+    return profile
+
+
+def test_finish_does_not_wait_for_the_profile_to_be_written(monkeypatch, profiling):
+    release = threading.Event()
+    save = ProfilingUtils._save
+
+    def slow_save(profile):
+        release.wait(5)
+        save(profile)
+
+    monkeypatch.setattr(ProfilingUtils, "_save", staticmethod(slow_save))
+    profile = profiled_request()
+
+    header = ProfilingUtils.finish(profile)
+
+    assert "embed;dur=12.0" in header
+    assert not os.path.exists(profiling / f"{profile.id}.json")
+    release.set()
+    ProfilingUtils.flush()
+    with open(profiling / f"{profile.id}.json", encoding="utf-8") as f:
+        assert json.load(f)["stages_ms"] == {"embed": 12.0}
+    assert os.path.exists(profiling / f"{profile.id}.folded")
+
+
+def test_requests_without_the_token_are_not_profiled():
+    assert ProfilingUtils.start("POST /chat/prompt", {PROFILE_HEADER: "wrong"}) is None
@@ -0,0 +1,97 @@
+import pytest
+from benchmarks.rerank_cascade_eval import sweep_thresholds
+from config.rag_config import RagConfig
+from rag.rerank_cascade import AdaptiveRerankCascade
+
+
+class FakeCrossEncoder:
+    """Scores from a fixed table; records how many passages it was asked to score"""
+
+    tokenizer_signature = "fake"
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.scored = []
+
+    def predict_scores(self, query, passages, passage_token_ids=None):
+        self.scored.append(list(passages))
+        return [self.scores[passage] for passage in passages]
+
+
+def candidates(*pairs):
+    return [(passage, score) for passage, score in pairs]
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(RagConfig, "RERANK_SKIP_DENSE_MARGIN", 0.1)
+    monkeypatch.setattr(RagConfig, "RERANK_SMALL_DECISIVE_MARGIN", 0.3)
+    monkeypatch.setattr(RagConfig, "RERANK_CASCADE_HEAD_EXTRA", 1)
+
+
+def test_no_more_candidates_than_top_k_are_reranked_by_the_large_model():
+    # Decisive dense margin, but with n <= top_k the order must still match the full rerank
+    large = FakeCrossEncoder({"a": 0.0, "b": 1.0})
+    cascade = AdaptiveRerankCascade(large, FakeCrossEncoder({"a": 0.0, "b": 1.0}))
+
+    results, decision = cascade.rerank("q", candidates(("a", 0.9), ("b", 0.5)), alpha=1.0, top_k=2)
+
+    assert decision["decision"] == "full_large"
+    assert [item[0] for item in results] == ["b", "a"]
+
+
+def test_decisive_dense_margin_keeps_the_retrieval_order():
+    large = FakeCrossEncoder({})
+    cascade = AdaptiveRerankCascade(large, FakeCrossEncoder({}))
+
+    results, decision = cascade.rerank("q", candidates(("a", 0.9), ("b", 0.5), ("c", 0.4)), top_k=2)
+
+    assert decision["decision"] == "dense_skip"
+    assert [item[0] for item in results] == ["a", "b"]
+    assert large.scored == []
+
+
+def test_decisive_small_margin_skips_the_large_model():
+    small = FakeCrossEncoder({"a": 0.1, "b": 0.9, "c": 1.0})
+    large = FakeCrossEncoder({})
+    cascade = AdaptiveRerankCascade(large, small)
+
+    results, decision = cascade.rerank("q", candidates(("a", 0.50), ("b", 0.48), ("c", 0.47)), alpha=1.0, top_k=2)
+
+    assert decision["decision"] == "small_only"
+    assert {item[0] for item in results} == {"b", "c"}
+    assert large.scored == []
+
+
+def test_ambiguous_head_goes_to_the_large_model():
+    small = FakeCrossEncoder({"a": 0.5, "b": 0.6, "c": 0.55, "d": 0.0})
+    large = FakeCrossEncoder({"a": 1.0, "b": 0.0, "c": 0.5})
+    cascade = AdaptiveRerankCascade(large, small)
+
+    results, decision = cascade.rerank(
+        "q", candidates(("a", 0.50), ("b", 0.49), ("c", 0.48), ("d", 0.47)), alpha=1.0, top_k=2)
+
+    assert decision["decision"] == "large_head"
+    assert sorted(large.scored[0]) == ["a", "b", "c"]  # top_k + RERANK_CASCADE_HEAD_EXTRA
+    assert [item[0] for item in results] == ["a", "c"]
+
+
+def test_sweep_recommends_the_cheapest_thresholds_meeting_the_target():
+    probes = [
+        # Dense skip is safe here
+        {"dense_margin": 0.20, "small_margin": 0.5,
+         "preserved": {"dense_skip": True, "small_only": True, "large_head": True},
+         "ms": {"dense_skip": 0.0, "small_only": 5.0, "large_head": 20.0}},
+        # Only the large model gets this one right
+        {"dense_margin": 0.05, "small_margin": 0.1,
+         "preserved": {"dense_skip": False, "small_only": False, "large_head": True},
+         "ms": {"dense_skip": 0.0, "small_only": 5.0, "large_head": 20.0}},
+    ]
+
+    grid, best = sweep_thresholds(probes, target_rate=1.0)
+
+    assert best["preservation_rate"] == 1.0
+    assert (best["skip_dense_margin"], best["mean_ms"]) == (0.2, 10.0)
+    assert best["small_decisive_margin"] in (0.5, None)
+    assert sweep_thresholds(probes, target_rate=1.1)[1] is None
+    assert any(row["skip_dense_margin"] is None and row["small_decisive_margin"] is None for row in grid)
@@ -0,0 +1,122 @@
+import asyncio
+from collections import OrderedDict
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from config.rag_config import RagConfig
+from rag.async_runtime import StageExecutors
+from rag.deadline import Deadline
+from rag.partition_router import PartitionRouter
+from services.RagService import RagService
+
+
+class FakeReranker:
+    """Cross-encoder that puts passages in reverse alphabetical order"""
+
+    tokenizer_signature = "fake"
+
+    def __init__(self):
+        self.calls = []
+
+    def rerank_with_original_scores(self, query, passages_with_scores, alpha=0.5, passage_token_ids=None):
+        self.calls.append([passage for passage, _ in passages_with_scores])
+        ranked = sorted(passages_with_scores, key=lambda item: item[0], reverse=True)
+        return [(passage, 1.0 - i / 10, 1.0 - i / 10, score) for i, (passage, score) in enumerate(ranked)]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(RagConfig, "USE_RERANKING", True)
+    service = RagService.__new__(RagService)
+    service.reranker = FakeReranker()
+    service.rerank_cascade = None
+    service.is_indexed = True
+    service.index_version = 0
+    service._retrieval_cache = OrderedDict()
+    return service
+
+
+def rank(service, texts, deadline):
+    scores = [1.0 - i / 100 for i in range(len(texts))]
+    metadata = [{"species": "a", "field": "b"} for _ in texts]
+    return service._rank_passages("q", texts, scores, metadata, deadline)
+
+
+def test_without_a_deadline_every_candidate_is_reranked(service):
+    items, rerank_info = rank(service, ["a", "b", "c"], Deadline(None))
+
+    assert rerank_info == {"reranking_used": True, "candidates": 3, "reranked": 3}
+    assert [item["text"] for item in items] == ["c", "b", "a"]
+
+
+def test_reranking_is_cut_to_what_fits_in_the_deadline(service, monkeypatch):
+    monkeypatch.setattr(RagConfig, "RERANK_ESTIMATED_MS_PER_PASSAGE", 100)
+
+    items, rerank_info = rank(service, [str(i) for i in range(10)], Deadline(350))
+
+    assert rerank_info["reranked"] == 3
+    assert [item["reranked"] for item in items] == [True] * 3 + [False] * 7
+
+
+class ShrinkingRanker:
+    """_arank_passages stand-in: each call runs out of budget and returns a different order"""
+
+    def __init__(self, size):
+        self.size = size
+        self.calls = 0
+
+    async def __call__(self, question, species, fields, deadline):
+        self.calls += 1
+        deadline.degrade("reduced_rerank", affordable_passages=self.size // 2, candidates=self.size)
+        texts = [f"p{i}" for i in range(self.size)]
+        if self.calls % 2 == 0:
+            texts.reverse()
+        return {"items": [{"rank": i + 1, "text": text} for i, text in enumerate(texts)],
+                "routing": {"partitions": None, "reason": "disabled"}, "rerank_info": {"reranking_used": True}}
+
+
+def test_pages_of_a_degraded_ranking_come_from_one_ranking(service):
+    ranker = service._arank_passages = ShrinkingRanker(6)
+
+    pages = [asyncio.run(service.aretrieve_passages("q", page=page, page_size=2)) for page in (1, 2, 3)]
+
+    texts = [item["text"] for page in pages for item in page["results"]]
+    assert sorted(texts) == [f"p{i}" for i in range(6)]
+    assert ranker.calls == 1
+    assert [page["cached"] for page in pages] == [False, True, True]
+
+
+def test_degraded_rankings_expire_after_their_ttl(service, monkeypatch):
+    monkeypatch.setattr(RagConfig, "RETRIEVAL_DEGRADED_CACHE_TTL_SECONDS", 0)
+    ranker = service._arank_passages = ShrinkingRanker(4)
+
+    asyncio.run(service.aretrieve_passages("q"))
+    result = asyncio.run(service.aretrieve_passages("q"))
+
+    assert ranker.calls == 2
+    assert result["cached"] is False
+
+
+class RecordingStore:
+    def __init__(self):
+        self.searches = []
+
+    async def asearch_with_metadata(self, query_embedding, k, partitions=None, filters=None):
+        self.searches.append({"partitions": partitions, "filters": filters})
+        return ["a", "b"], [0.9, 0.8], [{"species": "Rắn lục", "field": "Độc tính"}] * 2
+
+
+def test_filters_without_a_partition_index_go_into_the_store_query(service, monkeypatch):
+    monkeypatch.setattr(RagConfig, "RETRIEVAL_SLO_MS", None)
+    service.vector_store = RecordingStore()
+    service.partition_router = PartitionRouter()
+    service.stage_executors = StageExecutors()
+    service._embed_query = lambda question, deadline: [0.0]
+
+    result = asyncio.run(service.aretrieve_passages("q", species=["Rắn lục"]))
+
+    assert result["routing_info"]["reason"] == "filtered_global"
+    assert service.vector_store.searches == [{"partitions": None, "filters": {"species": ["Rắn lục"], "field": []}}]
+    assert result["total"] == 2
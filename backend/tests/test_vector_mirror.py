@@ -0,0 +1,98 @@
+import time
+import uuid
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointIdsList, PointStruct, VectorParams
+from rag.vector_mirror import LocalVectorMirror
+
+DIMENSION = 8
+COLLECTION = "mirror_test"
+
+
+def point(name, vector_seed, ingested_at=None):
+    payload = {"text": name, "partition": f"species::{name[0]}"}
+    if ingested_at is not False:
+        payload["ingested_at"] = ingested_at or time.time()
+    vector = np.random.default_rng(vector_seed).random(DIMENSION).tolist()
+    return PointStruct(id=str(uuid.uuid5(uuid.NAMESPACE_URL, name)), vector=vector, payload=payload)
+
+
+@pytest.fixture
+def client():
+    client = QdrantClient(":memory:")
+    client.create_collection(COLLECTION, vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def mirror(client, tmp_path):
+    return LocalVectorMirror(client, COLLECTION, DIMENSION, path=str(tmp_path / "mirror"))
+
+
+def mirrored_texts(mirror):
+    return sorted(mirror.texts)
+
+
+def test_refresh_drops_points_deleted_while_the_count_stays_the_same(client, mirror):
+    client.upsert(COLLECTION, [point(name, i) for i, name in enumerate(["a1", "a2", "b1"])])
+    mirror.full_sync()
+
+    # Delta: one chunk removed from one field, one added elsewhere -> same point count
+    client.delete(COLLECTION, points_selector=PointIdsList(points=[point("a2", 0).id]))
+    client.upsert(COLLECTION, [point("c1", 9)])
+    mirror.refresh()
+
+    assert mirrored_texts(mirror) == ["a1", "b1", "c1"]
+    texts, _, _ = mirror.search(np.ones(DIMENSION, dtype="float32"), k=10)
+    assert "a2" not in texts
+
+
+def test_refresh_updates_reingested_points(client, mirror):
+    client.upsert(COLLECTION, [point("a1", 1, ingested_at=time.time() - 3600)])
+    mirror.full_sync()
+    updated = point("a1", 2)
+    updated.payload["text"] = "a1 v2"
+    client.upsert(COLLECTION, [updated])
+
+    assert mirror.refresh() == 1
+    assert mirrored_texts(mirror) == ["a1 v2"]
+
+
+def test_refresh_falls_back_to_full_sync_for_points_without_timestamp(client, mirror):
+    client.upsert(COLLECTION, [point("a1", 1)])
+    mirror.full_sync()
+    client.upsert(COLLECTION, [point("b1", 2, ingested_at=False)])
+
+    mirror.refresh()
+    assert mirrored_texts(mirror) == ["a1", "b1"]
+
+
+def test_remove_drops_points_and_persists_the_snapshot(client, mirror, tmp_path):
+    client.upsert(COLLECTION, [point(name, i) for i, name in enumerate(["a1", "a2", "b1"])])
+    mirror.full_sync()
+
+    assert mirror.remove([point("a2", 0).id, "unknown"]) == 1
+    assert mirrored_texts(mirror) == ["a1", "b1"]
+    _, _, payloads = mirror.search(np.ones(DIMENSION, dtype="float32"), k=10, partitions=["species::a"])
+    assert [payload["text"] for payload in payloads] == ["a1"]
+
+    reloaded = LocalVectorMirror(client, COLLECTION, DIMENSION, path=str(tmp_path / "mirror"))
+    assert reloaded.load()
+    assert mirrored_texts(reloaded) == ["a1", "b1"]
+
+
+def test_search_applies_payload_filters(client, mirror):
+    points = [point(name, i) for i, name in enumerate(["a1", "a2", "b1"])]
+    for p in points:
+        p.payload["field"] = "toxicity" if p.payload["text"] == "a2" else "habitat"
+    client.upsert(COLLECTION, points)
+    mirror.full_sync()
+    query = np.ones(DIMENSION, dtype="float32")
+
+    _, _, payloads = mirror.search(query, k=10, filters={"field": ["habitat"]})
+    assert sorted(payload["text"] for payload in payloads) == ["a1", "b1"]
+    _, _, payloads = mirror.search(query, k=10, partitions=["species::a"], filters={"field": ["habitat"]})
+    assert [payload["text"] for payload in payloads] == ["a1"]
+    assert mirror.search(query, k=10, filters={"field": ["unknown"]}) == ([], [], [])
@@ -0,0 +1,105 @@
+import uuid
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+from config.rag_config import RagConfig
+from rag.qdrant_vector_store import QdrantVectorStore
+from rag.vector_store import FAISSVectorStore
+
+DIMENSION = RagConfig.VECTOR_DIMENSION
+
+
+def chunks(n_common=40):
+    """Many "common" chunks close to the query, one "rare" chunk far from it"""
+    rng = np.random.default_rng(0)
+    query = np.ones(DIMENSION, dtype="float32")
+    common = query + 0.1 * rng.standard_normal((n_common, DIMENSION)).astype("float32")
+    rare = -query + 0.1 * rng.standard_normal((1, DIMENSION)).astype("float32")
+    texts = [f"common {i}" for i in range(n_common)] + ["rare"]
+    metadata = [{"species": "common", "field": "habitat"} for _ in range(n_common)]
+    metadata.append({"species": "rare", "field": "habitat"})
+    return query, np.vstack([common, rare]), texts, metadata
+
+
+def test_faiss_filters_inside_the_search_not_after_it():
+    query, embeddings, texts, metadata = chunks()
+    store = FAISSVectorStore()
+    store.add_embeddings(embeddings, texts, metadata)
+
+    # The rare chunk is last globally; a post-filtered top-10 would miss it
+    found, _, found_metadata = store.search_with_metadata(query, 10, filters={"species": ["rare"]})
+
+    assert found == ["rare"]
+    assert found_metadata[0]["species"] == "rare"
+    assert store.search_with_metadata(query, 10, filters={"species": ["missing"]}) == ([], [], [])
+
+
+def test_faiss_filters_match_every_key_and_skip_deleted_chunks():
+    query, embeddings, texts, metadata = chunks(3)
+    metadata[0]["field"] = "toxicity"
+    store = FAISSVectorStore()
+    store.add_embeddings(embeddings, texts, metadata, ids=[f"id{i}" for i in range(len(texts))])
+    store.delete_embeddings(["id1"])
+
+    found, _, _ = store.search_with_metadata(query, 10, filters={"species": ["common"], "field": ["habitat"]})
+
+    assert found == ["common 2"]
+
+
+def test_faiss_upserts_are_compacted_on_save(tmp_path):
+    query, embeddings, texts, metadata = chunks(3)
+    for chunk_metadata in metadata:
+        chunk_metadata["partition"] = f"{chunk_metadata['species']}::habitat"
+    ids = [f"id{i}" for i in range(len(texts))]
+    store = FAISSVectorStore()
+    store.add_embeddings(embeddings, texts, metadata, ids=ids)
+    for _ in range(3):  # daily deltas re-uploading the same chunks
+        store.add_embeddings(embeddings[:2], ["common 0 v2", "common 1 v2"], [dict(m) for m in metadata[:2]], ids=ids[:2])
+    store.delete_embeddings(["id3"])
+
+    assert len(store.texts) == 10
+    assert store.partition_ids == {"common::habitat": [2, 8, 9]}
+    store.save_index(str(tmp_path / "index"))
+
+    assert store.texts == ["common 2", "common 0 v2", "common 1 v2"]
+    assert store.chunk_rows == {"id2": 0, "id0": 1, "id1": 2}
+    assert store.partition_ids == {"common::habitat": [0, 1, 2]}
+    found, scores, _ = store.search_with_metadata(embeddings[1], 1)
+    assert found == ["common 1 v2"] and scores[0] == pytest.approx(1.0, abs=1e-5)
+    loaded = FAISSVectorStore()
+    assert loaded.load_index(str(tmp_path / "index"))
+    assert loaded.texts == store.texts and loaded.index.ntotal == 3
+
+
+@pytest.fixture
+def qdrant_store():
+    client = QdrantClient(":memory:")
+    client.create_collection("filters", vectors_config=VectorParams(size=DIMENSION, distance=Distance.COSINE))
+    query, embeddings, texts, metadata = chunks()
+    client.upsert("filters", [
+        PointStruct(id=str(uuid.uuid4()), vector=vector.tolist(), payload={"text": text, **meta})
+        for vector, text, meta in zip(embeddings, texts, metadata)
+    ])
+    store = QdrantVectorStore.__new__(QdrantVectorStore)
+    store.client, store.collection_name, store.search_params = client, "filters", None
+    yield store, query
+    client.close()
+
+
+def test_qdrant_query_carries_the_payload_filter(qdrant_store):
+    store, query = qdrant_store
+
+    points = store.client.query_points(**store._query_request(query, 10, None, {"species": ["rare"], "field": []})).points
+
+    assert [point.payload["text"] for point in points] == ["rare"]
+
+
+def test_qdrant_iter_embeddings_pages_through_every_point(qdrant_store):
+    store, _ = qdrant_store
+    store.dimension = DIMENSION
+
+    batches = list(store.iter_embeddings(batch_size=16))
+
+    assert [len(embeddings) for embeddings, _ in batches] == [16, 16, 9]
+    assert sum(payload["species"] == "rare" for _, payloads in batches for payload in payloads) == 1
@@ -0,0 +1,26 @@
+import gc
+import os
+import psutil
+
+
+class MemoryUtils:
+    @staticmethod
+    def process_memory() -> dict:
+        """
+        Memory of the current (worker) process in MB.
+        uss = pages only this process uses (what one more worker costs), pss = rss with shared
+        pages split between the processes sharing them; rss counts shared pages in full.
+        """
+        process = psutil.Process(os.getpid())
+        info = process.memory_full_info()
+        mb = 1024 * 1024
+        memory = {
+            "pid": process.pid,
+            "rss_mb": round(info.rss / mb, 1),
+            "uss_mb": round(info.uss / mb, 1),
+            "gc_frozen_objects": gc.get_freeze_count()
+        }
+        if hasattr(info, "pss"):  # Linux only
+            memory["pss_mb"] = round(info.pss / mb, 1)
+            memory["shared_mb"] = round((info.rss - info.uss) / mb, 1)
+        return memory
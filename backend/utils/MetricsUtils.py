@@ -0,0 +1,241 @@
+import os
+import time
+from contextlib import contextmanager
+from prometheus_client import (Counter, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from config.rag_config import RagConfig
+from utils.ProfilingUtils import ProfilingUtils
+
+# Latency buckets (seconds): ms-level model stages up to multi-second LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# Collectors reading this process's live state (queues, caches, CPU budget) at scrape time
+_PROCESS_COLLECTORS = []
+
+RAG_STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Duration of one RAG pipeline stage",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+RAG_QUERY_SECONDS = Histogram(
+    "rag_query_duration_seconds", "End-to-end RAG query duration",
+    ["mode", "outcome"], buckets=LATENCY_BUCKETS
+)
+RAG_RETRIEVAL_SECONDS = Histogram(
+    "rag_retrieval_duration_seconds", "End-to-end retrieval-only request duration (no LLM)",
+    ["outcome", "cache"], buckets=LATENCY_BUCKETS
+)
+RAG_RETRIEVAL_SLO = Counter(
+    "rag_retrieval_slo_total", "Retrieval-only requests by whether they finished within RETRIEVAL_SLO_MS",
+    ["result"]
+)
+RAG_BATCH_SIZE = Histogram(
+    "rag_batch_size", "Number of items processed in one model call",
+    ["stage"], buckets=BATCH_BUCKETS
+)
+IMAGE_STAGE_SECONDS = Histogram(
+    "image_stage_duration_seconds", "Duration of one image classification stage",
+    ["stage", "model"], buckets=LATENCY_BUCKETS
+)
+IMAGE_PREDICTIONS = Counter(
+    "image_predictions_total", "Image classification requests",
+    ["model", "outcome"]
+)
+MONGO_OPERATION_SECONDS = Histogram(
+    "mongo_operation_duration_seconds", "Duration of one MongoDB operation",
+    ["collection", "operation", "outcome"], buckets=LATENCY_BUCKETS
+)
+
+
+class _RagPipelineCollector:
+    """Reads queue depths, cache and provider counters from RagService stats at scrape time"""
+
+    def __init__(self, rag_service):
+        self.rag_service = rag_service
+
+    def describe(self):
+        # Metric names are dynamic; don't collect at registration time
+        return []
+
+    def collect(self):
+        # Component stats only: vector_store.get_stats() would call Qdrant on every scrape
+        service = self.rag_service
+
+        info = GaugeMetricFamily(
+            "rag_index_info", "Models and index version currently served",
+            labels=["index_version", "vector_store", "embedding_model", "cross_encoder_model", "llm_model"]
+        )
+        info.add_metric([
+            str(service.index_version),
+            type(service.vector_store).__name__,
+            RagConfig.EMBEDDING_MODEL,
+            RagConfig.CROSS_ENCODER_MODEL if service.reranker is not None else "",
+            RagConfig.LLM_MODEL
+        ], 1)
+        yield info
+
+        queue = service.llm_scheduler.get_stats()
+        yield GaugeMetricFamily("rag_llm_queue_depth", "Requests waiting for LLM admission", value=queue["queued"])
+        yield GaugeMetricFamily("rag_llm_admission_rate_per_minute", "Current adaptive LLM admission rate",
+                                value=queue["rate_per_minute"])
+        admissions = CounterMetricFamily("rag_llm_admissions", "LLM admission outcomes", labels=["result"])
+        for result in ("admitted", "rejected_full", "timeouts", "rate_limited"):
+            admissions.add_metric([result], queue[result])
+        yield admissions
+
+        pending = GaugeMetricFamily("rag_stage_executor_pending", "Tasks running or queued per CPU stage",
+                                    labels=["stage"])
+        for stage, executor in service.stage_executors.get_stats().items():
+            pending.add_metric([stage], executor["pending"])
+        yield pending
+
+        if service.answer_cache is not None:
+            cache = service.answer_cache.get_stats()
+            lookups = CounterMetricFamily("rag_answer_cache_lookups", "Answer cache lookups", labels=["status"])
+            for status in ("hits", "misses", "coalesced"):
+                lookups.add_metric([status], cache[status])
+            yield lookups
+            yield GaugeMetricFamily("rag_answer_cache_hit_ratio", "Answer cache hits (incl. coalesced) / lookups",
+                                    value=cache["hit_rate"])
+            yield GaugeMetricFamily("rag_answer_cache_entries", "Answer cache size", value=cache["size"])
+
+        providers = CounterMetricFamily("rag_llm_provider_calls", "LLM provider calls",
+                                        labels=["provider", "result"])
+        for name, provider in service.llm.get_stats().items():
+            for result in ("requests", "errors", "wins", "hedged_requests", "fallback_requests", "cancelled"):
+                providers.add_metric([name, result], provider[result])
+        yield providers
+
+        if service.rerank_cascade is not None:
+            cascade = service.rerank_cascade.get_stats()
+            decisions = CounterMetricFamily("rag_rerank_cascade_decisions", "Rerank cascade decisions",
+                                            labels=["decision"])
+            for decision in ("dense_skip", "small_only", "large_head", "full_large"):
+                decisions.add_metric([decision], cascade[decision])
+            yield decisions
+
+
+class _InferenceRuntimeCollector:
+    """CPU budget, intra-op threads and per-model queue / utilization of the shared inference runtime"""
+
+    def __init__(self, runtime):
+        self.runtime = runtime
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        stats = self.runtime.get_stats()
+        yield GaugeMetricFamily("inference_cpu_budget", "Cores shared by the local models", value=stats["cpu_budget"])
+        yield GaugeMetricFamily("inference_intra_op_threads", "Torch intra-op threads (process-wide)",
+                                value=stats["intra_op_threads"])
+
+        running = GaugeMetricFamily("inference_running", "Model calls holding a lane", labels=["model"])
+        queued = GaugeMetricFamily("inference_queued", "Model calls waiting for a lane", labels=["model", "priority"])
+        completed = CounterMetricFamily("inference_calls", "Completed model calls", labels=["model", "priority"])
+        utilization = GaugeMetricFamily("inference_utilization_ratio",
+                                        "Busy lane time / window (INFERENCE_UTILIZATION_WINDOW)", labels=["model"])
+        busy = CounterMetricFamily("inference_busy_seconds", "Time model lanes were busy", labels=["model"])
+        for model, m in stats["models"].items():
+            running.add_metric([model], m["running"])
+            for priority in ("interactive", "bulk"):
+                queued.add_metric([model, priority], m[f"queued_{priority}"])
+                completed.add_metric([model, priority], m[f"completed_{priority}"])
+            utilization.add_metric([model], m["utilization"])
+            busy.add_metric([model], m["busy_seconds"])
+        yield from (running, queued, completed, utilization, busy)
+
+
+class MetricsUtils:
+    @staticmethod
+    @contextmanager
+    def time_stage(stage: str):
+        """Observe the duration of a RAG pipeline stage (embed, search, rerank, llm...)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            RAG_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+            ProfilingUtils.record_stage(stage, seconds)
+
+    @staticmethod
+    @contextmanager
+    def time_mongo(collection: str, operation: str):
+        """Observe the duration and outcome of a MongoDB operation"""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            MONGO_OPERATION_SECONDS.labels(collection=collection, operation=operation, outcome=outcome) \
+                .observe(time.perf_counter() - start)
+
+    @staticmethod
+    @contextmanager
+    def time_image_stage(stage: str, model: str):
+        """Observe the duration of an image classification stage (decode, infer)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            IMAGE_STAGE_SECONDS.labels(stage=stage, model=model).observe(seconds)
+            ProfilingUtils.record_stage(f"image_{stage}", seconds)
+
+    @staticmethod
+    def observe_stage(stage: str, seconds: float):
+        RAG_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        ProfilingUtils.record_stage(stage, seconds)
+
+    @staticmethod
+    def observe_query(mode: str, seconds: float, result: dict):
+        """Observe an end-to-end query (outcome "error" when the result carries an error)"""
+        outcome = "error" if "error" in result else "ok"
+        RAG_QUERY_SECONDS.labels(mode=mode, outcome=outcome).observe(seconds)
+
+    @staticmethod
+    def observe_retrieval(seconds: float, result: dict, cached: bool):
+        """Observe a retrieval-only request and whether it met RETRIEVAL_SLO_MS (always met without an SLO)"""
+        outcome = "error" if "error" in result else "ok"
+        RAG_RETRIEVAL_SECONDS.labels(outcome=outcome, cache="hit" if cached else "miss").observe(seconds)
+        slo_ms = RagConfig.RETRIEVAL_SLO_MS
+        RAG_RETRIEVAL_SLO.labels(result="met" if slo_ms is None or seconds * 1000 <= slo_ms else "missed").inc()
+
+    @staticmethod
+    def observe_batch(stage: str, size: int):
+        RAG_BATCH_SIZE.labels(stage=stage).observe(size)
+
+    @staticmethod
+    def register_rag_service(rag_service):
+        """Export the pipeline's queue / cache / provider stats on /metrics"""
+        MetricsUtils._register_process_collector(_RagPipelineCollector(rag_service))
+
+    @staticmethod
+    def register_inference_runtime(runtime):
+        """Export per-model CPU budget / queue / utilization on /metrics"""
+        MetricsUtils._register_process_collector(_InferenceRuntimeCollector(runtime))
+
+    @staticmethod
+    def _register_process_collector(collector):
+        _PROCESS_COLLECTORS.append(collector)
+        REGISTRY.register(collector)
+
+    @staticmethod
+    def render() -> tuple:
+        """
+        Prometheus exposition: (body, content type)
+
+        Single process: the default registry. Under gunicorn (PROMETHEUS_MULTIPROC_DIR set by
+        gunicorn.conf.py) the counters and histograms are summed over all workers' files; the
+        live queue / cache / runtime stats are those of the worker serving the scrape.
+        """
+        if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _PROCESS_COLLECTORS:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
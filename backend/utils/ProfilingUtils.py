@@ -0,0 +1,254 @@
+import json
+import os
+import queue
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from config.rag_config import RagConfig
+
+PROFILE_HEADER = "X-Profile-Token"
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Leaf frames in these files mean the thread is parked (idle pool worker, event loop select)
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "thread.py", "base_events.py")
+
+_current: ContextVar = ContextVar("request_profile", default=None)
+_active = 0  # Profiled requests in flight; stage hooks return immediately while it is 0
+
+
+class RequestProfile:
+    """Stage timings and stack samples of one profiled request"""
+
+    def __init__(self, name: str, reason: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+        self.name = name
+        self.reason = reason           # "header" or "sampled"
+        self.started = time.perf_counter()
+        self.stages = []               # (stage, seconds); appended from executor threads too
+        self.samples = Counter()       # folded stack -> count
+        self.total = None
+        self.token = None              # ContextVar token, reset when the request finishes
+
+    def stage_totals(self) -> dict:
+        """Seconds per stage name (stages that ran several times are summed)"""
+        totals = {}
+        for stage, seconds in list(self.stages):
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+
+class _Sampler:
+    """
+    Statistical profiler: a daemon thread snapshots every thread's stack each
+    PROFILING_INTERVAL while at least one request is profiled.
+
+    Concurrent requests share the worker threads, so samples taken while several profiled
+    or unprofiled requests are in flight can include their frames too; the stage timings
+    are exact per request.
+    """
+
+    def __init__(self, interval: float = RagConfig.PROFILING_INTERVAL):
+        self.interval = interval
+        self.profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self.profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            self.profiles.discard(profile)
+
+    def _run(self):
+        own = threading.get_ident()
+        while True:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._fold(frame)
+                if stack is not None:
+                    stacks.append(f"{names.get(ident, ident)};{stack}")
+            # Under the lock: once remove() returns, the profile's samples no longer change
+            with self._lock:
+                if not self.profiles:
+                    self._thread = None
+                    return
+                for profile in self.profiles:
+                    profile.samples.update(stacks)
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _fold(frame) -> Optional[str]:
+        """Root-to-leaf "func (file:line)" frames joined by ';', None for an idle thread"""
+        frames = []
+        in_app = False
+        leaf_file = os.path.basename(frame.f_code.co_filename)
+        while frame is not None and len(frames) < 128:
+            code = frame.f_code
+            in_app = in_app or (code.co_filename.startswith(_APP_ROOT) and "site-packages" not in code.co_filename)
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if not in_app and leaf_file in _IDLE_FILES:
+            return None
+        return ";".join(reversed(frames))
+
+
+class _ProfileWriter:
+    """
+    Writes finished profiles from a daemon thread: finish() runs on the event loop,
+    where the file writes and the directory scan of _save would block every request.
+    """
+
+    def __init__(self, max_pending: int = RagConfig.PROFILING_MAX_FILES):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, profile: RequestProfile):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-writer", daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(profile)
+        except queue.Full:
+            print(f"Warning: profile writer is behind, dropping profile {profile.id}")
+
+    def flush(self):
+        """Block until every submitted profile is written (tests, shutdown)"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            profile = self._queue.get()
+            try:
+                ProfilingUtils._save(profile)
+            except OSError as e:
+                print(f"Warning: could not save profile {profile.id}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+_sampler = _Sampler()
+_writer = _ProfileWriter()
+
+
+class ProfilingUtils:
+    @staticmethod
+    def start(name: str, headers) -> Optional[RequestProfile]:
+        """
+        Start profiling the current request if it asks for it (admin token header) or is sampled
+
+        Args:
+            name: Label stored with the profile (e.g. "POST /chat/prompt")
+            headers: Request headers
+
+        Returns:
+            RequestProfile, or None when the request is not profiled
+        """
+        global _active
+        token = RagConfig.PROFILING_ADMIN_TOKEN
+        if token and secrets.compare_digest(headers.get(PROFILE_HEADER, ""), token):
+            reason = "header"
+        elif RagConfig.PROFILING_SAMPLE_RATE > 0 and random.random() < RagConfig.PROFILING_SAMPLE_RATE:
+            reason = "sampled"
+        else:
+            return None
+
+        profile = RequestProfile(name, reason)
+        # The ContextVar follows the request into asyncio.to_thread / StageExecutors threads
+        profile.token = _current.set(profile)
+        _active += 1
+        _sampler.add(profile)
+        return profile
+
+    @staticmethod
+    def record_stage(stage: str, seconds: float):
+        """Add a stage timing to the current request's profile (no-op when nothing is profiled)"""
+        if not _active:
+            return
+        profile = _current.get()
+        if profile is not None:
+            profile.stages.append((stage, seconds))
+
+    @staticmethod
+    def finish(profile: RequestProfile) -> str:
+        """
+        Stop profiling, queue the profile for writing (in a background thread) and build
+        its Server-Timing header
+
+        Args:
+            profile: Profile returned by start()
+
+        Returns:
+            Server-Timing header value
+        """
+        global _active
+        profile.total = time.perf_counter() - profile.started
+        _sampler.remove(profile)
+        _active -= 1
+        try:
+            _current.reset(profile.token)
+        except ValueError:
+            pass  # finished from another context
+        _writer.submit(profile)
+        return ProfilingUtils.server_timing(profile)
+
+    @staticmethod
+    def flush():
+        """Wait until every finished profile is written to PROFILING_OUTPUT_DIR"""
+        _writer.flush()
+
+    @staticmethod
+    def server_timing(profile: RequestProfile) -> str:
+        """Server-Timing header: one entry per stage (ms), the total and the profile id"""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in profile.stage_totals().items()]
+        entries.append(f"total;dur={profile.total * 1000:.1f}")
+        entries.append(f'profile;desc="{profile.id}"')
+        return ", ".join(entries)
+
+    @staticmethod
+    def _save(profile: RequestProfile):
+        """
+        Write <id>.folded (collapsed stacks for flamegraph.pl / speedscope) and <id>.json
+        (stage timings), then drop the oldest profiles beyond PROFILING_MAX_FILES
+        """
+        directory = RagConfig.PROFILING_OUTPUT_DIR
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, profile.id)
+        with open(f"{base}.folded", "w", encoding="utf-8") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(f"{base}.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "id": profile.id,
+                "request": profile.name,
+                "reason": profile.reason,
+                "total_ms": round(profile.total * 1000, 1),
+                "stages_ms": {stage: round(s * 1000, 1) for stage, s in profile.stage_totals().items()},
+                "samples": sum(profile.samples.values()),
+                "sample_interval_ms": _sampler.interval * 1000
+            }, f, indent=2)
+
+        profiles = sorted(
+            (entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in profiles[:max(0, len(profiles) - RagConfig.PROFILING_MAX_FILES)]:
+            for path in (entry.path, entry.path[:-len(".json")] + ".folded"):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass